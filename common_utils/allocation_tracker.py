@@ -0,0 +1,205 @@
+"""
+Module to measure how much memory each frame allocates,
+and how often (and for how long) the garbage collector
+runs as a result.
+
+A collection pauses every thread, so on the Pi they
+show up as a visible stutter in the HUD.
+"""
+
+import gc
+import time
+import tracemalloc
+
+from common_utils.task_timer import RollingStats
+
+# tracemalloc.reset_peak() arrived in Python 3.9.
+# Without it only the net change for a frame can be measured.
+__CAN_RESET_PEAK__ = hasattr(tracemalloc, 'reset_peak')
+
+
+class AllocationTracker(object):
+    """
+    Tracks the allocations made by each frame, and the garbage collections.
+
+    The collection tracking uses `gc.callbacks` and is cheap enough to
+    leave on. The allocation tracking uses `tracemalloc`, which slows
+    every allocation down, so it is only turned on when asked for.
+    """
+
+    def __init__(
+        self,
+        window_size: int = 120
+    ):
+        self.__window_size__ = window_size
+
+        self.__is_tracing__ = False
+        self.__is_monitoring_gc__ = False
+
+        self.__frame_start_bytes__ = 0
+        self.__frame_start_objects__ = 0
+        self.__frame_start_collections__ = 0
+        self.__gc_start_time__ = None
+
+        self.__collections__ = [0, 0, 0]
+        self.__collection_count__ = 0
+
+        self.__allocated_bytes__ = RollingStats('FrameAllocatedBytes', window_size)
+        self.__retained_bytes__ = RollingStats('FrameRetainedBytes', window_size)
+        self.__tracked_objects__ = RollingStats('FrameTrackedObjects', window_size)
+        self.__gc_pauses__ = RollingStats('GcPauseMs', window_size)
+
+        self.last_frame = None
+
+    def start(
+        self,
+        trace_allocations: bool = True
+    ):
+        """
+        Starts watching the garbage collector, and optionally
+        tracing every allocation.
+
+        Args:
+            trace_allocations (bool, optional): Should tracemalloc be started? Defaults to True.
+        """
+
+        if not self.__is_monitoring_gc__:
+            gc.callbacks.append(self.__on_gc__)
+            self.__is_monitoring_gc__ = True
+
+        if trace_allocations and not self.__is_tracing__:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+            self.__is_tracing__ = True
+
+    def stop(
+        self
+    ):
+        if self.__is_monitoring_gc__:
+            gc.callbacks.remove(self.__on_gc__)
+            self.__is_monitoring_gc__ = False
+
+        if self.__is_tracing__:
+            tracemalloc.stop()
+            self.__is_tracing__ = False
+
+    def is_tracing(
+        self
+    ) -> bool:
+        """
+        Is every allocation being traced?
+        """
+
+        return self.__is_tracing__
+
+    def begin_frame(
+        self
+    ):
+        """
+        Marks the start of the work for a frame.
+        """
+
+        if not self.__is_tracing__:
+            return
+
+        self.__frame_start_collections__ = self.__collection_count__
+        self.__frame_start_objects__ = gc.get_count()[0]
+
+        if __CAN_RESET_PEAK__:
+            tracemalloc.reset_peak()
+
+        self.__frame_start_bytes__ = tracemalloc.get_traced_memory()[0]
+
+    def end_frame(
+        self
+    ):
+        """
+        Marks the end of the work for a frame and records what it allocated.
+        """
+
+        if not self.__is_tracing__:
+            return
+
+        current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        tracked_objects = gc.get_count()[0]
+
+        allocated_bytes = (peak_bytes if __CAN_RESET_PEAK__ else current_bytes) - self.__frame_start_bytes__
+        retained_bytes = current_bytes - self.__frame_start_bytes__
+        collections = self.__collection_count__ - self.__frame_start_collections__
+
+        self.last_frame = {
+            'allocated_bytes': max(0, allocated_bytes),
+            'retained_bytes': retained_bytes,
+            # A collection resets the count, so the change is only known without one.
+            'tracked_objects': (tracked_objects - self.__frame_start_objects__) if collections == 0 else None,
+            'collections': collections
+        }
+
+        self.__allocated_bytes__.push(self.last_frame['allocated_bytes'])
+        self.__retained_bytes__.push(retained_bytes)
+
+        if collections == 0:
+            self.__tracked_objects__.push(self.last_frame['tracked_objects'])
+
+    def get_report(
+        self
+    ) -> dict:
+        """
+        Returns the allocation and collection statistics in a form that can be serialized into JSON.
+
+        Returns:
+            dict: Allocation stats per frame (if tracing), and the collection counts and pauses.
+        """
+
+        report = {
+            'tracing': self.__is_tracing__,
+            'gc': {
+                'collections': {
+                    'gen0': self.__collections__[0],
+                    'gen1': self.__collections__[1],
+                    'gen2': self.__collections__[2]
+                },
+                'pause_ms': self.__gc_pauses__.to_dict(),
+                'frozen': gc.get_freeze_count(),
+                'thresholds': list(gc.get_threshold())
+            }
+        }
+
+        if self.__is_tracing__:
+            report['allocated_bytes'] = self.__allocated_bytes__.to_dict()
+            report['retained_bytes'] = self.__retained_bytes__.to_dict()
+            report['tracked_objects'] = self.__tracked_objects__.to_dict()
+
+        return report
+
+    def reset(
+        self
+    ):
+        self.__collections__ = [0, 0, 0]
+        self.__allocated_bytes__.reset()
+        self.__retained_bytes__.reset()
+        self.__tracked_objects__.reset()
+        self.__gc_pauses__.reset()
+
+    def __on_gc__(
+        self,
+        phase: str,
+        info: dict
+    ):
+        if phase == 'start':
+            self.__gc_start_time__ = time.perf_counter()
+
+            return
+
+        if self.__gc_start_time__ is None:
+            return
+
+        self.__gc_pauses__.push((time.perf_counter() - self.__gc_start_time__) * 1000.0)
+        self.__gc_start_time__ = None
+
+        self.__collections__[info['generation']] += 1
+        self.__collection_count__ += 1
+
+
+INSTANCE = AllocationTracker()
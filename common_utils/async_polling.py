@@ -0,0 +1,559 @@
+"""
+Module to poll the HTTP/JSON endpoints that feed the HUD
+from a single asyncio event loop.
+
+Every endpoint keeps one persistent (keep-alive) connection
+and is polled on its own schedule. The requests are all in
+flight at the same time on one thread, instead of each
+endpoint blocking a thread while it waits on the network.
+
+Decoded responses are handed to a callback on the event
+loop thread. The callback should only publish the data
+(such as into a `DataCache`) and return.
+
+To try it against a local stand-in for the Stratux,
+traffic manager and Aithre services:
+
+    python3 -m common_utils.async_polling
+"""
+
+import asyncio
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+from common_utils import endpoint_health
+from common_utils.task_timer import RollingStats
+
+# How long to wait for a response if the endpoint does not say.
+DEFAULT_TIMEOUT = 1.0
+
+# The most header bytes we will read before giving up on a response.
+MAX_HEADER_BYTES = 64 * 1024
+
+# The least time to wait between looking at an endpoint,
+# so a misbehaving schedule can not spin the event loop.
+MIN_POLL_WAIT = 0.001
+
+
+class HttpResponseError(Exception):
+    """
+    Raised when an endpoint returns something other than a successful response.
+    """
+    pass
+
+
+class AsyncHttpConnection(object):
+    """
+    A persistent HTTP/1.1 connection to one host.
+
+    Only supports what the HUD's services use: GET requests
+    returning bodies sized by Content-Length, chunked
+    transfer encoding, or by closing the connection.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int
+    ):
+        self.__host__ = host
+        self.__port__ = port
+        self.__host_header__ = host if port == 80 else "{}:{}".format(host, port)
+
+        self.__reader__ = None
+        self.__writer__ = None
+
+        self.connect_count = 0
+
+    def is_connected(
+        self
+    ) -> bool:
+        return self.__writer__ is not None
+
+    async def get_json(
+        self,
+        path: str
+    ):
+        """
+        Sends a GET for the path and decodes the JSON response.
+        A connection that has gone stale since the last request
+        is re-opened and the request retried once.
+
+        Args:
+            path (str): The path (and query) to request.
+
+        Returns:
+            The decoded JSON.
+        """
+
+        was_connected = self.is_connected()
+
+        try:
+            body = await self.__get__(path)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.close()
+
+            if not was_connected:
+                raise
+
+            # The server may have closed an idle keep-alive connection.
+            body = await self.__get__(path)
+
+        return json.loads(body.decode('utf-8')) if body else None
+
+    def close(
+        self
+    ):
+        if self.__writer__ is not None:
+            try:
+                self.__writer__.close()
+            except Exception:
+                pass
+
+        self.__reader__ = None
+        self.__writer__ = None
+
+    async def __get__(
+        self,
+        path: str
+    ) -> bytes:
+        if not self.is_connected():
+            self.__reader__, self.__writer__ = await asyncio.open_connection(
+                self.__host__,
+                self.__port__)
+            self.connect_count += 1
+
+        request = "GET {} HTTP/1.1\r\nHost: {}\r\nAccept: application/json\r\nConnection: keep-alive\r\n\r\n".format(
+            path,
+            self.__host_header__)
+
+        self.__writer__.write(request.encode('ascii'))
+        await self.__writer__.drain()
+
+        status_code, headers = await self.__read_head__()
+        body = await self.__read_body__(headers)
+
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+
+        if status_code < 200 or status_code >= 300:
+            raise HttpResponseError("{} returned {}".format(path, status_code))
+
+        return body
+
+    async def __read_head__(
+        self
+    ) -> tuple:
+        """
+        Reads the status line and headers.
+
+        Returns:
+            tuple: The status code, and the headers with lower case names.
+        """
+
+        head = await self.__reader__.readuntil(b'\r\n\r\n')
+
+        if len(head) > MAX_HEADER_BYTES:
+            raise HttpResponseError("Response headers are too large")
+
+        lines = head.decode('iso-8859-1').split('\r\n')
+        status_parts = lines[0].split(' ', 2)
+
+        if len(status_parts) < 2 or not status_parts[0].startswith('HTTP/'):
+            raise HttpResponseError("Malformed status line '{}'".format(lines[0]))
+
+        headers = {}
+
+        for line in lines[1:]:
+            if ':' not in line:
+                continue
+
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+
+        return int(status_parts[1]), headers
+
+    async def __read_body__(
+        self,
+        headers: dict
+    ) -> bytes:
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            chunks = []
+
+            while True:
+                size_line = await self.__reader__.readuntil(b'\r\n')
+                chunk_size = int(size_line.split(b';', 1)[0].strip(), 16)
+
+                if chunk_size == 0:
+                    # Skip any trailers
+                    while (await self.__reader__.readuntil(b'\r\n')) != b'\r\n':
+                        pass
+
+                    return b''.join(chunks)
+
+                chunks.append(await self.__reader__.readexactly(chunk_size))
+                await self.__reader__.readexactly(2)
+
+        if 'content-length' in headers:
+            return await self.__reader__.readexactly(int(headers['content-length']))
+
+        # No framing means the body runs until the server closes the connection.
+        body = await self.__reader__.read()
+        self.close()
+
+        return body
+
+
+class PolledEndpoint(object):
+    """
+    An endpoint, how often it is polled, and how it has been doing.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        interval: float,
+        callback,
+        timeout: float = DEFAULT_TIMEOUT,
+        is_enabled=None,
+        health: endpoint_health.EndpointHealth = None
+    ):
+        """
+        Creates a new endpoint to poll.
+
+        Args:
+            name (str): The name used in the statistics.
+            url (str): The full URL to GET.
+            interval (float): How often to poll (in seconds).
+            callback: Function taking the decoded JSON. Called on the event loop thread.
+            timeout (float, optional): How long to wait for a response. Defaults to DEFAULT_TIMEOUT.
+            is_enabled (optional): Function returning False when the endpoint should not be polled. Defaults to None.
+            health (EndpointHealth, optional): Tracks failures, backoff, and the poll interval. Defaults to None (one is created).
+        """
+
+        url_parts = urlsplit(url)
+
+        self.name = name
+        self.interval = interval
+        self.timeout = timeout
+        self.callback = callback
+        self.is_enabled = is_enabled
+        self.path = url_parts.path or '/'
+
+        if url_parts.query:
+            self.path += '?' + url_parts.query
+
+        self.connection = AsyncHttpConnection(
+            url_parts.hostname,
+            url_parts.port or 80)
+
+        self.health = health if health is not None else endpoint_health.EndpointHealth(
+            name,
+            interval,
+            interval * endpoint_health.DEFAULT_MAX_INTERVAL_SCALE)
+        self.last_response = None
+
+        self.request_count = 0
+        self.failure_count = 0
+        self.timeout_count = 0
+        self.last_error = None
+        self.response_time_stats = RollingStats(name)
+
+    def get_statistics(
+        self
+    ) -> dict:
+        return {
+            'name': self.name,
+            'interval_ms': self.interval * 1000.0,
+            'requests': self.request_count,
+            'failures': self.failure_count,
+            'timeouts': self.timeout_count,
+            'connects': self.connection.connect_count,
+            'state': self.health.state,
+            'poll_interval_ms': self.health.get_poll_interval() * 1000.0,
+            'last_error': self.last_error,
+            'response_time_ms': self.response_time_stats.to_dict()
+        }
+
+    def reset_statistics(
+        self
+    ):
+        self.request_count = 0
+        self.failure_count = 0
+        self.timeout_count = 0
+        self.last_error = None
+        self.response_time_stats.reset()
+
+
+class AsyncPoller(object):
+    """
+    Polls a set of endpoints concurrently from one event loop thread.
+    """
+
+    def __init__(
+        self
+    ):
+        self.__loop__ = None
+        self.__thread__ = None
+        self.__lock__ = threading.Lock()
+
+        # [PolledEndpoint]
+        self.__endpoints__ = []
+
+    def add_endpoint(
+        self,
+        name: str,
+        url: str,
+        interval: float,
+        callback,
+        timeout: float = DEFAULT_TIMEOUT,
+        is_enabled=None,
+        health: endpoint_health.EndpointHealth = None
+    ) -> PolledEndpoint:
+        """
+        Starts polling an endpoint. The event loop is started
+        the first time an endpoint is added.
+
+        Args:
+            name (str): The name used in the statistics.
+            url (str): The full URL to GET.
+            interval (float): How often to poll (in seconds).
+            callback: Function taking the decoded JSON. Called on the event loop thread.
+            timeout (float, optional): How long to wait for a response. Defaults to DEFAULT_TIMEOUT.
+            is_enabled (optional): Function returning False when the endpoint should not be polled. Defaults to None.
+            health (EndpointHealth, optional): Tracks failures, backoff, and the poll interval. Defaults to None (one is created).
+
+        Returns:
+            PolledEndpoint: The endpoint being polled.
+        """
+
+        endpoint = PolledEndpoint(
+            name,
+            url,
+            interval,
+            callback,
+            timeout,
+            is_enabled,
+            health)
+
+        with self.__lock__:
+            self.__start__()
+            self.__endpoints__.append(endpoint)
+
+        asyncio.run_coroutine_threadsafe(
+            self.__poll__(endpoint),
+            self.__loop__)
+
+        return endpoint
+
+    def submit(
+        self,
+        coroutine
+    ):
+        """
+        Runs a coroutine on the event loop, for I/O that is not a
+        simple poll (such as a stream). The event loop is started if needed.
+
+        Args:
+            coroutine: The coroutine to run.
+
+        Returns:
+            concurrent.futures.Future: The result of the coroutine.
+        """
+
+        with self.__lock__:
+            self.__start__()
+
+        return asyncio.run_coroutine_threadsafe(
+            coroutine,
+            self.__loop__)
+
+    def get_statistics(
+        self
+    ) -> list:
+        """
+        Returns the request statistics for every endpoint.
+
+        Returns:
+            list: A dictionary (that can be serialized into JSON) for each endpoint.
+        """
+
+        return [endpoint.get_statistics() for endpoint in self.__endpoints__[:]]
+
+    def reset_statistics(
+        self
+    ):
+        for endpoint in self.__endpoints__[:]:
+            endpoint.reset_statistics()
+
+    def __start__(
+        self
+    ):
+        """
+        Starts the event loop thread.
+        Must be called while holding the lock.
+        """
+
+        if self.__thread__ is not None:
+            return
+
+        self.__loop__ = asyncio.new_event_loop()
+        self.__thread__ = threading.Thread(
+            target=self.__run_loop__,
+            name="AsyncPoller",
+            daemon=True)
+        self.__thread__.start()
+
+    def __run_loop__(
+        self
+    ):
+        asyncio.set_event_loop(self.__loop__)
+        self.__loop__.run_forever()
+
+    async def __poll__(
+        self,
+        endpoint: PolledEndpoint
+    ):
+        while True:
+            is_enabled = endpoint.is_enabled is None or endpoint.is_enabled()
+
+            if is_enabled and endpoint.health.is_due():
+                await self.__request__(endpoint)
+
+            # The health keeps the schedule; measured from the start
+            # of the last request, or until the end of a backoff.
+            wait = endpoint.health.get_seconds_until_due() if is_enabled else endpoint.interval
+
+            await asyncio.sleep(max(MIN_POLL_WAIT, wait))
+
+    async def __request__(
+        self,
+        endpoint: PolledEndpoint
+    ):
+        request_start = time.perf_counter()
+        endpoint.request_count += 1
+
+        try:
+            response = await asyncio.wait_for(
+                endpoint.connection.get_json(endpoint.path),
+                endpoint.timeout)
+        except asyncio.TimeoutError:
+            endpoint.timeout_count += 1
+            endpoint.failure_count += 1
+            endpoint.last_error = "Timeout"
+            endpoint.health.record_failure("Timeout", time.perf_counter() - request_start, True)
+
+            # The response may still arrive, so the connection can not be reused.
+            endpoint.connection.close()
+
+            return
+        except Exception as ex:
+            endpoint.failure_count += 1
+            endpoint.last_error = str(ex)
+            endpoint.health.record_failure(str(ex), time.perf_counter() - request_start)
+            endpoint.connection.close()
+
+            return
+
+        response_time = time.perf_counter() - request_start
+        endpoint.response_time_stats.push(response_time * 1000.0)
+        endpoint.health.record_success(response_time, response != endpoint.last_response)
+        endpoint.last_response = response
+
+        try:
+            endpoint.callback(response)
+        except Exception as ex:
+            endpoint.last_error = "Callback: {}".format(ex)
+
+
+INSTANCE = AsyncPoller()
+
+
+if __name__ == '__main__':
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+    class StandInServer(ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+    class StandInHandler(BaseHTTPRequestHandler):
+        """
+        Answers for the Stratux, traffic manager, and Aithre
+        endpoints with canned data, keeping connections alive.
+        """
+
+        protocol_version = 'HTTP/1.1'
+
+        # The headers and body are written separately.
+        disable_nagle_algorithm = True
+
+        RESPONSES = {
+            '/getSituation': {'AHRSPitch': 1.5, 'AHRSRoll': -3.0, 'GPSGroundSpeed': 95.0, 'GPSFixQuality': 2},
+            '/Traffic/Reliable': {'A0B1C2': {'Tail': 'N12345', 'Lat': 47.5, 'Lng': -122.2, 'Alt': 3500}},
+            '/Service/Status': {'socketTimeSinceLastTraffic': 0.5},
+            '/aithre': {'co': 0, 'battery': 90},
+            '/illyrians': {'reports': []}
+        }
+
+        def do_GET(
+            self
+        ):
+            response = StandInHandler.RESPONSES.get(self.path)
+
+            if response is None:
+                self.send_error(404)
+
+                return
+
+            body = json.dumps(response).encode('utf-8')
+
+            # Use both framings so each is exercised.
+            if self.path == '/Traffic/Reliable':
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                self.wfile.write("{:x}\r\n".format(len(body)).encode('ascii') + body + b"\r\n0\r\n\r\n")
+
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(
+            self,
+            format,
+            *args
+        ):
+            pass
+
+    server = StandInServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = "http://127.0.0.1:{}".format(server.server_address[1])
+
+    responses = {}
+
+    for path, interval in [('/getSituation', 1.0 / 30.0), ('/Traffic/Reliable', 0.1), ('/Service/Status', 0.5), ('/aithre', 1.0), ('/illyrians', 1.0), ('/missing', 1.0)]:
+        INSTANCE.add_endpoint(
+            path,
+            base_url + path,
+            interval,
+            lambda response, path=path: responses.__setitem__(path, response))
+
+    time.sleep(3.0)
+
+    for endpoint_stats in INSTANCE.get_statistics():
+        print("{}: {} requests, {} failures, {} connects, {:.2f}ms mean. Last error={}. Last response={}".format(
+            endpoint_stats['name'],
+            endpoint_stats['requests'],
+            endpoint_stats['failures'],
+            endpoint_stats['connects'],
+            endpoint_stats['response_time_ms']['mean'],
+            endpoint_stats['last_error'],
+            responses.get(endpoint_stats['name'])))
@@ -1,8 +1,10 @@
-import datetime
 import threading
+import time
 
 import requests
 
+from common_utils import async_polling, endpoint_health, flight_recorder
+
 
 class DataCache(object):
     """
@@ -28,8 +30,13 @@ class DataCache(object):
         self.__lock_object__ = threading.Lock()
         self.__cache_name__ = cache_name
         self.__last_updated__ = None
+        self.__last_changed__ = None
         self.__json_package__ = {}
 
+        # Changes every time new data arrives, or the data becomes too old.
+        self.__version__ = 0
+        self.__is_stale__ = True
+
     def __get_data_age__(
         self
     ) -> float:
@@ -42,7 +49,7 @@ class DataCache(object):
             float -- The age of the data in seconds.
         """
         if self.__json_package__ is not None and self.__last_updated__ is not None:
-            return (datetime.datetime.utcnow() - self.__last_updated__).total_seconds()
+            return time.monotonic() - self.__last_updated__
 
         return self.__max_age_seconds__ * 1000.0
 
@@ -61,29 +68,45 @@ class DataCache(object):
 
             if (data_age > self.__max_age_seconds__) and (self.__json_package__ is not None) and len(self.__json_package__) > 0:
                 self.__json_package__ = {}
+                self.__version__ += 1
         finally:
             self.__lock_object__.release()
 
     def update(
         self,
         new_package: dict
-    ):
+    ) -> bool:
         """
         Performs a data update. Marks the timestamp of the data having been updated.
+        The version only changes if the package changes what is held.
         Thread safe.
 
         Arguments:
             new_package {dict} -- The updated dictionary. It is merged into the existing data.
+
+        Returns:
+            bool -- True if the data changed.
         """
 
         if new_package is None or len(new_package) < 1:
-            return
+            return False
 
         self.__lock_object__.acquire()
 
         try:
-            self.__last_updated__ = datetime.datetime.utcnow()
-            self.__json_package__.update(new_package)
+            was_stale = self.__is_stale__ or self.__get_data_age__() >= self.__max_age_seconds__
+            is_changed = was_stale or any(
+                [key not in self.__json_package__ or self.__json_package__[key] != value for key, value in new_package.items()])
+
+            self.__last_updated__ = time.monotonic()
+            self.__is_stale__ = False
+
+            if is_changed:
+                self.__json_package__.update(new_package)
+                self.__last_changed__ = self.__last_updated__
+                self.__version__ += 1
+
+            return is_changed
         finally:
             self.__lock_object__.release()
 
@@ -104,6 +127,44 @@ class DataCache(object):
 
         return False
 
+    def get_version(
+        self
+    ) -> int:
+        """
+        Get a number that changes every time what `get()` returns
+        would change; when new data arrives, or the data becomes too old.
+        Cheap enough to call before deciding to call `get()`.
+
+        Returns:
+            int -- The version of the data.
+        """
+        is_stale = self.__get_data_age__() >= self.__max_age_seconds__
+
+        if is_stale != self.__is_stale__:
+            self.__lock_object__.acquire()
+
+            try:
+                is_stale = self.__get_data_age__() >= self.__max_age_seconds__
+
+                if is_stale != self.__is_stale__:
+                    self.__is_stale__ = is_stale
+                    self.__version__ += 1
+            finally:
+                self.__lock_object__.release()
+
+        return self.__version__
+
+    def get_last_changed(
+        self
+    ) -> float:
+        """
+        Get when (monotonic) the data last changed.
+
+        Returns:
+            float -- The time of the last change, or None if there has never been any data.
+        """
+        return self.__last_changed__
+
     def get_item_count(
         self
     ) -> int:
@@ -141,8 +202,7 @@ class DataCache(object):
             if self.__last_updated__ is None:
                 return {}
 
-            time_since = datetime.datetime.utcnow() - self.__last_updated__
-            if time_since.total_seconds() < self.__max_age_seconds__:
+            if (time.monotonic() - self.__last_updated__) < self.__max_age_seconds__:
                 return self.__json_package__.copy()
         finally:
             self.__lock_object__.release()
@@ -165,7 +225,9 @@ class RestfulDataCache(object):
         session: requests.Session,
         service_url: str,
         maximum_age_seconds: float,
-        get_timeout: float = 1.0
+        get_timeout: float = 1.0,
+        poll_interval: float = None,
+        recorder_stream: int = None
     ):
         """
         Create the new cached REST fetcher
@@ -178,33 +240,135 @@ class RestfulDataCache(object):
 
         Keyword Arguments:
             get_timeout {float} -- The timeout for the GET call. (default: {1.0})
+            poll_interval {float} -- How often `update()` is expected to be called. (default: {None})
+            recorder_stream {int} -- The flight recorder stream for the responses. Not recorded if None. (default: {None})
         """
 
         super().__init__()
 
+        self.__cache_name__ = cache_name
         self.__data_cache__ = DataCache(cache_name, maximum_age_seconds)
         self.__service_url__ = service_url
         self.__session__ = session
         self.__timeout__ = get_timeout
+        self.__maximum_age_seconds__ = maximum_age_seconds
+        self.__recorder_stream__ = recorder_stream
+
+        # Polling an endpoint that is down blocks for the whole timeout,
+        # so it is given a rest. There is no point polling faster than
+        # the data changes, but it must be polled often enough to stay fresh.
+        self.__health__ = endpoint_health.EndpointHealth(
+            cache_name,
+            poll_interval if poll_interval is not None else 0.0,
+            self.__get_max_poll_interval__(poll_interval))
 
     def update(
         self
     ) -> dict:
         """
         Attempt to call the GET and update the cached value.
+        Does nothing if the endpoint is being given a rest, or
+        it has been polled more recently than its data changes.
 
         Returns:
             dict -- The value (if any, held in the cache.)
         """
+        if not self.__health__.is_due():
+            return self.get()
+
+        request_start = time.monotonic()
+
         try:
             report = self.__session__.get(
                 self.__service_url__,
                 timeout=self.__timeout__).json()
 
-            if report is not None:
-                self.__data_cache__.update(report)
-        finally:
-            return self.get()
+            self.__health__.record_success(
+                time.monotonic() - request_start,
+                self.publish(report))
+        except requests.Timeout as ex:
+            self.__health__.record_failure(str(ex), time.monotonic() - request_start, True)
+        except Exception as ex:
+            self.__health__.record_failure(str(ex), time.monotonic() - request_start)
+
+        return self.get()
+
+    def publish(
+        self,
+        report: dict
+    ) -> bool:
+        """
+        Puts a fresh response from the endpoint into the cache.
+
+        Arguments:
+            report {dict} -- The decoded response.
+
+        Returns:
+            bool -- True if the response changed the data.
+        """
+
+        if report is None:
+            return False
+
+        if self.__recorder_stream__ is not None:
+            flight_recorder.INSTANCE.record(self.__recorder_stream__, report)
+
+        return self.__data_cache__.update(report)
+
+    def start_async_polling(
+        self,
+        interval: float,
+        is_enabled=None
+    ):
+        """
+        Polls the endpoint from the shared event loop instead
+        of waiting for `update()` to be called.
+
+        Arguments:
+            interval {float} -- How often to poll (in seconds).
+
+        Keyword Arguments:
+            is_enabled -- Function returning False when the endpoint should not be polled. (default: {None})
+        """
+
+        self.__health__.set_interval(
+            interval,
+            self.__get_max_poll_interval__(interval))
+
+        async_polling.INSTANCE.add_endpoint(
+            self.__cache_name__,
+            self.__service_url__,
+            interval,
+            self.publish,
+            self.__timeout__,
+            is_enabled,
+            self.__health__)
+
+    def get_health(
+        self
+    ) -> endpoint_health.EndpointHealth:
+        """
+        Get how the endpoint is doing.
+
+        Returns:
+            EndpointHealth -- The health of the endpoint.
+        """
+        return self.__health__
+
+    def __get_max_poll_interval__(
+        self,
+        poll_interval: float
+    ) -> float:
+        """
+        The slowest the endpoint may be polled when its data is not changing.
+        Never so slow that the cached data would go stale.
+        """
+        max_interval = self.__maximum_age_seconds__ / 2.0
+
+        if poll_interval is None:
+            return max_interval
+
+        return max(poll_interval, min(max_interval, poll_interval * endpoint_health.DEFAULT_MAX_INTERVAL_SCALE))
 
     def get(
         self
@@ -225,6 +389,28 @@ class RestfulDataCache(object):
         """
         self.__data_cache__.garbage_collect()
 
+    def get_version(
+        self
+    ) -> int:
+        """
+        Get a number that changes every time the value in the cache changes.
+
+        Returns:
+            int -- The version of the cached value.
+        """
+        return self.__data_cache__.get_version()
+
+    def get_last_changed(
+        self
+    ) -> float:
+        """
+        Get when (monotonic) the data last changed.
+
+        Returns:
+            float -- The time of the last change, or None if there has never been any data.
+        """
+        return self.__data_cache__.get_last_changed()
+
     def get_item_count(
         self
     ) -> int:
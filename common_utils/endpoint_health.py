@@ -0,0 +1,388 @@
+"""
+Module to track how an HTTP endpoint is doing, and to
+decide when it is worth asking it for data again.
+
+Each endpoint gets a circuit breaker. After a few failures
+in a row the circuit opens and the endpoint is left alone
+for a while, backing off exponentially each time a probe
+fails. Once the wait is over a single probe (half-open) is
+let through; if it succeeds, normal polling resumes.
+
+While the endpoint is healthy the poll interval follows
+how often the endpoint's data actually changes, so a source
+that only updates a few times a second is not asked for
+the same data thirty times a second.
+
+>>> health = EndpointHealth("Test", 0.1, 1.0, failure_threshold=2, initial_backoff=4.0)
+>>> health.is_due(0.0)
+True
+>>> health.record_failure("refused", 0.01, now=0.0)
+>>> health.state
+'closed'
+>>> health.record_failure("refused", 0.01, now=0.1)
+>>> health.state
+'open'
+>>> health.is_due(2.0)
+False
+>>> health.is_due(4.1)
+True
+>>> health.state
+'half_open'
+>>> health.is_due(4.2)
+False
+>>> health.record_failure("refused", 0.01, now=4.2)
+>>> round(health.get_seconds_until_due(4.2), 3)
+8.0
+>>> health.is_due(12.2)
+True
+>>> health.record_success(0.01, now=12.2)
+>>> health.state
+'closed'
+"""
+
+import threading
+import time
+
+from common_utils.task_timer import RollingStats
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# How many failures in a row open the circuit.
+DEFAULT_FAILURE_THRESHOLD = 3
+
+# How long the circuit stays open the first time (in seconds).
+# Doubled every time a probe fails.
+DEFAULT_INITIAL_BACKOFF = 1.0
+
+# The longest the circuit stays open (in seconds).
+DEFAULT_MAX_BACKOFF = 30.0
+
+# How quickly the observed update interval follows changes
+# in how often the endpoint's data changes.
+UPDATE_INTERVAL_SMOOTHING = 0.25
+
+# How much slower than asked an endpoint whose data is not
+# changing may be polled.
+DEFAULT_MAX_INTERVAL_SCALE = 4.0
+
+# A poll is allowed once this much of the interval has passed,
+# so a caller on the same schedule does not skip every other poll.
+POLL_INTERVAL_TOLERANCE = 0.9
+
+
+class EndpointHealth(object):
+    """
+    Circuit breaker, backoff, and adaptive poll interval for one endpoint.
+    Safe to use from multiple threads.
+    """
+
+    # Every endpoint being tracked, for the telemetry.
+    __ENDPOINTS__ = []
+
+    @staticmethod
+    def get_all_statistics() -> list:
+        """
+        Returns the health of every endpoint.
+
+        Returns:
+            list: A dictionary (that can be serialized into JSON) for each endpoint.
+        """
+
+        return [endpoint.get_statistics() for endpoint in EndpointHealth.__ENDPOINTS__[:]]
+
+    @staticmethod
+    def reset_all_statistics():
+        for endpoint in EndpointHealth.__ENDPOINTS__[:]:
+            endpoint.reset_statistics()
+
+    def __init__(
+        self,
+        name: str,
+        min_interval: float = 0.0,
+        max_interval: float = None,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        initial_backoff: float = DEFAULT_INITIAL_BACKOFF,
+        max_backoff: float = DEFAULT_MAX_BACKOFF
+    ):
+        """
+        Starts tracking an endpoint.
+
+        Args:
+            name (str): The name used in the statistics.
+            min_interval (float, optional): The shortest time between polls (in seconds). Defaults to 0.0.
+            max_interval (float, optional): The longest time between polls, no matter how slowly the data changes. Defaults to None (the min_interval).
+            failure_threshold (int, optional): How many failures in a row open the circuit. Defaults to DEFAULT_FAILURE_THRESHOLD.
+            initial_backoff (float, optional): How long the circuit first stays open (in seconds). Defaults to DEFAULT_INITIAL_BACKOFF.
+            max_backoff (float, optional): The longest the circuit stays open (in seconds). Defaults to DEFAULT_MAX_BACKOFF.
+        """
+
+        self.name = name
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval if max_interval is not None else min_interval)
+        self.failure_threshold = max(1, failure_threshold)
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+
+        self.__lock__ = threading.Lock()
+        self.__backoff__ = initial_backoff
+        self.__retry_at__ = 0.0
+        self.__is_probing__ = False
+        self.__last_attempt__ = None
+        self.__last_change__ = None
+
+        # Smoothed time between changes in the data, in seconds.
+        self.__update_interval__ = None
+
+        self.latency_stats = RollingStats(name)
+        self.reset_statistics()
+
+        EndpointHealth.__ENDPOINTS__.append(self)
+
+    def set_interval(
+        self,
+        min_interval: float,
+        max_interval: float = None
+    ):
+        """
+        Changes the range the poll interval adapts within.
+
+        Args:
+            min_interval (float): The shortest time between polls (in seconds).
+            max_interval (float, optional): The longest time between polls. Defaults to None (the min_interval).
+        """
+
+        with self.__lock__:
+            self.min_interval = min_interval
+            self.max_interval = max(min_interval, max_interval if max_interval is not None else min_interval)
+
+    def is_due(
+        self,
+        now: float = None
+    ) -> bool:
+        """
+        Should the endpoint be asked for data now?
+        Returning True counts as starting a request; report how it went
+        with `record_success` or `record_failure`.
+
+        Args:
+            now (float, optional): The (monotonic) time. Defaults to now.
+
+        Returns:
+            bool: True if a request should be made.
+        """
+
+        now = time.monotonic() if now is None else now
+
+        with self.__lock__:
+            if self.state == OPEN:
+                if now < self.__retry_at__:
+                    self.skipped_count += 1
+
+                    return False
+
+                self.state = HALF_OPEN
+                self.__is_probing__ = False
+
+            if self.state == HALF_OPEN:
+                # Only one probe at a time.
+                if self.__is_probing__:
+                    self.skipped_count += 1
+
+                    return False
+
+                self.__is_probing__ = True
+            elif self.__last_attempt__ is not None \
+                    and (now - self.__last_attempt__) < (self.__get_poll_interval__(now) * POLL_INTERVAL_TOLERANCE):
+                self.skipped_count += 1
+
+                return False
+
+            self.__last_attempt__ = now
+
+            return True
+
+    def record_success(
+        self,
+        latency: float,
+        is_changed: bool = True,
+        now: float = None
+    ):
+        """
+        Records a successful response. Closes the circuit.
+
+        Args:
+            latency (float): How long the request took (in seconds).
+            is_changed (bool, optional): Was the data different from the previous response? Defaults to True.
+            now (float, optional): The (monotonic) time. Defaults to now.
+        """
+
+        now = time.monotonic() if now is None else now
+
+        with self.__lock__:
+            self.request_count += 1
+            self.latency_stats.push(latency * 1000.0)
+
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.__backoff__ = self.initial_backoff
+            self.__is_probing__ = False
+
+            if not is_changed:
+                self.unchanged_count += 1
+
+                return
+
+            if self.__last_change__ is not None:
+                change_interval = now - self.__last_change__
+
+                if self.__update_interval__ is None:
+                    self.__update_interval__ = change_interval
+                else:
+                    self.__update_interval__ += (change_interval - self.__update_interval__) * UPDATE_INTERVAL_SMOOTHING
+
+            self.__last_change__ = now
+
+    def record_failure(
+        self,
+        error: str,
+        latency: float,
+        is_timeout: bool = False,
+        now: float = None
+    ):
+        """
+        Records a failed request. Opens the circuit if there
+        have been enough failures in a row, or if a probe failed.
+
+        Args:
+            error (str): What went wrong.
+            latency (float): How long the request took before failing (in seconds).
+            is_timeout (bool, optional): Did the request time out? Defaults to False.
+            now (float, optional): The (monotonic) time. Defaults to now.
+        """
+
+        now = time.monotonic() if now is None else now
+
+        with self.__lock__:
+            self.request_count += 1
+            self.failure_count += 1
+            self.consecutive_failures += 1
+            self.last_error = error
+            self.latency_stats.push(latency * 1000.0)
+
+            if is_timeout:
+                self.timeout_count += 1
+
+            is_probe = self.state == HALF_OPEN
+            self.__is_probing__ = False
+
+            if not is_probe and self.consecutive_failures < self.failure_threshold:
+                return
+
+            if is_probe:
+                self.__backoff__ = min(self.max_backoff, self.__backoff__ * 2.0)
+
+            self.state = OPEN
+            self.open_count += 1
+            self.__retry_at__ = now + self.__backoff__
+
+    def get_poll_interval(
+        self,
+        now: float = None
+    ) -> float:
+        """
+        How long to wait between polls, based on how often the data changes.
+        Polls at twice the rate the data changes, within the min and max interval.
+
+        Args:
+            now (float, optional): The (monotonic) time. Defaults to now.
+
+        Returns:
+            float: The interval in seconds.
+        """
+
+        with self.__lock__:
+            return self.__get_poll_interval__(time.monotonic() if now is None else now)
+
+    def __get_poll_interval__(
+        self,
+        now: float
+    ) -> float:
+        if self.__update_interval__ is None:
+            return self.min_interval
+
+        # If the data has not changed for longer than usual,
+        # slow down to match.
+        update_interval = max(self.__update_interval__, now - self.__last_change__)
+
+        return min(self.max_interval, max(self.min_interval, update_interval / 2.0))
+
+    def get_seconds_until_due(
+        self,
+        now: float = None
+    ) -> float:
+        """
+        How long until the next request should be made.
+
+        Args:
+            now (float, optional): The (monotonic) time. Defaults to now.
+
+        Returns:
+            float: The number of seconds to wait.
+        """
+
+        now = time.monotonic() if now is None else now
+
+        with self.__lock__:
+            if self.state == OPEN:
+                return max(0.0, self.__retry_at__ - now)
+
+            if self.__last_attempt__ is None:
+                return 0.0
+
+            return max(0.0, self.__last_attempt__ + self.__get_poll_interval__(now) - now)
+
+    def get_statistics(
+        self
+    ) -> dict:
+        now = time.monotonic()
+
+        with self.__lock__:
+            return {
+                'name': self.name,
+                'state': self.state,
+                'requests': self.request_count,
+                'failures': self.failure_count,
+                'timeouts': self.timeout_count,
+                'unchanged': self.unchanged_count,
+                'skipped': self.skipped_count,
+                'consecutive_failures': self.consecutive_failures,
+                'circuit_opens': self.open_count,
+                'retry_in_s': max(0.0, self.__retry_at__ - now) if self.state == OPEN else 0.0,
+                'poll_interval_ms': self.__get_poll_interval__(now) * 1000.0,
+                'update_interval_ms': self.__update_interval__ * 1000.0 if self.__update_interval__ is not None else None,
+                'last_error': self.last_error,
+                'latency_ms': self.latency_stats.to_dict()
+            }
+
+    def reset_statistics(
+        self
+    ):
+        self.request_count = 0
+        self.failure_count = 0
+        self.timeout_count = 0
+        self.unchanged_count = 0
+        self.skipped_count = 0
+        self.open_count = 0
+        self.last_error = None
+        self.latency_stats.reset()
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
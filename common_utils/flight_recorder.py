@@ -0,0 +1,479 @@
+"""
+Module to record every payload the HUD takes in (the
+situation, avionics, traffic, service status, Aithre,
+and GDL-90 data) to a compact, append only, file so a
+flight can be looked at (or replayed) afterwards.
+
+The file starts with a header:
+
+    MAGIC (8 bytes), then '<QdB' (monotonic ns at the start, UNIX time at the start, flags)
+
+followed by records:
+
+    '<QBI' (monotonic ns when received, stream, payload length), then the payload
+
+The payload is the JSON (UTF-8) for the REST and WebSocket
+data, and the raw datagram for GDL-90. When compression is
+on, the records are gathered into chunks, and each chunk
+is written as a single STREAM_CHUNK record holding the
+zlib compressed records.
+
+`record()` only queues the payload. The file is written by
+a background thread, so the disk never holds up the caller.
+If the writer falls behind, payloads are dropped (and counted)
+rather than letting the queue grow without limit.
+
+To summarize a recording:
+
+    python3 -m common_utils.flight_recorder recording.hudrec
+"""
+
+import json
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+
+from common_utils.task_timer import RollingStats
+
+MAGIC = b'HUDREC01'
+HEADER_FORMAT = '<QdB'
+RECORD_FORMAT = '<QBI'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+
+FLAG_COMPRESSED = 1 << 0
+
+STREAM_CHUNK = 0
+STREAM_SITUATION = 1
+STREAM_AVIONICS = 2
+STREAM_TRAFFIC = 3
+STREAM_SERVICE_STATUS = 4
+STREAM_AITHRE = 5
+STREAM_ILLYRIAN = 6
+STREAM_STRATUX_TRAFFIC = 7
+STREAM_GDL90 = 8
+
+STREAM_NAMES = {
+    STREAM_CHUNK: 'chunk',
+    STREAM_SITUATION: 'situation',
+    STREAM_AVIONICS: 'avionics',
+    STREAM_TRAFFIC: 'traffic',
+    STREAM_SERVICE_STATUS: 'service_status',
+    STREAM_AITHRE: 'aithre',
+    STREAM_ILLYRIAN: 'illyrian',
+    STREAM_STRATUX_TRAFFIC: 'stratux_traffic',
+    STREAM_GDL90: 'gdl90'
+}
+
+# The streams whose payload is the raw bytes, not JSON.
+BINARY_STREAMS = [STREAM_GDL90]
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), 'hud_recordings')
+FILE_EXTENSION = '.hudrec'
+
+# How many payloads can be waiting for the writer.
+DEFAULT_MAX_QUEUE = 4096
+
+# A chunk is written once it holds this much,
+# or once it has been open this long.
+# The most data a crash can lose is a chunk.
+CHUNK_BYTES = 64 * 1024
+CHUNK_SECONDS = 1.0
+
+# How often an uncompressed recording is flushed to disk.
+FLUSH_SECONDS = 1.0
+
+
+def encode_record(
+    timestamp_ns: int,
+    stream: int,
+    payload: bytes
+) -> bytes:
+    """
+    Returns a single record, ready to be written.
+
+    >>> encode_record(1, STREAM_SITUATION, b'{}')
+    b'\\x01\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x01\\x02\\x00\\x00\\x00{}'
+    """
+
+    return struct.pack(RECORD_FORMAT, timestamp_ns, stream, len(payload)) + payload
+
+
+def encode_payload(
+    stream: int,
+    payload
+) -> bytes:
+    """
+    Turns a payload into the bytes that are recorded.
+
+    >>> encode_payload(STREAM_SITUATION, {'AHRSPitch': 1.5})
+    b'{"AHRSPitch":1.5}'
+    >>> encode_payload(STREAM_GDL90, b'~\\x00~')
+    b'~\\x00~'
+    """
+
+    if isinstance(payload, (bytes, bytearray)):
+        return bytes(payload)
+
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+def decode_payload(
+    stream: int,
+    payload: bytes
+):
+    """
+    The opposite of `encode_payload`.
+
+    >>> decode_payload(STREAM_SITUATION, b'{"AHRSPitch":1.5}')
+    {'AHRSPitch': 1.5}
+    >>> decode_payload(STREAM_GDL90, b'~\\x00~')
+    b'~\\x00~'
+    >>> decode_payload(STREAM_SITUATION, memoryview(b'{"AHRSRoll":2.0}'))
+    {'AHRSRoll': 2.0}
+    """
+
+    # The payload may be a view into a mapped recording,
+    # so it is copied out here, and only here.
+    if stream in BINARY_STREAMS:
+        return bytes(payload)
+
+    return json.loads(str(payload, 'utf-8'))
+
+
+def get_records(
+    data
+):
+    """
+    Yields every (timestamp ns, stream, payload) in the data.
+    Chunks are expanded. A record cut short (by a crash) ends the data.
+
+    The data may be bytes, or a memoryview (over a mapped recording).
+    Payloads are slices of the data, so a memoryview is never copied.
+
+    >>> data = encode_record(1, STREAM_SITUATION, b'{}') + encode_record(2, STREAM_GDL90, b'abc')
+    >>> list(get_records(data))
+    [(1, 1, b'{}'), (2, 8, b'abc')]
+    >>> list(get_records(encode_record(3, STREAM_CHUNK, zlib.compress(data))))
+    [(1, 1, b'{}'), (2, 8, b'abc')]
+    >>> list(get_records(data[:-1]))
+    [(1, 1, b'{}')]
+    >>> [(timestamp_ns, stream, bytes(payload)) for timestamp_ns, stream, payload in get_records(memoryview(data))]
+    [(1, 1, b'{}'), (2, 8, b'abc')]
+    """
+
+    offset = 0
+
+    while offset + RECORD_SIZE <= len(data):
+        timestamp_ns, stream, length = struct.unpack_from(RECORD_FORMAT, data, offset)
+        offset += RECORD_SIZE
+
+        if offset + length > len(data):
+            return
+
+        payload = data[offset:offset + length]
+        offset += length
+
+        if stream == STREAM_CHUNK:
+            try:
+                yield from get_records(zlib.decompress(payload))
+            except zlib.error:
+                return
+        else:
+            yield timestamp_ns, stream, payload
+
+
+def read_header(
+    recording_file
+) -> tuple:
+    """
+    Reads the header from the start of a recording.
+
+    Args:
+        recording_file: The recording, opened for binary reading.
+
+    Returns:
+        tuple: The monotonic ns, and UNIX time, the recording started, and the flags.
+    """
+
+    if recording_file.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a HUD recording")
+
+    return struct.unpack(HEADER_FORMAT, recording_file.read(HEADER_SIZE))
+
+
+def read_recording(
+    recording_path: str
+):
+    """
+    Yields every (timestamp ns, stream, payload) in a recording.
+
+    Args:
+        recording_path (str): The recording file.
+    """
+
+    with open(recording_path, 'rb') as recording_file:
+        read_header(recording_file)
+        data = recording_file.read()
+
+    yield from get_records(data)
+
+
+class FlightRecorder(object):
+    """
+    Queues the payloads and writes them to the
+    recording from a background thread.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = DEFAULT_MAX_QUEUE
+    ):
+        self.__queue__ = queue.Queue(max(1, max_queue))
+        self.__lock__ = threading.Lock()
+        self.__writer_thread__ = None
+        self.__file__ = None
+        self.__is_compressed__ = False
+
+        self.path = None
+        self.is_recording = False
+
+        self.write_stats = RollingStats("FlightRecorderWrite")
+        self.reset_statistics()
+
+    def start(
+        self,
+        recording_path: str = None,
+        is_compressed: bool = True
+    ) -> str:
+        """
+        Starts a new recording. Does nothing if already recording.
+
+        Args:
+            recording_path (str, optional): The file to write. Defaults to a new, timestamped, file in DEFAULT_DIRECTORY.
+            is_compressed (bool, optional): Gather the records into zlib compressed chunks. Defaults to True.
+
+        Returns:
+            str: The file being recorded to.
+        """
+
+        with self.__lock__:
+            if self.is_recording:
+                return self.path
+
+            if recording_path is None:
+                os.makedirs(DEFAULT_DIRECTORY, exist_ok=True)
+                recording_path = os.path.join(
+                    DEFAULT_DIRECTORY,
+                    "hud_{}{}".format(datetime.now().strftime("%Y%m%d_%H%M%S"), FILE_EXTENSION))
+
+            self.__file__ = open(recording_path, 'wb')
+            self.__file__.write(MAGIC)
+            self.__file__.write(struct.pack(
+                HEADER_FORMAT,
+                time.monotonic_ns(),
+                time.time(),
+                FLAG_COMPRESSED if is_compressed else 0))
+            self.__file__.flush()
+
+            self.__is_compressed__ = is_compressed
+            self.path = recording_path
+            self.is_recording = True
+
+            self.__writer_thread__ = threading.Thread(
+                target=self.__write_loop__,
+                name="FlightRecorder",
+                daemon=True)
+            self.__writer_thread__.start()
+
+            return recording_path
+
+    def stop(
+        self
+    ):
+        """
+        Writes out everything that is queued and closes the recording.
+        """
+
+        with self.__lock__:
+            if not self.is_recording:
+                return
+
+            self.is_recording = False
+            writer_thread = self.__writer_thread__
+            self.__writer_thread__ = None
+
+        # The writer stops once it reaches the marker.
+        self.__queue__.put(None)
+        writer_thread.join()
+
+    def record(
+        self,
+        stream: int,
+        payload
+    ) -> bool:
+        """
+        Queues a payload to be written. Does nothing if not recording.
+
+        Args:
+            stream (int): One of the STREAM_* values.
+            payload: The decoded JSON (dict or list), or the raw bytes.
+
+        Returns:
+            bool: True if the payload was queued.
+        """
+
+        if not self.is_recording or payload is None:
+            return False
+
+        timestamp_ns = time.monotonic_ns()
+
+        try:
+            # Encoded now, so the caller is free to change the payload.
+            self.__queue__.put_nowait((timestamp_ns, stream, encode_payload(stream, payload)))
+        except queue.Full:
+            self.dropped_count += 1
+
+            return False
+        except Exception as ex:
+            self.last_error = str(ex)
+
+            return False
+
+        return True
+
+    def __write_loop__(
+        self
+    ):
+        chunk = bytearray()
+        chunk_started = None
+        last_flush = time.monotonic()
+        is_stopping = False
+
+        while not is_stopping:
+            try:
+                item = self.__queue__.get(timeout=CHUNK_SECONDS)
+            except queue.Empty:
+                item = False
+
+            if item is None:
+                is_stopping = True
+            elif item:
+                timestamp_ns, stream, payload = item
+                record = encode_record(timestamp_ns, stream, payload)
+
+                self.record_counts[stream] = self.record_counts.get(stream, 0) + 1
+                self.payload_bytes += len(payload)
+
+                if self.__is_compressed__:
+                    if chunk_started is None:
+                        chunk_started = (time.monotonic(), timestamp_ns)
+
+                    chunk.extend(record)
+                else:
+                    self.__write__(record)
+
+            now = time.monotonic()
+
+            if self.__is_compressed__:
+                if chunk_started is not None \
+                        and (is_stopping or len(chunk) >= CHUNK_BYTES or (now - chunk_started[0]) >= CHUNK_SECONDS):
+                    self.__write__(encode_record(chunk_started[1], STREAM_CHUNK, zlib.compress(bytes(chunk))))
+                    self.__file__.flush()
+                    self.chunk_count += 1
+                    chunk = bytearray()
+                    chunk_started = None
+            elif is_stopping or (now - last_flush) >= FLUSH_SECONDS:
+                self.__file__.flush()
+                last_flush = now
+
+        self.__file__.close()
+        self.__file__ = None
+
+    def __write__(
+        self,
+        data: bytes
+    ):
+        start = time.perf_counter()
+
+        try:
+            self.__file__.write(data)
+            self.bytes_written += len(data)
+        except Exception as ex:
+            self.last_error = str(ex)
+
+        self.write_stats.push((time.perf_counter() - start) * 1000.0)
+
+    def get_statistics(
+        self
+    ) -> dict:
+        """
+        Returns how the recording is going, in a form that can be serialized into JSON.
+        """
+
+        return {
+            'recording': self.is_recording,
+            'path': self.path,
+            'compressed': self.__is_compressed__,
+            'queued': self.__queue__.qsize(),
+            'records': {STREAM_NAMES.get(stream, str(stream)): count for stream, count in self.record_counts.items()},
+            'payload_bytes': self.payload_bytes,
+            'bytes_written': self.bytes_written,
+            'chunks': self.chunk_count,
+            'dropped': self.dropped_count,
+            'last_error': self.last_error,
+            'write_ms': self.write_stats.to_dict()
+        }
+
+    def reset_statistics(
+        self
+    ):
+        self.record_counts = {}
+        self.payload_bytes = 0
+        self.bytes_written = 0
+        self.chunk_count = 0
+        self.dropped_count = 0
+        self.last_error = None
+        self.write_stats.reset()
+
+
+INSTANCE = FlightRecorder()
+
+
+def __summarize__(
+    recording_path: str
+):
+    with open(recording_path, 'rb') as recording_file:
+        start_ns, start_time, flags = read_header(recording_file)
+
+    counts = {}
+    payload_bytes = {}
+    last_ns = start_ns
+
+    for timestamp_ns, stream, payload in read_recording(recording_path):
+        name = STREAM_NAMES.get(stream, str(stream))
+        counts[name] = counts.get(name, 0) + 1
+        payload_bytes[name] = payload_bytes.get(name, 0) + len(payload)
+        last_ns = max(last_ns, timestamp_ns)
+
+    print("Started:    {}".format(datetime.fromtimestamp(start_time)))
+    print("Duration:   {:.1f}s".format((last_ns - start_ns) / 1e9))
+    print("Compressed: {}".format((flags & FLAG_COMPRESSED) != 0))
+    print("File bytes: {}".format(os.path.getsize(recording_path)))
+
+    for name in sorted(counts):
+        print("{:16} {:8} records {:10} bytes".format(name, counts[name], payload_bytes[name]))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        import doctest
+
+        doctest.testmod()
+    else:
+        __summarize__(sys.argv[1])
@@ -3,7 +3,7 @@ Class and module to handle caching of any data.
 """
 
 import threading
-from datetime import datetime
+import time
 
 from common_utils.task_timer import TaskProfiler
 
@@ -24,6 +24,10 @@ class GenericDataCache:
         self.__data_cache__ = {}
         self.__lock__ = threading.Lock()
 
+        self.__hits__ = 0
+        self.__misses__ = 0
+        self.__purges__ = 0
+
     def __purge_data__(
         self,
         texture_to_purge
@@ -38,19 +42,20 @@ class GenericDataCache:
         try:
             del self.__data_cache__[texture_to_purge]
             del self.__data_last_used__[texture_to_purge]
+            self.__purges__ += 1
         finally:
             pass
 
     def __get_purge_key__(
         self,
-        now: datetime,
+        now: float,
         data_key: str
     ):
         """
         Returns the key of the traffic to purge if it should be, otherwise returns None.
 
         Arguments:
-            now {datetime} -- The current time.
+            now {float} -- The current monotonic time.
             data_key {string} -- The identifier of the texture we are interesting in.
 
         Returns:
@@ -58,7 +63,7 @@ class GenericDataCache:
         """
 
         lsu = self.__data_last_used__[data_key]
-        time_since_last_use = (now - lsu).total_seconds()
+        time_since_last_use = now - lsu
 
         return data_key if time_since_last_use > GenericDataCache.__CACHE_INVALIDATION_TIME__ else None
 
@@ -75,16 +80,15 @@ class GenericDataCache:
 
             try:
                 self.__lock__.acquire()
-                now = datetime.utcnow()
+                now = time.monotonic()
                 textures_to_purge = [self.__get_purge_key__(
                     now,
                     data_key) for data_key in self.__data_last_used__]
                 textures_to_purge = list(filter(lambda x: x is not None,
                                                 textures_to_purge))
 
-                # pylint:disable=expression-not-assigned
-                [self.__purge_data__(
-                    texture_to_purge) for texture_to_purge in textures_to_purge]
+                for texture_to_purge in textures_to_purge:
+                    self.__purge_data__(texture_to_purge)
             finally:
                 self.__lock__.release()
 
@@ -104,7 +108,7 @@ class GenericDataCache:
                 self.__lock__.acquire()
                 self.__data_cache__[data_key] = value
 
-                self.__data_last_used__[data_key] = datetime.utcnow()
+                self.__data_last_used__[data_key] = time.monotonic()
             finally:
                 self.__lock__.release()
 
@@ -115,10 +119,15 @@ class GenericDataCache:
         with TaskProfiler("GenericDataCache::get_data"):
             try:
                 self.__lock__.acquire()
-                if data_key in self.__data_cache__:
-                    self.__data_last_used__[data_key] = datetime.utcnow()
+                data = self.__data_cache__.get(data_key)
+
+                if data is not None:
+                    self.__data_last_used__[data_key] = time.monotonic()
+                    self.__hits__ += 1
+
+                    return data
 
-                    return self.__data_cache__[data_key]
+                self.__misses__ += 1
             finally:
                 self.__lock__.release()
 
@@ -145,11 +154,55 @@ class GenericDataCache:
                 self.__lock__.acquire()
 
                 if data_key not in self.__data_cache__:
+                    self.__misses__ += 1
+
                     if data_creation_callback is None:
                         return None
                     self.__data_cache__[data_key] = data_creation_callback()
+                else:
+                    self.__hits__ += 1
 
-                self.__data_last_used__[data_key] = datetime.utcnow()
+                self.__data_last_used__[data_key] = time.monotonic()
                 return self.__data_cache__[data_key]
             finally:
                 self.__lock__.release()
+
+    def get_size(
+        self
+    ) -> int:
+        """
+        Returns the number of items currently held in the cache.
+        """
+
+        return len(self.__data_cache__)
+
+    def get_statistics(
+        self
+    ) -> dict:
+        """
+        Returns the size and effectiveness of the cache.
+
+        Returns:
+            dict: The size, hits, misses, purges, and hit rate of the cache.
+        """
+
+        lookups = self.__hits__ + self.__misses__
+
+        return {
+            'size': self.get_size(),
+            'hits': self.__hits__,
+            'misses': self.__misses__,
+            'purges': self.__purges__,
+            'hit_rate': (self.__hits__ / lookups) if lookups > 0 else None
+        }
+
+    def reset_statistics(
+        self
+    ):
+        """
+        Resets the hit, miss, and purge counts. Does not change the cached data.
+        """
+
+        self.__hits__ = 0
+        self.__misses__ = 0
+        self.__purges__ = 0
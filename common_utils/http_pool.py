@@ -0,0 +1,150 @@
+"""
+Module to share one pool of keep-alive HTTP connections
+between everything in the HUD that talks to a service.
+
+Opening a TCP connection over the Stratux Wi-Fi costs
+more than the request itself, so the connections are
+kept open and reused across requests and clients.
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# How many hosts to keep connection pools for.
+# The Stratux, avionics, traffic manager, and Aithre manager
+# with room to spare.
+DEFAULT_POOL_HOSTS = 8
+
+# How many idle keep-alive connections to keep per host.
+# One for each client that may be polling the host at the same time.
+DEFAULT_CONNECTIONS_PER_HOST = 4
+
+
+class HttpPoolManager(object):
+    """
+    Owns the `requests.Session` (and the connection pools behind it)
+    that all of the HUD's HTTP clients share.
+    """
+
+    def __init__(
+        self,
+        pool_hosts: int = DEFAULT_POOL_HOSTS,
+        connections_per_host: int = DEFAULT_CONNECTIONS_PER_HOST
+    ):
+        """
+        Creates the shared session.
+
+        Args:
+            pool_hosts (int, optional): How many hosts to keep connection pools for. Defaults to DEFAULT_POOL_HOSTS.
+            connections_per_host (int, optional): How many keep-alive connections to keep per host. Defaults to DEFAULT_CONNECTIONS_PER_HOST.
+        """
+
+        self.__pool_hosts__ = pool_hosts
+        self.__connections_per_host__ = connections_per_host
+
+        # Requests beyond the per-host limit get a connection that is
+        # closed afterwards rather than waiting for one to free up.
+        self.__adapter__ = HTTPAdapter(
+            pool_connections=pool_hosts,
+            pool_maxsize=connections_per_host,
+            pool_block=False)
+
+        self.__session__ = requests.Session()
+        self.__session__.mount('http://', self.__adapter__)
+        self.__session__.mount('https://', self.__adapter__)
+
+        # {host: (connections, requests)}
+        # The counts at the last reset.
+        self.__baselines__ = {}
+        self.__lock__ = threading.Lock()
+
+    def get_session(
+        self
+    ) -> requests.Session:
+        """
+        Returns the shared session.
+
+        Returns:
+            requests.Session: The session to make requests with.
+        """
+
+        return self.__session__
+
+    def get_statistics(
+        self
+    ) -> dict:
+        """
+        Returns the pool sizing, and how well connections
+        are being reused, in a form that can be serialized into JSON.
+
+        Returns:
+            dict: The pool limits, and the connection and request counts for each host.
+        """
+
+        hosts = {}
+
+        with self.__lock__:
+            for host, pool in self.__get_pools__():
+                base_connections, base_requests = self.__baselines__.get(host, (0, 0))
+                connections = pool.num_connections - base_connections
+                request_count = pool.num_requests - base_requests
+
+                hosts[host] = {
+                    'connections_opened': connections,
+                    'requests': request_count,
+                    'reused': max(0, request_count - connections),
+                    'reuse_rate': (max(0, request_count - connections) / request_count) if request_count > 0 else 0.0,
+                    'idle_connections': self.__get_idle_connection_count__(pool)
+                }
+
+        return {
+            'pool_hosts': self.__pool_hosts__,
+            'connections_per_host': self.__connections_per_host__,
+            'hosts': hosts
+        }
+
+    def reset_statistics(
+        self
+    ):
+        with self.__lock__:
+            self.__baselines__ = {host: (pool.num_connections, pool.num_requests) for host, pool in self.__get_pools__()}
+
+    def __get_idle_connection_count__(
+        self,
+        pool
+    ) -> int:
+        if pool.pool is None:
+            return 0
+
+        # The queue is filled with None placeholders up to the pool size.
+        return len([connection for connection in list(pool.pool.queue) if connection is not None])
+
+    def __get_pools__(
+        self
+    ) -> list:
+        """
+        Returns the connection pool for each host the session has talked to.
+
+        Returns:
+            list: (host, pool) for each host.
+        """
+
+        pools = self.__adapter__.poolmanager.pools
+
+        with pools.lock:
+            pool_keys = list(pools.keys())
+
+        host_pools = []
+
+        for pool_key in pool_keys:
+            pool = pools.get(pool_key)
+
+            if pool is not None:
+                host_pools.append(("{}:{}".format(pool.host, pool.port), pool))
+
+        return host_pools
+
+
+INSTANCE = HttpPoolManager()
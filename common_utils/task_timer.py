@@ -1,32 +1,86 @@
-import datetime
-import queue
+import math
 import threading
+import time
+from array import array
+from collections import deque
+
+
+def get_percentile(
+    sorted_samples,
+    percentile: float
+) -> float:
+    """
+    Returns the given percentile (nearest rank) of an already sorted sequence.
+
+    >>> get_percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 50)
+    5
+    >>> get_percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 95)
+    10
+    >>> get_percentile([], 50)
+
+    Args:
+        sorted_samples (list): The samples, sorted in ascending order.
+        percentile (float): The percentile to get [0 - 100]
+
+    Returns:
+        float: The value at the percentile, or None if there are no samples.
+    """
+
+    sample_count = len(sorted_samples) if sorted_samples is not None else 0
+
+    if sample_count < 1:
+        return None
+
+    rank = int(math.ceil((percentile / 100.0) * sample_count)) - 1
+
+    return sorted_samples[max(0, min(rank, sample_count - 1))]
 
 
 class RollingStats(object):
     """
-    Class to keep a rolling means.
+    Class to keep a rolling means, extremes, and percentiles
+    over a fixed window of the most recent samples.
+
+    The samples live in a fixed size ring buffer.
+    The mean is kept as a running sum, and the max/min
+    are tracked with monotonic queues, so a push is O(1).
+    Percentiles are computed on demand.
+
+    >>> stats = RollingStats("Test", 4)
+    >>> for value in [1.0, 5.0, 3.0, 2.0, 4.0]:
+    ...     stats.push(value)
+    >>> stats.average
+    3.5
+    >>> stats.get_max()
+    5.0
+    >>> stats.get_min()
+    2.0
+    >>> stats.get_percentile(50)
+    3.0
     """
 
+    DEFAULT_WINDOW_SIZE = 120
+
     def __init__(
         self,
-        name: str
+        name: str,
+        window_size: int = DEFAULT_WINDOW_SIZE
     ):
         """
         Creates a new mean tracker.
 
         Arguments:
             name {string} -- The name of the task being tracked.
+            window_size {int} -- The number of recent samples to keep. (default: {DEFAULT_WINDOW_SIZE})
         """
 
         self.task_name = name
-        self.__max_running_average__ = 120
-        self.__running_average__ = queue.Queue(self.__max_running_average__)
-        self.__running_sum__ = 0.0
-        self.__running_average_count__ = 0
+        self.__max_running_average__ = max(1, window_size)
         self.last = None
         self.average = 0.0
 
+        self.reset()
+
     def reset(
         self
     ):
@@ -35,9 +89,15 @@ class RollingStats(object):
         """
 
         self.average = 0.0
-        self.__running_average__ = queue.Queue(self.__max_running_average__)
+        self.__samples__ = array('d', [0.0]) * self.__max_running_average__
         self.__running_sum__ = 0.0
-        self.__running_average_count__ = 0.0
+        self.__running_average_count__ = 0
+        self.__push_count__ = 0
+
+        # (sample number, value) pairs.
+        # The front of each is the current extreme for the window.
+        self.__max_queue__ = deque()
+        self.__min_queue__ = deque()
 
     def push(
         self,
@@ -51,17 +111,142 @@ class RollingStats(object):
         """
 
         self.last = value
-        self.__running_average__.put(self.last)
-        self.__running_sum__ += self.last
-        self.__running_average_count__ += 1
 
-        if self.__running_average__.full():
-            self.__running_sum__ -= self.__running_average__.get()
-            self.__running_average_count__ -= 1
+        sample_number = self.__push_count__
+        index = sample_number % self.__max_running_average__
+
+        if self.__running_average_count__ < self.__max_running_average__:
+            self.__running_average_count__ += 1
+        else:
+            self.__running_sum__ -= self.__samples__[index]
+
+        self.__samples__[index] = value
+        self.__running_sum__ += value
+        self.__push_count__ = sample_number + 1
+
+        # Re-total once per trip around the ring so
+        # floating point error can not accumulate.
+        if index == self.__max_running_average__ - 1:
+            self.__running_sum__ = math.fsum(self.__samples__)
+
+        oldest_sample_number = self.__push_count__ - self.__max_running_average__
+
+        max_queue = self.__max_queue__
+        while max_queue and max_queue[-1][1] <= value:
+            max_queue.pop()
+        max_queue.append((sample_number, value))
+        if max_queue[0][0] < oldest_sample_number:
+            max_queue.popleft()
+
+        min_queue = self.__min_queue__
+        while min_queue and min_queue[-1][1] >= value:
+            min_queue.pop()
+        min_queue.append((sample_number, value))
+        if min_queue[0][0] < oldest_sample_number:
+            min_queue.popleft()
 
         self.average = float(self.__running_sum__ /
                              self.__running_average_count__)
 
+    def get_count(
+        self
+    ) -> int:
+        """
+        Returns the number of samples currently in the window.
+        """
+
+        return self.__running_average_count__
+
+    def get_max(
+        self
+    ) -> float:
+        """
+        Returns the largest sample in the window, or None if there are no samples.
+        """
+
+        max_queue = self.__max_queue__
+
+        return max_queue[0][1] if max_queue else None
+
+    def get_min(
+        self
+    ) -> float:
+        """
+        Returns the smallest sample in the window, or None if there are no samples.
+        """
+
+        min_queue = self.__min_queue__
+
+        return min_queue[0][1] if min_queue else None
+
+    def get_sorted_samples(
+        self
+    ) -> list:
+        """
+        Returns a sorted copy of the samples in the window.
+        """
+
+        return sorted(self.__samples__[:self.__running_average_count__])
+
+    def get_percentile(
+        self,
+        percentile: float
+    ) -> float:
+        """
+        Returns the given percentile of the samples in the window.
+
+        Arguments:
+            percentile {float} -- The percentile to get [0 - 100]
+
+        Returns:
+            float -- The value, or None if there are no samples.
+        """
+
+        return get_percentile(self.get_sorted_samples(), percentile)
+
+    def get_percentiles(
+        self,
+        percentiles: list = (50, 95, 99)
+    ) -> dict:
+        """
+        Returns several percentiles, only sorting the window once.
+
+        Keyword Arguments:
+            percentiles {list} -- The percentiles to get. (default: {(50, 95, 99)})
+
+        Returns:
+            dict -- The value for each of the requested percentiles.
+        """
+
+        sorted_samples = self.get_sorted_samples()
+
+        return {percentile: get_percentile(sorted_samples, percentile) for percentile in percentiles}
+
+    def to_dict(
+        self
+    ) -> dict:
+        """
+        Returns the current statistics as a dictionary
+        that can be serialized into JSON.
+
+        Returns:
+            dict -- The last, mean, min, max, and p50/p95/p99 of the window.
+        """
+
+        percentiles = self.get_percentiles()
+
+        return {
+            'name': self.task_name,
+            'count': self.__running_average_count__,
+            'last': self.last,
+            'mean': self.average,
+            'min': self.get_min(),
+            'max': self.get_max(),
+            'p50': percentiles[50],
+            'p95': percentiles[95],
+            'p99': percentiles[99]
+        }
+
     def to_string(
         self
     ) -> str:
@@ -76,8 +261,7 @@ class RollingStats(object):
             if self.last is None:
                 return "{0}: NO DATA".format(self.task_name)
 
-            slowest = max(
-                self.__running_average__.queue) if not self.__running_average__.empty() else None
+            slowest = self.get_max()
 
             if slowest is not None:
                 slowest_text = "{0:.1f}".format(slowest)
@@ -173,7 +357,7 @@ class TaskTimer(object):
     ):
         self.stop()
 
-        self.__start_time__ = datetime.datetime.utcnow()
+        self.__start_time__ = time.perf_counter()
         self.is_running = True
 
         self.__push_timer_on_stack__()
@@ -186,8 +370,7 @@ class TaskTimer(object):
 
         self.is_running = False
 
-        value = (datetime.datetime.utcnow() -
-                 self.__start_time__).total_seconds() * 1000.0
+        value = (time.perf_counter() - self.__start_time__) * 1000.0
         self.__stats__.push(value)
 
         self.__pop_timer_from_stack__()
@@ -198,43 +381,228 @@ class TaskTimer(object):
         return self.__stats__.to_string()
 
 
+class ProfilerThreadState(object):
+    """
+    The profiling state owned by a single thread.
+
+    Only the owning thread ever writes to the stack
+    or the stats, so recording a sample never needs a lock.
+    """
+
+    def __init__(
+        self,
+        thread_name: str
+    ):
+        self.thread_name = thread_name
+
+        # [TaskProfiler]
+        # The profilers currently running on this thread.
+        # The last entry is the innermost (current) task.
+        self.stack = []
+
+        # {string: [inclusive_ns, child_ns, call_count]}
+        self.stats = {}
+
+
+class DisabledTaskProfiler(object):
+    """
+    Stand-in returned by TaskProfiler when profiling is turned off.
+    Every operation is a no-op.
+    """
+
+    task_name = None
+
+    def start(
+        self
+    ):
+        pass
+
+    def stop(
+        self
+    ):
+        pass
+
+    def __enter__(
+        self
+    ):
+        return self
+
+    def __exit__(
+        self,
+        exc_type,
+        exc_val,
+        traceback
+    ):
+        pass
+
+
+__DISABLED_PROFILER__ = DisabledTaskProfiler()
+
+
 class TaskProfiler(object):
-    # {string:TimeDelta}
-    __TOTAL_TIMES__ = {}
+    """
+    Tracks the inclusive and exclusive (minus any profiled children)
+    time spent in a named task.
+
+    Each thread keeps its own call stack and statistics,
+    so tasks profiled from RecurringTask threads do not
+    corrupt the parent/child times of the render loop.
+    The statistics are merged when they are read.
+
+    Use as a context manager:
+
+        with TaskProfiler("Render::AllElements"):
+            ...
+    """
+
+    # When disabled, constructing a profiler costs
+    # a single attribute check and returns a shared no-op object.
+    __IS_ENABLED__ = True
 
-    # {string:float}
-    # Used to track how much time a task that was a child spent
-    # So we know what time was ONLY the given task
-    __CHILD_TIMES__ = {}
+    __THREAD_LOCAL__ = threading.local()
 
-    # {string: int}
-    __CALL_COUNTS__ = {}
+    # [ProfilerThreadState]
+    __THREAD_STATES__ = []
+    __THREAD_STATES_LOCK__ = threading.Lock()
 
-    # NOTE: Do we need to keep track of the thread here?
-    # [string]
-    __CALLING_TIMERS__ = []
+    def __new__(
+        cls,
+        task_name: str
+    ):
+        if not TaskProfiler.__IS_ENABLED__:
+            return __DISABLED_PROFILER__
+
+        return super().__new__(cls)
+
+    @staticmethod
+    def set_enabled(
+        is_enabled: bool
+    ):
+        """
+        Turns the profiler on or off for the whole process.
+
+        Args:
+            is_enabled (bool): Should tasks be profiled?
+        """
+
+        TaskProfiler.__IS_ENABLED__ = is_enabled
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return TaskProfiler.__IS_ENABLED__
+
+    @staticmethod
+    def __get_thread_state__() -> ProfilerThreadState:
+        """
+        Gets (or creates and registers) the profiling state for the calling thread.
+
+        Returns:
+            ProfilerThreadState: The state for the current thread.
+        """
+
+        try:
+            return TaskProfiler.__THREAD_LOCAL__.state
+        except AttributeError:
+            state = ProfilerThreadState(threading.current_thread().name)
+            TaskProfiler.__THREAD_LOCAL__.state = state
+
+            with TaskProfiler.__THREAD_STATES_LOCK__:
+                TaskProfiler.__THREAD_STATES__.append(state)
+
+            return state
+
+    @staticmethod
+    def __get_merged_stats__() -> dict:
+        """
+        Combines the statistics from every thread.
+
+        Returns:
+            dict: {task_name: [inclusive_ns, child_ns, call_count]}
+        """
+
+        with TaskProfiler.__THREAD_STATES_LOCK__:
+            thread_states = TaskProfiler.__THREAD_STATES__[:]
+
+        merged_stats = {}
+
+        for thread_state in thread_states:
+            for task_name, task_stats in list(thread_state.stats.items()):
+                if task_name not in merged_stats:
+                    merged_stats[task_name] = [0, 0, 0]
+
+                merged = merged_stats[task_name]
+                merged[0] += task_stats[0]
+                merged[1] += task_stats[1]
+                merged[2] += task_stats[2]
+
+        return merged_stats
 
     @staticmethod
     def reset():
-        for task_name in TaskProfiler.__TOTAL_TIMES__.keys():
-            TaskProfiler.__CHILD_TIMES__[task_name] = 0.0
-            TaskProfiler.__TOTAL_TIMES__[task_name] = 0.0
-            TaskProfiler.__CALL_COUNTS__[task_name] = 0
+        with TaskProfiler.__THREAD_STATES_LOCK__:
+            for thread_state in TaskProfiler.__THREAD_STATES__:
+                thread_state.stats = {}
 
-        TaskProfiler.__CALLING_TIMERS__ = []
+    @staticmethod
+    def get_inclusive_times() -> dict:
+        """
+        Returns the total time (in milliseconds) spent in each task,
+        including the time spent in any profiled children.
+
+        Returns:
+            dict: Keyed by task name.
+        """
+
+        return {task_name: task_stats[0] / 1000000.0 for task_name, task_stats in TaskProfiler.__get_merged_stats__().items()}
 
     @staticmethod
     def get_exclusive_times() -> dict:
-        exclusive_times = {}
+        """
+        Returns the total time (in milliseconds) spent in each task,
+        NOT including the time spent in any profiled children.
 
-        for task_name in TaskProfiler.__TOTAL_TIMES__.keys():
-            total_time = TaskProfiler.__TOTAL_TIMES__[task_name]
-            child_time = TaskProfiler.__CHILD_TIMES__[task_name]
-            exclusive_time = total_time - child_time
+        Returns:
+            dict: Keyed by task name.
+        """
 
-            exclusive_times[task_name] = exclusive_time
+        return {task_name: (task_stats[0] - task_stats[1]) / 1000000.0 for task_name, task_stats in TaskProfiler.__get_merged_stats__().items()}
 
-        return exclusive_times
+    @staticmethod
+    def get_call_counts() -> dict:
+        """
+        Returns the number of times each task has completed.
+
+        Returns:
+            dict: Keyed by task name.
+        """
+
+        return {task_name: task_stats[2] for task_name, task_stats in TaskProfiler.__get_merged_stats__().items()}
+
+    @staticmethod
+    def get_report() -> dict:
+        """
+        Returns the call counts, and inclusive/exclusive times (in milliseconds)
+        for every task, in a form that can be serialized into JSON.
+
+        Returns:
+            dict: Keyed by task name.
+        """
+
+        report = {}
+
+        for task_name, (inclusive_ns, child_ns, call_count) in TaskProfiler.__get_merged_stats__().items():
+            inclusive_ms = inclusive_ns / 1000000.0
+            exclusive_ms = (inclusive_ns - child_ns) / 1000000.0
+
+            report[task_name] = {
+                'calls': call_count,
+                'inclusive_ms': inclusive_ms,
+                'exclusive_ms': exclusive_ms,
+                'inclusive_mean_ms': (inclusive_ms / call_count) if call_count > 0 else None,
+                'exclusive_mean_ms': (exclusive_ms / call_count) if call_count > 0 else None
+            }
+
+        return report
 
     @staticmethod
     def log(
@@ -243,21 +611,20 @@ class TaskProfiler(object):
         if logger is None:
             return
 
-        exclusive_times = TaskProfiler.get_exclusive_times()
+        merged_stats = TaskProfiler.__get_merged_stats__()
 
         expense_order = sorted(
-            exclusive_times,
-            key=lambda profile: TaskProfiler.__TOTAL_TIMES__[profile],
+            merged_stats,
+            key=lambda profile: merged_stats[profile][0],
             reverse=True)
 
         logger.log_info_message('------ PERF ------')
         logger.log_info_message(
             'Task, Calls, IncTotal, ExTotal, IncMean, ExMean')
         for task_name in expense_order:
-            inclusive_ms = TaskProfiler.__TOTAL_TIMES__[task_name]
-            exclusive_ms = exclusive_times[task_name]
-
-            call_count = TaskProfiler.__CALL_COUNTS__[task_name]
+            inclusive_ns, child_ns, call_count = merged_stats[task_name]
+            inclusive_ms = inclusive_ns / 1000000.0
+            exclusive_ms = (inclusive_ns - child_ns) / 1000000.0
 
             inclusive_mean = 0.0
             exclusive_mean = 0.0
@@ -281,17 +648,10 @@ class TaskProfiler(object):
     ) -> None:
         super().__init__()
 
-        if task_name not in TaskProfiler.__CHILD_TIMES__:
-            TaskProfiler.__CHILD_TIMES__[task_name] = 0.0
-
-        if task_name not in TaskProfiler.__TOTAL_TIMES__:
-            TaskProfiler.__TOTAL_TIMES__[task_name] = 0.0
-
-        if task_name not in TaskProfiler.__CALL_COUNTS__:
-            TaskProfiler.__CALL_COUNTS__[task_name] = 0
-
         self.task_name = task_name
-        self.__timer__ = datetime.datetime.utcnow()
+        self.__start_time__ = 0
+        self.__child_time__ = 0
+        self.__thread_state__ = None
         self.__is_running__ = False
 
     def start(
@@ -300,9 +660,13 @@ class TaskProfiler(object):
         if self.__is_running__:
             return
 
-        self.__timer__ = datetime.datetime.utcnow()
+        thread_state = TaskProfiler.__get_thread_state__()
+        thread_state.stack.append(self)
+
+        self.__thread_state__ = thread_state
+        self.__child_time__ = 0
         self.__is_running__ = True
-        TaskProfiler.__CALLING_TIMERS__.append(self.task_name)
+        self.__start_time__ = time.perf_counter_ns()
 
     def stop(
         self
@@ -310,28 +674,38 @@ class TaskProfiler(object):
         if not self.__is_running__:
             return
 
+        total_ns = time.perf_counter_ns() - self.__start_time__
         self.__is_running__ = False
 
-        total_delta = datetime.datetime.utcnow() - self.__timer__
-        total_ms = total_delta.total_seconds() * 1000.0
+        thread_state = self.__thread_state__
+        calling_timers = thread_state.stack
 
-        TaskProfiler.__CALL_COUNTS__[self.task_name] += 1
+        if calling_timers and calling_timers[-1] is self:
+            calling_timers.pop()
+        elif self in calling_timers:
+            calling_timers.remove(self)
 
-        TaskProfiler.__TOTAL_TIMES__[self.task_name] += total_ms
-        TaskProfiler.__CALLING_TIMERS__.pop()
+        task_stats = thread_state.stats.get(self.task_name)
 
-        # Keep track of the parent's inclusive times
-        if len(TaskProfiler.__CALLING_TIMERS__) < 1:
-            return
+        if task_stats is None:
+            task_stats = [0, 0, 0]
+            thread_state.stats[self.task_name] = task_stats
 
-        parent_task_name = TaskProfiler.__CALLING_TIMERS__[-1]
-        TaskProfiler.__CHILD_TIMES__[parent_task_name] += total_ms
+        task_stats[0] += total_ns
+        task_stats[1] += self.__child_time__
+        task_stats[2] += 1
+
+        # Keep track of the parent's inclusive times
+        if calling_timers:
+            calling_timers[-1].__child_time__ += total_ns
 
     def __enter__(
         self
     ):
         self.start()
 
+        return self
+
     def __exit__(
         self,
         exc_type,
@@ -343,7 +717,6 @@ class TaskProfiler(object):
 
 if __name__ == '__main__':
     import logging
-    import time
 
     from common_utils.logger import HudLogger
 
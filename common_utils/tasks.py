@@ -1,12 +1,26 @@
 """
 Module to handle tasks that occur on a regularly scheduled interval.
+
+Recurring tasks share a single scheduler thread that sleeps
+until the earliest deadline, instead of each task owning
+a thread that polls the clock. Tasks that block on I/O
+are handed to a small worker pool so they can not delay
+the tasks scheduled behind them.
 """
 
-import datetime
+import heapq
+import itertools
+import math
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from logging import Logger, setLoggerClass
 
+from common_utils.task_timer import RollingStats
+
+# How many blocking tasks may run at the same time.
+DEFAULT_WORKER_COUNT = 4
+
 
 class IntermittentTask(object):
     """
@@ -17,14 +31,14 @@ class IntermittentTask(object):
     def run(
         self
     ):
-        now = datetime.datetime.utcnow()
+        now = time.monotonic()
         run_task = (self.__last_run__ is None) or (
-            (now - self.__last_run__).total_seconds() > self.__task_interval__)
+            (now - self.__last_run__) > self.__task_interval__)
 
         if run_task:
             try:
                 self.__task_callback__()
-                self.__last_run__ = datetime.datetime.utcnow()
+                self.__last_run__ = time.monotonic()
             except Exception as e:
                 # + sys.exc_info()[0]
                 error_mesage = "EX({}):{}".format(self.__task_name__, e)
@@ -53,16 +67,247 @@ class IntermittentTask(object):
         self.__last_run__ = None
 
 
+class TaskScheduler(object):
+    """
+    Runs recurring tasks from a min-heap of deadlines.
+
+    One thread sleeps until the earliest deadline, then either runs
+    the task itself (short, CPU bound work) or hands it to the worker
+    pool (anything that blocks on I/O). A task is never run again until
+    its previous run has finished, and its next deadline is always
+    computed from the previous deadline, not from when it finished,
+    so the schedule does not drift.
+
+    Each deadline carries the task's schedule token from when it was
+    queued. Stopping or restarting a task changes the token, so any
+    deadline still queued from before is dropped instead of run.
+    """
+
+    def __init__(
+        self,
+        worker_count: int = DEFAULT_WORKER_COUNT
+    ):
+        self.__worker_count__ = worker_count
+
+        # [(deadline, sequence, RecurringTask, schedule token)]
+        self.__deadlines__ = []
+        self.__sequence__ = itertools.count()
+        self.__condition__ = threading.Condition()
+
+        self.__thread__ = None
+        self.__workers__ = None
+        self.__busy_workers__ = 0
+
+    def schedule(
+        self,
+        task,
+        deadline: float,
+        schedule_token: int
+    ):
+        """
+        Queues a task to run at the given time.
+
+        Args:
+            task (RecurringTask): The task to run.
+            deadline (float): When to run it, in `time.monotonic()` seconds.
+            schedule_token (int): The task's schedule token. The deadline is dropped if the token has changed by the time it is due.
+        """
+
+        with self.__condition__:
+            self.__start__()
+
+            heapq.heappush(
+                self.__deadlines__,
+                (deadline, next(self.__sequence__), task, schedule_token))
+
+            # Only wake the scheduler if this is the new earliest deadline.
+            if self.__deadlines__[0][2] is task:
+                self.__condition__.notify()
+
+    def get_statistics(
+        self
+    ) -> dict:
+        """
+        Returns the state of the scheduler in a form that can be serialized into JSON.
+
+        Returns:
+            dict: The number of queued tasks, and how busy the worker pool is.
+        """
+
+        with self.__condition__:
+            next_deadline = self.__deadlines__[0][0] if self.__deadlines__ else None
+
+            return {
+                'queued': len(self.__deadlines__),
+                'next_deadline_ms': ((next_deadline - time.monotonic()) * 1000.0) if next_deadline is not None else None,
+                'workers': self.__worker_count__,
+                'busy_workers': self.__busy_workers__
+            }
+
+    def __start__(
+        self
+    ):
+        """
+        Starts the scheduler thread the first time a task is scheduled.
+        Must be called while holding the condition.
+        """
+
+        if self.__thread__ is not None:
+            return
+
+        self.__workers__ = ThreadPoolExecutor(
+            max_workers=self.__worker_count__,
+            thread_name_prefix="TaskWorker")
+        self.__thread__ = threading.Thread(
+            target=self.__run_loop__,
+            name="TaskScheduler",
+            daemon=True)
+        self.__thread__.start()
+
+    def __run_loop__(
+        self
+    ):
+        while True:
+            with self.__condition__:
+                while not self.__deadlines__:
+                    self.__condition__.wait()
+
+                deadline, sequence, task, schedule_token = self.__deadlines__[0]
+                time_to_wait = deadline - time.monotonic()
+
+                if time_to_wait > 0.0:
+                    self.__condition__.wait(time_to_wait)
+
+                    # Something may have been scheduled sooner.
+                    continue
+
+                heapq.heappop(self.__deadlines__)
+
+                # Queued before the task was stopped or restarted.
+                if schedule_token != task.get_schedule_token():
+                    continue
+
+                if task.is_blocking():
+                    self.__busy_workers__ += 1
+
+            if not task.is_blocking():
+                self.__run_task__(task, deadline, schedule_token)
+            else:
+                self.__workers__.submit(self.__run_blocking_task__, task, deadline, schedule_token)
+
+    def __run_blocking_task__(
+        self,
+        task,
+        deadline: float,
+        schedule_token: int
+    ):
+        try:
+            self.__run_task__(task, deadline, schedule_token)
+        finally:
+            with self.__condition__:
+                self.__busy_workers__ -= 1
+
+    def __run_task__(
+        self,
+        task,
+        deadline: float,
+        schedule_token: int
+    ):
+        if not task.is_running() or schedule_token != task.get_schedule_token():
+            return
+
+        try:
+            next_deadline = task.run_once(deadline)
+        except BaseException as ex:
+            # Nothing a task raises (including SystemExit and KeyboardInterrupt)
+            # may take down the scheduler thread, and every other task with it,
+            # or be lost in a worker's future. The task stays on its schedule.
+            next_deadline = task.handle_exception(ex, deadline)
+
+        if next_deadline is not None:
+            self.schedule(task, next_deadline, schedule_token)
+
+
+SCHEDULER = TaskScheduler()
+
+
 class RecurringTask(object):
     """
     Object to control and handle a recurring task.
+
+    Tasks are run by the shared `SCHEDULER`. Set `is_blocking`
+    for anything that waits on the network or disk so it runs
+    on the worker pool, and `use_dedicated_thread` for tasks
+    that never return (such as a server loop).
     """
 
+    # [RecurringTask]
+    __TASKS__ = []
+
+    @staticmethod
+    def get_statistics() -> list:
+        """
+        Returns the loop timing statistics for every recurring task.
+
+        Returns:
+            list: A dictionary (that can be serialized into JSON) for each task.
+        """
+
+        return [task.get_task_statistics() for task in RecurringTask.__TASKS__[:]]
+
+    @staticmethod
+    def reset_statistics():
+        for task in RecurringTask.__TASKS__[:]:
+            task.__run_time_stats__.reset()
+            task.__lateness_stats__.reset()
+            task.__run_count__ = 0
+            task.__exception_count__ = 0
+            task.__overrun_count__ = 0
+            task.__skipped_count__ = 0
+
+    def get_task_statistics(
+        self
+    ) -> dict:
+        """
+        Returns how often, and for how long, this task has run.
+
+        Returns:
+            dict: The name, interval, run/exception/overrun counts, and run times (in milliseconds).
+        """
+
+        return {
+            'name': self.__task_name__,
+            'interval_ms': self.__task_interval__ * 1000.0,
+            'is_alive': self.__is_alive__(),
+            'is_blocking': self.__is_blocking__,
+            'runs': self.__run_count__,
+            'exceptions': self.__exception_count__,
+            'overruns': self.__overrun_count__,
+            'skipped': self.__skipped_count__,
+            'run_time_ms': self.__run_time_stats__.to_dict(),
+            'lateness_ms': self.__lateness_stats__.to_dict()
+        }
+
+    def is_running(
+        self
+    ) -> bool:
+        return self.__is_running__
+
+    def is_blocking(
+        self
+    ) -> bool:
+        return self.__is_blocking__
+
+    def get_schedule_token(
+        self
+    ) -> int:
+        return self.__schedule_token__
+
     def __is_alive__(
         self
     ) -> bool:
         if self.__thread__ is None:
-            return False
+            return self.__is_running__
 
         # Python 3.0 to 3.8 use isAlive
         # Python 3.9 and later use is_alive
@@ -81,38 +326,130 @@ class RecurringTask(object):
         """
         Starts the task if it is not already running.
         """
-        if self.__task_callback__ is not None \
-            and self.__thread__ is not None \
-                and not self.__is_alive__():
-            self.__is_running__ = True
+        if self.__task_callback__ is None or self.__is_running__:
+            return False
+
+        self.__is_running__ = True
+        self.__schedule_token__ += 1
+
+        if self.__thread__ is not None:
             self.__thread__.start()
+        else:
+            SCHEDULER.schedule(self, time.monotonic(), self.__schedule_token__)
 
-            return True
+        return True
 
-        return False
+    def stop(
+        self
+    ):
+        """
+        Stops the task from being run again.
+        A run that is already in progress is allowed to finish.
+        Tasks on a dedicated thread can not be stopped.
+        """
+
+        self.__is_running__ = False
+        self.__schedule_token__ += 1
+
+    def run_once(
+        self,
+        deadline: float
+    ) -> float:
+        """
+        Runs the task for the given deadline.
+
+        Args:
+            deadline (float): When the task was due to run, in `time.monotonic()` seconds.
+
+        Returns:
+            float: When the task should next run, or None if it has been stopped.
+        """
+
+        task_start_time = time.monotonic()
+        self.__lateness_stats__.push((task_start_time - deadline) * 1000.0)
+
+        try:
+            self.__task_callback__()
+        except Exception as e:
+            self.__log_exception__(e)
+
+        now = time.monotonic()
+        self.__run_count__ += 1
+        self.__run_time_stats__.push((now - task_start_time) * 1000.0)
+
+        return self.__get_next_deadline__(deadline, now)
+
+    def handle_exception(
+        self,
+        exception: BaseException,
+        deadline: float
+    ) -> float:
+        """
+        Logs an exception that escaped `run_once`, such as SystemExit or KeyboardInterrupt.
+
+        Args:
+            exception (BaseException): What the task raised.
+            deadline (float): When the task was due to run, in `time.monotonic()` seconds.
+
+        Returns:
+            float: When the task should next run, or None if it has been stopped.
+        """
+
+        self.__run_count__ += 1
+        self.__log_exception__(exception)
+
+        return self.__get_next_deadline__(deadline, time.monotonic())
+
+    def __log_exception__(
+        self,
+        exception: BaseException
+    ):
+        self.__exception_count__ += 1
+        # + sys.exc_info()[0]
+        error_mesage = "EX({}):{}".format(self.__task_name__, str(exception) or repr(exception))
+
+        if self.__logger__ is not None:
+            self.__logger__.info(error_mesage)
+        else:
+            print(error_mesage)
+
+    def __get_next_deadline__(
+        self,
+        deadline: float,
+        now: float
+    ) -> float:
+        if not self.__is_running__:
+            return None
+
+        next_deadline = deadline + self.__task_interval__
+
+        # The run went past the next deadline. Skip the runs that
+        # were missed rather than running back-to-back to catch up,
+        # but stay on the original schedule.
+        if next_deadline <= now:
+            missed_runs = int(math.floor((now - next_deadline) / self.__task_interval__)) + 1 \
+                if self.__task_interval__ > 0.0 else 0
+
+            self.__overrun_count__ += 1
+            self.__skipped_count__ += missed_runs
+            next_deadline += missed_runs * self.__task_interval__
+
+        return next_deadline
 
     def __run_loop__(
         self
     ):
-        while True:
-            task_start_time = datetime.datetime.utcnow()
-            try:
-                self.__task_callback__()
-            except Exception as e:
-                # + sys.exc_info()[0]
-                error_mesage = "EX({}):{}".format(self.__task_name__, e)
+        deadline = time.monotonic()
 
-                if self.__logger__ is not None:
-                    self.__logger__.info(error_mesage)
-                else:
-                    print(error_mesage)
-            task_run_time = datetime.datetime.utcnow() - task_start_time
-            time_to_sleep = self.__task_interval__ - task_run_time.total_seconds()
+        while self.__is_running__:
+            deadline = self.run_once(deadline)
+
+            if deadline is None:
+                return
+
+            time_to_sleep = deadline - time.monotonic()
 
             if time_to_sleep > 0.0:
-                # print("{}: Sleeping for {} seconds".format(
-                #     self.__task_name__,
-                #     time_to_sleep))
                 time.sleep(time_to_sleep)
 
     def __init__(
@@ -121,21 +458,43 @@ class RecurringTask(object):
         task_interval: float,
         task_callback,
         logger: Logger = None,
-        start_immediate: bool = True
+        start_immediate: bool = True,
+        is_blocking: bool = False,
+        use_dedicated_thread: bool = False
     ):
         """
         Creates a new reccurring task.
         The call back is called at the given time schedule.
+
+        Arguments:
+            task_name {str} -- The name of the task for logging and statistics.
+            task_interval {float} -- How often the task should run (in seconds).
+            task_callback -- The function to run.
+            logger {Logger} -- Where exceptions are logged. (default: {None})
+            start_immediate {bool} -- Should the task be started now? (default: {True})
+            is_blocking {bool} -- Does the task wait on I/O? Blocking tasks run on the worker pool. (default: {False})
+            use_dedicated_thread {bool} -- Does the task need a thread to itself? (default: {False})
         """
 
         self.__task_name__ = task_name
         self.__task_interval__ = task_interval
         self.__task_callback__ = task_callback
         self.__logger__ = logger
+        self.__is_blocking__ = is_blocking
+        self.__is_running__ = False
+        self.__schedule_token__ = 0
+        self.__run_time_stats__ = RollingStats(task_name)
+        self.__lateness_stats__ = RollingStats(task_name)
+        self.__run_count__ = 0
+        self.__exception_count__ = 0
+        self.__overrun_count__ = 0
+        self.__skipped_count__ = 0
         self.__thread__ = threading.Thread(
             target=self.__run_loop__,
             name=task_name
-        )
+        ) if use_dedicated_thread else None
+
+        RecurringTask.__TASKS__.append(self)
 
         if start_immediate:
             self.start()
@@ -148,7 +507,7 @@ class TimerTest(object):
         self.a = 0
         self.b = 0
 
-        RecurringTask("A", 1, self.increment_a)
+        self.task_a = RecurringTask("A", 1, self.increment_a)
         RecurringTask("B", 2, self.increment_b)
 
     def increment_a(
@@ -161,7 +520,7 @@ class TimerTest(object):
     ):
         self.b += 1
 
-        if (self.b % 10) == 0:
+        if (self.b % 2) == 0:
             raise KeyboardInterrupt
 
 
@@ -169,8 +528,19 @@ if __name__ == '__main__':
 
     TEST = TimerTest()
 
-    while True:
+    for second in range(10):
         print("A:" + str(TEST.a))
         print("B:" + str(TEST.b))
 
+        # Restarting A must not leave it with two deadlines.
+        if second == 5:
+            TEST.task_a.stop()
+            TEST.task_a.start()
+
         time.sleep(1)
+
+    # B raising KeyboardInterrupt must not stop it, or the scheduler.
+    assert TEST.b >= 4, "B stopped after raising"
+    assert 9 <= TEST.a <= 12, "A ran {} times".format(TEST.a)
+
+    print("PASSED")
@@ -0,0 +1,141 @@
+"""
+Module to collect live performance data from
+the various parts of the HUD so it can be
+served (as JSON) without going through the log.
+"""
+
+import threading
+
+from common_utils import (allocation_tracker, async_polling, endpoint_health,
+                          flight_recorder, http_pool, websocket_stream)
+from common_utils.task_timer import TaskProfiler
+from common_utils import tasks
+from common_utils.tasks import RecurringTask
+
+
+class TelemetryRegistry(object):
+    """
+    Static registry of performance data providers.
+
+    A provider is a callback that returns something that can be
+    serialized into JSON. An optional reset callback clears
+    whatever the provider is accumulating.
+    """
+
+    # {string: (callback, reset_callback)}
+    __PROVIDERS__ = {}
+    __LOCK__ = threading.Lock()
+
+    @staticmethod
+    def add_provider(
+        name: str,
+        callback,
+        reset_callback=None
+    ):
+        """
+        Adds (or replaces) a named source of performance data.
+
+        Args:
+            name (str): The key the data will be reported under.
+            callback: Function that returns the data.
+            reset_callback (optional): Function that resets the data. Defaults to None.
+        """
+
+        if name is None or callback is None:
+            return
+
+        with TelemetryRegistry.__LOCK__:
+            TelemetryRegistry.__PROVIDERS__[name] = (callback, reset_callback)
+
+    @staticmethod
+    def remove_provider(
+        name: str
+    ):
+        with TelemetryRegistry.__LOCK__:
+            TelemetryRegistry.__PROVIDERS__.pop(name, None)
+
+    @staticmethod
+    def get_report() -> dict:
+        """
+        Collects the data from every provider.
+        A provider that fails reports its error instead of its data.
+
+        Returns:
+            dict: Keyed by provider name.
+        """
+
+        with TelemetryRegistry.__LOCK__:
+            providers = list(TelemetryRegistry.__PROVIDERS__.items())
+
+        report = {}
+
+        for name, (callback, reset_callback) in providers:
+            try:
+                report[name] = callback()
+            except Exception as ex:
+                report[name] = {'error': str(ex)}
+
+        return report
+
+    @staticmethod
+    def reset():
+        """
+        Resets every provider that supports being reset.
+        """
+
+        with TelemetryRegistry.__LOCK__:
+            providers = list(TelemetryRegistry.__PROVIDERS__.values())
+
+        for callback, reset_callback in providers:
+            if reset_callback is None:
+                continue
+
+            try:
+                reset_callback()
+            except Exception:
+                pass
+
+
+TelemetryRegistry.add_provider(
+    'profiler',
+    TaskProfiler.get_report,
+    TaskProfiler.reset)
+
+TelemetryRegistry.add_provider(
+    'tasks',
+    RecurringTask.get_statistics,
+    RecurringTask.reset_statistics)
+
+TelemetryRegistry.add_provider(
+    'scheduler',
+    tasks.SCHEDULER.get_statistics)
+
+TelemetryRegistry.add_provider(
+    'polling',
+    async_polling.INSTANCE.get_statistics,
+    async_polling.INSTANCE.reset_statistics)
+
+TelemetryRegistry.add_provider(
+    'streams',
+    websocket_stream.WebSocketStream.get_statistics,
+    websocket_stream.WebSocketStream.reset_statistics)
+
+TelemetryRegistry.add_provider(
+    'endpoints',
+    endpoint_health.EndpointHealth.get_all_statistics,
+    endpoint_health.EndpointHealth.reset_all_statistics)
+
+TelemetryRegistry.add_provider(
+    'flight_recorder',
+    flight_recorder.INSTANCE.get_statistics,
+    flight_recorder.INSTANCE.reset_statistics)
+
+TelemetryRegistry.add_provider(
+    'http_pool',
+    http_pool.INSTANCE.get_statistics,
+    http_pool.INSTANCE.reset_statistics)
+
+TelemetryRegistry.add_provider(
+    'allocations',
+    allocation_tracker.INSTANCE.get_report,
+    allocation_tracker.INSTANCE.reset)
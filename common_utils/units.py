@@ -208,6 +208,42 @@ def get_converted_units(
     return distance / yards_to_sm
 
 
+def get_raw_distance(
+    units: str,
+    distance: float
+) -> float:
+    """
+    The opposite of `get_converted_units`. Converts a distance
+    in the given units back into the ADS-B receiver's units.
+
+    Args:
+        units {string} -- 'statute', 'knots', or 'metric'
+        distance {float} -- The distance in the given units.
+
+    Returns:
+        float: The distance in the raw units (yards).
+
+    >>> get_raw_distance('statute', 93.75)
+    165000.0
+    >>> get_raw_distance('statute', 0)
+    0.0
+    >>> round(get_raw_distance('knots', 2.606931079259592), 6)
+    5280.0
+    >>> round(get_raw_distance('metric', 4.82804656138843), 6)
+    5280.0
+    """
+    if units is None:
+        units = STATUTE
+
+    if units == METRIC:
+        return distance * yards_to_km
+
+    if units == NAUTICAL:
+        return distance * yards_to_nm
+
+    return distance * yards_to_sm
+
+
 def get_distance_unit_suffix(
     units: str
 ) -> str:
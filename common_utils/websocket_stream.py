@@ -0,0 +1,576 @@
+"""
+Module to subscribe to a JSON WebSocket feed (such as the
+Stratux /situation and /traffic sockets) and hand each
+message to a callback as it arrives.
+
+The streams run on the same event loop as the pollers in
+`async_polling`, so they do not cost a thread each.
+A dropped connection is re-opened with a growing delay.
+
+A quiet connection is pinged. If nothing (not even the pong)
+comes back for a few idle periods, the connection is taken to
+be dead, such as a half-open socket after the Wi-Fi drops,
+and is re-opened.
+
+To try it against a local stand-in for the Stratux sockets:
+
+    python3 -m common_utils.websocket_stream
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+import time
+from urllib.parse import urlsplit
+
+from common_utils import async_polling
+from common_utils.task_timer import RollingStats
+
+# From RFC 6455. Combined with the key to prove the server speaks WebSocket.
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT = 0x1
+OPCODE_BINARY = 0x2
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+# Anything larger is not a situation or traffic report.
+MAX_MESSAGE_BYTES = 1024 * 1024
+
+# How long to wait before the first reconnect, and the longest wait.
+MIN_RECONNECT_SECONDS = 0.5
+MAX_RECONNECT_SECONDS = 10.0
+
+# How long to wait for the connection and handshake.
+CONNECT_TIMEOUT = 2.0
+
+# How many idle periods without a frame (even a pong) before the connection is dead.
+DEAD_AFTER_IDLE_PERIODS = 3
+
+
+def get_accept_key(
+    key: str
+) -> str:
+    """
+    Returns the Sec-WebSocket-Accept value a server must answer the key with.
+
+    >>> get_accept_key("dGhlIHNhbXBsZSBub25jZQ==")
+    's3pPLMBiTxaQ9kYGzzhZRbK+xOo='
+
+    Args:
+        key (str): The Sec-WebSocket-Key that was sent.
+
+    Returns:
+        str: The expected Sec-WebSocket-Accept.
+    """
+
+    return base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode('ascii')).digest()).decode('ascii')
+
+
+def encode_frame(
+    opcode: int,
+    payload: bytes,
+    mask: bool = True
+) -> bytes:
+    """
+    Builds a single, final frame. Frames from a client must be masked.
+
+    >>> encode_frame(OPCODE_TEXT, b'Hi', False)
+    b'\\x81\\x02Hi'
+
+    Args:
+        opcode (int): The frame type.
+        payload (bytes): The frame contents.
+        mask (bool, optional): Should the payload be masked? Defaults to True.
+
+    Returns:
+        bytes: The encoded frame.
+    """
+
+    payload_length = len(payload)
+    mask_bit = 0x80 if mask else 0x00
+    header = bytes([0x80 | opcode])
+
+    if payload_length < 126:
+        header += bytes([mask_bit | payload_length])
+    elif payload_length < 65536:
+        header += bytes([mask_bit | 126]) + struct.pack('!H', payload_length)
+    else:
+        header += bytes([mask_bit | 127]) + struct.pack('!Q', payload_length)
+
+    if not mask:
+        return header + payload
+
+    mask_key = os.urandom(4)
+
+    return header + mask_key + apply_mask(payload, mask_key)
+
+
+def apply_mask(
+    payload: bytes,
+    mask_key: bytes
+) -> bytes:
+    """
+    Masks (or unmasks) a payload.
+
+    >>> apply_mask(apply_mask(b'Hello', b'abcd'), b'abcd')
+    b'Hello'
+    """
+
+    if not payload:
+        return payload
+
+    # XOR the whole payload at once as a big integer
+    # instead of byte by byte.
+    repeated_mask = (mask_key * ((len(payload) // 4) + 1))[:len(payload)]
+
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(repeated_mask, 'big')).to_bytes(len(payload), 'big')
+
+
+class WebSocketConnection(object):
+    """
+    The client side of a single WebSocket connection.
+    """
+
+    def __init__(
+        self
+    ):
+        self.__reader__ = None
+        self.__writer__ = None
+
+        # When (monotonic) the last frame of any kind arrived.
+        self.last_frame_time = None
+
+    async def connect(
+        self,
+        host: str,
+        port: int,
+        path: str
+    ):
+        """
+        Opens the connection and performs the upgrade handshake.
+
+        Args:
+            host (str): The host to connect to.
+            port (int): The port to connect to.
+            path (str): The path of the socket.
+        """
+
+        self.__reader__, self.__writer__ = await asyncio.open_connection(host, port)
+
+        key = base64.b64encode(os.urandom(16)).decode('ascii')
+        request = "GET {} HTTP/1.1\r\nHost: {}:{}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\nSec-WebSocket-Key: {}\r\nSec-WebSocket-Version: 13\r\n\r\n".format(
+            path,
+            host,
+            port,
+            key)
+
+        self.__writer__.write(request.encode('ascii'))
+        await self.__writer__.drain()
+
+        head = (await self.__reader__.readuntil(b'\r\n\r\n')).decode('iso-8859-1')
+        lines = head.split('\r\n')
+        status_parts = lines[0].split(' ', 2)
+
+        if len(status_parts) < 2 or status_parts[1] != '101':
+            raise ConnectionError("WebSocket upgrade refused: '{}'".format(lines[0]))
+
+        headers = {}
+
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        if headers.get('sec-websocket-accept') != get_accept_key(key):
+            raise ConnectionError("WebSocket upgrade did not accept our key")
+
+        self.last_frame_time = time.monotonic()
+
+    def ping(
+        self
+    ):
+        """
+        Asks the server to show it is still there.
+        The pong is taken in by `receive()`, and only moves `last_frame_time`.
+        """
+
+        self.__writer__.write(encode_frame(OPCODE_PING, b''))
+
+    async def receive(
+        self
+    ):
+        """
+        Waits for the next complete message. Pings are answered
+        and fragmented messages are put back together.
+
+        Returns:
+            The message. A str for text messages, bytes for binary.
+        """
+
+        message_opcode = None
+        fragments = []
+        message_length = 0
+
+        while True:
+            opcode, is_final, payload = await self.__read_frame__()
+
+            if opcode == OPCODE_PING:
+                self.__writer__.write(encode_frame(OPCODE_PONG, payload))
+                continue
+
+            if opcode == OPCODE_PONG:
+                continue
+
+            if opcode == OPCODE_CLOSE:
+                self.__writer__.write(encode_frame(OPCODE_CLOSE, payload[:2]))
+                raise ConnectionError("WebSocket closed by the server")
+
+            if opcode != OPCODE_CONTINUATION:
+                message_opcode = opcode
+                fragments = []
+                message_length = 0
+
+            fragments.append(payload)
+            message_length += len(payload)
+
+            if message_length > MAX_MESSAGE_BYTES:
+                raise ConnectionError("WebSocket message is too large")
+
+            if is_final:
+                message = b''.join(fragments)
+
+                return message.decode('utf-8') if message_opcode == OPCODE_TEXT else message
+
+    def close(
+        self
+    ):
+        if self.__writer__ is not None:
+            try:
+                self.__writer__.write(encode_frame(OPCODE_CLOSE, struct.pack('!H', 1000)))
+                self.__writer__.close()
+            except Exception:
+                pass
+
+        self.__reader__ = None
+        self.__writer__ = None
+
+    async def __read_frame__(
+        self
+    ) -> tuple:
+        """
+        Reads a single frame.
+
+        Returns:
+            tuple: The opcode, if this is the final frame of the message, and the (unmasked) payload.
+        """
+
+        first_byte, second_byte = await self.__reader__.readexactly(2)
+        payload_length = second_byte & 0x7F
+
+        if payload_length == 126:
+            payload_length = struct.unpack('!H', await self.__reader__.readexactly(2))[0]
+        elif payload_length == 127:
+            payload_length = struct.unpack('!Q', await self.__reader__.readexactly(8))[0]
+
+        if payload_length > MAX_MESSAGE_BYTES:
+            raise ConnectionError("WebSocket frame is too large")
+
+        mask_key = await self.__reader__.readexactly(4) if (second_byte & 0x80) else None
+        payload = await self.__reader__.readexactly(payload_length)
+
+        if mask_key is not None:
+            payload = apply_mask(payload, mask_key)
+
+        self.last_frame_time = time.monotonic()
+
+        return first_byte & 0x0F, (first_byte & 0x80) != 0, payload
+
+
+class WebSocketStream(object):
+    """
+    Keeps a subscription to a JSON WebSocket open and
+    hands every message to a callback.
+    """
+
+    # [WebSocketStream]
+    __STREAMS__ = []
+
+    @staticmethod
+    def get_statistics() -> list:
+        """
+        Returns the statistics for every stream.
+
+        Returns:
+            list: A dictionary (that can be serialized into JSON) for each stream.
+        """
+
+        return [stream.get_stream_statistics() for stream in WebSocketStream.__STREAMS__[:]]
+
+    @staticmethod
+    def reset_statistics():
+        for stream in WebSocketStream.__STREAMS__[:]:
+            stream.message_count = 0
+            stream.error_count = 0
+            stream.byte_count = 0
+            stream.__message_interval_stats__.reset()
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        callback,
+        idle_seconds: float = 1.0,
+        alive_callback=None
+    ):
+        """
+        Creates a new stream. Call `start()` to connect.
+
+        Args:
+            name (str): The name used in the statistics.
+            url (str): The ws:// URL to subscribe to.
+            callback: Function taking each decoded JSON message. Called on the event loop thread.
+            idle_seconds (float, optional): How long without a message before the server is pinged. Defaults to 1.0.
+            alive_callback (optional): Function called when the server has answered a ping, while there are no messages. Defaults to None.
+        """
+
+        url_parts = urlsplit(url)
+
+        self.name = name
+        self.__host__ = url_parts.hostname
+        self.__port__ = url_parts.port or 80
+        self.__path__ = (url_parts.path or '/') + (('?' + url_parts.query) if url_parts.query else '')
+        self.__callback__ = callback
+        self.__idle_seconds__ = idle_seconds
+        self.__alive_callback__ = alive_callback
+
+        self.__future__ = None
+        self.__last_message_time__ = None
+        self.__message_interval_stats__ = RollingStats(name)
+
+        self.is_connected = False
+        self.connect_count = 0
+        self.message_count = 0
+        self.byte_count = 0
+        self.error_count = 0
+        self.last_error = None
+
+        WebSocketStream.__STREAMS__.append(self)
+
+    def start(
+        self
+    ):
+        """
+        Starts the stream (if it is not already running).
+        """
+
+        if self.__future__ is None:
+            self.__future__ = async_polling.INSTANCE.submit(self.__run__())
+
+    def get_stream_statistics(
+        self
+    ) -> dict:
+        return {
+            'name': self.name,
+            'is_connected': self.is_connected,
+            'connects': self.connect_count,
+            'messages': self.message_count,
+            'bytes': self.byte_count,
+            'errors': self.error_count,
+            'last_error': self.last_error,
+            'message_interval_ms': self.__message_interval_stats__.to_dict()
+        }
+
+    async def __run__(
+        self
+    ):
+        reconnect_delay = MIN_RECONNECT_SECONDS
+
+        while True:
+            connection = WebSocketConnection()
+
+            try:
+                await asyncio.wait_for(
+                    connection.connect(self.__host__, self.__port__, self.__path__),
+                    CONNECT_TIMEOUT)
+
+                self.is_connected = True
+                self.connect_count += 1
+                reconnect_delay = MIN_RECONNECT_SECONDS
+
+                await self.__receive_messages__(connection)
+            except asyncio.CancelledError:
+                connection.close()
+
+                raise
+            except Exception as ex:
+                self.error_count += 1
+                self.last_error = str(ex) or ex.__class__.__name__
+            finally:
+                self.is_connected = False
+
+            connection.close()
+
+            await asyncio.sleep(reconnect_delay)
+            reconnect_delay = min(reconnect_delay * 2.0, MAX_RECONNECT_SECONDS)
+
+    async def __receive_messages__(
+        self,
+        connection: WebSocketConnection
+    ):
+        # A quiet socket is not a dead one (there may be no traffic),
+        # so the read is never cancelled just because it is taking a while.
+        # It is only given up on when the server stops answering pings.
+        receive_task = None
+        ping_time = None
+
+        try:
+            while True:
+                if receive_task is None:
+                    receive_task = asyncio.ensure_future(connection.receive())
+
+                done, pending = await asyncio.wait({receive_task}, timeout=self.__idle_seconds__)
+
+                if not done:
+                    seconds_since_frame = time.monotonic() - connection.last_frame_time
+
+                    if seconds_since_frame > (self.__idle_seconds__ * DEAD_AFTER_IDLE_PERIODS):
+                        raise ConnectionError("No answer for {:.1f} seconds".format(seconds_since_frame))
+
+                    # Something (the pong) came back since the last ping.
+                    if ping_time is not None and connection.last_frame_time >= ping_time and self.__alive_callback__ is not None:
+                        self.__alive_callback__()
+
+                    ping_time = time.monotonic()
+                    connection.ping()
+
+                    continue
+
+                message = receive_task.result()
+                receive_task = None
+
+                self.__on_message__(message)
+        finally:
+            if receive_task is not None:
+                receive_task.cancel()
+
+    def __on_message__(
+        self,
+        message
+    ):
+        now = time.perf_counter()
+
+        if self.__last_message_time__ is not None:
+            self.__message_interval_stats__.push((now - self.__last_message_time__) * 1000.0)
+
+        self.__last_message_time__ = now
+        self.message_count += 1
+        self.byte_count += len(message)
+
+        try:
+            self.__callback__(json.loads(message))
+        except Exception as ex:
+            self.error_count += 1
+            self.last_error = "Callback: {}".format(ex)
+
+
+if __name__ == '__main__':
+    async def __serve_stand_in__(
+        reader,
+        writer
+    ):
+        """
+        Pretends to be the Stratux sockets.
+        /situation pushes a report every 50ms, and /traffic
+        pushes a few (fragmented) reports then goes quiet
+        (answering pings), and drops the connection to show
+        the reconnect. /silent never answers, like a socket
+        left half-open when the Wi-Fi drops.
+        """
+
+        head = (await reader.readuntil(b'\r\n\r\n')).decode('iso-8859-1')
+        path = head.split(' ', 2)[1]
+        key = [line.split(':', 1)[1].strip() for line in head.split('\r\n') if line.lower().startswith('sec-websocket-key')][0]
+
+        writer.write("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\nSec-WebSocket-Accept: {}\r\n\r\n".format(
+            get_accept_key(key)).encode('ascii'))
+
+        if path == '/silent':
+            await asyncio.sleep(10.0)
+        elif path == '/situation':
+            for count in range(1000):
+                situation = {'AHRSRoll': float(count % 30), 'AHRSPitch': 2.0, 'GPSFixQuality': 2}
+                writer.write(encode_frame(OPCODE_TEXT, json.dumps(situation).encode('utf-8'), False))
+                await writer.drain()
+                await asyncio.sleep(0.05)
+        else:
+            writer.write(encode_frame(OPCODE_PING, b'ping', False))
+
+            for icao in [11268767, 10645359]:
+                report = json.dumps({'Icao_addr': icao, 'Tail': 'N{}'.format(icao % 1000), 'Position_valid': True}).encode('utf-8')
+                split = len(report) // 2
+
+                writer.write(bytes([OPCODE_TEXT, split]) + report[:split])
+                writer.write(bytes([0x80 | OPCODE_CONTINUATION, len(report) - split]) + report[split:])
+                await writer.drain()
+
+            async def __answer_pings__():
+                while True:
+                    first_byte, second_byte = await reader.readexactly(2)
+                    mask_key = await reader.readexactly(4)
+                    payload = apply_mask(await reader.readexactly(second_byte & 0x7F), mask_key)
+
+                    if (first_byte & 0x0F) == OPCODE_PING:
+                        writer.write(encode_frame(OPCODE_PONG, payload, False))
+
+            try:
+                await asyncio.wait_for(__answer_pings__(), 2.5)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                pass
+
+        writer.close()
+
+    import threading
+
+    received = {'/situation': [], '/traffic': [], '/silent': []}
+    alive_count = [0]
+    ports = []
+
+    def __start_server__():
+        server_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(server_loop)
+        stand_in = server_loop.run_until_complete(asyncio.start_server(__serve_stand_in__, '127.0.0.1', 0))
+        ports.append(stand_in.sockets[0].getsockname()[1])
+        server_loop.run_forever()
+
+    threading.Thread(target=__start_server__, daemon=True).start()
+
+    while not ports:
+        time.sleep(0.01)
+
+    for path in received.keys():
+        WebSocketStream(
+            path,
+            "ws://127.0.0.1:{}{}".format(ports[0], path),
+            received[path].append,
+            1.0,
+            lambda: alive_count.__setitem__(0, alive_count[0] + 1)).start()
+
+    time.sleep(5.0)
+
+    for stream_stats in WebSocketStream.get_statistics():
+        print("{}: connected={}, {} connects, {} messages, {} errors, last error={}. Last message={}".format(
+            stream_stats['name'],
+            stream_stats['is_connected'],
+            stream_stats['connects'],
+            stream_stats['messages'],
+            stream_stats['errors'],
+            stream_stats['last_error'],
+            received[stream_stats['name']][-1] if received[stream_stats['name']] else None))
+
+    print("Alive callbacks: {}".format(alive_count[0]))
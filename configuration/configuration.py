@@ -3,14 +3,15 @@ import json
 import os
 from os.path import expanduser
 
-import requests
-from common_utils import tasks, units
+from common_utils import http_pool, tasks, units
 from data_sources import receiver_capabilities, receiver_status
 
 EARTH_RADIUS_NAUTICAL_MILES = 3440
 EARTH_RADIUS_STATUTE_MILES = 3956
 EARTH_RADIUS_KILOMETERS_MILES = 6371
 MAX_MINUTES_BEFORE_REMOVING_TRAFFIC_REPORT = 2
+MAX_TRAFFIC_EXTRAPOLATION_SECONDS = 3.0
+DEFAULT_REPLAY_SPEED = 1.0
 MAX_FRAMERATE = 60
 TARGET_AHRS_FRAMERATE = 30
 AHRS_TIMEOUT = 10.0 * (1.0 / float(TARGET_AHRS_FRAMERATE))
@@ -73,6 +74,9 @@ HEADING_BUGS_FILE = get_absolute_file_path(__heading_bugs_file__)
 class DataSourceNames(object):
     STRATUX = "stratux"
     SIMULATION = "simulation"
+    WEBSOCKET = "websocket"
+    GDL90 = "gdl90"
+    REPLAY = "replay"
 
 
 class Configuration(object):
@@ -95,6 +99,7 @@ class Configuration(object):
     FLIP_VERTICAL_KEY = "flip_vertical"
     OWNSHIP_KEY = "ownship"
     MAX_MINUTES_BEFORE_REMOVING_TRAFFIC_REPORT_KEY = "traffic_report_removal_minutes"
+    MAX_TRAFFIC_EXTRAPOLATION_SECONDS_KEY = "traffic_extrapolation_seconds"
     DISTANCE_UNITS_KEY = "distance_units"
     ENABLE_DECLINATION_KEY = "enable_declination"
     DECLINATION_KEY = "declination"
@@ -103,6 +108,14 @@ class Configuration(object):
     AITHRE_KEY = 'aithre'
     TRAFFIC_MANAGER_KEY = 'traffic_manager'
     AITHRE_MANAGER_KEY = 'aithre_manager'
+    QUALITY_GOVERNOR_KEY = 'quality_governor'
+    ELEMENT_LAYERS_KEY = 'element_layers'
+    ASYNC_POLLING_KEY = 'async_polling'
+    AHRS_PREDICTION_KEY = 'ahrs_prediction'
+    FLIGHT_RECORDER_KEY = 'flight_recorder'
+    FLIGHT_RECORDER_COMPRESSION_KEY = 'flight_recorder_compression'
+    REPLAY_FILE_KEY = 'replay_file'
+    REPLAY_SPEED_KEY = 'replay_speed'
 
     DEFAULT_DEGREES_OF_PITCH = 90
     DEFAULT_PITCH_DEGREES_DISPLAY_SCALER = 2.0
@@ -201,12 +214,21 @@ class Configuration(object):
             Configuration.FLIP_HORIZONTAL_KEY: self.flip_horizontal,
             Configuration.FLIP_VERTICAL_KEY: self.flip_vertical,
             Configuration.MAX_MINUTES_BEFORE_REMOVING_TRAFFIC_REPORT_KEY: self.max_minutes_before_removal,
+            Configuration.MAX_TRAFFIC_EXTRAPOLATION_SECONDS_KEY: self.max_traffic_extrapolation_seconds,
             Configuration.DISTANCE_UNITS_KEY: self.get_units(),
             Configuration.ENABLE_DECLINATION_KEY: self.__is_declination_enabled__,
             Configuration.DEGREES_OF_PITCH_KEY: self.get_degrees_of_pitch(),
             Configuration.PITCH_DEGREES_DISPLAY_SCALER_KEY: self.get_pitch_degrees_display_scaler(),
             Configuration.AITHRE_KEY: self.aithre_enabled,
             Configuration.TRAFFIC_MANAGER_KEY: self.get_traffic_manager_address(),
+            Configuration.QUALITY_GOVERNOR_KEY: self.quality_governor_enabled,
+            Configuration.ELEMENT_LAYERS_KEY: self.element_layers_enabled,
+            Configuration.ASYNC_POLLING_KEY: self.async_polling_enabled,
+            Configuration.AHRS_PREDICTION_KEY: self.ahrs_prediction_enabled,
+            Configuration.FLIGHT_RECORDER_KEY: self.flight_recorder_enabled,
+            Configuration.FLIGHT_RECORDER_COMPRESSION_KEY: self.flight_recorder_compression_enabled,
+            Configuration.REPLAY_FILE_KEY: self.replay_file,
+            Configuration.REPLAY_SPEED_KEY: self.replay_speed,
             DEFAULT_VIEW_KEY: self.__view_index__
         }
 
@@ -239,6 +261,10 @@ class Configuration(object):
         if json_config is None:
             return
 
+        # Lets anything derived from the configuration
+        # know that it needs to be rebuilt.
+        self.generation += 1
+
         set_from_maps = [Configuration.STRATUX_ADDRESS_KEY,
                          Configuration.DATA_SOURCE_KEY]
 
@@ -251,6 +277,47 @@ class Configuration(object):
             self.__configuration__[Configuration.AITHRE_KEY] = \
                 self.aithre_enabled
 
+        if Configuration.QUALITY_GOVERNOR_KEY in json_config:
+            self.quality_governor_enabled = bool(json_config[Configuration.QUALITY_GOVERNOR_KEY])
+            self.__configuration__[Configuration.QUALITY_GOVERNOR_KEY] = \
+                self.quality_governor_enabled
+
+        if Configuration.ELEMENT_LAYERS_KEY in json_config:
+            self.element_layers_enabled = bool(json_config[Configuration.ELEMENT_LAYERS_KEY])
+            self.__configuration__[Configuration.ELEMENT_LAYERS_KEY] = \
+                self.element_layers_enabled
+
+        if Configuration.AHRS_PREDICTION_KEY in json_config:
+            self.ahrs_prediction_enabled = bool(json_config[Configuration.AHRS_PREDICTION_KEY])
+            self.__configuration__[Configuration.AHRS_PREDICTION_KEY] = \
+                self.ahrs_prediction_enabled
+
+        # The recorder is started with the HUD, so these take effect on the next start.
+        if Configuration.FLIGHT_RECORDER_KEY in json_config:
+            self.flight_recorder_enabled = bool(json_config[Configuration.FLIGHT_RECORDER_KEY])
+            self.__configuration__[Configuration.FLIGHT_RECORDER_KEY] = \
+                self.flight_recorder_enabled
+
+        if Configuration.FLIGHT_RECORDER_COMPRESSION_KEY in json_config:
+            self.flight_recorder_compression_enabled = bool(json_config[Configuration.FLIGHT_RECORDER_COMPRESSION_KEY])
+            self.__configuration__[Configuration.FLIGHT_RECORDER_COMPRESSION_KEY] = \
+                self.flight_recorder_compression_enabled
+
+        # The replay is opened when the HUD starts, so these take effect on the next start.
+        if Configuration.REPLAY_FILE_KEY in json_config:
+            self.replay_file = str(json_config[Configuration.REPLAY_FILE_KEY])
+            self.__configuration__[Configuration.REPLAY_FILE_KEY] = self.replay_file
+
+        if Configuration.REPLAY_SPEED_KEY in json_config:
+            self.replay_speed = max(0.0, float(json_config[Configuration.REPLAY_SPEED_KEY]))
+            self.__configuration__[Configuration.REPLAY_SPEED_KEY] = self.replay_speed
+
+        # The pollers are created at start up, so this takes effect on the next start.
+        if Configuration.ASYNC_POLLING_KEY in json_config:
+            self.async_polling_enabled = bool(json_config[Configuration.ASYNC_POLLING_KEY])
+            self.__configuration__[Configuration.ASYNC_POLLING_KEY] = \
+                self.async_polling_enabled
+
         if Configuration.FLIP_HORIZONTAL_KEY in json_config:
             self.flip_horizontal = \
                 bool(json_config[Configuration.FLIP_HORIZONTAL_KEY])
@@ -269,6 +336,12 @@ class Configuration(object):
             self.__configuration__[
                 Configuration.MAX_MINUTES_BEFORE_REMOVING_TRAFFIC_REPORT_KEY] = self.max_minutes_before_removal
 
+        if Configuration.MAX_TRAFFIC_EXTRAPOLATION_SECONDS_KEY in json_config:
+            self.max_traffic_extrapolation_seconds = max(0.0, float(
+                json_config[Configuration.MAX_TRAFFIC_EXTRAPOLATION_SECONDS_KEY]))
+            self.__configuration__[
+                Configuration.MAX_TRAFFIC_EXTRAPOLATION_SECONDS_KEY] = self.max_traffic_extrapolation_seconds
+
         if Configuration.DISTANCE_UNITS_KEY in json_config:
             self.units = json_config[Configuration.DISTANCE_UNITS_KEY]
             self.__configuration__[
@@ -595,6 +668,7 @@ class Configuration(object):
     ):
         self.__view_index__ = 0
         self.__hud_views__ = None
+        self.generation = 0
         self.get_views_list()
         self.degrees_of_pitch = Configuration.DEFAULT_DEGREES_OF_PITCH
         self.pitch_degrees_display_scaler = Configuration.DEFAULT_PITCH_DEGREES_DISPLAY_SCALER
@@ -604,6 +678,9 @@ class Configuration(object):
         self.max_minutes_before_removal = self.__get_config_value__(
             Configuration.MAX_MINUTES_BEFORE_REMOVING_TRAFFIC_REPORT_KEY,
             MAX_MINUTES_BEFORE_REMOVING_TRAFFIC_REPORT)
+        self.max_traffic_extrapolation_seconds = self.__get_config_value__(
+            Configuration.MAX_TRAFFIC_EXTRAPOLATION_SECONDS_KEY,
+            MAX_TRAFFIC_EXTRAPOLATION_SECONDS)
         self.log_filename = "stratux_hud.log"
 
         self.flip_horizontal = self.__get_config_value__(
@@ -618,13 +695,40 @@ class Configuration(object):
         self.aithre_enabled = self.__get_config_value__(
             Configuration.AITHRE_KEY,
             True)
+        self.quality_governor_enabled = self.__get_config_value__(
+            Configuration.QUALITY_GOVERNOR_KEY,
+            True)
+        self.element_layers_enabled = self.__get_config_value__(
+            Configuration.ELEMENT_LAYERS_KEY,
+            True)
+        self.async_polling_enabled = self.__get_config_value__(
+            Configuration.ASYNC_POLLING_KEY,
+            False)
+        self.ahrs_prediction_enabled = self.__get_config_value__(
+            Configuration.AHRS_PREDICTION_KEY,
+            True)
+        self.flight_recorder_enabled = self.__get_config_value__(
+            Configuration.FLIGHT_RECORDER_KEY,
+            False)
+        self.flight_recorder_compression_enabled = self.__get_config_value__(
+            Configuration.FLIGHT_RECORDER_COMPRESSION_KEY,
+            True)
+
+        # The speed is a multiple of real time.
+        # Zero replays as fast as the data can be taken in.
+        self.replay_file = self.__get_config_value__(
+            Configuration.REPLAY_FILE_KEY,
+            "")
+        self.replay_speed = self.__get_config_value__(
+            Configuration.REPLAY_SPEED_KEY,
+            DEFAULT_REPLAY_SPEED)
         self.traffic_manager_address = self.__get_config_value__(
             Configuration.TRAFFIC_MANAGER_KEY,
             Configuration.DEFAULT_TRAFFIC_MANAGER_ADDRESS)
         self.aithre_manager_address = self.__get_config_value__(
             Configuration.AITHRE_MANAGER_KEY,
             Configuration.DEFAULT_AITHRE_MANAGER_ADDRESS)
-        self.__stratux_session__ = requests.Session()
+        self.__stratux_session__ = http_pool.INSTANCE.get_session()
 
         self.stratux_status = receiver_status.StratuxStatus(
             self.stratux_address(),
@@ -635,7 +739,8 @@ class Configuration(object):
         tasks.RecurringTask(
             'UpdateCapabilities',
             15,
-            self.__update_capabilities__)
+            self.__update_capabilities__,
+            is_blocking=True)
 
         self.__view_index__ = self.get_default_view_index()
 
@@ -9,6 +9,7 @@ import re
 import shutil
 from http.server import BaseHTTPRequestHandler
 
+from common_utils.telemetry import TelemetryRegistry
 from configuration import configuration
 
 CONFIGURATION = None
@@ -23,6 +24,8 @@ MEDIA_TYPE_VALUE = 'application/json'
 # Invoke-WebRequest -Uri "http://localhost:8080/settings" -Method GET -ContentType "application/json"
 # Invoke-WebRequest -Uri "http://localhost:8080/settings" -Method PUT -ContentType "application/json" -Body '{"flip_horizontal": true}'
 # curl -X PUT -d '{"declination": 17}' http://localhost:8080/settings
+# curl http://localhost:8080/perf
+# curl -X POST http://localhost:8080/perf/reset
 
 ERROR_JSON = '{success: false}'
 
@@ -132,6 +135,28 @@ def get_view_previous(
     return get_current_view_response()
 
 
+def get_perf(
+    handler
+) -> dict:
+    """
+    Handler for a REST call to get the live performance data.
+    """
+
+    return TelemetryRegistry.get_report()
+
+
+def reset_perf(
+    handler
+) -> dict:
+    """
+    Handler for a REST call to reset the accumulated performance data.
+    """
+
+    TelemetryRegistry.reset()
+
+    return {"perf": "reset"}
+
+
 def get_json_success_response(
     text: str
 ) -> str:
@@ -154,7 +179,11 @@ class ConfigurationHost(BaseHTTPRequestHandler):
         r'^/view_elements': {'GET': get_elements_list, MEDIA_TYPE_KEY: MEDIA_TYPE_VALUE},
         r'^/views': {'GET': get_views_list, 'PUT': set_views, MEDIA_TYPE_KEY: MEDIA_TYPE_VALUE},
         r'^/view/next': {'GET': get_view_next},
-        r'^/view/previous': {'GET': get_view_previous}
+        r'^/view/previous': {'GET': get_view_previous},
+        # The more specific route needs to be matched first.
+        # Resetting changes state, so a prefetch or refresh (GET) must not do it.
+        r'^/perf/reset': {'PUT': reset_perf, 'POST': reset_perf, MEDIA_TYPE_KEY: MEDIA_TYPE_VALUE},
+        r'^/perf': {'GET': get_perf, MEDIA_TYPE_KEY: MEDIA_TYPE_VALUE}
     }
 
     def do_HEAD(
@@ -252,7 +281,7 @@ class ConfigurationHost(BaseHTTPRequestHandler):
         else:
             self.send_response(405)
             self.end_headers()
-            self.wfile.write(method + ' is not supported\n')
+            self.wfile.write((method + ' is not supported\n').encode())
 
     def __handle_request__(
         self,
@@ -0,0 +1,258 @@
+"""
+Handles trading visual quality for frame rate.
+
+Watches how long each element takes to render against
+the frame budget. When the budget is being missed, the
+most expensive element is asked to drop one quality level.
+When there is headroom again, the most recent reduction
+is undone.
+"""
+
+import time
+
+from common_utils.task_timer import RollingStats
+
+# Proportion of the frame budget that the render work needs to stay under.
+DEGRADE_THRESHOLD = 0.9
+
+# Proportion of the frame budget that the render work must be under
+# before any quality is restored. The gap between this and
+# DEGRADE_THRESHOLD is the hysteresis that keeps us from flapping.
+RESTORE_THRESHOLD = 0.6
+
+# How long the budget must be missed before reducing quality.
+DEGRADE_HOLD_SECONDS = 2.0
+
+# How long there must be headroom before restoring quality.
+RESTORE_HOLD_SECONDS = 10.0
+
+# Minimum time between any two changes so the
+# effect of the last change can be measured.
+SETTLE_SECONDS = 2.0
+
+# How many frames are used to judge the frame and element times.
+SAMPLE_WINDOW = 60
+
+
+class QualityGovernor(object):
+    """
+    Adjusts the quality level of individual HUD elements to stay within a frame budget.
+
+    Elements expose their available reductions through
+    `get_quality_levels()` and take them through `set_quality_level()`.
+    """
+
+    def __init__(
+        self,
+        frame_budget_ms: float,
+        logger=None
+    ):
+        """
+        Creates a new governor.
+
+        Args:
+            frame_budget_ms (float): How long a frame has (in milliseconds).
+            logger (HudLogger, optional): The logger to report changes to. Defaults to None.
+        """
+
+        self.__frame_budget_ms__ = frame_budget_ms
+        self.__logger__ = logger
+
+        self.__frame_stats__ = RollingStats("FrameWork", SAMPLE_WINDOW)
+
+        # {HudElement: RollingStats}
+        self.__element_stats__ = {}
+
+        # [HudElement]
+        # Elements in the order that they were degraded.
+        # The last one is the first to be restored.
+        self.__degraded_elements__ = []
+
+        self.__over_budget_since__ = None
+        self.__under_budget_since__ = None
+        self.__last_change__ = 0.0
+
+        self.degrade_count = 0
+        self.restore_count = 0
+
+    def record_element_time(
+        self,
+        hud_element,
+        render_time_ms: float
+    ):
+        """
+        Records how long an element took to render this frame.
+
+        Args:
+            hud_element (HudElement): The element that was rendered.
+            render_time_ms (float): How long the element took (in milliseconds).
+        """
+
+        element_stats = self.__element_stats__.get(hud_element)
+
+        if element_stats is None:
+            element_stats = RollingStats(str(hud_element.__class__.__name__), SAMPLE_WINDOW)
+            self.__element_stats__[hud_element] = element_stats
+
+        element_stats.push(render_time_ms)
+
+    def record_frame_time(
+        self,
+        frame_time_ms: float,
+        view_elements: list,
+        now: float = None
+    ):
+        """
+        Records how long the render work for a frame took, and
+        then adjusts the quality of the view's elements if needed.
+
+        Args:
+            frame_time_ms (float): How long the frame's work took (in milliseconds). This should NOT include any time spent waiting for the next frame.
+            view_elements (list): The elements in the view that was rendered.
+            now (float, optional): The current monotonic time. Defaults to None.
+        """
+
+        self.__frame_stats__.push(frame_time_ms)
+
+        if self.__frame_stats__.get_count() < SAMPLE_WINDOW:
+            return
+
+        now = time.monotonic() if now is None else now
+
+        if (now - self.__last_change__) < SETTLE_SECONDS:
+            return
+
+        frame_time = self.__frame_stats__.get_percentile(95)
+
+        if frame_time > (self.__frame_budget_ms__ * DEGRADE_THRESHOLD):
+            self.__under_budget_since__ = None
+
+            if self.__over_budget_since__ is None:
+                self.__over_budget_since__ = now
+            elif (now - self.__over_budget_since__) >= DEGRADE_HOLD_SECONDS:
+                if self.__degrade__(view_elements, frame_time):
+                    self.__on_change__(now)
+        elif frame_time < (self.__frame_budget_ms__ * RESTORE_THRESHOLD):
+            self.__over_budget_since__ = None
+
+            if self.__under_budget_since__ is None:
+                self.__under_budget_since__ = now
+            elif (now - self.__under_budget_since__) >= RESTORE_HOLD_SECONDS:
+                if self.__restore__(frame_time):
+                    self.__on_change__(now)
+        else:
+            self.__over_budget_since__ = None
+            self.__under_budget_since__ = None
+
+    def get_report(
+        self
+    ) -> dict:
+        """
+        Returns the state of the governor in a form that can be serialized into JSON.
+
+        Returns:
+            dict: The budget, frame stats, and the quality level of any reduced elements.
+        """
+
+        return {
+            'frame_budget_ms': self.__frame_budget_ms__,
+            'frame_work_ms': self.__frame_stats__.to_dict(),
+            'degrades': self.degrade_count,
+            'restores': self.restore_count,
+            'reduced_elements': {
+                element.__class__.__name__: element.get_quality_level() for element in self.__degraded_elements__
+            }
+        }
+
+    def __on_change__(
+        self,
+        now: float
+    ):
+        self.__last_change__ = now
+        self.__over_budget_since__ = None
+        self.__under_budget_since__ = None
+
+        # The samples from before the change no longer represent the cost.
+        self.__frame_stats__.reset()
+
+        for element_stats in self.__element_stats__.values():
+            element_stats.reset()
+
+    def __degrade__(
+        self,
+        view_elements: list,
+        frame_time: float
+    ) -> bool:
+        """
+        Drops the quality of the most expensive element that can still be reduced.
+
+        Returns:
+            bool: True if an element was changed.
+        """
+
+        most_expensive_element = None
+        most_expensive_time = 0.0
+
+        for hud_element in view_elements:
+            element_stats = self.__element_stats__.get(hud_element)
+
+            if element_stats is None \
+                    or hud_element.get_quality_level() >= hud_element.get_quality_levels():
+                continue
+
+            if element_stats.average > most_expensive_time:
+                most_expensive_element = hud_element
+                most_expensive_time = element_stats.average
+
+        if most_expensive_element is None:
+            return False
+
+        new_level = most_expensive_element.get_quality_level() + 1
+        most_expensive_element.set_quality_level(new_level)
+        self.__degraded_elements__.append(most_expensive_element)
+        self.degrade_count += 1
+
+        self.__log__("Frame work at {:.1f}ms of {:.1f}ms budget. Reducing {} ({:.1f}ms) to quality level {}".format(
+            frame_time,
+            self.__frame_budget_ms__,
+            most_expensive_element.__class__.__name__,
+            most_expensive_time,
+            new_level))
+
+        return True
+
+    def __restore__(
+        self,
+        frame_time: float
+    ) -> bool:
+        """
+        Undoes the most recent quality reduction.
+
+        Returns:
+            bool: True if an element was changed.
+        """
+
+        if not self.__degraded_elements__:
+            return False
+
+        hud_element = self.__degraded_elements__.pop()
+        new_level = max(0, hud_element.get_quality_level() - 1)
+        hud_element.set_quality_level(new_level)
+        self.restore_count += 1
+
+        self.__log__("Frame work at {:.1f}ms of {:.1f}ms budget. Restoring {} to quality level {}".format(
+            frame_time,
+            self.__frame_budget_ms__,
+            hud_element.__class__.__name__,
+            new_level))
+
+        return True
+
+    def __log__(
+        self,
+        text: str
+    ):
+        # Called from the render loop, so without a logger it is dropped,
+        # not printed.
+        if self.__logger__ is not None:
+            self.__logger__.log_info_message(text)
@@ -2,6 +2,7 @@
 Data store to standardize AHRS data.
 """
 
+import time
 from datetime import datetime, timezone
 from typing import Union
 
@@ -86,9 +87,54 @@ class AhrsData:
         """
         return int(fast_math.wrap_degrees(self.compass_heading)) if self.__is_compass_heading_valid__() else NOT_AVAILABLE
 
+    def freeze(
+        self
+    ):
+        """
+        Makes the data read-only. Sources freeze the snapshots
+        they share between callers so nothing can change them.
+
+        Returns:
+            AhrsData: self, for convenience.
+        """
+        self.__is_frozen__ = True
+
+        return self
+
+    def copy(
+        self
+    ):
+        """
+        Returns a copy that can be changed, even if this is frozen.
+
+        Returns:
+            AhrsData: The copy.
+        """
+        new_copy = AhrsData()
+        new_copy.__dict__.update(self.__dict__)
+        new_copy.__dict__.pop('__is_frozen__', None)
+
+        return new_copy
+
+    def __setattr__(
+        self,
+        name: str,
+        value
+    ):
+        if self.__dict__.get('__is_frozen__', False):
+            raise AttributeError("AhrsData snapshot is read-only ({})".format(name))
+
+        super().__setattr__(name, value)
+
     def __init__(
         self
     ):
+        # Changes every time a source publishes new data.
+        # Two snapshots with the same version hold the same data.
+        self.version = 0
+        # When (monotonic) the data was measured,
+        # or for a prediction, the time it was predicted for.
+        self.timestamp = time.monotonic()
         self.roll = 0.0
         self.pitch = 0.0
         self.compass_heading = 0.0
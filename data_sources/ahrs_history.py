@@ -0,0 +1,517 @@
+"""
+Keeps a short, timestamped, history of the attitude so the
+HUD can draw the attitude for the moment a frame is shown,
+instead of the moment the last AHRS package arrived.
+
+The AHRS arrives at about TARGET_AHRS_FRAMERATE (with jitter),
+but the HUD renders at MAX_FRAMERATE. Holding the last package
+makes the horizon step. Instead the pitch, roll, and heading
+rates are estimated from the most recent samples and the
+attitude is extrapolated a short distance forward.
+
+Every time a new sample arrives it is compared against what
+was predicted for it, so the prediction error is measured
+against the real data as it flies.
+"""
+
+import math
+import time
+from collections import deque
+from numbers import Number
+
+from common_utils import fast_math
+from common_utils.task_timer import RollingStats
+
+from data_sources.ahrs_data import AhrsData
+
+HOLD = 'hold'
+LINEAR = 'linear'
+QUADRATIC = 'quadratic'
+
+PREDICTION_METHODS = [HOLD, LINEAR, QUADRATIC]
+
+# How many samples to keep.
+DEFAULT_HISTORY_SIZE = 8
+
+# How many of the most recent samples each fit uses.
+# More samples smooth out the sensor noise, but
+# follow changes in the rates more slowly.
+LINEAR_FIT_SAMPLES = 4
+QUADRATIC_FIT_SAMPLES = 8
+
+# Never predict further than this past the newest sample.
+# If the data is older than this, something is wrong
+# and guessing further would only make it worse.
+MAX_EXTRAPOLATION_SECONDS = 0.1
+
+# Samples further apart than this are not used to estimate the rates.
+MAX_SAMPLE_SPAN_SECONDS = 0.5
+
+# How quickly the estimate of the time to get a frame on screen
+# follows changes.
+PRESENT_LATENCY_SMOOTHING = 0.1
+
+# Anything above 360 means the compass heading is not available.
+MAX_VALID_HEADING = 360
+
+
+def get_angle_difference(
+    from_angle: float,
+    to_angle: float
+) -> float:
+    """
+    Returns the shortest signed turn from one angle to another.
+
+    >>> get_angle_difference(350, 10)
+    20
+    >>> get_angle_difference(10, 350)
+    -20
+    >>> get_angle_difference(170, -170)
+    20
+    """
+
+    difference = (to_angle - from_angle) % 360
+
+    return difference - 360 if difference > 180 else difference
+
+
+def get_wrapped_angle(
+    angle: float
+) -> float:
+    """
+    Wraps an angle into -180 to 180.
+
+    >>> get_wrapped_angle(190)
+    -170
+    >>> get_wrapped_angle(-190)
+    170
+    >>> get_wrapped_angle(45)
+    45
+    """
+
+    angle = angle % 360
+
+    return angle - 360 if angle > 180 else angle
+
+
+def __fit_line__(
+    times: list,
+    values: list
+) -> tuple:
+    """
+    Least squares line through the samples.
+
+    Returns:
+        tuple: The value and rate at time zero, or None if there is not enough spread in the times.
+    """
+
+    count = len(times)
+    mean_time = sum(times) / count
+    mean_value = sum(values) / count
+    time_spread = sum([(sample_time - mean_time) ** 2 for sample_time in times])
+
+    if time_spread <= 0.0:
+        return None
+
+    rate = sum([(sample_time - mean_time) * (value - mean_value) for sample_time, value in zip(times, values)]) / time_spread
+
+    return mean_value - rate * mean_time, rate
+
+
+def __fit_parabola__(
+    times: list,
+    values: list
+) -> tuple:
+    """
+    Least squares parabola through the samples.
+
+    Returns:
+        tuple: The value, rate, and half the acceleration at time zero, or None if it can not be fit.
+    """
+
+    s0 = float(len(times))
+    s1 = sum(times)
+    s2 = sum([sample_time ** 2 for sample_time in times])
+    s3 = sum([sample_time ** 3 for sample_time in times])
+    s4 = sum([sample_time ** 4 for sample_time in times])
+    y0 = sum(values)
+    y1 = sum([sample_time * value for sample_time, value in zip(times, values)])
+    y2 = sum([(sample_time ** 2) * value for sample_time, value in zip(times, values)])
+
+    # Cramer's rule on the normal equations.
+    determinant = s0 * (s2 * s4 - s3 * s3) - s1 * (s1 * s4 - s3 * s2) + s2 * (s1 * s3 - s2 * s2)
+
+    if math.fabs(determinant) < 1e-18:
+        return None
+
+    a = (y0 * (s2 * s4 - s3 * s3) - s1 * (y1 * s4 - s3 * y2) + s2 * (y1 * s3 - s2 * y2)) / determinant
+    b = (s0 * (y1 * s4 - s3 * y2) - y0 * (s1 * s4 - s3 * s2) + s2 * (s1 * y2 - y1 * s2)) / determinant
+    c = (s0 * (s2 * y2 - y1 * s3) - s1 * (s1 * y2 - y1 * s2) + y0 * (s1 * s3 - s2 * s2)) / determinant
+
+    return a, b, c
+
+
+def extrapolate(
+    times: list,
+    values: list,
+    timestamp: float,
+    method: str
+) -> float:
+    """
+    Predicts the value at a timestamp from the samples.
+    The values must already be unwrapped (no jumps at 360).
+
+    LINEAR and QUADRATIC are least squares fits over the most
+    recent LINEAR_FIT_SAMPLES or QUADRATIC_FIT_SAMPLES, so a
+    single noisy sample does not throw the prediction off.
+    Falls back to a simpler fit if there are not enough samples.
+
+    >>> round(extrapolate([0.0, 1.0], [0.0, 2.0], 1.5, LINEAR), 6)
+    3.0
+    >>> round(extrapolate([0.0, 1.0, 2.0], [0.0, 1.0, 4.0], 3.0, QUADRATIC), 6)
+    9.0
+    >>> extrapolate([0.0, 1.0], [0.0, 2.0], 1.5, HOLD)
+    2.0
+    >>> extrapolate([1.0], [2.0], 1.5, QUADRATIC)
+    2.0
+    """
+
+    newest_time = times[-1]
+
+    if method == QUADRATIC and len(values) >= 3:
+        fit_times = [sample_time - newest_time for sample_time in times[-QUADRATIC_FIT_SAMPLES:]]
+        parabola = __fit_parabola__(fit_times, values[-QUADRATIC_FIT_SAMPLES:])
+
+        if parabola is not None:
+            offset = timestamp - newest_time
+
+            return parabola[0] + parabola[1] * offset + parabola[2] * offset * offset
+
+    if method in [LINEAR, QUADRATIC] and len(values) >= 2:
+        fit_times = [sample_time - newest_time for sample_time in times[-LINEAR_FIT_SAMPLES:]]
+        line = __fit_line__(fit_times, values[-LINEAR_FIT_SAMPLES:])
+
+        if line is not None:
+            return line[0] + line[1] * (timestamp - newest_time)
+
+    return values[-1]
+
+
+class AhrsSample(object):
+    """
+    The parts of the attitude that are predicted, and when they were measured.
+    """
+
+    __slots__ = ('timestamp', 'version', 'pitch', 'roll', 'heading')
+
+    def __init__(
+        self,
+        timestamp: float,
+        version: int,
+        pitch: float,
+        roll: float,
+        heading: float
+    ):
+        self.timestamp = timestamp
+        self.version = version
+        self.pitch = pitch
+        self.roll = roll
+        self.heading = heading
+
+
+class AhrsHistory(object):
+    """
+    Timestamped history of the attitude, and a predictor over it.
+    Expected to be used from the render thread.
+    """
+
+    def __init__(
+        self,
+        size: int = DEFAULT_HISTORY_SIZE,
+        method: str = LINEAR,
+        max_extrapolation: float = MAX_EXTRAPOLATION_SECONDS
+    ):
+        """
+        Creates an empty history.
+
+        Args:
+            size (int, optional): How many samples to keep. Defaults to DEFAULT_HISTORY_SIZE.
+            method (str, optional): One of PREDICTION_METHODS. Defaults to LINEAR.
+            max_extrapolation (float, optional): The furthest (in seconds) to predict past the newest sample. Defaults to MAX_EXTRAPOLATION_SECONDS.
+        """
+
+        self.method = method
+        self.max_extrapolation = max_extrapolation
+
+        self.__samples__ = deque(maxlen=max(1, size))
+        self.__present_latency__ = 0.0
+
+        self.sample_interval_stats = RollingStats("AhrsSampleInterval")
+        self.sample_age_stats = RollingStats("AhrsSampleAge")
+        self.present_latency_stats = RollingStats("AhrsPresentLatency")
+        self.predict_time_stats = RollingStats("AhrsPredict")
+        self.pitch_error_stats = RollingStats("AhrsPitchError")
+        self.roll_error_stats = RollingStats("AhrsRollError")
+        self.heading_error_stats = RollingStats("AhrsHeadingError")
+
+        self.clamped_count = 0
+
+    def push(
+        self,
+        orientation: AhrsData,
+        timestamp: float = None
+    ) -> bool:
+        """
+        Adds the orientation to the history, if it is new.
+
+        Before it is added, the prediction for its timestamp
+        is made from the older samples and the error recorded.
+
+        Args:
+            orientation (AhrsData): The latest AHRS data.
+            timestamp (float, optional): When (monotonic) the data was measured. Defaults to the data's own timestamp.
+
+        Returns:
+            bool: True if the sample was new.
+        """
+
+        if orientation is None:
+            return False
+
+        timestamp = timestamp if timestamp is not None else orientation.timestamp
+        newest = self.__samples__[-1] if len(self.__samples__) > 0 else None
+
+        if newest is not None and (orientation.version == newest.version or timestamp <= newest.timestamp):
+            return False
+
+        pitch = orientation.pitch if isinstance(orientation.pitch, Number) else None
+        roll = orientation.roll if isinstance(orientation.roll, Number) else None
+        heading = orientation.compass_heading \
+            if isinstance(orientation.compass_heading, Number) and 0 <= orientation.compass_heading <= MAX_VALID_HEADING else None
+
+        if pitch is None or roll is None:
+            # Nothing to predict from. Start over once the data is back.
+            self.__samples__.clear()
+
+            return False
+
+        if newest is not None:
+            self.sample_interval_stats.push((timestamp - newest.timestamp) * 1000.0)
+            self.__record_error__(timestamp, pitch, roll, heading)
+
+        self.__samples__.append(AhrsSample(timestamp, orientation.version, pitch, roll, heading))
+
+        return True
+
+    def __record_error__(
+        self,
+        timestamp: float,
+        pitch: float,
+        roll: float,
+        heading: float
+    ):
+        prediction = self.predict(timestamp, False)
+
+        if prediction is None:
+            return
+
+        predicted_pitch, predicted_roll, predicted_heading = prediction
+
+        self.pitch_error_stats.push(math.fabs(predicted_pitch - pitch))
+        self.roll_error_stats.push(math.fabs(get_angle_difference(predicted_roll, roll)))
+
+        if heading is not None and predicted_heading is not None:
+            self.heading_error_stats.push(math.fabs(get_angle_difference(predicted_heading, heading)))
+
+    def __get_recent_samples__(
+        self
+    ) -> list:
+        """
+        Returns the samples that are close enough together to estimate rates from.
+        """
+
+        samples = list(self.__samples__)
+        newest_timestamp = samples[-1].timestamp
+
+        return [sample for sample in samples if (newest_timestamp - sample.timestamp) <= MAX_SAMPLE_SPAN_SECONDS]
+
+    def predict(
+        self,
+        timestamp: float,
+        is_recorded: bool = True
+    ) -> tuple:
+        """
+        Predicts the attitude at a time.
+
+        Args:
+            timestamp (float): The (monotonic) time to predict the attitude for.
+            is_recorded (bool, optional): Record the age of the data and timing. Defaults to True.
+
+        Returns:
+            tuple: The pitch, roll, and heading (None if not known), or None if there is no history.
+        """
+
+        if len(self.__samples__) == 0:
+            return None
+
+        predict_start = time.perf_counter()
+        samples = self.__get_recent_samples__()
+        newest = samples[-1]
+        sample_age = timestamp - newest.timestamp
+
+        # Predicting backwards is never useful, and predicting too far
+        # forward turns noise into large errors.
+        horizon = min(max(0.0, sample_age), self.max_extrapolation)
+        target_time = newest.timestamp + horizon
+
+        times = [sample.timestamp for sample in samples]
+
+        pitch = extrapolate(times, [sample.pitch for sample in samples], target_time, self.method)
+        roll = extrapolate(times, self.__unwrap__([sample.roll for sample in samples]), target_time, self.method)
+
+        heading_samples = [sample for sample in samples if sample.heading is not None]
+        heading = None
+
+        if len(heading_samples) > 0:
+            heading = extrapolate(
+                [sample.timestamp for sample in heading_samples],
+                self.__unwrap__([sample.heading for sample in heading_samples]),
+                target_time,
+                self.method) % 360
+
+        if is_recorded:
+            self.sample_age_stats.push(sample_age * 1000.0)
+            self.predict_time_stats.push((time.perf_counter() - predict_start) * 1000.0)
+
+            if sample_age > self.max_extrapolation:
+                self.clamped_count += 1
+
+        return fast_math.clamp(-90.0, pitch, 90.0), get_wrapped_angle(roll), heading
+
+    def __unwrap__(
+        self,
+        angles: list
+    ) -> list:
+        """
+        Removes the jumps at +/-180 (or 0/360) so the angles can be fit.
+
+        >>> AhrsHistory().__unwrap__([350, 355, 2, 8])
+        [350, 355, 362, 368]
+        """
+
+        unwrapped = [angles[0]]
+
+        for angle in angles[1:]:
+            unwrapped.append(unwrapped[-1] + get_angle_difference(unwrapped[-1], angle))
+
+        return unwrapped
+
+    def record_present_latency(
+        self,
+        seconds: float
+    ):
+        """
+        Records how long it took from getting the attitude
+        to the frame being on screen.
+
+        Args:
+            seconds (float): The time it took.
+        """
+
+        self.present_latency_stats.push(seconds * 1000.0)
+        self.__present_latency__ += (seconds - self.__present_latency__) * PRESENT_LATENCY_SMOOTHING
+
+    def get_present_latency(
+        self
+    ) -> float:
+        """
+        Returns the (smoothed) time from getting the attitude to the frame being on screen.
+
+        Returns:
+            float: The time in seconds.
+        """
+
+        return self.__present_latency__
+
+    def get_predicted_orientation(
+        self,
+        orientation: AhrsData,
+        timestamp: float
+    ) -> AhrsData:
+        """
+        Returns the orientation with the pitch, roll, and heading
+        predicted for a time. The timestamp becomes the time
+        predicted for. Everything else is unchanged.
+
+        Args:
+            orientation (AhrsData): The latest AHRS data.
+            timestamp (float): The (monotonic) time the orientation will be shown.
+
+        Returns:
+            AhrsData: A (read-only) copy of the orientation with the predicted attitude.
+        """
+
+        prediction = self.predict(timestamp)
+
+        if prediction is None:
+            return orientation
+
+        pitch, roll, heading = prediction
+        predicted = orientation.copy()
+        predicted.pitch = pitch
+        predicted.roll = roll
+        predicted.timestamp = timestamp
+
+        if heading is not None:
+            predicted.compass_heading = heading
+
+        return predicted.freeze()
+
+    def get_statistics(
+        self
+    ) -> dict:
+        """
+        Returns the latency budget, and how well the prediction is doing,
+        in a form that can be serialized into JSON.
+
+        Returns:
+            dict: The timings in milliseconds, and the errors in degrees.
+        """
+
+        return {
+            'method': self.method,
+            'samples': len(self.__samples__),
+            'clamped': self.clamped_count,
+            'latency_ms': {
+                'sample_interval': self.sample_interval_stats.to_dict(),
+                'sample_age': self.sample_age_stats.to_dict(),
+                'present': self.present_latency_stats.to_dict(),
+                'predict': self.predict_time_stats.to_dict()
+            },
+            'error_degrees': {
+                'pitch': self.pitch_error_stats.to_dict(),
+                'roll': self.roll_error_stats.to_dict(),
+                'heading': self.heading_error_stats.to_dict()
+            }
+        }
+
+    def reset_statistics(
+        self
+    ):
+        for stats in [
+                self.sample_interval_stats,
+                self.sample_age_stats,
+                self.present_latency_stats,
+                self.predict_time_stats,
+                self.pitch_error_stats,
+                self.roll_error_stats,
+                self.heading_error_stats]:
+            stats.reset()
+
+        self.clamped_count = 0
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
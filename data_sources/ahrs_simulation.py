@@ -1,3 +1,4 @@
+import time
 from datetime import datetime, timedelta, timezone
 
 from common_utils import fast_math, geo_math, simulated_values
@@ -32,6 +33,8 @@ class AhrsSimulation(object):
         self.ahrs_data.position = [simulated_lat, simulated_long]
         self.ahrs_data.compass_heading = geo_math.get_bearing(self.ahrs_data.position, [self.__ending_lat__, self.__ending_long__])
         self.ahrs_data.gps_heading = self.ahrs_data.compass_heading
+        self.ahrs_data.version += 1
+        self.ahrs_data.timestamp = time.monotonic()
 
     def update(
         self
@@ -43,6 +46,28 @@ class AhrsSimulation(object):
 
         self.simulate()
 
+    def update_avionics(
+        self
+    ):
+        """
+        The simulation does not have a separate avionics feed.
+        Exists so the simulation can be used anywhere the Stratux source is.
+        """
+
+        pass
+
+    def is_data_source_available(
+        self
+    ) -> bool:
+        """
+        The simulation is always available.
+
+        Returns:
+            bool: True
+        """
+
+        return True
+
     def get_ahrs(
         self
     ):
@@ -54,6 +79,18 @@ class AhrsSimulation(object):
         """
         return self.ahrs_data
 
+    def get_version(
+        self
+    ) -> int:
+        """
+        Returns the version of the simulated values.
+        Changes every time the simulation is ticked.
+
+        Returns:
+            int: The version of the AHRS data.
+        """
+        return self.ahrs_data.version
+
     def __init__(
         self
     ):
@@ -4,11 +4,12 @@ integrating (with priorty) multiple orientation
 or AHRS sources into a single point.
 """
 
-from common_utils import logging_object, tasks
+from common_utils import flight_recorder, logging_object, tasks
 from common_utils.logger import HudLogger
 from configuration import configuration
 
-from data_sources import ahrs_data, gdl90_ahrs_source
+from data_sources import (ahrs_data, ahrs_history, ahrs_simulation,
+                          flight_replay, gdl90_ahrs_source, gdl90_udp_source)
 
 
 class Aircraft(logging_object.LoggingObject):
@@ -44,17 +45,98 @@ class Aircraft(logging_object.LoggingObject):
     ):
         super().__init__(logger)
 
-        self.ahrs_source = gdl90_ahrs_source.AhrsStratux(logger)
+        self.ahrs_source = self.__create_ahrs_source__(logger)
+        self.ahrs_history = ahrs_history.AhrsHistory()
 
-        tasks.RecurringTask(
-            'UpdateStratuxAhrs',
-            1.0 / configuration.TARGET_AHRS_FRAMERATE,
-            self.__update_orientation__)
+        # The replay hands the recorded data over, so there is nothing to poll.
+        if configuration.CONFIGURATION.data_source() == configuration.DataSourceNames.REPLAY:
+            self.ahrs_source.start_replay(flight_replay.INSTANCE)
+
+            return
+
+        # GDL-90 is pushed to us, so there is nothing to poll.
+        if isinstance(self.ahrs_source, gdl90_udp_source.AhrsGdl90):
+            return
+
+        is_stratux_source = isinstance(self.ahrs_source, gdl90_ahrs_source.AhrsStratux)
+        is_streaming = is_stratux_source \
+            and configuration.CONFIGURATION.data_source() == configuration.DataSourceNames.WEBSOCKET
+
+        if is_streaming:
+            self.ahrs_source.start_situation_stream()
+
+        if configuration.CONFIGURATION.async_polling_enabled and is_stratux_source:
+            self.ahrs_source.start_async_polling(1.0 / configuration.TARGET_AHRS_FRAMERATE)
+
+            return
+
+        if not is_streaming:
+            tasks.RecurringTask(
+                'UpdateStratuxAhrs',
+                1.0 / configuration.TARGET_AHRS_FRAMERATE,
+                self.__update_orientation__,
+                is_blocking=True)
 
         tasks.RecurringTask(
             'UpdateAvionics',
             1.0 / configuration.TARGET_AHRS_FRAMERATE,
-            self.__update_avionics_orientation__)
+            self.__update_avionics_orientation__,
+            is_blocking=True)
+
+    def __create_ahrs_source__(
+        self,
+        logger: HudLogger = None
+    ):
+        """
+        Creates the AHRS source based on the configured data source.
+
+        Args:
+            logger (HudLogger, optional): The logger to use. Defaults to None.
+
+        Returns:
+            The source to pull the AHRS data from.
+        """
+
+        if configuration.CONFIGURATION.data_source() == configuration.DataSourceNames.SIMULATION:
+            return ahrs_simulation.AhrsSimulation()
+
+        if configuration.CONFIGURATION.data_source() == configuration.DataSourceNames.GDL90:
+            return gdl90_udp_source.AhrsGdl90()
+
+        if configuration.CONFIGURATION.data_source() == configuration.DataSourceNames.REPLAY:
+            return self.__create_replay_ahrs_source__(logger)
+
+        return gdl90_ahrs_source.AhrsStratux(logger)
+
+    def __create_replay_ahrs_source__(
+        self,
+        logger: HudLogger = None
+    ):
+        """
+        Creates the AHRS source that matches what was recorded.
+        A recording taken from GDL-90 has no situation reports.
+
+        Args:
+            logger (HudLogger, optional): The logger to use. Defaults to None.
+
+        Returns:
+            The source to pull the AHRS data from.
+        """
+
+        try:
+            if not flight_replay.INSTANCE.is_open():
+                flight_replay.INSTANCE.open(configuration.CONFIGURATION.replay_file)
+
+            stream_counts = flight_replay.INSTANCE.get_stream_counts()
+        except Exception as ex:
+            self.warn(f"Unable to open the replay {configuration.CONFIGURATION.replay_file}: {ex}")
+            stream_counts = {}
+
+        if stream_counts.get(flight_recorder.STREAM_SITUATION, 0) == 0 \
+                and stream_counts.get(flight_recorder.STREAM_GDL90, 0) > 0:
+            return gdl90_udp_source.AhrsGdl90(is_listening=False)
+
+        return gdl90_ahrs_source.AhrsStratux(logger)
 
     def is_ahrs_available(
         self
@@ -76,6 +158,40 @@ class Aircraft(logging_object.LoggingObject):
         """
         return self.ahrs_source.get_ahrs()
 
+    def get_predicted_orientation(
+        self,
+        timestamp: float
+    ) -> ahrs_data.AhrsData:
+        """
+        Get the AHRS data for the aircraft, with the attitude
+        predicted for the time it will be shown.
+
+        Only to be called from the render thread.
+
+        Args:
+            timestamp (float): The (monotonic) time the data will be shown.
+
+        Returns:
+            ahrs_data.AhrsData: The AHRS data for the aircraft, with the predicted attitude.
+        """
+        orientation = self.get_orientation()
+        self.ahrs_history.push(orientation)
+
+        return self.ahrs_history.get_predicted_orientation(orientation, timestamp)
+
+    def get_orientation_version(
+        self
+    ) -> int:
+        """
+        Get the version of the current AHRS data.
+        The version only changes when there is new data,
+        so it can be used to skip work when nothing has changed.
+
+        Returns:
+            int: The version of the current AHRS data.
+        """
+        return self.ahrs_source.get_version()
+
     def __update_orientation__(
         self
     ):
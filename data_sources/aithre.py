@@ -1,8 +1,8 @@
 import time
 
-import requests
-from common_utils import data_cache
+from common_utils import data_cache, flight_recorder, http_pool
 from configuration import configuration
+from data_sources import flight_replay
 
 ERROR_JSON_KEY = 'error'
 
@@ -86,7 +86,7 @@ class AithreClient(object):
         self,
         rest_address
     ):
-        self.__aithre_session__ = requests.Session()
+        self.__aithre_session__ = http_pool.INSTANCE.get_session()
         self.rest_address = rest_address
 
         self.__aithre_source__ = data_cache.RestfulDataCache(
@@ -94,18 +94,27 @@ class AithreClient(object):
             self.__aithre_session__,
             "http://{}/aithre".format(self.rest_address),
             MAX_SECONDS_BETWEEN_CO_REPORT,
-            SERVICE_CALL_TIMEOUT)
+            SERVICE_CALL_TIMEOUT,
+            recorder_stream=flight_recorder.STREAM_AITHRE)
 
         self.__illyrian_source__ = data_cache.RestfulDataCache(
             "Illyrian",
             self.__aithre_session__,
             "http://{}/illyrians".format(self.rest_address),
             MAX_SECONDS_BETWEEN_SPO2_REPORT,
-            SERVICE_CALL_TIMEOUT)
+            SERVICE_CALL_TIMEOUT,
+            recorder_stream=flight_recorder.STREAM_ILLYRIAN)
 
         self.__co_has_been_connected__ = False
         self.__spo2_has_been_connected__ = False
 
+        # The replay hands the recorded reports over instead.
+        self.__is_replaying__ = configuration.CONFIGURATION.data_source() == configuration.DataSourceNames.REPLAY
+
+        if self.__is_replaying__:
+            flight_replay.INSTANCE.set_handler(flight_recorder.STREAM_AITHRE, self.__aithre_source__.publish)
+            flight_replay.INSTANCE.set_handler(flight_recorder.STREAM_ILLYRIAN, self.__illyrian_source__.publish)
+
         AithreClient.INSTANCE = self
 
     def __get_spo_reports__(
@@ -155,12 +164,38 @@ class AithreClient(object):
             report,
             self.__co_has_been_connected__)
 
+    def start_async_polling(
+        self,
+        interval: float,
+        is_enabled=None
+    ):
+        """
+        Polls the Aithre and Illyrian sources from the
+        shared event loop instead of through `update_aithre()`.
+
+        Arguments:
+            interval {float} -- How often to poll (in seconds).
+
+        Keyword Arguments:
+            is_enabled -- Function returning False when the sources should not be polled. (default: {None})
+        """
+
+        if self.__is_replaying__:
+            return
+
+        self.__aithre_source__.start_async_polling(interval, is_enabled)
+        self.__illyrian_source__.start_async_polling(interval, is_enabled)
+
     def update_aithre(
         self
     ):
         """
         Calls the aithre manager and gets the current data from all devices.
         """
+
+        if self.__is_replaying__:
+            return
+
         try:
             self.__aithre_source__.update()
         except:
@@ -6,16 +6,98 @@ and other data.
 import threading
 from datetime import datetime
 
+from common_utils import units
 from common_utils.local_debug import IS_PI
 from common_utils.task_timer import TaskProfiler
 from configuration import configuration
 from core_services import zoom_tracker
 
-from data_sources import traffic
+from data_sources import traffic, traffic_index
 
 __ANTI_ALIAS_TEXT__ = not IS_PI
 
 
+class TrafficSnapshot(object):
+    """
+    The traffic, as the views see it, at one point in time.
+
+    Snapshots are built by the traffic update thread and are
+    never changed once published, but only the membership is
+    frozen. The Traffic objects in the lists (and the index) are views
+    over live TrafficTable rows, which change with every report,
+    and a row can be reused by another aircraft once it has been
+    quarantined for `traffic_table.SLOT_QUARANTINE_SECONDS`.
+
+    The index keeps the distance and bearing from when it was built,
+    so the order it returns the traffic in can disagree with
+    `Traffic.distance`. Read the values to draw through
+    `traffic_geometry`, for the current frame, not from the snapshot.
+    """
+
+    __slots__ = (
+        'generation',
+        'manager_generation',
+        'nearby_key',
+        'is_traffic_available',
+        'reliable_traffic',
+        'nearby_traffic',
+        'index')
+
+    def __init__(
+        self,
+        generation: int = 0,
+        manager_generation: int = None,
+        nearby_key: tuple = None,
+        is_traffic_available: bool = False,
+        reliable_traffic: tuple = (),
+        nearby_traffic: tuple = (),
+        index: traffic_index.TrafficIndex = traffic_index.EMPTY
+    ):
+        """
+        Creates a snapshot.
+
+        Args:
+            generation (int, optional): Incremented every time the traffic lists change. Defaults to 0.
+            manager_generation (int, optional): The TrafficManager generation the traffic was read at. Defaults to None.
+            nearby_key (tuple, optional): What the nearby traffic was filtered with. Defaults to None.
+            is_traffic_available (bool, optional): Is the traffic service available? Defaults to False.
+            reliable_traffic (tuple, optional): The traffic that has a position. Defaults to ().
+            nearby_traffic (tuple, optional): The reliable traffic inside the inner range, closest first. Defaults to ().
+            index (TrafficIndex, optional): Spatial index over the reliable traffic. Defaults to traffic_index.EMPTY.
+        """
+
+        object.__setattr__(self, 'generation', generation)
+        object.__setattr__(self, 'manager_generation', manager_generation)
+        object.__setattr__(self, 'nearby_key', nearby_key)
+        object.__setattr__(self, 'is_traffic_available', is_traffic_available)
+        object.__setattr__(self, 'reliable_traffic', reliable_traffic)
+        object.__setattr__(self, 'nearby_traffic', nearby_traffic)
+        object.__setattr__(self, 'index', index)
+
+    def __setattr__(
+        self,
+        name: str,
+        value
+    ):
+        raise AttributeError("TrafficSnapshot is read-only ({})".format(name))
+
+    def replace(
+        self,
+        **changes
+    ):
+        """
+        Returns a copy of the snapshot with some of the values changed.
+
+        Returns:
+            TrafficSnapshot: The new snapshot.
+        """
+
+        values = {name: getattr(self, name) for name in TrafficSnapshot.__slots__}
+        values.update(changes)
+
+        return TrafficSnapshot(**values)
+
+
 class HudDataCache(object):
     """
     handle caching, and invalidation, of textures and other data.
@@ -27,34 +109,51 @@ class HudDataCache(object):
 
     DECLINATION = None
 
-    NEARBY_TRAFFIC = []
-    RELIABLE_TRAFFIC = []
-    IS_TRAFFIC_AVAILABLE = False
+    # The current traffic. Replaced (never changed) by the
+    # update thread, so readers take no lock and make no copy.
+    # Read it ONCE and use that snapshot for the whole frame
+    # so the values used together always agree.
+    TRAFFIC_SNAPSHOT = TrafficSnapshot()
 
-    __LOCK__ = threading.Lock()
+    # Only serializes the writers. Readers never take it.
+    __UPDATE_LOCK__ = threading.Lock()
 
     __TRAFFIC_CLIENT__ = traffic.AdsbTrafficClient(
         configuration.CONFIGURATION.get_traffic_manager_address())
-    
+
+    @staticmethod
+    def __get_nearby_key__(
+        manager_generation: int
+    ) -> tuple:
+        return (
+            manager_generation,
+            zoom_tracker.INSTANCE.get_target_threshold_distance(),
+            configuration.CONFIGURATION.get_units())
+
+    @staticmethod
+    def __get_nearby_traffic__(
+        index: traffic_index.TrafficIndex
+    ) -> tuple:
+        return tuple(index.query_radius(HudDataCache.get_inner_range_raw_distance()))
+
     @staticmethod
     def update_nearby_traffic_reports():
-        with TaskProfiler("HudDataCache::update_nearby_traffic_reports"):
-            HudDataCache.__LOCK__.acquire()
+        """
+        Republishes the nearby traffic if the inner range (or units) have changed.
+        """
 
-            try:
-                traffic_reports = HudDataCache.RELIABLE_TRAFFIC
+        with TaskProfiler("HudDataCache::update_nearby_traffic_reports"):
+            with HudDataCache.__UPDATE_LOCK__:
+                snapshot = HudDataCache.TRAFFIC_SNAPSHOT
+                nearby_key = HudDataCache.__get_nearby_key__(snapshot.manager_generation)
 
-                if traffic_reports is None:
+                if nearby_key == snapshot.nearby_key:
                     return
 
-                HudDataCache.NEARBY_TRAFFIC = list(
-                    filter(
-                        lambda x: zoom_tracker.INSTANCE.is_in_inner_range(
-                            x.distance
-                        )[0],
-                        traffic_reports))
-            finally:
-                HudDataCache.__LOCK__.release()
+                HudDataCache.TRAFFIC_SNAPSHOT = snapshot.replace(
+                    generation=snapshot.generation + 1,
+                    nearby_key=nearby_key,
+                    nearby_traffic=HudDataCache.__get_nearby_traffic__(snapshot.index))
 
     @staticmethod
     def update_traffic_reports():
@@ -62,51 +161,97 @@ class HudDataCache(object):
         Updates the intermediary traffic store with the currently known reliable data.
         """
         with TaskProfiler("HudDataCache::update_traffic_reports"):
-            HudDataCache.__LOCK__.acquire()
+            with HudDataCache.__UPDATE_LOCK__:
+                snapshot = HudDataCache.TRAFFIC_SNAPSHOT
+                traffic_manager = traffic.AdsbTrafficClient.TRAFFIC_MANAGER
+                is_traffic_available = traffic_manager.is_traffic_available()
+
+                # Read before building the list so a report that
+                # lands part way through causes another rebuild.
+                manager_generation = traffic_manager.generation
+
+                if manager_generation == snapshot.manager_generation:
+                    if is_traffic_available != snapshot.is_traffic_available:
+                        HudDataCache.TRAFFIC_SNAPSHOT = snapshot.replace(
+                            is_traffic_available=is_traffic_available)
+
+                    return
+
+                reliable_traffic = tuple(traffic_manager.get_traffic_with_position())
+                index = traffic_index.TrafficIndex(
+                    reliable_traffic,
+                    manager_generation)
+
+                # Everything is built before the single assignment
+                # that publishes it.
+                HudDataCache.TRAFFIC_SNAPSHOT = TrafficSnapshot(
+                    snapshot.generation + 1,
+                    manager_generation,
+                    HudDataCache.__get_nearby_key__(manager_generation),
+                    is_traffic_available,
+                    reliable_traffic,
+                    HudDataCache.__get_nearby_traffic__(index),
+                    index)
+
+    @staticmethod
+    def get_traffic_snapshot() -> TrafficSnapshot:
+        """
+        Returns the current traffic. Safe to call from any thread.
+
+        Returns:
+            TrafficSnapshot: The latest published traffic.
+        """
+
+        return HudDataCache.TRAFFIC_SNAPSHOT
+
+    @staticmethod
+    def get_inner_range_raw_distance() -> float:
+        """
+        Returns the inner range of the scope in the receiver's (raw) units.
+
+        Returns:
+            float: The distance that a target is considered close within.
+        """
 
-            try:
-                HudDataCache.RELIABLE_TRAFFIC = traffic.AdsbTrafficClient.TRAFFIC_MANAGER.get_traffic_with_position()
-                HudDataCache.IS_TRAFFIC_AVAILABLE = traffic.AdsbTrafficClient.TRAFFIC_MANAGER.is_traffic_available()
-            finally:
-                HudDataCache.__LOCK__.release()
+        return units.get_raw_distance(
+            configuration.CONFIGURATION.get_units(),
+            zoom_tracker.INSTANCE.get_target_threshold_distance())
 
     @staticmethod
-    def get_reliable_traffic() -> list:
+    def get_traffic_index() -> traffic_index.TrafficIndex:
         """
-        Returns a thread safe copy of the currently known reliable traffic.
+        Returns the spatial index of the reliable traffic.
+        The index is never changed once built, so it is safe to query from any thread.
 
         Returns:
-            list: A list of the reliable traffic stored in Traffic objects.
+            TrafficIndex: The index of the current reliable traffic.
         """
 
-        with TaskProfiler("HudDataCache::get_reliable_traffic"):
-            traffic_clone = None
-            HudDataCache.__LOCK__.acquire()
-            try:
-                traffic_clone = HudDataCache.RELIABLE_TRAFFIC[:]
-            finally:
-                HudDataCache.__LOCK__.release()
+        return HudDataCache.TRAFFIC_SNAPSHOT.index
 
-        return traffic_clone
-    
     @staticmethod
-    def get_nearby_traffic() -> list:
+    def get_reliable_traffic() -> tuple:
         """
-        Returns a thread safe copy of the currently known NEARBY reliable traffic.
+        Returns the currently known reliable traffic.
+        The tuple is shared, and never changed, so it is not copied.
 
         Returns:
-            list: A list of the reliable and NEARBY traffic stored in Traffic objects.
+            tuple: The reliable traffic stored in Traffic objects.
         """
 
-        with TaskProfiler("HudDataCache::get_reliable_traffic"):
-            traffic_clone = None
-            HudDataCache.__LOCK__.acquire()
-            try:
-                traffic_clone = HudDataCache.NEARBY_TRAFFIC[:]
-            finally:
-                HudDataCache.__LOCK__.release()
+        return HudDataCache.TRAFFIC_SNAPSHOT.reliable_traffic
+
+    @staticmethod
+    def get_nearby_traffic() -> tuple:
+        """
+        Returns the currently known NEARBY reliable traffic, closest first.
+        The tuple is shared, and never changed, so it is not copied.
+
+        Returns:
+            tuple: The reliable and NEARBY traffic stored in Traffic objects.
+        """
 
-        return traffic_clone
+        return HudDataCache.TRAFFIC_SNAPSHOT.nearby_traffic
 
     @staticmethod
     def __purge_texture__(
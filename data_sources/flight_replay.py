@@ -0,0 +1,486 @@
+"""
+Module to replay a flight recording into the HUD, through
+the same code paths the live data takes.
+
+Each stream in the recording is handed to whatever took it
+in when it was live: the situation and avionics go into the
+AHRS caches, the traffic into the traffic manager, the GDL-90
+datagrams into the GDL-90 listener, and so on. When the data
+source is "replay", the data sources register a handler for
+the streams they own, instead of polling or listening.
+
+The recording is memory mapped, and the records are read as
+views straight out of the mapping. A payload is only copied
+when it is decoded. Compressed chunks still have to be expanded.
+
+When each record is handed over is set by a virtual clock.
+At a speed of 1 the flight plays out as it was recorded,
+at N it plays out N times faster, and at 0 every record
+is handed over as fast as the handlers take them.
+
+For repeatable runs, `step()` hands over every record up
+to a point in the recording, from the caller's thread,
+without using the clock at all.
+
+To replay a recording, set "data_source" to "replay" and
+"replay_file" to the recording.
+"""
+
+import mmap
+import struct
+import threading
+import time
+
+from common_utils import flight_recorder
+from common_utils.task_timer import RollingStats
+from configuration import configuration
+
+
+class VirtualClock(object):
+    """
+    Maps the time in a recording onto the (monotonic) clock.
+
+    >>> clock = VirtualClock(2.0)
+    >>> clock.start(100.0, now=10.0)
+    >>> clock.get_time(now=11.0)
+    102.0
+    >>> clock.get_seconds_until(106.0, now=11.0)
+    2.0
+    >>> clock.get_seconds_until(101.0, now=11.0)
+    0.0
+    >>> VirtualClock(0.0).get_seconds_until(1000.0)
+    0.0
+    """
+
+    def __init__(
+        self,
+        speed: float = 1.0
+    ):
+        """
+        Creates the clock.
+
+        Args:
+            speed (float, optional): How many seconds of the recording pass each second. Zero is as fast as possible. Defaults to 1.0.
+        """
+
+        self.speed = max(0.0, speed)
+        self.__start_time__ = 0.0
+        self.__start_monotonic__ = time.monotonic()
+
+    def start(
+        self,
+        start_time: float,
+        now: float = None
+    ):
+        """
+        Starts the clock at a point in the recording.
+
+        Args:
+            start_time (float): The time in the recording (in seconds) to start at.
+            now (float, optional): The (monotonic) time. Defaults to now.
+        """
+
+        self.__start_time__ = start_time
+        self.__start_monotonic__ = time.monotonic() if now is None else now
+
+    def get_time(
+        self,
+        now: float = None
+    ) -> float:
+        """
+        Where the clock is in the recording.
+
+        Args:
+            now (float, optional): The (monotonic) time. Defaults to now.
+
+        Returns:
+            float: The time in the recording, in seconds. Infinite when running as fast as possible.
+        """
+
+        if self.speed <= 0.0:
+            return float('inf')
+
+        now = time.monotonic() if now is None else now
+
+        return self.__start_time__ + ((now - self.__start_monotonic__) * self.speed)
+
+    def get_seconds_until(
+        self,
+        recording_time: float,
+        now: float = None
+    ) -> float:
+        """
+        How long until the clock reaches a point in the recording.
+
+        Args:
+            recording_time (float): The time in the recording, in seconds.
+            now (float, optional): The (monotonic) time. Defaults to now.
+
+        Returns:
+            float: The number of (real) seconds to wait.
+        """
+
+        if self.speed <= 0.0:
+            return 0.0
+
+        return max(0.0, (recording_time - self.get_time(now)) / self.speed)
+
+
+class FlightReplay(object):
+    """
+    Hands the records in a recording to the handlers
+    for their streams, on time according to a virtual clock.
+    """
+
+    def __init__(
+        self
+    ):
+        # {stream: function taking the decoded payload}
+        self.__handlers__ = {}
+        self.__lock__ = threading.Lock()
+        self.__stop_event__ = threading.Event()
+        self.__replay_thread__ = None
+
+        self.__file__ = None
+        self.__map__ = None
+        self.__view__ = None
+        self.__records__ = None
+        self.__pending_record__ = None
+        self.__start_ns__ = 0
+        self.__stream_counts__ = None
+
+        self.path = None
+        self.clock = VirtualClock()
+        self.recording_time = 0.0
+        self.is_finished = False
+
+        self.dispatch_stats = RollingStats("FlightReplayDispatch")
+        self.lag_stats = RollingStats("FlightReplayLag")
+        self.reset_statistics()
+
+    def set_handler(
+        self,
+        stream: int,
+        handler
+    ):
+        """
+        Sets where the records for a stream go.
+
+        Args:
+            stream (int): One of the flight_recorder.STREAM_* values.
+            handler: Function taking the decoded payload.
+        """
+
+        self.__handlers__[stream] = handler
+
+    def is_open(
+        self
+    ) -> bool:
+        return self.__map__ is not None
+
+    def is_running(
+        self
+    ) -> bool:
+        return self.__replay_thread__ is not None and self.__replay_thread__.is_alive()
+
+    def open(
+        self,
+        recording_path: str
+    ):
+        """
+        Maps a recording, ready to replay from the start.
+
+        Args:
+            recording_path (str): The recording file.
+        """
+
+        self.close()
+
+        recording_file = open(recording_path, 'rb')
+
+        try:
+            recording_map = mmap.mmap(recording_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except:
+            recording_file.close()
+            raise
+
+        if recording_map[:len(flight_recorder.MAGIC)] != flight_recorder.MAGIC:
+            recording_map.close()
+            recording_file.close()
+
+            raise ValueError("Not a HUD recording")
+
+        self.__start_ns__, _, _ = struct.unpack_from(
+            flight_recorder.HEADER_FORMAT,
+            recording_map,
+            len(flight_recorder.MAGIC))
+
+        with self.__lock__:
+            self.__file__ = recording_file
+            self.__map__ = recording_map
+            self.__view__ = memoryview(recording_map)[len(flight_recorder.MAGIC) + flight_recorder.HEADER_SIZE:]
+            self.__records__ = flight_recorder.get_records(self.__view__)
+            self.__pending_record__ = None
+            self.__stream_counts__ = None
+
+            self.path = recording_path
+            self.recording_time = 0.0
+            self.is_finished = False
+
+    def close(
+        self
+    ):
+        """
+        Stops the replay (if running) and unmaps the recording.
+        """
+
+        self.stop()
+
+        with self.__lock__:
+            if self.__records__ is not None:
+                self.__records__.close()
+
+            self.__records__ = None
+            self.__pending_record__ = None
+
+            if self.__view__ is not None:
+                self.__view__.release()
+                self.__view__ = None
+
+            if self.__map__ is not None:
+                try:
+                    self.__map__.close()
+                except BufferError:
+                    # A handler kept a view into the recording.
+                    # The mapping goes away once that is let go of.
+                    pass
+
+                self.__map__ = None
+
+            if self.__file__ is not None:
+                self.__file__.close()
+                self.__file__ = None
+
+    def get_stream_counts(
+        self
+    ) -> dict:
+        """
+        How many records of each stream are in the recording.
+        Reads the whole recording the first time it is asked.
+
+        Returns:
+            dict: The number of records, keyed by stream.
+        """
+
+        with self.__lock__:
+            if self.__stream_counts__ is None and self.__view__ is not None:
+                counts = {}
+
+                for _, stream, _ in flight_recorder.get_records(self.__view__):
+                    counts[stream] = counts.get(stream, 0) + 1
+
+                self.__stream_counts__ = counts
+
+            return dict(self.__stream_counts__ or {})
+
+    def start(
+        self,
+        recording_path: str = None,
+        speed: float = None
+    ):
+        """
+        Replays the recording from a background thread.
+
+        Args:
+            recording_path (str, optional): The recording to replay. Defaults to the one already open, or the configured one.
+            speed (float, optional): How many seconds of the recording to replay each second. Zero is as fast as possible. Defaults to the configuration.
+        """
+
+        if self.is_running():
+            return
+
+        if recording_path is not None:
+            self.open(recording_path)
+        elif not self.is_open():
+            self.open(configuration.CONFIGURATION.replay_file)
+
+        self.clock = VirtualClock(configuration.CONFIGURATION.replay_speed if speed is None else speed)
+        self.__stop_event__.clear()
+        self.__replay_thread__ = threading.Thread(
+            target=self.__replay_loop__,
+            name="FlightReplay",
+            daemon=True)
+        self.__replay_thread__.start()
+
+    def stop(
+        self
+    ):
+        """
+        Stops the replay thread. The recording stays open where it was.
+        """
+
+        replay_thread = self.__replay_thread__
+
+        if replay_thread is None:
+            return
+
+        self.__stop_event__.set()
+
+        if replay_thread is not threading.current_thread():
+            replay_thread.join()
+
+        self.__replay_thread__ = None
+
+    def step(
+        self,
+        recording_time: float
+    ) -> int:
+        """
+        Hands over every record up to a point in the recording,
+        from the caller's thread. Do not mix with `start()`.
+
+        Args:
+            recording_time (float): The time in the recording (in seconds) to replay up to.
+
+        Returns:
+            int: The number of records handed over.
+        """
+
+        count = 0
+
+        while True:
+            record = self.__get_next_record__(recording_time)
+
+            if record is None:
+                break
+
+            self.__dispatch__(record)
+            count += 1
+
+        self.recording_time = max(self.recording_time, recording_time)
+
+        return count
+
+    def __get_time__(
+        self,
+        timestamp_ns: int
+    ) -> float:
+        return (timestamp_ns - self.__start_ns__) / 1e9
+
+    def __get_next_record__(
+        self,
+        until_time: float = None
+    ) -> tuple:
+        """
+        Takes the next record, if it is not later than `until_time`.
+        A later record is held on to for the next call.
+        """
+
+        with self.__lock__:
+            record = self.__pending_record__
+
+            if record is None and self.__records__ is not None:
+                record = next(self.__records__, None)
+
+            if record is None:
+                self.__pending_record__ = None
+                self.is_finished = True
+
+                return None
+
+            if until_time is not None and self.__get_time__(record[0]) > until_time:
+                self.__pending_record__ = record
+
+                return None
+
+            self.__pending_record__ = None
+
+            return record
+
+    def __dispatch__(
+        self,
+        record: tuple
+    ):
+        timestamp_ns, stream, payload = record
+        self.recording_time = max(self.recording_time, self.__get_time__(timestamp_ns))
+        handler = self.__handlers__.get(stream)
+
+        if handler is None:
+            self.unhandled_count += 1
+
+            return
+
+        dispatch_start = time.perf_counter()
+
+        try:
+            handler(flight_recorder.decode_payload(stream, payload))
+            self.record_counts[stream] = self.record_counts.get(stream, 0) + 1
+        except Exception as ex:
+            self.error_count += 1
+            self.last_error = str(ex)
+
+        self.dispatch_stats.push((time.perf_counter() - dispatch_start) * 1000.0)
+
+    def __replay_loop__(
+        self
+    ):
+        self.clock.start(self.recording_time)
+
+        while not self.__stop_event__.is_set():
+            record = self.__get_next_record__()
+
+            if record is None:
+                break
+
+            record_time = self.__get_time__(record[0])
+            wait = self.clock.get_seconds_until(record_time)
+
+            if wait > 0.0 and self.__stop_event__.wait(wait):
+                # Put back, so the replay can pick up from here.
+                with self.__lock__:
+                    self.__pending_record__ = record
+
+                break
+
+            if self.clock.speed > 0.0:
+                self.lag_stats.push(((self.clock.get_time() - record_time) / self.clock.speed) * 1000.0)
+
+            self.__dispatch__(record)
+
+    def get_statistics(
+        self
+    ) -> dict:
+        return {
+            'path': self.path,
+            'speed': self.clock.speed,
+            'is_running': self.is_running(),
+            'is_finished': self.is_finished,
+            'recording_s': self.recording_time,
+            'records': {
+                flight_recorder.STREAM_NAMES.get(stream, str(stream)): count
+                for stream, count in self.record_counts.items()},
+            'unhandled': self.unhandled_count,
+            'errors': self.error_count,
+            'last_error': self.last_error,
+            'dispatch_ms': self.dispatch_stats.to_dict(),
+            'lag_ms': self.lag_stats.to_dict()
+        }
+
+    def reset_statistics(
+        self
+    ):
+        self.record_counts = {}
+        self.unhandled_count = 0
+        self.error_count = 0
+        self.last_error = None
+        self.dispatch_stats.reset()
+        self.lag_stats.reset()
+
+
+INSTANCE = FlightReplay()
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
@@ -2,10 +2,12 @@
 Module to extract GDL-90 data and turn it into a common, usable form.
 """
 
+import threading
+import time
 from datetime import datetime, timezone
 
-import requests
-from common_utils import data_cache, logging_object
+from common_utils import (data_cache, flight_recorder, http_pool,
+                          logging_object, websocket_stream)
 from common_utils.logger import HudLogger
 from configuration import configuration
 
@@ -171,6 +173,9 @@ class AhrsStratux(logging_object.LoggingObject):
         """
         Attempts to get the AHRS data from the Stratux source.
         """
+        if self.__situation_stream__ is not None:
+            return
+
         self.__stratux_ahrs_cache__.update()
 
     def update_avionics(
@@ -181,6 +186,56 @@ class AhrsStratux(logging_object.LoggingObject):
         """
         self.__avionics_cache__.update()
 
+    def start_async_polling(
+        self,
+        interval: float
+    ):
+        """
+        Polls both AHRS sources from the shared event loop
+        instead of through `update()` and `update_avionics()`.
+
+        Arguments:
+            interval {float} -- How often to poll (in seconds).
+        """
+        if self.__situation_stream__ is None:
+            self.__stratux_ahrs_cache__.start_async_polling(interval)
+
+        self.__avionics_cache__.start_async_polling(interval)
+
+    def start_situation_stream(
+        self
+    ):
+        """
+        Subscribes to the Stratux situation socket. Every report
+        the Stratux pushes goes straight into the AHRS cache, and
+        `getSituation` is no longer polled.
+        The avionics source is still polled.
+        """
+        if self.__situation_stream__ is not None:
+            return
+
+        self.__situation_stream__ = websocket_stream.WebSocketStream(
+            "StratuxSituation",
+            "ws://{0}/situation".format(
+                configuration.CONFIGURATION.stratux_address()),
+            self.__stratux_ahrs_cache__.publish)
+        self.__situation_stream__.start()
+
+    def start_replay(
+        self,
+        replay
+    ):
+        """
+        Takes the situation and avionics from a flight replay,
+        instead of polling the Stratux and the avionics adapter.
+
+        Arguments:
+            replay {FlightReplay} -- The replay to take the data from.
+        """
+
+        replay.set_handler(flight_recorder.STREAM_SITUATION, self.__stratux_ahrs_cache__.publish)
+        replay.set_handler(flight_recorder.STREAM_AVIONICS, self.__avionics_cache__.publish)
+
     def is_data_source_available(
         self
     ) -> bool:
@@ -198,19 +253,107 @@ class AhrsStratux(logging_object.LoggingObject):
 
     def get_ahrs(
         self
-    ) -> dict:
+    ) -> ahrs_data.AhrsData:
         """
         Returns a decoded AHRS object back. Attempts to combine ALL available
         AHRS data source.
         Avionics sourced data is prioritized over Stratux AHRS sourced data.
 
+        The data is only decoded when one of the sources has changed.
+        Until then every caller gets the same (read-only) snapshot.
+
         Returns:
             AhrsData -- Any available AHRS data.
         """
-        package = {}
+        snapshot_key = self.__get_snapshot_key__()
+        snapshot = self.__snapshot__
+
+        if snapshot is not None and snapshot_key == self.__snapshot_key__:
+            return snapshot
+
+        self.__snapshot_lock__.acquire()
+
+        try:
+            # Another thread may have decoded it while we waited.
+            snapshot_key = self.__get_snapshot_key__()
 
-        self.__stratux_ahrs_cache__.garbage_collect()
-        self.__avionics_cache__.garbage_collect()
+            if self.__snapshot__ is not None and snapshot_key == self.__snapshot_key__:
+                return self.__snapshot__
+
+            # The key is taken before the data is read, so an update
+            # that lands while decoding forces another decode.
+            self.__stratux_ahrs_cache__.garbage_collect()
+            self.__avionics_cache__.garbage_collect()
+            source_versions = self.__get_snapshot_key__()[:2]
+            package = self.__get_package__()
+
+            snapshot = self.__decode_situation__(package)
+            snapshot.version = self.__snapshot__.version + 1 if self.__snapshot__ is not None else 1
+            snapshot.timestamp = self.__get_data_time__(snapshot.timestamp)
+            snapshot.freeze()
+
+            # Without the GPS time the snapshot carries the system time,
+            # so it goes out of date every second.
+            self.__snapshot_uses_system_time__ = 'GPSTime' not in package
+            self.__snapshot_key__ = source_versions + self.__get_snapshot_key__()[2:]
+            self.__snapshot__ = snapshot
+            self.decode_count += 1
+        finally:
+            self.__snapshot_lock__.release()
+
+        return snapshot
+
+    def get_version(
+        self
+    ) -> int:
+        """
+        Returns the version of the latest AHRS data.
+        Changes every time the data from either source changes.
+
+        Returns:
+            int -- The version of the AHRS data.
+        """
+        return self.get_ahrs().version
+
+    def __get_snapshot_key__(
+        self
+    ) -> tuple:
+        """
+        Returns what the current snapshot depends on.
+        If the key has not changed, then neither has the data.
+        """
+        return (
+            self.__stratux_ahrs_cache__.get_version(),
+            self.__avionics_cache__.get_version(),
+            int(time.time()) if self.__snapshot_uses_system_time__ else None)
+
+    def __get_data_time__(
+        self,
+        default_time: float
+    ) -> float:
+        """
+        Returns when (monotonic) the Stratux situation last changed.
+
+        The attitude comes from the situation, so its time is when the
+        situation changed, the same as the GDL-90 source using the time
+        the 0x4C report arrived. A newer avionics update does not make
+        the attitude any newer.
+        """
+        change_time = self.__stratux_ahrs_cache__.get_last_changed()
+
+        return change_time if change_time is not None else default_time
+
+    def __get_package__(
+        self
+    ) -> dict:
+        """
+        Combines the packages from both sources.
+        Avionics sourced data is prioritized over Stratux AHRS sourced data.
+
+        Returns:
+            dict -- The combined package.
+        """
+        package = {}
 
         stratux_ahrs = self.__stratux_ahrs_cache__.get()
         avionics_ahrs = self.__avionics_cache__.get()
@@ -221,7 +364,7 @@ class AhrsStratux(logging_object.LoggingObject):
         if avionics_ahrs is not None:
             package.update(avionics_ahrs)
 
-        return self.__decode_situation__(package)
+        return package
 
     def __init__(
         self,
@@ -229,7 +372,8 @@ class AhrsStratux(logging_object.LoggingObject):
     ):
         super(AhrsStratux, self).__init__(logger)
 
-        self.__stratux_session__ = requests.Session()
+        self.__stratux_session__ = http_pool.INSTANCE.get_session()
+        self.__situation_stream__ = None
 
         self.__stratux_ahrs_cache__ = data_cache.RestfulDataCache(
             "StratuxAhrsCache",
@@ -237,14 +381,24 @@ class AhrsStratux(logging_object.LoggingObject):
             "http://{0}/getSituation".format(
                 configuration.CONFIGURATION.stratux_address()),
             MAX_STRATUX_AHRS_AGE,
-            configuration.AHRS_TIMEOUT)
+            configuration.AHRS_TIMEOUT,
+            1.0 / configuration.TARGET_AHRS_FRAMERATE,
+            flight_recorder.STREAM_SITUATION)
         self.__avionics_cache__ = data_cache.RestfulDataCache(
             "AvionicsCache",
             self.__stratux_session__,
             "http://{0}/getSituation".format(
                 configuration.CONFIGURATION.avionics_address()),
             MAX_AVIONICS_AGE,
-            AVIONICS_TIMEOUT)
+            AVIONICS_TIMEOUT,
+            1.0 / configuration.TARGET_AHRS_FRAMERATE,
+            flight_recorder.STREAM_AVIONICS)
 
         self.__max_gs__ = 1.0
         self.__min_gs__ = 1.0
+
+        self.__snapshot__ = None
+        self.__snapshot_key__ = None
+        self.__snapshot_uses_system_time__ = False
+        self.__snapshot_lock__ = threading.Lock()
+        self.decode_count = 0
@@ -0,0 +1,435 @@
+"""
+Module to decode the GDL-90 messages the Stratux sends over UDP.
+
+https://www.faa.gov/nextgen/programs/adsb/archival/media/gdl90_public_icd_reva.pdf
+
+Decodes the Heartbeat (0x00), Ownship Report (0x0A),
+Ownship Geometric Altitude (0x0B), Traffic Report (0x14),
+and the Stratux AHRS report (0x4C).
+
+Frames are split on the flag byte, un-stuffed, and checked
+a whole frame at a time. The messages are unpacked with
+precompiled structs, so nothing is done byte by byte in Python.
+"""
+
+import binascii
+import struct
+
+FLAG_BYTE = 0x7E
+CONTROL_ESCAPE = 0x7D
+ESCAPE_XOR = 0x20
+
+HEARTBEAT_ID = 0x00
+OWNSHIP_REPORT_ID = 0x0A
+OWNSHIP_GEOMETRIC_ALTITUDE_ID = 0x0B
+TRAFFIC_REPORT_ID = 0x14
+STRATUX_AHRS_ID = 0x4C
+
+# The second byte of a 0x4C message, and the sub-id for an AHRS report.
+STRATUX_AHRS_SIGNATURE = 0x45
+STRATUX_AHRS_SUB_ID = 0x01
+
+# Sent by the Stratux in place of any AHRS value it does not have.
+STRATUX_AHRS_INVALID = 0x7FFF
+
+# Degrees per count of the 24 bit latitude and longitude.
+LAT_LON_RESOLUTION = 180.0 / (1 << 23)
+
+# Degrees per count of the 8 bit track.
+TRACK_RESOLUTION = 360.0 / 256.0
+
+ALTITUDE_INVALID = 0xFFF
+HORIZONTAL_VELOCITY_INVALID = 0xFFF
+VERTICAL_VELOCITY_INVALID = 0x800
+
+# Status, time stamp (LSB first), message counts.
+__HEARTBEAT__ = struct.Struct('<xBBHH')
+
+# Status/address type, address (24 bits), latitude (24 bits), longitude (24 bits),
+# altitude/misc, NIC/NACp, velocities (24 bits), track, emitter, callsign, emergency.
+__POSITION_REPORT__ = struct.Struct('>xBBHBHBHHBBBBBB8sB')
+
+# Altitude (5 foot resolution), vertical metrics.
+__GEOMETRIC_ALTITUDE__ = struct.Struct('>xhH')
+
+# Signature, sub-id, version, then roll, pitch, heading, slip/skid,
+# yaw rate, G (all tenths), airspeed, pressure altitude (+5000), vertical speed.
+__STRATUX_AHRS__ = struct.Struct('>xBBBhhhhhhhHh')
+
+
+class Heartbeat(object):
+    __slots__ = ['is_gps_position_valid', 'seconds_since_midnight']
+
+    def __init__(
+        self,
+        is_gps_position_valid: bool,
+        seconds_since_midnight: int
+    ):
+        self.is_gps_position_valid = is_gps_position_valid
+        self.seconds_since_midnight = seconds_since_midnight
+
+
+class PositionReport(object):
+    """
+    An Ownship Report or Traffic Report. They share a layout.
+
+    Values that the report marks as unknown are None.
+    Altitude is pressure altitude in feet, speeds are knots,
+    vertical speed is feet per minute.
+    """
+
+    __slots__ = ['message_id', 'address', 'address_type', 'latitude', 'longitude', 'altitude', 'is_airborne',
+                 'is_extrapolated', 'nic', 'nacp', 'horizontal_velocity', 'vertical_velocity', 'track',
+                 'emitter_category', 'callsign', 'emergency_code']
+
+    def __init__(
+        self
+    ):
+        self.message_id = None
+        self.address = None
+        self.address_type = None
+        self.latitude = None
+        self.longitude = None
+        self.altitude = None
+        self.is_airborne = False
+        self.is_extrapolated = False
+        self.nic = 0
+        self.nacp = 0
+        self.horizontal_velocity = None
+        self.vertical_velocity = None
+        self.track = None
+        self.emitter_category = 0
+        self.callsign = ''
+        self.emergency_code = 0
+
+    def is_position_valid(
+        self
+    ) -> bool:
+        # A position of exactly 0,0 with a NIC of 0 is the "no position" marker.
+        return self.latitude is not None \
+            and not (self.nic == 0 and self.latitude == 0.0 and self.longitude == 0.0)
+
+
+class GeometricAltitude(object):
+    __slots__ = ['altitude', 'is_vertical_warning', 'vertical_figure_of_merit']
+
+    def __init__(
+        self,
+        altitude: int,
+        is_vertical_warning: bool,
+        vertical_figure_of_merit: int
+    ):
+        self.altitude = altitude
+        self.is_vertical_warning = is_vertical_warning
+        self.vertical_figure_of_merit = vertical_figure_of_merit
+
+
+class StratuxAhrs(object):
+    """
+    The Stratux AHRS report. Values the Stratux does not have are None.
+    Angles are degrees, airspeed is knots, altitude is feet,
+    and vertical speed is feet per minute.
+    """
+
+    __slots__ = ['roll', 'pitch', 'heading', 'slip_skid', 'yaw_rate', 'g_load', 'airspeed', 'pressure_altitude',
+                 'vertical_speed']
+
+    def __init__(
+        self
+    ):
+        self.roll = None
+        self.pitch = None
+        self.heading = None
+        self.slip_skid = None
+        self.yaw_rate = None
+        self.g_load = None
+        self.airspeed = None
+        self.pressure_altitude = None
+        self.vertical_speed = None
+
+
+def get_crc(
+    data
+) -> int:
+    """
+    Returns the GDL-90 frame check (CRC-16-CCITT, starting from zero).
+
+    The ICD's table driven CRC is the "augmented" form. It
+    is the same as the standard CRC (which `binascii` does in C)
+    of all but the last two bytes, XORed with those two bytes.
+
+    >>> hex(get_crc(bytes([0x00, 0x81, 0x41, 0xDB, 0xD0, 0x08, 0x02])))
+    '0x8bb3'
+    """
+
+    if len(data) < 2:
+        return binascii.crc_hqx(data, 0)
+
+    return binascii.crc_hqx(data[:-2], 0) ^ ((data[-2] << 8) | data[-1])
+
+
+def unstuff(
+    frame: bytes
+) -> bytes:
+    """
+    Removes the byte stuffing from a frame (without the flag bytes).
+
+    >>> unstuff(bytes([0x01, 0x7D, 0x5E, 0x02, 0x7D, 0x5D]))
+    b'\\x01~\\x02}'
+    >>> unstuff(b'\\x01\\x02')
+    b'\\x01\\x02'
+    """
+
+    if CONTROL_ESCAPE not in frame:
+        return frame
+
+    # Work a run at a time between escapes, not byte by byte.
+    parts = frame.split(bytes([CONTROL_ESCAPE]))
+    unstuffed = bytearray(parts[0])
+
+    for part in parts[1:]:
+        if part:
+            unstuffed.append(part[0] ^ ESCAPE_XOR)
+            unstuffed += part[1:]
+
+    return bytes(unstuffed)
+
+
+def stuff(
+    data: bytes
+) -> bytes:
+    """
+    Adds the byte stuffing to a message so it can be framed.
+
+    >>> stuff(bytes([0x01, 0x7E, 0x02, 0x7D]))
+    b'\\x01}^\\x02}]'
+    """
+
+    return data.replace(b'\x7d', b'\x7d\x5d').replace(b'\x7e', b'\x7d\x5e')
+
+
+def frame_message(
+    message: bytes
+) -> bytes:
+    """
+    Adds the frame check, stuffing, and flags to a message.
+    Used to build captures and stand-ins.
+
+    >>> frame_message(bytes([0x00, 0x81, 0x41, 0xDB, 0xD0, 0x08, 0x02])).hex()
+    '7e008141dbd00802b38b7e'
+    """
+
+    crc = get_crc(message)
+
+    return bytes([FLAG_BYTE]) + stuff(message + bytes([crc & 0xFF, crc >> 8])) + bytes([FLAG_BYTE])
+
+
+def get_messages(
+    data: bytes
+) -> list:
+    """
+    Splits received data into messages that passed the frame check.
+    The frame check bytes are removed.
+
+    >>> get_messages(bytes.fromhex('7e008141dbd00802b38b7e7e0081410000000000007e'))
+    [b'\\x00\\x81A\\xdb\\xd0\\x08\\x02']
+
+    Args:
+        data (bytes): One or more frames (such as a UDP datagram).
+
+    Returns:
+        list: The valid messages, each starting with the message id.
+    """
+
+    messages = []
+
+    for frame in data.split(b'\x7e'):
+        if len(frame) < 3:
+            continue
+
+        message = unstuff(frame)
+
+        if get_crc(message[:-2]) == (message[-2] | (message[-1] << 8)):
+            messages.append(message[:-2])
+
+    return messages
+
+
+def get_signed(
+    value: int,
+    bits: int
+) -> int:
+    """
+    Sign extends a two's complement value.
+
+    >>> get_signed(0xFFF, 12)
+    -1
+    >>> get_signed(0x7FF, 12)
+    2047
+    """
+
+    if value & (1 << (bits - 1)):
+        return value - (1 << bits)
+
+    return value
+
+
+def decode_heartbeat(
+    message: bytes
+) -> Heartbeat:
+    """
+    >>> heartbeat = decode_heartbeat(bytes([0x00, 0x81, 0x41, 0xDB, 0xD0, 0x08, 0x02]))
+    >>> heartbeat.is_gps_position_valid, heartbeat.seconds_since_midnight
+    (True, 53467)
+    """
+
+    if len(message) < __HEARTBEAT__.size:
+        return None
+
+    status_one, status_two, time_stamp, message_counts = __HEARTBEAT__.unpack_from(message)
+
+    return Heartbeat(
+        (status_one & 0x80) != 0,
+        time_stamp | ((status_two & 0x80) << 9))
+
+
+def decode_position_report(
+    message: bytes
+) -> PositionReport:
+    """
+    Decodes an Ownship Report or Traffic Report.
+
+    Using the example from the ICD:
+    >>> report = decode_position_report(bytes.fromhex('1400ab45491fef15a889780f09a907b00120014e3832355620202000'))
+    >>> hex(report.address), round(report.latitude, 4), round(report.longitude, 4)
+    ('0xab4549', 44.9071, -122.9949)
+    >>> report.altitude, report.is_airborne, report.horizontal_velocity, report.vertical_velocity, report.track
+    (5000, True, 123, 64, 45.0)
+    >>> report.nic, report.nacp, report.callsign
+    (10, 9, 'N825V')
+    """
+
+    if len(message) < __POSITION_REPORT__.size:
+        return None
+
+    status_and_type, address_high, address_low, latitude_high, latitude_low, longitude_high, longitude_low, \
+        altitude_and_misc, nic_and_nacp, velocity_one, velocity_two, velocity_three, track, emitter_category, \
+        callsign, emergency = __POSITION_REPORT__.unpack_from(message)
+
+    report = PositionReport()
+    report.message_id = message[0]
+    report.address_type = status_and_type & 0x0F
+    report.address = (address_high << 16) | address_low
+    report.latitude = get_signed((latitude_high << 16) | latitude_low, 24) * LAT_LON_RESOLUTION
+    report.longitude = get_signed((longitude_high << 16) | longitude_low, 24) * LAT_LON_RESOLUTION
+
+    raw_altitude = altitude_and_misc >> 4
+    misc = altitude_and_misc & 0x0F
+    report.altitude = ((raw_altitude * 25) - 1000) if raw_altitude != ALTITUDE_INVALID else None
+    report.is_airborne = (misc & 0x08) != 0
+    report.is_extrapolated = (misc & 0x04) != 0
+
+    report.nic = nic_and_nacp >> 4
+    report.nacp = nic_and_nacp & 0x0F
+
+    horizontal_velocity = (velocity_one << 4) | (velocity_two >> 4)
+    vertical_velocity = ((velocity_two & 0x0F) << 8) | velocity_three
+    report.horizontal_velocity = horizontal_velocity if horizontal_velocity != HORIZONTAL_VELOCITY_INVALID else None
+    report.vertical_velocity = (get_signed(vertical_velocity, 12) * 64) \
+        if vertical_velocity != VERTICAL_VELOCITY_INVALID else None
+
+    # The low two bits of misc say if (and what kind of) track is valid.
+    report.track = (track * TRACK_RESOLUTION) if (misc & 0x03) != 0 else None
+    report.emitter_category = emitter_category
+    report.callsign = callsign.decode('ascii', 'replace').strip()
+    report.emergency_code = emergency >> 4
+
+    return report
+
+
+def decode_geometric_altitude(
+    message: bytes
+) -> GeometricAltitude:
+    """
+    >>> decode_geometric_altitude(bytes([0x0B, 0x00, 0xC8, 0x00, 0x0A])).altitude
+    1000
+    """
+
+    if len(message) < __GEOMETRIC_ALTITUDE__.size:
+        return None
+
+    altitude, vertical_metrics = __GEOMETRIC_ALTITUDE__.unpack_from(message)
+
+    return GeometricAltitude(
+        altitude * 5,
+        (vertical_metrics & 0x8000) != 0,
+        vertical_metrics & 0x7FFF)
+
+
+def __get_tenths__(
+    value: int
+) -> float:
+    return (value / 10.0) if value != STRATUX_AHRS_INVALID else None
+
+
+def decode_stratux_ahrs(
+    message: bytes
+) -> StratuxAhrs:
+    """
+    >>> ahrs = decode_stratux_ahrs(bytes.fromhex('4c450101ffe2001e0d48fffb7fff000a005a157c00407fff'))
+    >>> ahrs.roll, ahrs.pitch, ahrs.heading, ahrs.slip_skid, ahrs.yaw_rate, ahrs.g_load
+    (-3.0, 3.0, 340.0, 0.5, None, 1.0)
+    >>> ahrs.airspeed, ahrs.pressure_altitude, ahrs.vertical_speed
+    (90, 500, 64)
+    """
+
+    if len(message) < __STRATUX_AHRS__.size:
+        return None
+
+    signature, sub_id, version, roll, pitch, heading, slip_skid, yaw_rate, g_load, airspeed, \
+        pressure_altitude, vertical_speed = __STRATUX_AHRS__.unpack_from(message)
+
+    if signature != STRATUX_AHRS_SIGNATURE or sub_id != STRATUX_AHRS_SUB_ID:
+        return None
+
+    ahrs = StratuxAhrs()
+    ahrs.roll = __get_tenths__(roll)
+    ahrs.pitch = __get_tenths__(pitch)
+    ahrs.heading = __get_tenths__(heading)
+
+    # The Stratux sends the slip/skid with the sign flipped from its JSON.
+    ahrs.slip_skid = -__get_tenths__(slip_skid) if slip_skid != STRATUX_AHRS_INVALID else None
+    ahrs.yaw_rate = __get_tenths__(yaw_rate)
+    ahrs.g_load = __get_tenths__(g_load)
+    ahrs.airspeed = airspeed if airspeed != STRATUX_AHRS_INVALID else None
+    ahrs.pressure_altitude = (pressure_altitude - 5000) if pressure_altitude != 0xFFFF else None
+    ahrs.vertical_speed = vertical_speed if vertical_speed != STRATUX_AHRS_INVALID else None
+
+    return ahrs
+
+
+def decode_message(
+    message: bytes
+):
+    """
+    Decodes a single (un-framed) message.
+
+    Returns:
+        The decoded message, or None if the message is not one we use.
+    """
+
+    message_id = message[0]
+
+    if message_id == HEARTBEAT_ID:
+        return decode_heartbeat(message)
+
+    if message_id == OWNSHIP_REPORT_ID or message_id == TRAFFIC_REPORT_ID:
+        return decode_position_report(message)
+
+    if message_id == OWNSHIP_GEOMETRIC_ALTITUDE_ID:
+        return decode_geometric_altitude(message)
+
+    if message_id == STRATUX_AHRS_ID:
+        return decode_stratux_ahrs(message)
+
+    return None
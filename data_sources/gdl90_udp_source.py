@@ -0,0 +1,663 @@
+"""
+Module to listen for the GDL-90 messages that a Stratux
+broadcasts over UDP, and turn them into AHRS data and traffic.
+
+The messages are pushed at the rate the Stratux sends them,
+so there is no polling, HTTP, or JSON in the way.
+
+The listener runs on the `async_polling` event loop.
+
+A capture of the UDP traffic can be recorded, decoded,
+or replayed (at the rate it was sent) to stand in for a Stratux:
+
+    python3 -m data_sources.gdl90_udp_source record capture.gdl90
+    python3 -m data_sources.gdl90_udp_source decode capture.gdl90
+    python3 -m data_sources.gdl90_udp_source replay capture.gdl90 [host]
+"""
+
+import asyncio
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from common_utils import async_polling, flight_recorder, geo_math
+from common_utils.telemetry import TelemetryRegistry
+
+from data_sources import ahrs_data, gdl90_decoder
+
+GDL90_PORT = 4000
+
+# Anything older than this is no longer used.
+MAX_GDL90_AGE = 2.0
+
+# The Stratux sends a heartbeat once a second.
+# Replays are paced on them.
+HEARTBEAT_INTERVAL = 1.0
+
+METERS_PER_STATUTE_MILE = 1609.344
+
+
+class Gdl90Listener(asyncio.DatagramProtocol):
+    """
+    Receives GDL-90 datagrams and keeps the most recent
+    heartbeat, ownship, and AHRS reports. Traffic reports
+    are handed to a callback as they arrive.
+    """
+
+    def __init__(
+        self,
+        port: int = GDL90_PORT
+    ):
+        super().__init__()
+
+        self.__port__ = port
+        self.__is_started__ = False
+        self.__lock__ = threading.Lock()
+
+        self.__traffic_callback__ = None
+        self.__heartbeat_callback__ = None
+
+        # [message, time received]
+        self.__heartbeat__ = [None, 0.0]
+        self.__ownship__ = [None, 0.0]
+        self.__geometric_altitude__ = [None, 0.0]
+        self.__ahrs__ = [None, 0.0]
+
+        self.datagram_count = 0
+        self.byte_count = 0
+        self.message_counts = {}
+        self.last_error = None
+
+    def start(
+        self
+    ):
+        """
+        Starts listening (if not already).
+        """
+
+        with self.__lock__:
+            if self.__is_started__:
+                return
+
+            self.__is_started__ = True
+
+        async_polling.INSTANCE.submit(self.__listen__())
+
+    def set_traffic_callbacks(
+        self,
+        report_callback,
+        heartbeat_callback=None
+    ):
+        """
+        Sets where the traffic goes.
+
+        Args:
+            report_callback: Function taking a traffic report, shaped like the Stratux JSON.
+            heartbeat_callback (optional): Function called on every heartbeat. Defaults to None.
+        """
+
+        self.__traffic_callback__ = report_callback
+        self.__heartbeat_callback__ = heartbeat_callback
+
+    def datagram_received(
+        self,
+        data: bytes,
+        address
+    ):
+        flight_recorder.INSTANCE.record(flight_recorder.STREAM_GDL90, data)
+
+        self.handle_data(data)
+
+    def error_received(
+        self,
+        exc
+    ):
+        self.last_error = str(exc)
+
+    def handle_data(
+        self,
+        data: bytes
+    ):
+        """
+        Decodes and applies every message in the data.
+
+        Args:
+            data (bytes): One or more GDL-90 frames.
+        """
+
+        self.datagram_count += 1
+        self.byte_count += len(data)
+
+        for message in gdl90_decoder.get_messages(data):
+            message_id = message[0]
+            self.message_counts[message_id] = self.message_counts.get(message_id, 0) + 1
+
+            decoded = gdl90_decoder.decode_message(message)
+
+            if decoded is None:
+                continue
+
+            now = time.monotonic()
+
+            if message_id == gdl90_decoder.TRAFFIC_REPORT_ID:
+                self.__on_traffic__(decoded)
+            elif message_id == gdl90_decoder.STRATUX_AHRS_ID:
+                self.__ahrs__ = [decoded, now]
+            elif message_id == gdl90_decoder.OWNSHIP_REPORT_ID:
+                self.__ownship__ = [decoded, now]
+            elif message_id == gdl90_decoder.OWNSHIP_GEOMETRIC_ALTITUDE_ID:
+                self.__geometric_altitude__ = [decoded, now]
+            elif message_id == gdl90_decoder.HEARTBEAT_ID:
+                self.__heartbeat__ = [decoded, now]
+
+                if self.__heartbeat_callback__ is not None:
+                    self.__heartbeat_callback__()
+
+    def get_recent(
+        self,
+        message_id: int
+    ):
+        """
+        Returns the most recent message of the given type, if it is recent enough to use.
+
+        Args:
+            message_id (int): The GDL-90 message id.
+
+        Returns:
+            The decoded message, or None.
+        """
+
+        message, received = {
+            gdl90_decoder.HEARTBEAT_ID: self.__heartbeat__,
+            gdl90_decoder.OWNSHIP_REPORT_ID: self.__ownship__,
+            gdl90_decoder.OWNSHIP_GEOMETRIC_ALTITUDE_ID: self.__geometric_altitude__,
+            gdl90_decoder.STRATUX_AHRS_ID: self.__ahrs__
+        }[message_id]
+
+        if message is None or (time.monotonic() - received) > MAX_GDL90_AGE:
+            return None
+
+        return message
+
+    def get_received_time(
+        self,
+        message_id: int
+    ) -> float:
+        """
+        Returns when (monotonic) the most recent message of the given type arrived.
+
+        Args:
+            message_id (int): The GDL-90 message id.
+
+        Returns:
+            float: The time the message arrived, or None if there has not been one.
+        """
+
+        message, received = {
+            gdl90_decoder.HEARTBEAT_ID: self.__heartbeat__,
+            gdl90_decoder.OWNSHIP_REPORT_ID: self.__ownship__,
+            gdl90_decoder.OWNSHIP_GEOMETRIC_ALTITUDE_ID: self.__geometric_altitude__,
+            gdl90_decoder.STRATUX_AHRS_ID: self.__ahrs__
+        }[message_id]
+
+        return received if message is not None else None
+
+    def get_statistics(
+        self
+    ) -> dict:
+        return {
+            'port': self.__port__,
+            'datagrams': self.datagram_count,
+            'bytes': self.byte_count,
+            'messages': {"0x{:02X}".format(message_id): count for message_id, count in self.message_counts.items()},
+            'last_error': self.last_error
+        }
+
+    def reset_statistics(
+        self
+    ):
+        self.datagram_count = 0
+        self.byte_count = 0
+        self.message_counts = {}
+        self.last_error = None
+
+    async def __listen__(
+        self
+    ):
+        loop = asyncio.get_event_loop()
+
+        try:
+            await loop.create_datagram_endpoint(
+                lambda: self,
+                local_addr=('0.0.0.0', self.__port__))
+        except Exception as ex:
+            self.last_error = "Unable to listen on UDP {}: {}".format(self.__port__, ex)
+
+    def __on_traffic__(
+        self,
+        report: gdl90_decoder.PositionReport
+    ):
+        if self.__traffic_callback__ is None:
+            return
+
+        ownship = self.get_recent(gdl90_decoder.OWNSHIP_REPORT_ID)
+
+        if ownship is not None and ownship.address == report.address:
+            return
+
+        self.__traffic_callback__(get_traffic_json(report, ownship))
+
+
+def get_traffic_json(
+    report: gdl90_decoder.PositionReport,
+    ownship: gdl90_decoder.PositionReport = None
+) -> dict:
+    """
+    Converts a traffic report into the same shape as the Stratux JSON,
+    so it can go through the same path as the traffic from the REST services.
+
+    Args:
+        report (PositionReport): The traffic report.
+        ownship (PositionReport, optional): Our own position, to work out the distance and bearing. Defaults to None.
+
+    Returns:
+        dict: The report, using the Stratux names.
+    """
+
+    is_position_valid = report.is_position_valid()
+
+    traffic_json = {
+        'Icao_addr': report.address,
+        'Addr_type': report.address_type,
+        'Tail': report.callsign,
+        'Emitter_category': report.emitter_category,
+        'OnGround': not report.is_airborne,
+        'Position_valid': is_position_valid,
+        'Lat': report.latitude,
+        'Lng': report.longitude,
+        'NIC': report.nic,
+        'NACp': report.nacp,
+        'ExtrapolatedPosition': report.is_extrapolated,
+        'Speed_valid': report.horizontal_velocity is not None
+    }
+
+    if report.altitude is not None:
+        traffic_json['Alt'] = report.altitude
+
+    if report.track is not None:
+        traffic_json['Track'] = report.track
+
+    if report.horizontal_velocity is not None:
+        traffic_json['Speed'] = report.horizontal_velocity
+
+    if report.vertical_velocity is not None:
+        traffic_json['Vvel'] = report.vertical_velocity
+
+    is_bearing_distance_valid = is_position_valid \
+        and ownship is not None \
+        and ownship.is_position_valid()
+
+    traffic_json['BearingDist_valid'] = is_bearing_distance_valid
+
+    # The Stratux reports distance in meters.
+    if is_bearing_distance_valid:
+        ownship_position = (ownship.latitude, ownship.longitude)
+        traffic_position = (report.latitude, report.longitude)
+
+        traffic_json['Distance'] = geo_math.get_distance(ownship_position, traffic_position) * METERS_PER_STATUTE_MILE
+        traffic_json['Bearing'] = geo_math.get_bearing(ownship_position, traffic_position)
+
+    return traffic_json
+
+
+class AhrsGdl90(object):
+    """
+    AHRS source fed by GDL-90.
+    Has the same interface as the other AHRS sources.
+    """
+
+    def __init__(
+        self,
+        listener: Gdl90Listener = None,
+        is_listening: bool = True
+    ):
+        """
+        Creates the source.
+
+        Args:
+            listener (Gdl90Listener, optional): Where the data comes from. Defaults to the shared listener.
+            is_listening (bool, optional): Open the GDL-90 port. False when the data is handed to the listener some other way. Defaults to True.
+        """
+
+        self.__listener__ = listener if listener is not None else get_listener()
+
+        if is_listening:
+            self.__listener__.start()
+
+        self.__max_gs__ = 1.0
+        self.__min_gs__ = 1.0
+
+        self.__snapshot__ = None
+        self.__snapshot_key__ = None
+        self.__snapshot_lock__ = threading.Lock()
+        self.decode_count = 0
+
+    def start_replay(
+        self,
+        replay
+    ):
+        """
+        Takes the GDL-90 datagrams from a flight replay, instead of the port.
+
+        Args:
+            replay (FlightReplay): The replay to take the data from.
+        """
+
+        replay.set_handler(flight_recorder.STREAM_GDL90, self.__listener__.handle_data)
+
+    def update(
+        self
+    ):
+        """
+        The data is pushed to us, so there is nothing to fetch.
+        """
+
+        pass
+
+    def update_avionics(
+        self
+    ):
+        """
+        The avionics are not part of the GDL-90 feed.
+        """
+
+        pass
+
+    def is_data_source_available(
+        self
+    ) -> bool:
+        """
+        Is there a recent AHRS or ownship report?
+
+        Returns:
+            bool: True if the data is available and recent.
+        """
+
+        return self.__listener__.get_recent(gdl90_decoder.STRATUX_AHRS_ID) is not None \
+            or self.__listener__.get_recent(gdl90_decoder.OWNSHIP_REPORT_ID) is not None
+
+    def get_ahrs(
+        self
+    ) -> ahrs_data.AhrsData:
+        """
+        Builds the AHRS data from the most recent reports.
+
+        Every datagram is decoded into a new message, so the
+        data is only rebuilt when one of the messages is replaced
+        (or ages out). Until then every caller gets the same
+        (read-only) snapshot.
+
+        Returns:
+            AhrsData: Any available AHRS data.
+        """
+
+        messages = self.__get_messages__()
+        snapshot_key = self.__get_snapshot_key__(messages)
+        snapshot = self.__snapshot__
+
+        if snapshot is not None and snapshot_key == self.__snapshot_key__:
+            return snapshot
+
+        with self.__snapshot_lock__:
+            snapshot = self.__build_ahrs__(*messages)
+            snapshot.version = self.__snapshot__.version + 1 if self.__snapshot__ is not None else 1
+
+            # The attitude comes from the AHRS message.
+            if messages[3] is not None:
+                snapshot.timestamp = self.__listener__.get_received_time(gdl90_decoder.STRATUX_AHRS_ID)
+            snapshot.freeze()
+
+            self.__snapshot_key__ = snapshot_key
+            self.__snapshot__ = snapshot
+            self.decode_count += 1
+
+        return snapshot
+
+    def get_version(
+        self
+    ) -> int:
+        """
+        Returns the version of the latest AHRS data.
+
+        Returns:
+            int: The version of the AHRS data.
+        """
+
+        return self.get_ahrs().version
+
+    def __get_messages__(
+        self
+    ) -> tuple:
+        return (
+            self.__listener__.get_recent(gdl90_decoder.HEARTBEAT_ID),
+            self.__listener__.get_recent(gdl90_decoder.OWNSHIP_REPORT_ID),
+            self.__listener__.get_recent(gdl90_decoder.OWNSHIP_GEOMETRIC_ALTITUDE_ID),
+            self.__listener__.get_recent(gdl90_decoder.STRATUX_AHRS_ID))
+
+    def __get_snapshot_key__(
+        self,
+        messages: tuple
+    ) -> tuple:
+        """
+        Returns what the snapshot depends on.
+        If the key has not changed, then neither has the data.
+        """
+
+        heartbeat = messages[0]
+
+        # Without a GPS time in the heartbeat, the system time is used,
+        # so the snapshot goes out of date every second.
+        uses_system_time = heartbeat is None or not heartbeat.is_gps_position_valid
+
+        # The messages compare by identity, and are kept alive
+        # by the key, so a replaced message always misses.
+        return messages + (int(time.time()) if uses_system_time else None,)
+
+    def __build_ahrs__(
+        self,
+        heartbeat: gdl90_decoder.Heartbeat,
+        ownship: gdl90_decoder.PositionReport,
+        geometric_altitude: gdl90_decoder.GeometricAltitude,
+        ahrs: gdl90_decoder.StratuxAhrs
+    ) -> ahrs_data.AhrsData:
+        if ahrs is None:
+            ahrs = gdl90_decoder.StratuxAhrs()
+
+        new_ahrs_data = ahrs_data.AhrsData()
+
+        new_ahrs_data.gps_online = heartbeat is not None \
+            and heartbeat.is_gps_position_valid \
+            and ownship is not None \
+            and ownship.is_position_valid()
+
+        new_ahrs_data.roll = ahrs.roll if ahrs.roll is not None else 0.0
+        new_ahrs_data.pitch = ahrs.pitch if ahrs.pitch is not None else 0.0
+
+        # anything above 360 indicates "not available"
+        new_ahrs_data.compass_heading = ahrs.heading if ahrs.heading is not None else 1080
+
+        new_ahrs_data.gps_heading = ownship.track \
+            if new_ahrs_data.gps_online and ownship.track is not None else ahrs_data.NOT_AVAILABLE
+
+        new_ahrs_data.position = (ownship.latitude, ownship.longitude) if new_ahrs_data.gps_online else (None, None)
+
+        # GDL-90 has no MSL altitude. The 0x4C and ownship altitudes are
+        # pressure altitudes, which is what the altimeter tape expects.
+        # The 0x0B geometric altitude is above the WGS-84 ellipsoid, and
+        # can be off from MSL by a few hundred feet (the geoid), so
+        # it is only used when there is nothing else.
+        new_ahrs_data.alt = self.__get_first_available__([
+            ahrs.pressure_altitude,
+            ownship.altitude if ownship is not None else None,
+            geometric_altitude.altitude if geometric_altitude is not None else None])
+
+        new_ahrs_data.vertical_speed = self.__get_first_available__([
+            ahrs.vertical_speed,
+            ownship.vertical_velocity if ownship is not None else None])
+
+        new_ahrs_data.airspeed = ahrs.airspeed if ahrs.airspeed is not None else ahrs_data.NOT_AVAILABLE
+
+        new_ahrs_data.groundspeed = ownship.horizontal_velocity \
+            if new_ahrs_data.gps_online and ownship.horizontal_velocity is not None else ahrs_data.NOT_AVAILABLE
+
+        new_ahrs_data.g_load = ahrs.g_load if ahrs.g_load is not None else ahrs_data.NOT_AVAILABLE
+        new_ahrs_data.slip_skid = ahrs.slip_skid
+
+        new_ahrs_data.utc_time = str(self.__get_utc_time__(heartbeat))
+
+        if new_ahrs_data.g_load is not ahrs_data.NOT_AVAILABLE:
+            self.__max_gs__ = max(self.__max_gs__, new_ahrs_data.g_load)
+            self.__min_gs__ = min(self.__min_gs__, new_ahrs_data.g_load)
+
+        new_ahrs_data.min_g = self.__min_gs__
+        new_ahrs_data.max_g = self.__max_gs__
+
+        return new_ahrs_data
+
+    def __get_first_available__(
+        self,
+        values: list
+    ):
+        for value in values:
+            if value is not None:
+                return value
+
+        return ahrs_data.NOT_AVAILABLE
+
+    def __get_utc_time__(
+        self,
+        heartbeat: gdl90_decoder.Heartbeat
+    ) -> datetime:
+        """
+        The heartbeat only has the seconds since midnight,
+        so the date comes from the system clock.
+        """
+
+        now = datetime.now(timezone.utc)
+
+        if heartbeat is None or not heartbeat.is_gps_position_valid:
+            return now
+
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        return midnight + timedelta(seconds=heartbeat.seconds_since_midnight)
+
+
+__LISTENER__ = None
+__LISTENER_LOCK__ = threading.Lock()
+
+
+def get_listener() -> Gdl90Listener:
+    """
+    Returns the shared listener, creating it if needed.
+    The AHRS and the traffic both come from the same socket.
+
+    Returns:
+        Gdl90Listener: The listener for the GDL-90 port.
+    """
+
+    global __LISTENER__
+
+    with __LISTENER_LOCK__:
+        if __LISTENER__ is None:
+            __LISTENER__ = Gdl90Listener()
+
+            TelemetryRegistry.add_provider(
+                'gdl90',
+                __LISTENER__.get_statistics,
+                __LISTENER__.reset_statistics)
+
+        return __LISTENER__
+
+
+def __get_frames__(
+    data: bytes
+) -> list:
+    """
+    Splits a capture back into its (still stuffed) frames.
+    """
+
+    return [frame for frame in data.split(b'\x7e') if frame]
+
+
+def __record__(
+    capture_path: str
+):
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    receiver.bind(('0.0.0.0', GDL90_PORT))
+
+    print("Recording UDP {} to {}. Ctrl-C to stop.".format(GDL90_PORT, capture_path))
+
+    with open(capture_path, 'ab') as capture_file:
+        try:
+            while True:
+                capture_file.write(receiver.recvfrom(4096)[0])
+        except KeyboardInterrupt:
+            pass
+
+
+def __decode__(
+    capture_path: str
+):
+    with open(capture_path, 'rb') as capture_file:
+        data = capture_file.read()
+
+    for message in gdl90_decoder.get_messages(data):
+        decoded = gdl90_decoder.decode_message(message)
+
+        if decoded is None:
+            print("0x{:02X}: (not decoded)".format(message[0]))
+            continue
+
+        print("0x{:02X}: {}".format(
+            message[0],
+            {name: getattr(decoded, name) for name in decoded.__slots__}))
+
+
+def __replay__(
+    capture_path: str,
+    host: str = '127.0.0.1'
+):
+    with open(capture_path, 'rb') as capture_file:
+        frames = __get_frames__(capture_file.read())
+
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+
+    print("Replaying {} frames to {}:{}".format(len(frames), host, GDL90_PORT))
+
+    next_heartbeat = time.monotonic()
+
+    for frame in frames:
+        # Send everything between heartbeats, then wait for the next second.
+        if gdl90_decoder.unstuff(frame)[0] == gdl90_decoder.HEARTBEAT_ID:
+            time.sleep(max(0.0, next_heartbeat - time.monotonic()))
+            next_heartbeat += HEARTBEAT_INTERVAL
+
+        sender.sendto(b'\x7e' + frame + b'\x7e', (host, GDL90_PORT))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3 or sys.argv[1] not in ['record', 'decode', 'replay']:
+        print(__doc__)
+        sys.exit(1)
+
+    if sys.argv[1] == 'record':
+        __record__(sys.argv[2])
+    elif sys.argv[1] == 'decode':
+        __decode__(sys.argv[2])
+    else:
+        __replay__(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else '127.0.0.1')
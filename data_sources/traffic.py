@@ -9,26 +9,78 @@ import threading
 import time
 
 import requests
-from common_utils import simulated_values, tasks
+from common_utils import (async_polling, endpoint_health, flight_recorder,
+                          http_pool, simulated_values, tasks,
+                          websocket_stream)
 from configuration import configuration
+from data_sources import flight_replay, gdl90_udp_source, traffic_table
 from data_sources.ahrs_data import AhrsData
 
 
+def get_altitude_delta_text(
+    altitude_delta: int
+) -> str:
+    """
+    Formats the difference in altitude (in hundreds of feet) for display.
+
+    Arguments:
+        altitude_delta {int} -- The traffic's altitude less our own, in feet. None if unknown.
+
+    Returns:
+        str -- The delta for display.
+
+    >>> get_altitude_delta_text(1000)
+    '+10'
+    >>> get_altitude_delta_text(-450)
+    '-4'
+    >>> get_altitude_delta_text(None)
+    'UNK'
+    """
+
+    if altitude_delta is None:
+        return "UNK"
+
+    altitude_delta = int((altitude_delta / 100.0) + 0.5)
+
+    delta_sign = '+' if altitude_delta > 0 else ''
+    return "{0}{1}".format(delta_sign, altitude_delta)
+
+
 class Traffic(object):
     """
     Holds data about traffic that the ADSB has received.
     """
 
-    TAIL_NUMBER_KEY = 'displayName'
-    LATITUDE_KEY = 'Lat'
-    LONGITUDE_KEY = 'Lng'
-    DISTANCE_KEY = 'Distance'
-    BEARING_KEY = 'Bearing'
-    TRACK_KEY = 'Track'
-    ALTITUDE_KEY = 'Alt'
+    TAIL_NUMBER_KEY = traffic_table.DISPLAY_NAME_KEY
+    LATITUDE_KEY = traffic_table.LATITUDE_KEY
+    LONGITUDE_KEY = traffic_table.LONGITUDE_KEY
+    DISTANCE_KEY = traffic_table.DISTANCE_KEY
+    BEARING_KEY = traffic_table.BEARING_KEY
+    TRACK_KEY = traffic_table.TRACK_KEY
+    ALTITUDE_KEY = traffic_table.ALTITUDE_KEY
+    SPEED_KEY = traffic_table.SPEED_KEY
+    VERTICAL_SPEED_KEY = traffic_table.VERTICAL_SPEED_KEY
     # We need to key off the ICAO address due to 'Anonymous Mode'...
     ICAO_ADDR_KEY = 'Icao_addr'
 
+    # Bits for `change_mask`, marking which of the parsed
+    # fields the most recent report changed.
+    CHANGED_NONE = traffic_table.CHANGED_NONE
+    CHANGED_DISPLAY_NAME = traffic_table.CHANGED_DISPLAY_NAME
+    CHANGED_POSITION = traffic_table.CHANGED_POSITION
+    CHANGED_DISTANCE = traffic_table.CHANGED_DISTANCE
+    CHANGED_BEARING = traffic_table.CHANGED_BEARING
+    CHANGED_TRACK = traffic_table.CHANGED_TRACK
+    CHANGED_ALTITUDE = traffic_table.CHANGED_ALTITUDE
+    CHANGED_ON_GROUND = traffic_table.CHANGED_ON_GROUND
+    CHANGED_SPEED = traffic_table.CHANGED_SPEED
+    CHANGED_VERTICAL_SPEED = traffic_table.CHANGED_VERTICAL_SPEED
+    CHANGED_ALL = traffic_table.CHANGED_ALL
+
+    # A view over a row of a TrafficTable.
+    # Only the ICAO address lives on the object itself.
+    __slots__ = ('icao_address', '__table__', '__slot__')
+
     """
     Holds an instance of a traffic callout.
 
@@ -86,13 +138,9 @@ class Traffic(object):
         orientation: AhrsData
     ) -> str:
         if orientation is None:
-            return "UNK"
-
-        altitude_delta = self.get_altitude_delta(orientation.alt)
-        altitude_delta = int((altitude_delta / 100.0) + 0.5)
+            return get_altitude_delta_text(None)
 
-        delta_sign = '+' if altitude_delta > 0 else ''
-        return "{0}{1}".format(delta_sign, altitude_delta)
+        return get_altitude_delta_text(self.get_altitude_delta(orientation.alt))
 
     def is_on_ground(
         self
@@ -104,13 +152,7 @@ class Traffic(object):
             bool -- True if the plane is on the ground.
         """
 
-        try:
-            if 'OnGround' in self.__json__:
-                return bool(self.__json__['OnGround'])
-        except:
-            pass
-
-        return False
+        return self.__table__.on_ground[self.__slot__] != 0
 
     def get_age(
         self
@@ -118,8 +160,7 @@ class Traffic(object):
         """
         Returns the age of this report in total seconds.
         """
-        delta = datetime.datetime.utcnow() - self.time_decoded
-        return delta.total_seconds()
+        return time.monotonic() - self.__table__.time_decoded[self.__slot__]
 
     def get_display_name(
         self
@@ -128,11 +169,106 @@ class Traffic(object):
         Returns the identifier to use of the traffic
         """
 
-        if self.display_name is not None and len(self.display_name) > 1:
-            return self.display_name
+        display_name = self.display_name
+
+        if display_name is not None and len(display_name) > 1:
+            return display_name
 
         return self.icao_address
 
+    @property
+    def slot(
+        self
+    ) -> int:
+        """
+        The row of the table this traffic is held in.
+        """
+        return self.__slot__
+
+    @property
+    def display_name(
+        self
+    ) -> str:
+        return self.__table__.display_name[self.__slot__]
+
+    @property
+    def time_decoded(
+        self
+    ) -> float:
+        """
+        When the last report was received, from `time.monotonic()`.
+        """
+        return self.__table__.time_decoded[self.__slot__]
+
+    @property
+    def time_positioned(
+        self
+    ) -> float:
+        """
+        When the distance, bearing, or position last changed, from `time.monotonic()`.
+        """
+        return self.__table__.time_positioned[self.__slot__]
+
+    @property
+    def change_mask(
+        self
+    ) -> int:
+        return self.__table__.change_mask[self.__slot__]
+
+    @property
+    def latitude(
+        self
+    ) -> float:
+        return traffic_table.get_value(self.__table__.latitude[self.__slot__])
+
+    @property
+    def longitude(
+        self
+    ) -> float:
+        return traffic_table.get_value(self.__table__.longitude[self.__slot__])
+
+    @property
+    def distance(
+        self
+    ) -> float:
+        return traffic_table.get_value(self.__table__.distance[self.__slot__])
+
+    @property
+    def bearing(
+        self
+    ) -> float:
+        return traffic_table.get_value(self.__table__.bearing[self.__slot__])
+
+    @property
+    def track(
+        self
+    ) -> float:
+        return traffic_table.get_value(self.__table__.track[self.__slot__])
+
+    @property
+    def altitude(
+        self
+    ) -> float:
+        return traffic_table.get_value(self.__table__.altitude[self.__slot__])
+
+    @property
+    def speed(
+        self
+    ) -> float:
+        """
+        The ground speed in knots.
+        """
+        return traffic_table.get_value(self.__table__.speed[self.__slot__])
+
+    @property
+    def vertical_speed(
+        self
+    ) -> float:
+        """
+        The vertical speed in feet per minute.
+        """
+        return traffic_table.get_value(self.__table__.vertical_speed[self.__slot__])
+
     def get_bearing(
         self,
         starting_lat: float,
@@ -143,8 +279,8 @@ class Traffic(object):
         given point.
         """
 
-        lat2 = float(self.__json__[Traffic.LATITUDE_KEY])
-        lon2 = float(self.__json__[Traffic.LONGITUDE_KEY])
+        lat2 = float(self.latitude)
+        lon2 = float(self.longitude)
 
         bearing = math.atan2(math.sin(lon2 - starting_lon) * math.cos(lat2), math.cos(starting_lat)
                              * math.sin(lat2) - math.sin(starting_lat) * math.cos(lat2) * math.cos(lon2 - starting_lon))
@@ -187,120 +323,59 @@ class Traffic(object):
     def update(
         self,
         json_report: dict
-    ):
+    ) -> int:
         """
         Applies the new data to the existing traffic.
-        """
 
-        try:
-            self.__json__.update(json_report)
-            self.__update_from_json__()
-        except:
-            print("Issue in update()")
+        Arguments:
+            json_report {dict} -- The newest report for this aircraft.
 
-    def __init__(
-        self,
-        icao_address: str,
-        json_from_stratux: dict
-    ):
-        """
-        Initializes the traffic from the JSON response.
+        Returns:
+            int -- The `CHANGED_*` bits for the fields that changed.
         """
 
-        # Create all of the possible data
-        self.icao_address = icao_address
-        self.display_name = None
-        self.time_decoded = datetime.datetime.utcnow()
-        self.latitude = None
-        self.longitude = None
-        self.distance = None
-        self.bearing = None
-        self.altitude = None
-        self.track = None
+        try:
+            return self.__table__.update(self.__slot__, json_report)
+        except Exception as ex:
+            print("Exception while updating:{}".format(ex))
 
-        self.__json__ = json_from_stratux
-        self.__update_from_json__()
+        return Traffic.CHANGED_NONE
 
-    def __update_from_json__(
+    def release(
         self
     ):
         """
-        Updates the report from the most recently received report.
-        (Deserialized from the JSON)
-        """
-
-        # Position report with full GPS
-        # {u'TargetType': 1,
-        # u'Vvel': -1152,
-        # u'Speed_valid': True,
-        # u'Emitter_category': 3,
-        # u'Tail': u'SKW4677',
-        # u'GnssDiffFromBaroAlt': -300,
-        # u'Reg': u'N256SY',
-        # u'Last_seen': u'0001-01-01T03:20:11.93Z',
-        # u'Squawk': 0,
-        # u'Track': 181,
-        # u'Timestamp': u'2018-02-25T22:04:00.122Z',
-        # u'Icao_addr': 10645359,
-        # u'ExtrapolatedPosition': False,
-        # u'Addr_type': 0,
-        # u'Last_alt': u'0001-01-01T03:20:12.2Z',
-        # u'Lat': 47.642025,
-        # u'Position_valid': True,
-        # u'Distance': 6686.765716909548,
-        # u'Age': 0.15000000000000002,
-        # u'Last_GnssDiffAlt': 4000,
-        # u'Last_speed': u'0001-01-01T03:20:12.26Z',
-        # u'AgeLastAlt': 0.15000000000000002,
-        # u'Last_GnssDiff': u'0001-01-01T03:20:12.26Z',
-        # u'BearingDist_valid': True,
-        # u'Lng': -122.31614,
-        # u'Bearing': 144.92257263398366,
-        # u'OnGround': False,
-        # u'NIC': 8,
-        # u'Last_source': 1,
-        # u'PriorityStatus': 0,
-        # u'NACp': 10,
-        # u'SignalLevel': -5.054252345140135,
-        # u'AltIsGNSS': False,
-        # u'Alt': 4000,
-        # u'Speed': 177}
+        Gives the row back to the table. The view keeps
+        returning the last values until the row is reused.
+        """
 
-        try:
-            self.display_name = self.__json__[Traffic.TAIL_NUMBER_KEY]
-            self.time_decoded = datetime.datetime.utcnow()
+        self.__table__.release(self.__slot__)
 
-            if Traffic.LATITUDE_KEY in self.__json__:
-                self.latitude = self.__json__[Traffic.LATITUDE_KEY]
-            else:
-                self.latitude = None
+    def __init__(
+        self,
+        icao_address: str,
+        json_from_stratux: dict,
+        table: traffic_table.TrafficTable = None
+    ):
+        """
+        Initializes the traffic from the JSON response.
 
-            if Traffic.LONGITUDE_KEY in self.__json__:
-                self.longitude = self.__json__[Traffic.LONGITUDE_KEY]
-            else:
-                self.longitude = None
+        Arguments:
+            icao_address {str} -- The ICAO address of the aircraft.
+            json_from_stratux {dict} -- The first report for the aircraft.
 
-            if Traffic.DISTANCE_KEY in self.__json__:
-                self.distance = float(self.__json__[Traffic.DISTANCE_KEY])
-            else:
-                self.distance = None
+        Keyword Arguments:
+            table {TrafficTable} -- The table to hold the values in. A single row table is made if not given. (default: {None})
+        """
 
-            if Traffic.BEARING_KEY in self.__json__:
-                self.bearing = float(self.__json__[Traffic.BEARING_KEY])
-            else:
-                self.bearing = None
+        self.icao_address = icao_address
+        self.__table__ = table if table is not None else traffic_table.TrafficTable(1)
+        self.__slot__ = self.__table__.allocate()
 
-            if Traffic.TRACK_KEY in self.__json__:
-                self.track = float(self.__json__[Traffic.TRACK_KEY])
-            else:
-                self.track = None
+        self.update(json_from_stratux)
 
-            if Traffic.ALTITUDE_KEY in self.__json__:
-                self.altitude = float(self.__json__[Traffic.ALTITUDE_KEY])
-            else:
-                self.altitude = None
-        except Exception as ex:
-            print("Exception while updating:{}".format(ex))
+        # Everything is new to a brand new report.
+        self.__table__.change_mask[self.__slot__] = Traffic.CHANGED_ALL
 
 
 class SimulatedTraffic(object):
@@ -446,7 +521,7 @@ class TrafficManager(object):
         """
         Record a heartbeat / response from the traffic manager.
         """
-        self.__last_report_time__ = datetime.datetime.utcnow()
+        self.__last_report_time__ = time.monotonic()
 
     def is_traffic_available(
         self
@@ -460,7 +535,7 @@ class TrafficManager(object):
         if self.__last_report_time__ is None:
             return False
 
-        return (datetime.datetime.utcnow() - self.__last_report_time__).total_seconds() < 10
+        return (time.monotonic() - self.__last_report_time__) < 10
 
     def clear(
         self
@@ -469,7 +544,15 @@ class TrafficManager(object):
         Resets the traffic reports.
         """
 
-        self.traffic = {}
+        self.__lock__.acquire()
+        try:
+            for traffic_report in self.traffic.values():
+                traffic_report.release()
+
+            self.traffic = {}
+            self.generation += 1
+        finally:
+            self.__lock__.release()
 
     def get_traffic_with_position(
         self
@@ -486,7 +569,7 @@ class TrafficManager(object):
         try:
             traffic_with_position = {
                 k: v for k, v in self.traffic.items()
-                if v is not None and ownship != int(v.icao_address)
+                if v is not None and ownship != int(v.icao_address) and v.distance is not None
             }
         except Exception:
             traffic_with_position = []
@@ -508,15 +591,30 @@ class TrafficManager(object):
     ) -> str:
         """
         Updates or sets a traffic report.
+
+        Known aircraft are updated in place. The generation
+        only moves when a report changes something, so repeats
+        of the same report do not cause downstream work.
         """
+        identifier = str(icao_address)
+
         self.__lock__.acquire()
         try:
-            traffic_report = Traffic(icao_address, json_report)
-            identifier = str(traffic_report.icao_address)
-            if traffic_report.icao_address in self.traffic:
-                self.traffic[identifier].update(json_report)
+            traffic_report = self.traffic.get(identifier)
+
+            if traffic_report is not None:
+                change_mask = traffic_report.update(json_report)
             else:
+                traffic_report = Traffic(icao_address, json_report, self.table)
+                change_mask = traffic_report.change_mask
                 self.traffic[identifier] = traffic_report
+
+            self.reports_handled += 1
+
+            if change_mask != Traffic.CHANGED_NONE:
+                self.generation += 1
+            else:
+                self.unchanged_reports += 1
         finally:
             self.__lock__.release()
 
@@ -542,7 +640,10 @@ class TrafficManager(object):
                     traffic_to_remove.append(identifier)
 
             for identifier_to_remove in traffic_to_remove:
-                del self.traffic[identifier_to_remove]
+                self.traffic.pop(identifier_to_remove).release()
+
+            if len(traffic_to_remove) > 0:
+                self.generation += 1
         except:
             print("Issue on prune")
         finally:
@@ -551,8 +652,16 @@ class TrafficManager(object):
     def __init__(
         self
     ):
-        # Traffic held by tail number
+        # Traffic held by tail number.
+        # Each is a view over a row in the table.
         self.traffic = {}
+        self.table = traffic_table.TrafficTable()
+
+        # Moves every time a report is added, removed, or changed.
+        self.generation = 0
+        self.reports_handled = 0
+        self.unchanged_reports = 0
+
         self.__last_report_time__ = None
         self.__lock__ = threading.Lock()
         self.__prune_task__ = tasks.RecurringTask(
@@ -575,34 +684,142 @@ class AdsbTrafficClient:
         self,
         rest_address: str
     ):
-        self.__traffic_session__ = requests.Session()
+        self.__traffic_session__ = http_pool.INSTANCE.get_session()
         self.rest_address = rest_address
+        AdsbTrafficClient.INSTANCE = self
+
+        # The Stratux pushes its traffic directly,
+        # so the traffic manager is not needed.
+        if configuration.CONFIGURATION.data_source() == configuration.DataSourceNames.GDL90:
+            listener = gdl90_udp_source.get_listener()
+            listener.set_traffic_callbacks(
+                self.publish_stratux_traffic,
+                AdsbTrafficClient.TRAFFIC_MANAGER.heartbeat)
+            listener.start()
+
+            self.__update_traffic_task__ = None
+            self.__update_service_health_task__ = None
+
+            return
+
+        # The replay hands the recorded traffic over, through the same
+        # calls the live data would have gone through.
+        if configuration.CONFIGURATION.data_source() == configuration.DataSourceNames.REPLAY:
+            listener = gdl90_udp_source.get_listener()
+            listener.set_traffic_callbacks(
+                self.publish_stratux_traffic,
+                AdsbTrafficClient.TRAFFIC_MANAGER.heartbeat)
+
+            replay = flight_replay.INSTANCE
+            replay.set_handler(flight_recorder.STREAM_TRAFFIC, self.publish_reliable_traffic)
+            replay.set_handler(flight_recorder.STREAM_SERVICE_STATUS, self.publish_traffic_manager_service_status)
+            replay.set_handler(flight_recorder.STREAM_STRATUX_TRAFFIC, self.publish_stratux_traffic)
+            replay.set_handler(flight_recorder.STREAM_GDL90, listener.handle_data)
+
+            self.__update_traffic_task__ = None
+            self.__update_service_health_task__ = None
+
+            return
+
+        if configuration.CONFIGURATION.data_source() == configuration.DataSourceNames.WEBSOCKET:
+            # With no traffic around the socket is quiet. The traffic
+            # manager only counts as available while the Stratux is
+            # still answering the pings on it.
+            self.__update_traffic_task__ = websocket_stream.WebSocketStream(
+                'StratuxTraffic',
+                "ws://{}/traffic".format(configuration.CONFIGURATION.stratux_address()),
+                self.__on_stratux_traffic_message__,
+                1.0,
+                AdsbTrafficClient.TRAFFIC_MANAGER.heartbeat)
+            self.__update_traffic_task__.start()
+            self.__update_service_health_task__ = None
+
+            return
+
+        if configuration.CONFIGURATION.async_polling_enabled:
+            self.__update_traffic_task__ = async_polling.INSTANCE.add_endpoint(
+                'UpdateTraffic',
+                "http://{}/Traffic/Reliable".format(self.rest_address),
+                0.1,
+                self.publish_reliable_traffic,
+                configuration.AHRS_TIMEOUT)
+            self.__update_service_health_task__ = async_polling.INSTANCE.add_endpoint(
+                'UpdateTrafficManagerHealth',
+                "http://{}/Service/Status".format(self.rest_address),
+                0.5,
+                self.publish_traffic_manager_service_status,
+                configuration.AHRS_TIMEOUT)
+
+            return
+
+        # A traffic manager that is not running would otherwise
+        # block these tasks for the whole timeout, every time.
+        self.__traffic_health__ = endpoint_health.EndpointHealth(
+            'UpdateTraffic',
+            0.0,
+            0.1 * endpoint_health.DEFAULT_MAX_INTERVAL_SCALE)
+        self.__last_traffic_json__ = None
+        self.__service_status_health__ = endpoint_health.EndpointHealth(
+            'UpdateTrafficManagerHealth',
+            0.0,
+            0.5 * endpoint_health.DEFAULT_MAX_INTERVAL_SCALE)
+        self.__last_status_json__ = None
+
         self.__update_traffic_task__ = tasks.RecurringTask(
             'UpdateTraffic',
             0.1,
-            self.update_reliable_traffic)
+            self.update_reliable_traffic,
+            is_blocking=True)
         self.__update_service_health_task__ = tasks.RecurringTask(
             'UpdateTrafficManagerHealth',
             0.5,
-            self.get_traffic_manager_service_status)
-        AdsbTrafficClient.INSTANCE = self
+            self.get_traffic_manager_service_status,
+            is_blocking=True)
 
     def get_traffic_manager_service_status(
         self
     ):
+        if not self.__service_status_health__.is_due():
+            return
+
+        request_start = time.monotonic()
+
         try:
             status_json = self.__traffic_session__.get(
                 "http://{}/Service/Status".format(self.rest_address),
                 timeout=configuration.AHRS_TIMEOUT).json()
 
-            if status_json is not None and AdsbTrafficClient.TIME_SINCE_LAST_REPORT_KEY in status_json:
-                time_since_last_report = float(
-                    status_json[AdsbTrafficClient.TIME_SINCE_LAST_REPORT_KEY])
+            self.__service_status_health__.record_success(
+                time.monotonic() - request_start,
+                status_json != self.__last_status_json__)
+            self.__last_status_json__ = status_json
 
-                if time_since_last_report < 60.0:
-                    AdsbTrafficClient.TRAFFIC_MANAGER.heartbeat()
-        except:
-            pass
+            self.publish_traffic_manager_service_status(status_json)
+        except Exception as ex:
+            self.__service_status_health__.record_failure(
+                str(ex),
+                time.monotonic() - request_start,
+                isinstance(ex, requests.Timeout))
+
+    def publish_traffic_manager_service_status(
+        self,
+        status_json: dict
+    ):
+        """
+        Marks the traffic manager as alive if it has heard traffic recently.
+
+        Arguments:
+            status_json {dict} -- The response from the service status endpoint.
+        """
+
+        flight_recorder.INSTANCE.record(flight_recorder.STREAM_SERVICE_STATUS, status_json)
+
+        if status_json is not None and AdsbTrafficClient.TIME_SINCE_LAST_REPORT_KEY in status_json:
+            time_since_last_report = float(
+                status_json[AdsbTrafficClient.TIME_SINCE_LAST_REPORT_KEY])
+
+            if time_since_last_report < 60.0:
+                AdsbTrafficClient.TRAFFIC_MANAGER.heartbeat()
 
     def reset_traffic_manager(
         self
@@ -624,16 +841,24 @@ class AdsbTrafficClient:
         """
         Calls the traffic manager and gets a list of traffic that is trustable
         for position data.
+        Does nothing while the traffic manager is being given a rest.
         """
+        if not self.__traffic_health__.is_due():
+            return False
+
+        request_start = time.monotonic()
+
         try:
             traffic_json = self.__traffic_session__.get(
                 "http://{}/Traffic/Reliable".format(self.rest_address),
                 timeout=configuration.AHRS_TIMEOUT).json()
 
-            # Report each traffic based on the keys
-            for icao_identifier in traffic_json.keys():
-                self.received_message(
-                    icao_identifier, traffic_json[icao_identifier])
+            self.__traffic_health__.record_success(
+                time.monotonic() - request_start,
+                traffic_json != self.__last_traffic_json__)
+            self.__last_traffic_json__ = traffic_json
+
+            self.publish_reliable_traffic(traffic_json)
 
             return True
 
@@ -641,12 +866,89 @@ class AdsbTrafficClient:
             raise
         except SystemExit:
             raise
-        except Exception:
+        except Exception as ex:
             # If we are spamming the REST too quickly, then we may loose a single update.
             # Do no consider the service unavailable unless we are
             # way below the max target framerate.
+            self.__traffic_health__.record_failure(
+                str(ex),
+                time.monotonic() - request_start,
+                isinstance(ex, requests.Timeout))
+
             return False
 
+    def publish_reliable_traffic(
+        self,
+        traffic_json: dict
+    ):
+        """
+        Hands each report from the reliable traffic endpoint to the traffic manager.
+
+        Arguments:
+            traffic_json {dict} -- The reports, keyed by ICAO identifier.
+        """
+
+        if traffic_json is None:
+            return
+
+        flight_recorder.INSTANCE.record(flight_recorder.STREAM_TRAFFIC, traffic_json)
+
+        # Report each traffic based on the keys
+        for icao_identifier in traffic_json.keys():
+            self.received_message(
+                icao_identifier, traffic_json[icao_identifier])
+
+    def publish_stratux_traffic(
+        self,
+        stratux_report: dict
+    ):
+        """
+        Hands a single report pushed by the Stratux (over the traffic socket or GDL-90) to the traffic manager.
+
+        The Stratux sends every report it hears, so reports
+        without a valid position, or without a bearing and
+        distance from us (no ownship fix yet), are dropped here
+        instead of by the traffic manager. It also does not add
+        the display name that the traffic manager does.
+
+        Arguments:
+            stratux_report {dict} -- The report for a single aircraft.
+        """
+
+        if stratux_report is None or Traffic.ICAO_ADDR_KEY not in stratux_report:
+            return
+
+        # A connected socket is a live receiver, even without traffic.
+        AdsbTrafficClient.TRAFFIC_MANAGER.heartbeat()
+
+        if not stratux_report.get('Position_valid', True) \
+                or not stratux_report.get('BearingDist_valid', True):
+            return
+
+        icao_identifier = str(stratux_report[Traffic.ICAO_ADDR_KEY])
+
+        if not stratux_report.get(Traffic.TAIL_NUMBER_KEY):
+            stratux_report[Traffic.TAIL_NUMBER_KEY] = stratux_report.get('Tail') \
+                or stratux_report.get('Reg') \
+                or "{:06X}".format(int(stratux_report[Traffic.ICAO_ADDR_KEY]))
+
+        self.received_message(
+            icao_identifier,
+            stratux_report)
+
+    def __on_stratux_traffic_message__(
+        self,
+        stratux_report: dict
+    ):
+        """
+        Records, and then publishes, a report pushed over the traffic socket.
+        GDL-90 traffic is recorded as the raw datagrams instead.
+        """
+
+        flight_recorder.INSTANCE.record(flight_recorder.STREAM_STRATUX_TRAFFIC, stratux_report)
+
+        self.publish_stratux_traffic(stratux_report)
+
     def received_message(
         self,
         icao_identifier: str,
@@ -0,0 +1,344 @@
+"""
+Dead reckons the traffic between reports.
+
+The distance and bearing to a target only change when a
+new report arrives, so the reticles and the scope targets
+jump every update. Between reports each target is moved
+along its reported track, speed, and vertical speed, and
+we are moved along our own ground track and speed. The
+distance and bearing are then worked out again from where
+the two of us are expected to be.
+
+The projection is done for every row of the TrafficTable
+in one pass, straight off the columns, so the results are
+indexed by the same slot as the traffic. NumPy is used when
+it is available; otherwise the same math is done with plain
+Python. A target is never moved further than the configured
+age past its last report, so a target that stops reporting
+does not wander off on its own.
+"""
+
+import math
+from numbers import Number
+
+from common_utils import units
+from configuration import configuration
+
+from data_sources.ahrs_data import AhrsData
+from data_sources.traffic_table import TrafficTable
+
+__NUMPY_AVAILABLE__ = False
+try:
+    import numpy
+
+    __NUMPY_AVAILABLE__ = True
+except:
+    pass
+
+# The distance the receiver reports is in yards,
+# and the speeds are in knots.
+RAW_DISTANCE_PER_KNOT_SECOND = units.yards_to_nm / 3600.0
+
+
+def __get_number__(
+    value
+) -> float:
+    """
+    Returns the value if it is a number, or None if it is not available.
+
+    >>> __get_number__(1.5)
+    1.5
+    >>> __get_number__('---') is None
+    True
+    """
+
+    return value if isinstance(value, Number) else None
+
+
+def get_velocity(
+    speed: float,
+    track: float
+) -> tuple:
+    """
+    Converts a speed (knots) and (true) track into an
+    east/north velocity in raw distance units per second.
+
+    >>> [round(value, 6) for value in get_velocity(3600.0, 90.0)]
+    [2025.37, 0.0]
+    >>> get_velocity(None, 90.0)
+    (0.0, 0.0)
+    """
+
+    if speed is None or track is None:
+        return 0.0, 0.0
+
+    radians = math.radians(track)
+    raw_speed = speed * RAW_DISTANCE_PER_KNOT_SECOND
+
+    return raw_speed * math.sin(radians), raw_speed * math.cos(radians)
+
+
+def extrapolate(
+    distance: float,
+    bearing: float,
+    altitude: float,
+    speed: float,
+    track: float,
+    vertical_speed: float,
+    elapsed: float,
+    own_velocity: tuple
+) -> tuple:
+    """
+    Moves a single target along its track, and us along ours.
+
+    Args:
+        distance (float): The reported distance, in raw units.
+        bearing (float): The reported (true) bearing.
+        altitude (float): The reported altitude, in feet.
+        speed (float): The target's speed in knots. None if not known.
+        track (float): The target's (true) track. None if not known.
+        vertical_speed (float): The target's vertical speed in feet per minute. None if not known.
+        elapsed (float): How far ahead to move, in seconds.
+        own_velocity (tuple): Our east/north velocity, from `get_velocity`.
+
+    Returns:
+        tuple: The distance, bearing, and altitude after `elapsed` seconds.
+
+    >>> [round(value, 3) for value in extrapolate(1000.0, 0.0, 5000.0, 3600.0, 180.0, 600.0, 0.25, (0.0, 0.0))]
+    [493.657, 0.0, 5002.5]
+    >>> [round(value, 3) for value in extrapolate(1000.0, 90.0, 5000.0, 3600.0, 0.0, None, 1.0, (0.0, 2025.37))]
+    [1000.0, 90.0, 5000.0]
+    >>> extrapolate(1000.0, 90.0, 5000.0, None, None, None, 1.0, (0.0, 2025.37))
+    (1000.0, 90.0, 5000.0)
+    """
+
+    if vertical_speed is not None and altitude is not None:
+        altitude += vertical_speed * elapsed / 60.0
+
+    # Without knowing where the target is going,
+    # the last report is the best guess.
+    if speed is None or track is None or distance is None or bearing is None:
+        return distance, bearing, altitude
+
+    target_east, target_north = get_velocity(speed, track)
+    radians = math.radians(bearing)
+    east = distance * math.sin(radians) + (target_east - own_velocity[0]) * elapsed
+    north = distance * math.cos(radians) + (target_north - own_velocity[1]) * elapsed
+
+    return math.hypot(east, north), math.degrees(math.atan2(east, north)) % 360.0, altitude
+
+
+class TrafficExtrapolation(object):
+    """
+    Holds the dead reckoned distance, bearing, and altitude
+    for every row of a TrafficTable, as of the last call to `update`.
+    """
+
+    def __init__(
+        self,
+        table: TrafficTable,
+        use_numpy: bool = True
+    ):
+        """
+        Creates the (empty) extrapolation for a table.
+
+        Args:
+            table (TrafficTable): The table holding the traffic.
+            use_numpy (bool, optional): Use NumPy if it is available. Defaults to True.
+        """
+
+        self.__table__ = table
+        self.__use_numpy__ = use_numpy and __NUMPY_AVAILABLE__
+        self.__key__ = None
+
+        # Each is indexed by the slot of the traffic.
+        # Missing values are NaN.
+        self.distance = []
+        self.bearing = []
+        self.altitude = []
+
+        # Moves every time the columns are recomputed.
+        self.version = 0
+        self.timestamp = None
+        self.extrapolated_count = 0
+
+        self.updates = 0
+        self.reuses = 0
+
+    def update(
+        self,
+        orientation: AhrsData,
+        timestamp: float = None,
+        max_age: float = None
+    ):
+        """
+        Moves every target to where it should be at a time.
+        Call once per frame, before the columns are used.
+
+        Args:
+            orientation (AhrsData): Our current orientation. The ground speed and track are used.
+            timestamp (float, optional): The (monotonic) time to move the traffic to. Defaults to the orientation's timestamp.
+            max_age (float, optional): The furthest, in seconds, to move a target past its last report. Defaults to the configuration.
+
+        Returns:
+            TrafficExtrapolation: self, for convenience.
+        """
+
+        timestamp = orientation.timestamp if timestamp is None else timestamp
+        max_age = configuration.CONFIGURATION.max_traffic_extrapolation_seconds if max_age is None else max_age
+
+        groundspeed = __get_number__(orientation.groundspeed) if orientation.gps_online else None
+        ground_track = __get_number__(orientation.gps_heading)
+
+        # Moving the traffic, but not us, would be worse than not moving anything.
+        is_extrapolating = max_age > 0.0 and groundspeed is not None and ground_track is not None
+        own_velocity = get_velocity(groundspeed, ground_track) if is_extrapolating else None
+
+        key = (
+            self.__table__.version,
+            self.__table__.capacity,
+            timestamp if is_extrapolating else None,
+            own_velocity,
+            max_age)
+
+        if key == self.__key__:
+            self.reuses += 1
+
+            return self
+
+        if self.__use_numpy__:
+            self.__update_numpy__(timestamp, max_age, own_velocity)
+        else:
+            self.__update_python__(timestamp, max_age, own_velocity)
+
+        self.__key__ = key
+        self.timestamp = timestamp
+        self.version += 1
+        self.updates += 1
+
+        return self
+
+    def __update_numpy__(
+        self,
+        timestamp: float,
+        max_age: float,
+        own_velocity: tuple
+    ):
+        table = self.__table__
+
+        # Copied in one call each, so the table is free
+        # to grow on the traffic thread afterwards.
+        distance = numpy.array(table.distance, dtype=numpy.float64)
+        bearing = numpy.array(table.bearing, dtype=numpy.float64)
+        altitude = numpy.array(table.altitude, dtype=numpy.float64)
+
+        if own_velocity is None:
+            self.distance = distance
+            self.bearing = bearing
+            self.altitude = altitude
+            self.extrapolated_count = 0
+
+            return
+
+        # Trimmed to the same length in case the table grew between the copies.
+        rows = min(len(distance), len(bearing), len(altitude))
+        distance = distance[:rows]
+        bearing = bearing[:rows]
+        altitude = altitude[:rows]
+        speed = numpy.array(table.speed, dtype=numpy.float64)[:rows]
+        track = numpy.array(table.track, dtype=numpy.float64)[:rows]
+        vertical_speed = numpy.array(table.vertical_speed, dtype=numpy.float64)[:rows]
+        time_positioned = numpy.array(table.time_positioned, dtype=numpy.float64)[:rows]
+
+        elapsed = numpy.clip(timestamp - time_positioned, 0.0, max_age)
+        is_moving = ~numpy.isnan(speed) & ~numpy.isnan(track)
+
+        bearing_radians = numpy.radians(bearing)
+        track_radians = numpy.radians(track)
+        raw_speed = speed * RAW_DISTANCE_PER_KNOT_SECOND
+
+        east = distance * numpy.sin(bearing_radians) \
+            + (raw_speed * numpy.sin(track_radians) - own_velocity[0]) * elapsed
+        north = distance * numpy.cos(bearing_radians) \
+            + (raw_speed * numpy.cos(track_radians) - own_velocity[1]) * elapsed
+
+        self.distance = numpy.where(is_moving, numpy.hypot(east, north), distance)
+        self.bearing = numpy.where(is_moving, numpy.mod(numpy.degrees(numpy.arctan2(east, north)), 360.0), bearing)
+        self.altitude = numpy.where(
+            numpy.isnan(vertical_speed),
+            altitude,
+            altitude + vertical_speed * elapsed / 60.0)
+        self.extrapolated_count = int(numpy.count_nonzero(is_moving & (elapsed > 0.0) & ~numpy.isnan(distance)))
+
+    def __update_python__(
+        self,
+        timestamp: float,
+        max_age: float,
+        own_velocity: tuple
+    ):
+        table = self.__table__
+
+        if own_velocity is None:
+            self.distance = list(table.distance)
+            self.bearing = list(table.bearing)
+            self.altitude = list(table.altitude)
+            self.extrapolated_count = 0
+
+            return
+
+        distances = []
+        bearings = []
+        altitudes = []
+        extrapolated_count = 0
+
+        for distance, bearing, altitude, speed, track, vertical_speed, time_positioned in zip(
+                list(table.distance),
+                list(table.bearing),
+                list(table.altitude),
+                list(table.speed),
+                list(table.track),
+                list(table.vertical_speed),
+                list(table.time_positioned)):
+            elapsed = min(max_age, max(0.0, timestamp - time_positioned))
+            is_moving = speed == speed and track == track and distance == distance and bearing == bearing
+
+            # NaN stays NaN, so missing values pass straight through.
+            distance, bearing, altitude = extrapolate(
+                distance,
+                bearing,
+                altitude,
+                speed if is_moving else None,
+                track if is_moving else None,
+                vertical_speed if vertical_speed == vertical_speed else None,
+                elapsed,
+                own_velocity)
+
+            if is_moving and elapsed > 0.0:
+                extrapolated_count += 1
+
+            distances.append(distance)
+            bearings.append(bearing)
+            altitudes.append(altitude)
+
+        self.distance = distances
+        self.bearing = bearings
+        self.altitude = altitudes
+        self.extrapolated_count = extrapolated_count
+
+    def get_statistics(
+        self
+    ) -> dict:
+        return {
+            'uses_numpy': self.__use_numpy__,
+            'rows': len(self.distance),
+            'extrapolated': self.extrapolated_count,
+            'max_age_s': self.__key__[4] if self.__key__ is not None else None,
+            'updates': self.updates,
+            'reuses': self.reuses
+        }
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,362 @@
+"""
+Computes the geometry (altitude delta, declination corrected
+bearing, display distance, and screen projection) for every
+traffic target in one pass, instead of per target, per element.
+
+The traffic is first dead reckoned to the time of the frame
+(see `traffic_extrapolation`), so the geometry is for where
+the traffic is expected to be, not where it last reported.
+
+The pass works straight off the columns of the TrafficTable,
+so the results are indexed by the same slot as the traffic.
+NumPy is used when it is available; otherwise the same
+math is done with plain Python.
+"""
+
+import math
+from numbers import Number
+
+from common_utils import units
+from configuration import configuration
+from core_services import zoom_tracker
+
+from data_sources import traffic
+from data_sources.ahrs_data import AhrsData
+from data_sources.data_cache import HudDataCache
+from data_sources.traffic_extrapolation import TrafficExtrapolation
+from data_sources.traffic_table import TrafficTable, get_value
+
+__NUMPY_AVAILABLE__ = False
+try:
+    import numpy
+
+    __NUMPY_AVAILABLE__ = True
+except:
+    pass
+
+
+def __get_number__(
+    value
+) -> float:
+    """
+    Returns the value if it is a number, or None if it is not available.
+
+    >>> __get_number__(1.5)
+    1.5
+    >>> __get_number__('---') is None
+    True
+    """
+
+    return value if isinstance(value, Number) else None
+
+
+class TrafficGeometry(object):
+    """
+    Holds the geometry for every row of a TrafficTable,
+    as of the last call to `update`.
+    """
+
+    def __init__(
+        self,
+        table: TrafficTable,
+        use_numpy: bool = True
+    ):
+        """
+        Creates the (empty) geometry for a table.
+
+        Args:
+            table (TrafficTable): The table holding the traffic.
+            use_numpy (bool, optional): Use NumPy if it is available. Defaults to True.
+        """
+
+        self.__table__ = table
+        self.__use_numpy__ = use_numpy and __NUMPY_AVAILABLE__
+        self.__key__ = None
+
+        self.extrapolation = TrafficExtrapolation(table, use_numpy)
+
+        # Each is indexed by the slot of the traffic.
+        # Missing values are NaN.
+        self.distance = []
+        self.bearing = []
+        self.altitude_delta = []
+        self.magnetic_bearing = []
+        self.display_distance = []
+        self.horizontal_offset_degrees = []
+        self.vertical_offset_degrees = []
+
+        self.updates = 0
+        self.reuses = 0
+
+    def update(
+        self,
+        orientation: AhrsData
+    ):
+        """
+        Recomputes the geometry if the traffic, or our
+        own position, has changed since the last update.
+        Call once per frame before using the getters.
+
+        The traffic is moved to the time of the orientation's
+        timestamp, so every element drawing the same frame
+        sees the traffic in the same place.
+
+        Args:
+            orientation (AhrsData): Our current orientation.
+
+        Returns:
+            TrafficGeometry: self, for convenience.
+        """
+
+        own_altitude = __get_number__(orientation.alt)
+        pitch = __get_number__(orientation.pitch)
+        compass = __get_number__(orientation.get_onscreen_projection_heading())
+        declination = (HudDataCache.DECLINATION or 0.0) if configuration.CONFIGURATION.is_declination_enabled() else None
+        display_units = configuration.CONFIGURATION.get_units()
+
+        self.extrapolation.update(orientation)
+
+        key = (
+            self.extrapolation.version,
+            own_altitude,
+            pitch,
+            compass,
+            declination,
+            display_units)
+
+        if key == self.__key__:
+            self.reuses += 1
+
+            return self
+
+        if self.__use_numpy__:
+            self.__update_numpy__(own_altitude, pitch, compass, declination, display_units)
+        else:
+            self.__update_python__(own_altitude, pitch, compass, declination, display_units)
+
+        self.__key__ = key
+        self.updates += 1
+
+        return self
+
+    def __update_numpy__(
+        self,
+        own_altitude: float,
+        pitch: float,
+        compass: float,
+        declination: float,
+        display_units: str
+    ):
+        extrapolation = self.extrapolation
+
+        altitude = numpy.asarray(extrapolation.altitude, dtype=numpy.float64)
+        distance = numpy.asarray(extrapolation.distance, dtype=numpy.float64)
+        bearing = numpy.asarray(extrapolation.bearing, dtype=numpy.float64)
+
+        altitude_delta = numpy.trunc(altitude - (own_altitude if own_altitude is not None else numpy.nan))
+
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            slope = numpy.where(distance > 0, altitude_delta / distance, 0.0)
+
+        vertical_degrees = numpy.degrees(numpy.arctan(slope))
+
+        if declination is not None:
+            magnetic_bearing = numpy.mod(numpy.trunc(bearing - declination), 360.0)
+        else:
+            magnetic_bearing = numpy.trunc(bearing)
+
+        self.distance = distance
+        self.bearing = bearing
+        self.altitude_delta = altitude_delta
+        self.magnetic_bearing = magnetic_bearing
+        self.display_distance = units.get_converted_units(display_units, distance)
+        self.horizontal_offset_degrees = magnetic_bearing - (compass if compass is not None else numpy.nan)
+        self.vertical_offset_degrees = vertical_degrees - (pitch if pitch is not None else numpy.nan)
+
+    def __update_python__(
+        self,
+        own_altitude: float,
+        pitch: float,
+        compass: float,
+        declination: float,
+        display_units: str
+    ):
+        extrapolation = self.extrapolation
+        nan = math.nan
+        distances = list(extrapolation.distance)
+        bearings = list(extrapolation.bearing)
+
+        altitude_delta = [
+            float(int(altitude - own_altitude)) if own_altitude is not None and altitude == altitude else nan
+            for altitude in list(extrapolation.altitude)]
+
+        vertical_degrees = [
+            math.degrees(math.atan(delta / distance)) if distance > 0 else (0.0 if delta == delta else nan)
+            for delta, distance in zip(altitude_delta, distances)]
+
+        if declination is not None:
+            magnetic_bearing = [
+                float(int(bearing - declination) % 360) if bearing == bearing else nan
+                for bearing in bearings]
+        else:
+            magnetic_bearing = [
+                float(int(bearing)) if bearing == bearing else nan
+                for bearing in bearings]
+
+        self.distance = distances
+        self.bearing = bearings
+        self.altitude_delta = altitude_delta
+        self.magnetic_bearing = magnetic_bearing
+        self.display_distance = [
+            units.get_converted_units(display_units, distance)
+            for distance in distances]
+        self.horizontal_offset_degrees = [
+            bearing - compass if compass is not None else nan
+            for bearing in magnetic_bearing]
+        self.vertical_offset_degrees = [
+            degrees - pitch if pitch is not None else nan
+            for degrees in vertical_degrees]
+
+    def __get_column_value__(
+        self,
+        column,
+        target: traffic.Traffic
+    ) -> float:
+        """
+        Returns the value for the traffic, or None if it
+        is missing or the traffic is newer than the last update.
+        """
+
+        slot = target.slot
+
+        if slot >= len(column):
+            return None
+
+        return get_value(float(column[slot]))
+
+    def get_distance(
+        self,
+        target: traffic.Traffic
+    ) -> float:
+        """
+        Returns the (dead reckoned) distance to the traffic, in raw units.
+        Falls back to the reported distance.
+        """
+
+        distance = self.__get_column_value__(self.distance, target)
+
+        return distance if distance is not None else target.distance
+
+    def get_bearing(
+        self,
+        target: traffic.Traffic
+    ) -> float:
+        """
+        Returns the (dead reckoned) true bearing to the traffic.
+        Falls back to the reported bearing.
+        """
+
+        bearing = self.__get_column_value__(self.bearing, target)
+
+        return bearing if bearing is not None else target.bearing
+
+    def get_altitude_delta(
+        self,
+        target: traffic.Traffic
+    ) -> int:
+        """
+        Returns the traffic's altitude less our own, in feet.
+        """
+
+        altitude_delta = self.__get_column_value__(self.altitude_delta, target)
+
+        return int(altitude_delta) if altitude_delta is not None else None
+
+    def get_altitude_delta_text(
+        self,
+        target: traffic.Traffic
+    ) -> str:
+        """
+        Returns the altitude delta, in hundreds of feet, for display.
+        """
+
+        return traffic.get_altitude_delta_text(self.get_altitude_delta(target))
+
+    def get_magnetic_bearing(
+        self,
+        target: traffic.Traffic
+    ) -> int:
+        """
+        Returns the bearing to the traffic with the declination (if enabled) applied.
+        """
+
+        bearing = self.__get_column_value__(self.magnetic_bearing, target)
+
+        return int(bearing) if bearing is not None else None
+
+    def get_display_distance(
+        self,
+        target: traffic.Traffic
+    ) -> float:
+        """
+        Returns the distance to the traffic in the user's units.
+        """
+
+        return self.__get_column_value__(self.display_distance, target)
+
+    def is_in_inner_range(
+        self,
+        target: traffic.Traffic
+    ) -> tuple:
+        """
+        Is the traffic within the inner range of the scope?
+        The same as `zoom_tracker.INSTANCE.is_in_inner_range()`
+        but using the precomputed distance.
+
+        Returns:
+            tuple: True if the traffic is within the inner range, and the distance in the user's units.
+        """
+
+        display_distance = self.get_display_distance(target)
+
+        if display_distance is None:
+            return False, None
+
+        return display_distance <= zoom_tracker.INSTANCE.get_target_threshold_distance(), display_distance
+
+    def get_projection_degrees(
+        self,
+        target: traffic.Traffic
+    ) -> tuple:
+        """
+        Returns how far (in degrees) the traffic is to the right of,
+        and above, where we are pointed. (None, None) if not known.
+        """
+
+        horizontal = self.__get_column_value__(self.horizontal_offset_degrees, target)
+        vertical = self.__get_column_value__(self.vertical_offset_degrees, target)
+
+        if horizontal is None or vertical is None:
+            return None, None
+
+        return horizontal, vertical
+
+    def get_statistics(
+        self
+    ) -> dict:
+        return {
+            'uses_numpy': self.__use_numpy__,
+            'rows': len(self.altitude_delta),
+            'updates': self.updates,
+            'reuses': self.reuses,
+            'extrapolation': self.extrapolation.get_statistics()
+        }
+
+
+INSTANCE = TrafficGeometry(traffic.AdsbTrafficClient.TRAFFIC_MANAGER.table)
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,319 @@
+"""
+Spatial index over the traffic, so range, nearest, and
+bearing queries do not have to look at every target.
+
+Each target is placed on a uniform grid using its local
+east/north offset from us (taken from the distance and
+bearing the receiver reports), and into an altitude band.
+The index is built once per traffic generation, and is
+not changed afterwards, so it can be read from any thread.
+It keeps the distance and bearing from when it was built,
+so results are ordered by those, not by the live values.
+"""
+
+import heapq
+import math
+from typing import Tuple
+
+# The size of a grid cell, in the receiver's (raw) distance units.
+# About a statute mile.
+DEFAULT_CELL_SIZE = 1760.0
+
+# The height of an altitude band, in feet.
+ALTITUDE_BAND_FEET = 1000.0
+
+
+def get_local_position(
+    distance: float,
+    bearing: float
+) -> Tuple[float, float]:
+    """
+    Converts a distance and (true) bearing into an east/north offset.
+
+    >>> get_local_position(100.0, 0.0)
+    (0.0, 100.0)
+    >>> [round(value, 6) for value in get_local_position(100.0, 90.0)]
+    [100.0, 0.0]
+    """
+
+    radians = math.radians(bearing)
+
+    return distance * math.sin(radians), distance * math.cos(radians)
+
+
+def get_bearing_difference(
+    first_bearing: float,
+    second_bearing: float
+) -> float:
+    """
+    Returns the smallest angle between two bearings.
+
+    >>> get_bearing_difference(350, 10)
+    20.0
+    >>> get_bearing_difference(90, 45)
+    45.0
+    """
+
+    difference = math.fabs(first_bearing - second_bearing) % 360
+
+    return 360 - difference if difference > 180 else difference
+
+
+class TrafficIndex(object):
+    """
+    Uniform grid (with altitude bands) over a snapshot of the traffic.
+    """
+
+    def __init__(
+        self,
+        traffic_reports: list,
+        generation: int = 0,
+        cell_size: float = DEFAULT_CELL_SIZE
+    ):
+        """
+        Builds the index.
+
+        Args:
+            traffic_reports (list): The traffic to index. Traffic without a distance or bearing is left out.
+            generation (int, optional): The traffic generation the reports are from. Defaults to 0.
+            cell_size (float, optional): The size of a grid cell in raw distance units. Defaults to DEFAULT_CELL_SIZE.
+        """
+
+        self.generation = generation
+        self.cell_size = cell_size
+
+        # {(cell_x, cell_y): {altitude_band: [(distance, bearing, altitude, traffic)]}}
+        self.__cells__ = {}
+        self.__query_cache__ = {}
+        self.__max_cell_radius__ = 0
+
+        self.count = 0
+        self.query_hits = 0
+        self.query_misses = 0
+
+        cells = self.__cells__
+        floor = math.floor
+
+        for traffic in traffic_reports:
+            distance = traffic.distance
+            bearing = traffic.bearing
+
+            if distance is None or bearing is None:
+                continue
+
+            east, north = get_local_position(distance, bearing)
+            cell = (floor(east / cell_size), floor(north / cell_size))
+            altitude = traffic.altitude
+            band = int(altitude // ALTITUDE_BAND_FEET) if altitude is not None else None
+            entry = (distance, bearing, altitude, traffic)
+
+            bands = cells.get(cell)
+
+            if bands is None:
+                cells[cell] = {band: [entry]}
+            elif band in bands:
+                bands[band].append(entry)
+            else:
+                bands[band] = [entry]
+
+        self.count = sum([len(entries) for bands in cells.values() for entries in bands.values()])
+        self.__max_cell_radius__ = max([max(abs(cell[0]), abs(cell[1])) for cell in cells], default=0)
+
+    def __get_cached__(
+        self,
+        key: tuple,
+        query
+    ) -> list:
+        """
+        Returns the result of the query from the cache, running it if needed.
+        """
+
+        result = self.__query_cache__.get(key)
+
+        if result is None:
+            self.query_misses += 1
+            result = query()
+            self.__query_cache__[key] = result
+        else:
+            self.query_hits += 1
+
+        return result
+
+    def __get_entries_in_ring__(
+        self,
+        ring: int,
+        altitude_range: Tuple[float, float]
+    ):
+        """
+        Yields the entries in the cells that are exactly `ring` cells out from the center.
+        """
+
+        if ring == 0:
+            cells = [(-1, -1), (-1, 0), (0, -1), (0, 0)]
+        else:
+            low = -ring - 1
+            high = ring
+            cells = [(x, y) for x in range(low, high + 1) for y in [low, high]] \
+                + [(x, y) for x in [low, high] for y in range(low + 1, high)]
+
+        if altitude_range is not None:
+            low_band = int(altitude_range[0] // ALTITUDE_BAND_FEET)
+            high_band = int(altitude_range[1] // ALTITUDE_BAND_FEET)
+
+        for cell in cells:
+            bands = self.__cells__.get(cell)
+
+            if bands is None:
+                continue
+
+            for band, entries in bands.items():
+                if altitude_range is not None:
+                    if band is None or band < low_band or band > high_band:
+                        continue
+
+                    for entry in entries:
+                        if altitude_range[0] <= entry[2] <= altitude_range[1]:
+                            yield entry
+                else:
+                    yield from entries
+
+    def __get_ring_count__(
+        self,
+        radius: float
+    ) -> int:
+        """
+        How many rings of cells need to be searched to cover the radius.
+        """
+
+        if radius is None:
+            return self.__max_cell_radius__ + 1
+
+        return min(self.__max_cell_radius__, int(math.ceil(radius / self.cell_size))) + 1
+
+    def __query_radius__(
+        self,
+        radius: float,
+        altitude_range: Tuple[float, float]
+    ) -> list:
+        entries = [
+            entry
+            for ring in range(self.__get_ring_count__(radius))
+            for entry in self.__get_entries_in_ring__(ring, altitude_range)
+            if entry[0] <= radius]
+
+        return [entry[3] for entry in sorted(entries, key=lambda entry: entry[0])]
+
+    def query_radius(
+        self,
+        radius: float,
+        altitude_range: Tuple[float, float] = None
+    ) -> list:
+        """
+        Returns the traffic within a distance of us, closest first.
+
+        Args:
+            radius (float): The distance, in raw units.
+            altitude_range (Tuple[float, float], optional): The lowest and highest altitude to include. Defaults to None (any altitude).
+
+        Returns:
+            list: The traffic, sorted by distance.
+        """
+
+        return self.__get_cached__(
+            ('radius', radius, altitude_range),
+            lambda: self.__query_radius__(radius, altitude_range))
+
+    def __query_nearest__(
+        self,
+        count: int,
+        radius: float,
+        altitude_range: Tuple[float, float]
+    ) -> list:
+        nearest = []
+
+        for ring in range(self.__get_ring_count__(radius)):
+            # Everything in this ring is at least this far away,
+            # so once we have enough targets closer than that we can stop.
+            if len(nearest) >= count and nearest[-1][0] <= ring * self.cell_size:
+                break
+
+            nearest.extend(
+                entry for entry in self.__get_entries_in_ring__(ring, altitude_range)
+                if radius is None or entry[0] <= radius)
+            nearest = heapq.nsmallest(count, nearest, key=lambda entry: entry[0])
+
+        return [entry[3] for entry in nearest]
+
+    def query_nearest(
+        self,
+        count: int,
+        radius: float = None,
+        altitude_range: Tuple[float, float] = None
+    ) -> list:
+        """
+        Returns the closest traffic.
+
+        Args:
+            count (int): The most targets to return.
+            radius (float, optional): Only include targets within this (raw) distance. Defaults to None (any distance).
+            altitude_range (Tuple[float, float], optional): The lowest and highest altitude to include. Defaults to None (any altitude).
+
+        Returns:
+            list: Up to `count` targets, closest first.
+        """
+
+        return self.__get_cached__(
+            ('nearest', count, radius, altitude_range),
+            lambda: self.__query_nearest__(count, radius, altitude_range))
+
+    def query_cone(
+        self,
+        bearing: float,
+        half_angle: float,
+        radius: float = None,
+        altitude_range: Tuple[float, float] = None
+    ) -> list:
+        """
+        Returns the traffic within a cone (centered on us) pointed along a bearing.
+
+        The result is not cached. The bearing is usually the live heading,
+        so the same cone is rarely asked for twice.
+
+        Args:
+            bearing (float): The direction the cone points.
+            half_angle (float): How far either side of the bearing to include.
+            radius (float, optional): Only include targets within this (raw) distance. Defaults to None (any distance).
+            altitude_range (Tuple[float, float], optional): The lowest and highest altitude to include. Defaults to None (any altitude).
+
+        Returns:
+            list: The traffic, closest first.
+        """
+
+        entries = [
+            entry
+            for ring in range(self.__get_ring_count__(radius))
+            for entry in self.__get_entries_in_ring__(ring, altitude_range)
+            if (radius is None or entry[0] <= radius) and get_bearing_difference(entry[1], bearing) < half_angle]
+
+        return [entry[3] for entry in sorted(entries, key=lambda entry: entry[0])]
+
+    def get_statistics(
+        self
+    ) -> dict:
+        return {
+            'generation': self.generation,
+            'targets': self.count,
+            'cells': len(self.__cells__),
+            'cached_queries': len(self.__query_cache__),
+            'query_hits': self.query_hits,
+            'query_misses': self.query_misses
+        }
+
+
+EMPTY = TrafficIndex([])
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
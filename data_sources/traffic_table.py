@@ -0,0 +1,348 @@
+"""
+Compact, column based, storage for traffic reports.
+
+Each tracked aircraft gets a slot (row) in the table,
+and each field the views use is a column held in an
+`array`. Nothing else from the report is kept.
+
+Keeping the columns in flat arrays keeps the memory
+small when a lot of traffic is tracked, and lets the
+geometry for all of the traffic be computed in one pass.
+"""
+
+import math
+import time
+from array import array
+from collections import deque
+
+# How many rows to start with.
+DEFAULT_CAPACITY = 32
+
+# How long a released slot is held before it can be
+# given to another aircraft. A view that a render is still
+# holding keeps reading the (stale) aircraft it was made
+# for instead of suddenly showing a different one.
+SLOT_QUARANTINE_SECONDS = 5.0
+
+# Missing values are stored as NaN, and returned as None.
+MISSING = math.nan
+
+DISPLAY_NAME_KEY = 'displayName'
+LATITUDE_KEY = 'Lat'
+LONGITUDE_KEY = 'Lng'
+DISTANCE_KEY = 'Distance'
+BEARING_KEY = 'Bearing'
+TRACK_KEY = 'Track'
+ALTITUDE_KEY = 'Alt'
+ON_GROUND_KEY = 'OnGround'
+SPEED_KEY = 'Speed'
+SPEED_VALID_KEY = 'Speed_valid'
+VERTICAL_SPEED_KEY = 'Vvel'
+
+# Bits for the change mask, marking which of the
+# fields the most recent report changed.
+CHANGED_NONE = 0
+CHANGED_DISPLAY_NAME = 1 << 0
+CHANGED_POSITION = 1 << 1
+CHANGED_DISTANCE = 1 << 2
+CHANGED_BEARING = 1 << 3
+CHANGED_TRACK = 1 << 4
+CHANGED_ALTITUDE = 1 << 5
+CHANGED_ON_GROUND = 1 << 6
+CHANGED_SPEED = 1 << 7
+CHANGED_VERTICAL_SPEED = 1 << 8
+CHANGED_ALL = (1 << 9) - 1
+
+# Any of these move where the traffic is relative to us.
+CHANGED_LOCATION = CHANGED_POSITION | CHANGED_DISTANCE | CHANGED_BEARING
+
+
+def get_value(
+    value: float
+) -> float:
+    """
+    Returns the stored value, or None if it is missing.
+
+    >>> get_value(1.5)
+    1.5
+    >>> get_value(MISSING) is None
+    True
+    """
+
+    return None if value != value else value
+
+
+class TrafficTable(object):
+    """
+    Struct-of-arrays store for the traffic, indexed by slot.
+
+    Not thread safe. The owner (the TrafficManager) is
+    expected to serialize changes. Reads of a single value
+    are safe from any thread.
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY
+    ):
+        """
+        Creates an empty table.
+
+        Args:
+            capacity (int, optional): How many rows to start with. Defaults to DEFAULT_CAPACITY.
+        """
+
+        self.capacity = 0
+
+        # Moves every time a row is allocated, released, or changed.
+        self.version = 0
+
+        self.latitude = array('d')
+        self.longitude = array('d')
+        self.distance = array('d')
+        self.bearing = array('d')
+        self.track = array('d')
+        self.altitude = array('d')
+        # Knots, and feet per minute.
+        self.speed = array('d')
+        self.vertical_speed = array('d')
+        self.time_decoded = array('d')
+        # When the distance, bearing, or position last changed.
+        self.time_positioned = array('d')
+        self.on_ground = array('b')
+        self.change_mask = array('H')
+        self.display_name = []
+
+        self.__free_slots__ = []
+        self.__quarantined_slots__ = deque()
+        self.__slots_in_use__ = 0
+
+        self.__grow__(max(1, capacity))
+
+    def __get_columns__(
+        self
+    ) -> list:
+        return [
+            self.latitude,
+            self.longitude,
+            self.distance,
+            self.bearing,
+            self.track,
+            self.altitude,
+            self.speed,
+            self.vertical_speed,
+            self.time_decoded,
+            self.time_positioned,
+            self.on_ground,
+            self.change_mask]
+
+    def __grow__(
+        self,
+        new_capacity: int
+    ):
+        """
+        Adds rows to every column, and makes them available.
+
+        Args:
+            new_capacity (int): The total number of rows to have.
+        """
+
+        added_rows = new_capacity - self.capacity
+
+        if added_rows <= 0:
+            return
+
+        # Rows that have never been allocated read as missing.
+        for column in self.__get_columns__():
+            column.extend([MISSING if column.typecode == 'd' else 0] * added_rows)
+
+        self.display_name.extend([None] * added_rows)
+
+        # Handed out from the end, so hand the lowest slots out first.
+        self.__free_slots__.extend(range(new_capacity - 1, self.capacity - 1, -1))
+        self.capacity = new_capacity
+
+    def __release_quarantined_slots__(
+        self,
+        now: float
+    ):
+        while len(self.__quarantined_slots__) > 0 and self.__quarantined_slots__[0][0] <= now:
+            self.__free_slots__.append(self.__quarantined_slots__.popleft()[1])
+
+    def allocate(
+        self
+    ) -> int:
+        """
+        Reserves an empty row.
+
+        Returns:
+            int: The slot of the row.
+        """
+
+        self.__release_quarantined_slots__(time.monotonic())
+
+        if len(self.__free_slots__) == 0:
+            self.__grow__(self.capacity * 2)
+
+        slot = self.__free_slots__.pop()
+
+        self.latitude[slot] = MISSING
+        self.longitude[slot] = MISSING
+        self.distance[slot] = MISSING
+        self.bearing[slot] = MISSING
+        self.track[slot] = MISSING
+        self.altitude[slot] = MISSING
+        self.speed[slot] = MISSING
+        self.vertical_speed[slot] = MISSING
+        self.time_decoded[slot] = time.monotonic()
+        self.time_positioned[slot] = self.time_decoded[slot]
+        self.on_ground[slot] = 0
+        self.change_mask[slot] = CHANGED_NONE
+        self.display_name[slot] = None
+
+        self.__slots_in_use__ += 1
+        self.version += 1
+
+        return slot
+
+    def release(
+        self,
+        slot: int
+    ):
+        """
+        Gives up a row. The values stay readable until
+        the slot comes out of quarantine and is reused.
+
+        Args:
+            slot (int): The slot given by `allocate`.
+        """
+
+        self.__quarantined_slots__.append((time.monotonic() + SLOT_QUARANTINE_SECONDS, slot))
+        self.__slots_in_use__ -= 1
+        self.version += 1
+
+    def update(
+        self,
+        slot: int,
+        json_report: dict,
+        now: float = None
+    ) -> int:
+        """
+        Applies a (Stratux formatted) traffic report to a row.
+
+        Fields that are not in the report keep their previous
+        value. Only the fields whose values differ are written.
+
+        Args:
+            slot (int): The row to update.
+            json_report (dict): The report.
+            now (float, optional): The (monotonic) time the report was received. Defaults to now.
+
+        Returns:
+            int: The CHANGED_* bits for the fields that changed.
+        """
+
+        change_mask = CHANGED_NONE
+
+        now = time.monotonic() if now is None else now
+        self.time_decoded[slot] = now
+
+        if DISPLAY_NAME_KEY in json_report:
+            display_name = json_report[DISPLAY_NAME_KEY]
+
+            if display_name != self.display_name[slot]:
+                self.display_name[slot] = display_name
+                change_mask |= CHANGED_DISPLAY_NAME
+
+        if self.__update_column__(self.latitude, slot, json_report, LATITUDE_KEY) \
+                | self.__update_column__(self.longitude, slot, json_report, LONGITUDE_KEY):
+            change_mask |= CHANGED_POSITION
+
+        if self.__update_column__(self.distance, slot, json_report, DISTANCE_KEY):
+            change_mask |= CHANGED_DISTANCE
+
+        if self.__update_column__(self.bearing, slot, json_report, BEARING_KEY):
+            change_mask |= CHANGED_BEARING
+
+        if self.__update_column__(self.track, slot, json_report, TRACK_KEY):
+            change_mask |= CHANGED_TRACK
+
+        if self.__update_column__(self.altitude, slot, json_report, ALTITUDE_KEY):
+            change_mask |= CHANGED_ALTITUDE
+
+        if self.__update_column__(self.speed, slot, json_report, SPEED_KEY, json_report.get(SPEED_VALID_KEY, True)):
+            change_mask |= CHANGED_SPEED
+
+        if self.__update_column__(self.vertical_speed, slot, json_report, VERTICAL_SPEED_KEY):
+            change_mask |= CHANGED_VERTICAL_SPEED
+
+        if ON_GROUND_KEY in json_report:
+            on_ground = 1 if json_report[ON_GROUND_KEY] else 0
+
+            if on_ground != self.on_ground[slot]:
+                self.on_ground[slot] = on_ground
+                change_mask |= CHANGED_ON_GROUND
+
+        self.change_mask[slot] = change_mask
+
+        if change_mask & CHANGED_LOCATION:
+            self.time_positioned[slot] = now
+
+        if change_mask != CHANGED_NONE:
+            self.version += 1
+
+        return change_mask
+
+    def __update_column__(
+        self,
+        column: array,
+        slot: int,
+        json_report: dict,
+        key: str,
+        is_valid: bool = True
+    ) -> bool:
+        """
+        Copies a single value from the report into a column.
+        A value the report marks as not valid is stored as missing.
+
+        Returns:
+            bool: True if the stored value changed.
+        """
+
+        if key not in json_report:
+            return False
+
+        value = json_report[key]
+        value = MISSING if value is None or not is_valid else float(value)
+        old_value = column[slot]
+
+        # NaN never equals itself, so compare "missing" separately.
+        if value == old_value or (value != value and old_value != old_value):
+            return False
+
+        column[slot] = value
+
+        return True
+
+    def get_statistics(
+        self
+    ) -> dict:
+        """
+        Returns the size of the table, in a form that can be serialized into JSON.
+
+        Returns:
+            dict: The capacity, rows in use or quarantined, and bytes held by the columns.
+        """
+
+        return {
+            'capacity': self.capacity,
+            'in_use': self.__slots_in_use__,
+            'quarantined': len(self.__quarantined_slots__),
+            'column_bytes': sum([column.buffer_info()[1] * column.itemsize for column in self.__get_columns__()])
+        }
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
@@ -1,26 +1,29 @@
 #!/usr/bin/env python
 
 import contextlib
+import gc
 import json
 import sys
-from time import sleep
+from time import monotonic, perf_counter, sleep
 
 import pygame
-import requests
 
-from common_utils import local_debug, system_tools
+from common_utils import (allocation_tracker, flight_recorder, http_pool,
+                          local_debug, system_tools)
 from common_utils.logger import HudLogger
 from common_utils.task_timer import RollingStats, TaskProfiler
 from common_utils.tasks import IntermittentTask, RecurringTask
+from common_utils.telemetry import TelemetryRegistry
 from configuration import configuration, configuration_server
 from configuration.configuration import CONFIGURATION
-from core_services import breadcrumbs, zoom_tracker
-from data_sources import aithre, declination, targets
+from core_services import breadcrumbs, quality_governor, zoom_tracker
+from data_sources import (aithre, declination, flight_replay, targets,
+                          traffic_geometry)
 from data_sources.ahrs_data import AhrsData
 from data_sources.aircraft import Aircraft
 from data_sources.data_cache import HudDataCache
 from data_sources.traffic import AdsbTrafficClient
-from rendering import colors, display, drawing, text_renderer
+from rendering import colors, display, drawing, layers, text_renderer
 # Due to the way we import the name of the class to be instantiated
 # from the configuration, all of the element class names need
 # to be imported EVEN if the compiler tries to tell you
@@ -57,7 +60,7 @@ def __send_stratux_post__(
         ending_url)
 
     try:
-        requests.Session().post(url, timeout=2)
+        http_pool.INSTANCE.get_session().post(url, timeout=2)
 
         return True
     except Exception:
@@ -115,11 +118,19 @@ class HeadsUpDisplay(object):
 
         clock = pygame.time.Clock()
 
+        # Everything built during startup lives as long as the HUD does.
+        # Moving it out of the collector's view keeps the full
+        # collections (and the stutter they cause) short.
+        gc.collect()
+        gc.freeze()
+
         try:
             while self.tick(clock):
                 pass
         finally:
             pygame.display.quit()
+            flight_recorder.INSTANCE.stop()
+            flight_replay.INSTANCE.close()
 
         return 0
 
@@ -188,12 +199,15 @@ class HeadsUpDisplay(object):
         """
 
         current_fps = 0  # initialize up front avoids exception
+        allocation_tracker.INSTANCE.begin_frame()
+        frame_start_time = perf_counter()
+        view = None
 
         try:
             if not self.__handle_input__():
                 return False
 
-            orientation = self.__aircraft__.get_orientation()
+            orientation = self.__get_orientation__()
             self.__update_declination_task__.run()
 
             view_name, view, view_uses_ahrs = self.__hud_views__[
@@ -217,7 +231,8 @@ class HeadsUpDisplay(object):
             # and improve readability
             with TaskProfiler("Render::AllElements"):
                 try:
-                    [self.__render_view_element__(hud_element, orientation) for hud_element in view]
+                    for hud_element in view:
+                        self.__render_view_element__(hud_element, orientation)
                 except Exception as e:
                     self.warn(f"LOOP:{e}")
                 if show_unavailable:
@@ -247,26 +262,106 @@ class HeadsUpDisplay(object):
             self.__display__.flip()
             self.__fps__.push(current_fps)
 
+            if self.__orientation_time__ is not None:
+                self.__aircraft__.ahrs_history.record_present_latency(monotonic() - self.__orientation_time__)
+                self.__orientation_time__ = None
+
+            if view is not None and CONFIGURATION.quality_governor_enabled:
+                self.__quality_governor__.record_frame_time(
+                    (perf_counter() - frame_start_time) * 1000.0,
+                    view)
+
+            allocation_tracker.INSTANCE.end_frame()
+
             clock.tick(configuration.MAX_FRAMERATE)
 
         return True
 
+    def __start_flight_recorder__(
+        self
+    ):
+        """
+        Starts recording every payload the HUD takes in.
+        A recorder that can not start must not stop the HUD.
+        """
+
+        try:
+            recording_path = flight_recorder.INSTANCE.start(
+                is_compressed=CONFIGURATION.flight_recorder_compression_enabled)
+            self.log(f'Recording to {recording_path}')
+        except Exception as ex:
+            self.warn(f'Unable to start the flight recorder: {ex}')
+
+    def __start_flight_replay__(
+        self
+    ):
+        """
+        Starts handing the recorded data to the data sources.
+        A recording that can not be replayed must not stop the HUD.
+        """
+
+        try:
+            flight_replay.INSTANCE.start()
+            self.log(f'Replaying {flight_replay.INSTANCE.path} at {flight_replay.INSTANCE.clock.speed}x')
+        except Exception as ex:
+            self.warn(f'Unable to replay {CONFIGURATION.replay_file}: {ex}')
+
+    def __get_orientation__(
+        self
+    ) -> AhrsData:
+        """
+        Gets the orientation to draw this frame with.
+        With prediction on, the attitude is for when the frame
+        will be on screen, rather than when the data arrived.
+
+        Returns:
+            AhrsData: The orientation.
+        """
+
+        if not CONFIGURATION.ahrs_prediction_enabled:
+            return self.__aircraft__.get_orientation()
+
+        self.__orientation_time__ = monotonic()
+
+        return self.__aircraft__.get_predicted_orientation(
+            self.__orientation_time__ + self.__aircraft__.ahrs_history.get_present_latency())
+
     def __render_view_element__(
         self,
         hud_element,
         orientation: AhrsData
     ):
-        element_name = str(hud_element)
-        element_name = element_name.split(" object")[0]
-        element_name = element_name.split('<')[-1]
+        element_name = self.__element_names__.get(hud_element)
+
+        if element_name is None:
+            element_name = "{}.{}".format(
+                hud_element.__class__.__module__,
+                hud_element.__class__.__name__)
+            self.__element_names__[hud_element] = element_name
 
         with TaskProfiler(element_name):
             surface = pygame.display.get_surface()
+            element_start_time = perf_counter()
             try:
-                hud_element.render(surface, orientation)
+                layer_key = hud_element.get_layer_key(orientation) \
+                    if self.__element_layers__ is not None and CONFIGURATION.element_layers_enabled else None
+
+                if layer_key is None:
+                    hud_element.render(surface, orientation)
+                else:
+                    self.__element_layers__.render(
+                        surface,
+                        hud_element,
+                        layer_key,
+                        hud_element.render,
+                        orientation)
             except Exception as e:
                 self.warn(f'ELEMENT {element_name} EX:{e}')
 
+            self.__quality_governor__.record_element_time(
+                hud_element,
+                (perf_counter() - element_start_time) * 1000.0)
+
     def __render_text__(
         self,
         text: str,
@@ -499,9 +594,108 @@ class HeadsUpDisplay(object):
 
         HudDataCache.DECLINATION = updated_declination
 
+    def __update_texture_cache_stats__(
+        self
+    ):
+        """
+        Records the size of the text cache, and how many
+        misses and purges have happened since the last time.
+        """
+
+        cache_stats = text_renderer.get_cache_statistics()
+
+        self.__texture_cache_size__.push(cache_stats['size'])
+        self.__texture_cache_misses__.push(cache_stats['misses'] - self.__last_texture_cache_stats__['misses'])
+        self.__texture_cache_purges__.push(cache_stats['purges'] - self.__last_texture_cache_stats__['purges'])
+
+        self.__last_texture_cache_stats__ = cache_stats
+
+    def __get_fps_telemetry__(
+        self
+    ) -> dict:
+        return self.__fps__.to_dict()
+
+    def __get_cache_telemetry__(
+        self
+    ) -> dict:
+        return {
+            'text': text_renderer.get_cache_statistics(),
+            'texture': drawing.renderer.get_texture_cache_statistics(),
+            'text_size': self.__texture_cache_size__.to_dict(),
+            'text_misses': self.__texture_cache_misses__.to_dict(),
+            'text_purges': self.__texture_cache_purges__.to_dict(),
+            'layers': self.__element_layers__.get_statistics() if self.__element_layers__ is not None else None
+        }
+
+    def __reset_cache_telemetry__(
+        self
+    ):
+        text_renderer.reset_cache_statistics()
+        drawing.renderer.reset_texture_cache_statistics()
+
+        if self.__element_layers__ is not None:
+            self.__element_layers__.reset_statistics()
+
+        self.__last_texture_cache_stats__ = text_renderer.get_cache_statistics()
+
+    def __get_traffic_telemetry__(
+        self
+    ) -> dict:
+        traffic_snapshot = HudDataCache.get_traffic_snapshot()
+
+        return {
+            'tracked': len(AdsbTrafficClient.TRAFFIC_MANAGER.traffic),
+            'generation': AdsbTrafficClient.TRAFFIC_MANAGER.generation,
+            'reports': AdsbTrafficClient.TRAFFIC_MANAGER.reports_handled,
+            'unchanged_reports': AdsbTrafficClient.TRAFFIC_MANAGER.unchanged_reports,
+            'table': AdsbTrafficClient.TRAFFIC_MANAGER.table.get_statistics(),
+            'geometry': traffic_geometry.INSTANCE.get_statistics(),
+            'index': traffic_snapshot.index.get_statistics(),
+            'snapshot_generation': traffic_snapshot.generation,
+            'reliable': len(traffic_snapshot.reliable_traffic),
+            'nearby': len(traffic_snapshot.nearby_traffic),
+            'is_available': traffic_snapshot.is_traffic_available
+        }
+
+    def __get_view_telemetry__(
+        self
+    ) -> dict:
+        view_name, view, view_uses_ahrs = self.__hud_views__[CONFIGURATION.get_view_index()]
+
+        return {
+            'name': view_name,
+            'elements': len(view),
+            'uses_ahrs': view_uses_ahrs,
+            'renderer': drawing.renderer.RENDERER_NAME,
+            'resolution': [self.__width__, self.__height__]
+        }
+
+    def __register_telemetry__(
+        self
+    ):
+        """
+        Makes the HUD's own performance data available through
+        the /perf route of the configuration server.
+        """
+
+        TelemetryRegistry.add_provider('fps', self.__get_fps_telemetry__, self.__fps__.reset)
+        TelemetryRegistry.add_provider('caches', self.__get_cache_telemetry__, self.__reset_cache_telemetry__)
+        TelemetryRegistry.add_provider('traffic', self.__get_traffic_telemetry__)
+        TelemetryRegistry.add_provider('view', self.__get_view_telemetry__)
+        TelemetryRegistry.add_provider('quality_governor', self.__quality_governor__.get_report)
+        TelemetryRegistry.add_provider(
+            'flight_replay',
+            flight_replay.INSTANCE.get_statistics,
+            flight_replay.INSTANCE.reset_statistics)
+        TelemetryRegistry.add_provider(
+            'ahrs_prediction',
+            self.__aircraft__.ahrs_history.get_statistics,
+            self.__aircraft__.ahrs_history.reset_statistics)
+
     def __render_perf__(
         self
     ):
+        self.__update_texture_cache_stats__()
         TaskProfiler.log(self.__logger__)
         self.__perf_log_count = self.__perf_log_count + 1
 
@@ -543,14 +737,32 @@ class HeadsUpDisplay(object):
         self.__texture_cache_misses__ = RollingStats('TextureCacheMisses')
         self.__texture_cache_purges__ = RollingStats('TextureCachePurges')
 
+        self.__last_texture_cache_stats__ = text_renderer.get_cache_statistics()
+
         self.__fps__.push(0)
 
+        # {HudElement: str}
+        # Building the name from the element every frame is a lot of garbage.
+        self.__element_names__ = {}
+
+        self.__quality_governor__ = quality_governor.QualityGovernor(
+            1000.0 / configuration.MAX_FRAMERATE,
+            logger)
+
         self.__display__ = display.Display(
             force_fullscreen,
             force_software)
         pygame.display.set_caption(f"StratuxHUD ({drawing.renderer.RENDERER_NAME})")
         self.__width__, self.__height__ = self.__display__.size
 
+        # The OpenGL renderer has no framebuffer to capture layers from.
+        # Without numpy a captured layer would not match drawing the element directly.
+        self.__element_layers__ = layers.ElementLayers(self.__display__.size) \
+            if self.__display__.get_framebuffer() is not None and drawing.renderer.is_geometry_recording_exact() else None
+
+        if not drawing.renderer.is_geometry_recording_exact():
+            self.warn("NumPy is not available. The static geometry and element layer caches are off, so rendering is slower.")
+
         pygame.mouse.set_visible(False)
 
         pygame.font.init()
@@ -571,7 +783,16 @@ class HeadsUpDisplay(object):
             font_size_loading)
         self.__show_boot_screen__()
 
+        self.__is_replaying__ = CONFIGURATION.data_source() == configuration.DataSourceNames.REPLAY
+
+        # Started before any of the data sources, so nothing is missed.
+        # A replay is not recorded again.
+        if CONFIGURATION.flight_recorder_enabled and not self.__is_replaying__:
+            self.__start_flight_recorder__()
+
         self.__aircraft__ = Aircraft(self.__logger__)
+        self.__register_telemetry__()
+        self.__orientation_time__ = None
 
         self.__pixels_per_degree_y__ = int((self.__height__ / CONFIGURATION.get_degrees_of_pitch()) * CONFIGURATION.get_pitch_degrees_display_scaler())
 
@@ -589,11 +810,13 @@ class HeadsUpDisplay(object):
             self.web_server = None
 
         if self.web_server is not None:
+            # The server loop never returns, so it can not share the scheduler.
             RecurringTask(
                 "rest_host",
                 0.1,
                 self.web_server.run,
-                logger.get_logger())
+                logger.get_logger(),
+                use_dedicated_thread=True)
 
         RecurringTask(
             "update_traffic",
@@ -601,11 +824,17 @@ class HeadsUpDisplay(object):
             self.__update_traffic_reports__,
             logger.get_logger())
 
-        RecurringTask(
-            "update_aithre",
-            5.0,
-            self.__update_aithre__,
-            logger.get_logger())
+        if CONFIGURATION.async_polling_enabled and aithre.AithreClient.INSTANCE is not None:
+            aithre.AithreClient.INSTANCE.start_async_polling(
+                5.0,
+                lambda: CONFIGURATION.aithre_enabled)
+        else:
+            RecurringTask(
+                "update_aithre",
+                5.0,
+                self.__update_aithre__,
+                logger.get_logger(),
+                is_blocking=True)
 
         RecurringTask(
             "update_zoom",
@@ -619,6 +848,10 @@ class HeadsUpDisplay(object):
             self.__update_groundtrack__,
             logger.get_logger())
 
+        # Started last, so everything that takes the data is ready for it.
+        if self.__is_replaying__:
+            self.__start_flight_replay__()
+
     def __show_boot_screen__(
         self
     ):
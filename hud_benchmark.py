@@ -1,16 +1,75 @@
 """
-File to  run various math benchmarks in order to determine
+File to  run various benchmarks in order to determine
 what is the best way to go about some math on
-various versions of the Pi.
+various versions of the Pi, and how long the
+HUD actually takes to render a frame.
+
+Usage:
+    python3 hud_benchmark.py
+        Runs the math micro-benchmarks.
+
+    python3 hud_benchmark.py frames --frames 300 --traffic 50 --output frames.json
+        Builds the full HUD against the SDL "dummy" video driver,
+        feeds it simulated AHRS and traffic, and drives `tick()`
+        for every view in views.json. Frame times are reported
+        (as JSON) per view and per element.
+
+    python3 hud_benchmark.py frames --allocations
+        As above, but also traces every allocation and reports
+        the bytes allocated, and objects left for the garbage
+        collector, by each frame. Tracing slows everything down,
+        so the frame times are NOT comparable to a normal run.
+
+    python3 hud_benchmark.py traffic --frames 300
+        Times the traffic geometry (altitude delta, bearing,
+        distance, and screen projection) for 10, 100, and 1000
+        targets. Compares the per-target math the views used to
+        do against the batch pass, with and without NumPy.
+
+    python3 hud_benchmark.py contention --frames 600 --traffic 100
+        Runs the traffic update thread at 10Hz against a render
+        thread at 60Hz, and times how long the render thread
+        spends getting the traffic. Compares the published
+        snapshot against the old lock-and-copy reads.
+
+    python3 hud_benchmark.py extrapolation --frames 600 --traffic 50
+        Flies simulated traffic around us, reporting once a
+        second, and draws it at 60Hz. Reports how far each
+        target jumps between frames, and how far it is drawn
+        from where it really is, with and without the traffic
+        being dead reckoned between reports.
+
+    python3 hud_benchmark.py prediction [--recording capture.gdl90]
+        Replays the attitude from a GDL-90 capture (made with
+        `python3 -m data_sources.gdl90_udp_source record`), or a
+        simulated flight if no capture is given, through the AHRS
+        predictor. Reports how far the attitude drawn at 60Hz is
+        from the real attitude, for each prediction method.
+
+    python3 hud_benchmark.py replay --recording flight.hudrec
+        Replays a flight recording (from the flight recorder)
+        through the full HUD as fast as it will go, stepping
+        1/60th of a second of the recording each frame. Reports
+        how many times faster than real time the recording went
+        through, and the time taken to hand over the data and to
+        draw each frame.
 """
 
+import argparse
+import json
 import logging
 import math
+import os
+import platform
 import random
+import sys
+import threading
+import time
+from datetime import datetime
 
-from common_utils import fast_math
+from common_utils import allocation_tracker, fast_math
 from common_utils.logger import HudLogger
-from common_utils.task_timer import TaskProfiler
+from common_utils.task_timer import TaskProfiler, get_percentile
 
 python_logger = logging.getLogger("hud_benchmark")
 python_logger.setLevel(logging.DEBUG)
@@ -18,12 +77,40 @@ LOGGER = HudLogger(python_logger)
 
 MAX_TEST_CALLS = 1000000
 
-random_angles = [fast_math.wrap_degrees(random.randrange(0.0, 360.0) + ((random.randrange(0, 9) / 10))) for i in range(1, MAX_TEST_CALLS)]
+MATH_MODE = "math"
+FRAMES_MODE = "frames"
+TRAFFIC_MODE = "traffic"
+CONTENTION_MODE = "contention"
+PREDICTION_MODE = "prediction"
+EXTRAPOLATION_MODE = "extrapolation"
+REPLAY_MODE = "replay"
+
+DEFAULT_FRAMES_PER_VIEW = 300
+DEFAULT_WARMUP_FRAMES = 30
+DEFAULT_TRAFFIC_COUNT = 20
+TRAFFIC_GEOMETRY_TARGET_COUNTS = [10, 100, 1000]
 
-random_radians = [math.radians(random.randrange(0.0, 360.0) + ((random.randrange(0, 9) / 10))) for i in range(1, MAX_TEST_CALLS)]
+CONTENTION_UPDATE_HZ = 10.0
+CONTENTION_RENDER_HZ = 60.0
 
-random_ints = [random.randrange(0, 1000) for i in range(1, MAX_TEST_CALLS)]
-random_floats = [float(i) for i in random_ints]
+# About how many times a frame the traffic
+# views ask the data cache for the traffic.
+CONTENTION_READS_PER_FRAME = 8
+
+# The simulated traffic for the extrapolation benchmark.
+EXTRAPOLATION_RENDER_HZ = 60.0
+EXTRAPOLATION_REPORT_SECONDS = 1.0
+EXTRAPOLATION_OWNSHIP_KNOTS = 110.0
+EXTRAPOLATION_OWNSHIP_TRACK = 90.0
+EXTRAPOLATION_MAX_RANGE = 10000.0
+
+# The simulated flight for the prediction benchmark.
+PREDICTION_SIMULATED_SECONDS = 60.0
+PREDICTION_SAMPLE_JITTER_SECONDS = 0.006
+PREDICTION_SAMPLE_NOISE_DEGREES = 0.1
+
+# How much of a recording the replay benchmark hands over each frame.
+REPLAY_RENDER_HZ = 60.0
 
 
 def mult_for_list(
@@ -40,105 +127,1143 @@ def div_for_list(
     val = num / 4.0
 
 
-for attempt in range(0, 4):
-    LOGGER.log_info_message("Round #{}".format(attempt))
-
-    LOGGER.log_info_message("    trig::calced")
-    # Test trig functions
-    # 4th slowest on the Pi
-    with TaskProfiler("trig::calced"):
-        for rand_val in random_angles:
-            radians = math.radians(rand_val)
-            cos_rand = math.cos(radians)
-            sin_rant = math.sin(radians)
-
-    LOGGER.log_info_message("    trig::cached")
-    # 2nd Slowest on the Pi
-    with TaskProfiler("trig::cached"):
-        for rand_val in random_angles:
-            cos_rand = fast_math.cos(rand_val)
-            sin_rant = fast_math.sin(rand_val)
-
-    LOGGER.log_info_message("    degrees_to_radians::calced")
-    with TaskProfiler("degrees_to_radians::calced"):
-        for rand_val in random_angles:
-            radians = math.radians(rand_val)
-
-    # 3rd Slowest on the Pi
-    LOGGER.log_info_message("    degrees_to_radians::cached")
-    with TaskProfiler("degrees_to_radians::cached"):
-        for rand_val in random_angles:
-            radians = fast_math.get_radians(rand_val)
-
-    LOGGER.log_info_message("    radians_to_degrees::calced")
-    with TaskProfiler("radians_to_degrees::calced"):
-        for rand_val in random_radians:
-            degrees = math.degrees(rand_val)
-
-    # Slowest on the Pi
-    LOGGER.log_info_message("    radians_to_degrees::cached")
-    with TaskProfiler("radians_to_degrees::cached"):
-        for rand_val in random_angles:
-            degrees = fast_math.get_degrees(rand_val)
-
-    LOGGER.log_info_message("    mult::float_operator")
-    with TaskProfiler("mult::float_operator"):
-        for rand_val in random_floats:
-            radians = rand_val * 2.0
-            radians = rand_val * 4.0
-
-    LOGGER.log_info_message("    div::float_operator")
-    with TaskProfiler("div::float_operator"):
-        for rand_val in random_floats:
-            radians = rand_val / 2.0
-            radians = rand_val / 4.0
-
-    LOGGER.log_info_message("    mult::float_to_int_shifted")
-    with TaskProfiler("mult::float_to_int_shifted"):
-        for rand_val in random_floats:
-            as_int = int(rand_val)
-            radians = as_int << 1
-            radians = as_int << 2
-
-    LOGGER.log_info_message("    div::float_to_int_shifted")
-    with TaskProfiler("div::float_to_int_shifted"):
-        for rand_val in random_floats:
-            as_int = int(rand_val)
-            radians = as_int >> 1
-            radians = as_int >> 2
-
-    LOGGER.log_info_message("    mult::int_shifted")
-    with TaskProfiler("mult::int_shifted"):
-        for rand_val in random_ints:
-            radians = rand_val << 1
-            radians = rand_val << 2
-
-    LOGGER.log_info_message("    mult::int_operator")
-    with TaskProfiler("mult::int_operator"):
-        for rand_val in random_ints:
-            radians = rand_val * 2
-            radians = rand_val * 4
-
-    LOGGER.log_info_message("    div::int_operator")
-    with TaskProfiler("div::int_operator"):
-        for rand_val in random_ints:
-            radians = rand_val / 2
-            radians = rand_val / 4
-
-    LOGGER.log_info_message("    div::int_shifted")
-    with TaskProfiler("div::int_shifted"):
-        for rand_val in random_ints:
-            radians = rand_val >> 1
-            radians = rand_val >> 2
-
-    LOGGER.log_info_message("    mult::float_operator_list_comprehension")
-    with TaskProfiler("mult::float_operator_list_comprehension"):
-        [mult_for_list(rand_val) for rand_val in random_floats]
-
-    LOGGER.log_info_message("    div::float_operator_list_comprehension")
-    with TaskProfiler("div::float_operator_list_comprehension"):
-        [div_for_list(rand_val) for rand_val in random_floats]
-
-TaskProfiler.log(LOGGER)
-
-quit()
+def run_math_benchmarks():
+    """
+    Runs the trig and integer math micro-benchmarks and
+    logs the results through the TaskProfiler.
+    """
+
+    random_angles = [fast_math.wrap_degrees(random.randrange(0.0, 360.0) + ((random.randrange(0, 9) / 10))) for i in range(1, MAX_TEST_CALLS)]
+
+    random_radians = [math.radians(random.randrange(0.0, 360.0) + ((random.randrange(0, 9) / 10))) for i in range(1, MAX_TEST_CALLS)]
+
+    random_ints = [random.randrange(0, 1000) for i in range(1, MAX_TEST_CALLS)]
+    random_floats = [float(i) for i in random_ints]
+
+    for attempt in range(0, 4):
+        LOGGER.log_info_message("Round #{}".format(attempt))
+
+        LOGGER.log_info_message("    trig::calced")
+        # Test trig functions
+        # 4th slowest on the Pi
+        with TaskProfiler("trig::calced"):
+            for rand_val in random_angles:
+                radians = math.radians(rand_val)
+                cos_rand = math.cos(radians)
+                sin_rant = math.sin(radians)
+
+        LOGGER.log_info_message("    trig::cached")
+        # 2nd Slowest on the Pi
+        with TaskProfiler("trig::cached"):
+            for rand_val in random_angles:
+                cos_rand = fast_math.cos(rand_val)
+                sin_rant = fast_math.sin(rand_val)
+
+        LOGGER.log_info_message("    degrees_to_radians::calced")
+        with TaskProfiler("degrees_to_radians::calced"):
+            for rand_val in random_angles:
+                radians = math.radians(rand_val)
+
+        # 3rd Slowest on the Pi
+        LOGGER.log_info_message("    degrees_to_radians::cached")
+        with TaskProfiler("degrees_to_radians::cached"):
+            for rand_val in random_angles:
+                radians = fast_math.get_radians(rand_val)
+
+        LOGGER.log_info_message("    radians_to_degrees::calced")
+        with TaskProfiler("radians_to_degrees::calced"):
+            for rand_val in random_radians:
+                degrees = math.degrees(rand_val)
+
+        # Slowest on the Pi
+        LOGGER.log_info_message("    radians_to_degrees::cached")
+        with TaskProfiler("radians_to_degrees::cached"):
+            for rand_val in random_angles:
+                degrees = fast_math.get_degrees(rand_val)
+
+        LOGGER.log_info_message("    mult::float_operator")
+        with TaskProfiler("mult::float_operator"):
+            for rand_val in random_floats:
+                radians = rand_val * 2.0
+                radians = rand_val * 4.0
+
+        LOGGER.log_info_message("    div::float_operator")
+        with TaskProfiler("div::float_operator"):
+            for rand_val in random_floats:
+                radians = rand_val / 2.0
+                radians = rand_val / 4.0
+
+        LOGGER.log_info_message("    mult::float_to_int_shifted")
+        with TaskProfiler("mult::float_to_int_shifted"):
+            for rand_val in random_floats:
+                as_int = int(rand_val)
+                radians = as_int << 1
+                radians = as_int << 2
+
+        LOGGER.log_info_message("    div::float_to_int_shifted")
+        with TaskProfiler("div::float_to_int_shifted"):
+            for rand_val in random_floats:
+                as_int = int(rand_val)
+                radians = as_int >> 1
+                radians = as_int >> 2
+
+        LOGGER.log_info_message("    mult::int_shifted")
+        with TaskProfiler("mult::int_shifted"):
+            for rand_val in random_ints:
+                radians = rand_val << 1
+                radians = rand_val << 2
+
+        LOGGER.log_info_message("    mult::int_operator")
+        with TaskProfiler("mult::int_operator"):
+            for rand_val in random_ints:
+                radians = rand_val * 2
+                radians = rand_val * 4
+
+        LOGGER.log_info_message("    div::int_operator")
+        with TaskProfiler("div::int_operator"):
+            for rand_val in random_ints:
+                radians = rand_val / 2
+                radians = rand_val / 4
+
+        LOGGER.log_info_message("    div::int_shifted")
+        with TaskProfiler("div::int_shifted"):
+            for rand_val in random_ints:
+                radians = rand_val >> 1
+                radians = rand_val >> 2
+
+        LOGGER.log_info_message("    mult::float_operator_list_comprehension")
+        with TaskProfiler("mult::float_operator_list_comprehension"):
+            [mult_for_list(rand_val) for rand_val in random_floats]
+
+        LOGGER.log_info_message("    div::float_operator_list_comprehension")
+        with TaskProfiler("div::float_operator_list_comprehension"):
+            [div_for_list(rand_val) for rand_val in random_floats]
+
+    TaskProfiler.log(LOGGER)
+
+
+class BenchmarkClock(object):
+    """
+    Stand-in for `pygame.time.Clock` that never sleeps.
+
+    The HUD caps itself at MAX_FRAMERATE, which would
+    hide the actual cost of a frame.
+    """
+
+    def __init__(
+        self
+    ):
+        self.__last_tick__ = None
+        self.__fps__ = 0.0
+
+    def tick(
+        self,
+        framerate: int = 0
+    ) -> int:
+        """
+        Marks the end of a frame. Does NOT limit the framerate.
+
+        Args:
+            framerate (int, optional): Ignored. Defaults to 0.
+
+        Returns:
+            int: The number of milliseconds since the previous tick.
+        """
+
+        now = time.perf_counter()
+        elapsed = 0.0 if self.__last_tick__ is None else now - self.__last_tick__
+        self.__last_tick__ = now
+
+        if elapsed > 0.0:
+            self.__fps__ = 1.0 / elapsed
+
+        return int(elapsed * 1000.0)
+
+    def get_fps(
+        self
+    ) -> float:
+        return self.__fps__
+
+
+def __summarize__(
+    samples: list
+) -> dict:
+    """
+    Reduces a set of timing samples (in milliseconds) to the statistics we report.
+
+    Args:
+        samples (list): The samples in milliseconds.
+
+    Returns:
+        dict: The count, mean, p50, p95, p99, and max of the samples.
+    """
+
+    sorted_samples = sorted(samples)
+    sample_count = len(sorted_samples)
+
+    return {
+        'samples': sample_count,
+        'mean_ms': (sum(sorted_samples) / sample_count) if sample_count > 0 else None,
+        'p50_ms': get_percentile(sorted_samples, 50),
+        'p95_ms': get_percentile(sorted_samples, 95),
+        'p99_ms': get_percentile(sorted_samples, 99),
+        'max_ms': sorted_samples[-1] if sample_count > 0 else None
+    }
+
+
+def __summarize_counts__(
+    samples: list
+) -> dict:
+    """
+    Reduces a set of per-frame counts (bytes, objects) to the statistics we report.
+
+    Args:
+        samples (list): The count from each frame.
+
+    Returns:
+        dict: The count, mean, p50, p95, p99, and max of the samples.
+    """
+
+    sorted_samples = sorted(samples)
+    sample_count = len(sorted_samples)
+
+    return {
+        'samples': sample_count,
+        'mean': (sum(sorted_samples) / sample_count) if sample_count > 0 else None,
+        'p50': get_percentile(sorted_samples, 50),
+        'p95': get_percentile(sorted_samples, 95),
+        'p99': get_percentile(sorted_samples, 99),
+        'max': sorted_samples[-1] if sample_count > 0 else None
+    }
+
+
+def __get_element_name__(
+    hud_element
+) -> str:
+    return "{}.{}".format(
+        hud_element.__class__.__module__,
+        hud_element.__class__.__name__)
+
+
+def run_frame_benchmark(
+    frames_per_view: int = DEFAULT_FRAMES_PER_VIEW,
+    traffic_count: int = DEFAULT_TRAFFIC_COUNT,
+    warmup_frames: int = DEFAULT_WARMUP_FRAMES,
+    reduced_visuals: bool = False,
+    trace_allocations: bool = False
+) -> dict:
+    """
+    Builds a HeadsUpDisplay using the SDL dummy video driver
+    and drives it for a number of frames for each view.
+
+    The AHRS comes from the simulator, and the traffic is
+    fed from a set of SimulatedTraffic targets every frame.
+
+    Args:
+        frames_per_view (int, optional): The number of measured frames for each view.
+        traffic_count (int, optional): The number of simulated traffic targets.
+        warmup_frames (int, optional): Frames to render (and discard) before measuring each view.
+        reduced_visuals (bool, optional): Should the HUD be built with reduced visuals?
+        trace_allocations (bool, optional): Should the allocations made by each frame be traced?
+
+    Returns:
+        dict: The frame timing results, per view and per element.
+    """
+
+    # The display and renderer are picked at import time,
+    # so these need to be in place before the HUD is imported.
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+
+    from rendering import display
+
+    if not display.is_forced_software_rendering():
+        sys.argv.append(display.FORCE_SOFTWARE_FLAG)
+
+    import heads_up_display
+    from configuration.configuration import (CONFIGURATION, Configuration,
+                                             DataSourceNames)
+    from data_sources.data_cache import HudDataCache
+    from data_sources.traffic import AdsbTrafficClient, SimulatedTraffic
+    from rendering import drawing
+
+    CONFIGURATION.__configuration__[Configuration.DATA_SOURCE_KEY] = DataSourceNames.SIMULATION
+
+    hud = heads_up_display.HeadsUpDisplay(
+        LOGGER,
+        False,
+        True,
+        reduced_visuals)
+
+    simulated_traffic = [SimulatedTraffic(max_distance) for max_distance in range(100, 100000, max(1, int(100000 / max(1, traffic_count))))][:traffic_count]
+
+    element_samples = {}
+    render_view_element = hud.__render_view_element__
+
+    def __timed_render_view_element__(
+        hud_element,
+        orientation
+    ):
+        start_time = time.perf_counter()
+        render_view_element(hud_element, orientation)
+        element_time = (time.perf_counter() - start_time) * 1000.0
+
+        element_name = __get_element_name__(hud_element)
+
+        if element_name not in element_samples:
+            element_samples[element_name] = []
+
+        element_samples[element_name].append(element_time)
+
+    hud.__render_view_element__ = __timed_render_view_element__
+
+    clock = BenchmarkClock()
+    results = {
+        'timestamp': str(datetime.utcnow()),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'renderer': drawing.renderer.RENDERER_NAME,
+        'resolution': [hud.__width__, hud.__height__],
+        'reduced_visuals': reduced_visuals,
+        'traffic_targets': len(simulated_traffic),
+        'frames_per_view': frames_per_view,
+        'warmup_frames': warmup_frames,
+        'trace_allocations': trace_allocations,
+        'views': {}
+    }
+
+    if trace_allocations:
+        allocation_tracker.INSTANCE.start()
+
+    all_frame_samples = []
+
+    for view_index, (view_name, view_elements, view_uses_ahrs) in enumerate(hud.get_hud_views()):
+        LOGGER.log_info_message("Benchmarking view #{} '{}'".format(view_index, view_name))
+
+        CONFIGURATION.__view_index__ = view_index
+        frame_samples = []
+        allocated_samples = []
+        tracked_object_samples = []
+        collections = 0
+
+        for frame in range(warmup_frames + frames_per_view):
+            # Feed the traffic through the normal path,
+            # but outside of the timed portion of the frame.
+            for target in simulated_traffic:
+                target.simulate()
+                AdsbTrafficClient.TRAFFIC_MANAGER.handle_traffic_report(
+                    target.icao_address,
+                    target.to_json())
+
+            AdsbTrafficClient.TRAFFIC_MANAGER.heartbeat()
+            HudDataCache.update_traffic_reports()
+            HudDataCache.update_nearby_traffic_reports()
+
+            if frame == warmup_frames:
+                element_samples.clear()
+
+            start_time = time.perf_counter()
+            hud.tick(clock)
+            frame_time = (time.perf_counter() - start_time) * 1000.0
+
+            if frame >= warmup_frames:
+                frame_samples.append(frame_time)
+
+                allocations = allocation_tracker.INSTANCE.last_frame
+
+                if trace_allocations and allocations is not None:
+                    allocated_samples.append(allocations['allocated_bytes'])
+                    collections += allocations['collections']
+
+                    if allocations['tracked_objects'] is not None:
+                        tracked_object_samples.append(allocations['tracked_objects'])
+
+        all_frame_samples.extend(frame_samples)
+
+        results['views'][view_name] = {
+            'frame': __summarize__(frame_samples),
+            'elements': {element_name: __summarize__(samples) for element_name, samples in element_samples.items()}
+        }
+
+        if trace_allocations:
+            results['views'][view_name]['allocations'] = {
+                'allocated_bytes': __summarize_counts__(allocated_samples),
+                'tracked_objects': __summarize_counts__(tracked_object_samples),
+                'collections': collections
+            }
+
+    results['all_views'] = __summarize__(all_frame_samples)
+
+    return results
+
+
+def run_traffic_geometry_benchmark(
+    passes: int = DEFAULT_FRAMES_PER_VIEW,
+    target_counts: list = TRAFFIC_GEOMETRY_TARGET_COUNTS
+) -> dict:
+    """
+    Times a full pass of the traffic geometry for
+    different amounts of traffic.
+
+    Args:
+        passes (int, optional): How many passes to time for each amount of traffic.
+        target_counts (list, optional): The amounts of traffic to time.
+
+    Returns:
+        dict: The timing of each method, for each amount of traffic.
+    """
+
+    from configuration.configuration import CONFIGURATION
+    from core_services import zoom_tracker
+    from data_sources import traffic_geometry
+    from data_sources.ahrs_data import AhrsData
+    from data_sources.traffic import Traffic
+    from data_sources.traffic_table import TrafficTable
+    from views.hud_elements import apply_declination
+
+    orientation = AhrsData()
+    orientation.alt = 4500
+    orientation.compass_heading = 90
+    orientation.gps_online = True
+    orientation.gps_heading = 90
+
+    def __per_target_pass__(
+        targets: list
+    ):
+        """
+        The math each of the ADS-B elements did for every target.
+        """
+
+        compass = orientation.get_onscreen_projection_heading()
+
+        for target in targets:
+            altitude_delta = target.get_altitude_delta(orientation.alt)
+            slope = altitude_delta / target.distance if target.distance > 0 else 0.0
+            vertical_degrees = math.degrees(math.atan(slope)) - orientation.pitch
+            horizontal_degrees = apply_declination(target.bearing) - compass
+            zoom_tracker.INSTANCE.is_in_inner_range(target.distance)
+
+    results = {
+        'passes': passes,
+        'uses_numpy': traffic_geometry.__NUMPY_AVAILABLE__,
+        'declination_enabled': CONFIGURATION.is_declination_enabled(),
+        'targets': {}
+    }
+
+    for target_count in target_counts:
+        table = TrafficTable(target_count)
+        targets = [Traffic(
+            icao_address,
+            {
+                'displayName': "N{}".format(icao_address),
+                'Lat': 47.0 + random.uniform(-1.0, 1.0),
+                'Lng': -122.0 + random.uniform(-1.0, 1.0),
+                'Distance': random.uniform(100.0, 100000.0),
+                'Bearing': random.uniform(0.0, 360.0),
+                'Track': random.uniform(0.0, 360.0),
+                'Alt': random.uniform(0.0, 12000.0)
+            },
+            table) for icao_address in range(target_count)]
+
+        geometry_methods = [
+            ('per_target', lambda: __per_target_pass__(targets)),
+            ('batch_python', traffic_geometry.TrafficGeometry(table, False).update)]
+
+        if traffic_geometry.__NUMPY_AVAILABLE__:
+            geometry_methods.append(('batch_numpy', traffic_geometry.TrafficGeometry(table, True).update))
+
+        method_results = {}
+
+        for method_name, geometry_pass in geometry_methods:
+            samples = []
+
+            for pass_index in range(passes):
+                # Move the aircraft so the batch pass can not reuse the last result.
+                orientation.pitch = pass_index % 10
+
+                start = time.perf_counter()
+
+                if method_name == 'per_target':
+                    geometry_pass()
+                else:
+                    geometry_pass(orientation)
+
+                samples.append((time.perf_counter() - start) * 1000.0)
+
+            method_results[method_name] = __summarize__(samples)
+
+        results['targets'][str(target_count)] = method_results
+
+    return results
+
+
+def run_traffic_contention_benchmark(
+    frames: int = DEFAULT_FRAMES_PER_VIEW,
+    traffic_count: int = DEFAULT_TRAFFIC_COUNT
+) -> dict:
+    """
+    Times how long the render thread spends getting the traffic
+    while the update thread is publishing new traffic.
+
+    The update thread runs at CONTENTION_UPDATE_HZ, feeding new
+    reports into the TrafficManager and publishing them through
+    the HudDataCache. The render thread runs at CONTENTION_RENDER_HZ
+    and reads the traffic CONTENTION_READS_PER_FRAME times a frame.
+
+    The "snapshot" reader uses the HudDataCache getters. The
+    "locked_copy" reader does what the getters used to do;
+    take the update lock and copy the list.
+
+    Args:
+        frames (int, optional): How many render frames to time for each reader.
+        traffic_count (int, optional): How many targets to simulate.
+
+    Returns:
+        dict: The time spent reading, per frame, for each reader, and the time each update took.
+    """
+
+    from data_sources.data_cache import HudDataCache
+    from data_sources.traffic import AdsbTrafficClient, SimulatedTraffic
+
+    simulated_traffic = [SimulatedTraffic(max_distance) for max_distance in range(100, 100000, max(1, int(100000 / max(1, traffic_count))))][:traffic_count]
+
+    def __update__():
+        for target in simulated_traffic:
+            target.simulate()
+            AdsbTrafficClient.TRAFFIC_MANAGER.handle_traffic_report(
+                target.icao_address,
+                target.to_json())
+
+        HudDataCache.update_traffic_reports()
+        HudDataCache.update_nearby_traffic_reports()
+
+    def __snapshot_read__():
+        return len(HudDataCache.get_reliable_traffic()) + len(HudDataCache.get_nearby_traffic())
+
+    def __locked_copy_read__():
+        with HudDataCache.__UPDATE_LOCK__:
+            reliable_traffic = list(HudDataCache.TRAFFIC_SNAPSHOT.reliable_traffic)
+
+        with HudDataCache.__UPDATE_LOCK__:
+            nearby_traffic = list(HudDataCache.TRAFFIC_SNAPSHOT.nearby_traffic)
+
+        return len(reliable_traffic) + len(nearby_traffic)
+
+    results = {
+        'timestamp': str(datetime.utcnow()),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'traffic_targets': len(simulated_traffic),
+        'frames': frames,
+        'update_hz': CONTENTION_UPDATE_HZ,
+        'render_hz': CONTENTION_RENDER_HZ,
+        'reads_per_frame': CONTENTION_READS_PER_FRAME,
+        'readers': {}
+    }
+
+    for reader_name, reader in [('snapshot', __snapshot_read__), ('locked_copy', __locked_copy_read__)]:
+        is_running = True
+        update_samples = []
+
+        def __update_loop__():
+            while is_running:
+                start = time.perf_counter()
+                __update__()
+                elapsed = time.perf_counter() - start
+                update_samples.append(elapsed * 1000.0)
+                time.sleep(max(0.0, (1.0 / CONTENTION_UPDATE_HZ) - elapsed))
+
+        __update__()
+
+        update_thread = threading.Thread(
+            target=__update_loop__,
+            daemon=True)
+        update_thread.start()
+
+        read_samples = []
+
+        for frame in range(frames):
+            frame_start = time.perf_counter()
+
+            for read in range(CONTENTION_READS_PER_FRAME):
+                reader()
+
+            read_time = time.perf_counter() - frame_start
+            read_samples.append(read_time * 1000.0)
+            time.sleep(max(0.0, (1.0 / CONTENTION_RENDER_HZ) - read_time))
+
+        is_running = False
+        update_thread.join()
+
+        results['readers'][reader_name] = {
+            'read_per_frame': __summarize__(read_samples),
+            'update': __summarize__(update_samples)
+        }
+
+    return results
+
+
+def run_traffic_extrapolation_benchmark(
+    frames: int = DEFAULT_FRAMES_PER_VIEW,
+    traffic_count: int = DEFAULT_TRAFFIC_COUNT
+) -> dict:
+    """
+    Measures how smoothly the traffic moves on screen.
+
+    Every target flies a straight line, and reports where it
+    is once every EXTRAPOLATION_REPORT_SECONDS. We fly a straight
+    line too. The traffic is drawn EXTRAPOLATION_RENDER_HZ times a
+    second (on a simulated clock, so the run is not real time),
+    both as reported ("hold"), and dead reckoned ("extrapolated").
+
+    Args:
+        frames (int, optional): How many frames to draw.
+        traffic_count (int, optional): How many targets to simulate.
+
+    Returns:
+        dict: The distance (raw units) each target moves between
+              frames, and is drawn from where it really is, for each
+              method. Also the time an update takes.
+    """
+
+    from configuration.configuration import CONFIGURATION
+    from data_sources import traffic_extrapolation
+    from data_sources.ahrs_data import AhrsData
+    from data_sources.traffic import Traffic
+    from data_sources.traffic_table import TrafficTable
+
+    random.seed(traffic_count)
+
+    raw_per_knot_second = traffic_extrapolation.RAW_DISTANCE_PER_KNOT_SECOND
+    own_velocity = traffic_extrapolation.get_velocity(EXTRAPOLATION_OWNSHIP_KNOTS, EXTRAPOLATION_OWNSHIP_TRACK)
+
+    # Starting east/north offset from us, velocity, speed, track, altitude, and vertical speed.
+    flights = []
+
+    for target_index in range(traffic_count):
+        speed = random.uniform(60.0, 250.0)
+        track = random.uniform(0.0, 360.0)
+        flights.append({
+            'position': (
+                random.uniform(-EXTRAPOLATION_MAX_RANGE, EXTRAPOLATION_MAX_RANGE),
+                random.uniform(-EXTRAPOLATION_MAX_RANGE, EXTRAPOLATION_MAX_RANGE)),
+            'velocity': traffic_extrapolation.get_velocity(speed, track),
+            'speed': speed,
+            'track': track,
+            'altitude': random.uniform(1000.0, 10000.0),
+            'vertical_speed': random.uniform(-1000.0, 1000.0),
+            'report_phase': random.uniform(0.0, EXTRAPOLATION_REPORT_SECONDS)})
+
+    def __get_true_position__(
+        flight: dict,
+        elapsed: float
+    ) -> tuple:
+        return (
+            flight['position'][0] + (flight['velocity'][0] - own_velocity[0]) * elapsed,
+            flight['position'][1] + (flight['velocity'][1] - own_velocity[1]) * elapsed)
+
+    def __get_report__(
+        flight: dict,
+        elapsed: float
+    ) -> dict:
+        east, north = __get_true_position__(flight, elapsed)
+
+        return {
+            'Distance': math.hypot(east, north),
+            'Bearing': math.degrees(math.atan2(east, north)) % 360.0,
+            'Track': flight['track'],
+            'Speed': flight['speed'],
+            'Speed_valid': True,
+            'Vvel': flight['vertical_speed'],
+            'Alt': flight['altitude'] + flight['vertical_speed'] * elapsed / 60.0
+        }
+
+    start_time = time.monotonic()
+
+    orientation = AhrsData()
+    orientation.gps_online = True
+    orientation.groundspeed = EXTRAPOLATION_OWNSHIP_KNOTS
+    orientation.gps_heading = EXTRAPOLATION_OWNSHIP_TRACK
+
+    methods = [
+        ('hold', 0.0),
+        ('extrapolated', CONFIGURATION.max_traffic_extrapolation_seconds)]
+
+    results = {
+        'timestamp': str(datetime.utcnow()),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'uses_numpy': traffic_extrapolation.__NUMPY_AVAILABLE__,
+        'traffic_targets': traffic_count,
+        'frames': frames,
+        'render_hz': EXTRAPOLATION_RENDER_HZ,
+        'report_seconds': EXTRAPOLATION_REPORT_SECONDS,
+        'ownship_knots': EXTRAPOLATION_OWNSHIP_KNOTS,
+        'raw_units_per_knot_second': raw_per_knot_second,
+        'methods': {}
+    }
+
+    for method_name, max_age in methods:
+        table = TrafficTable(traffic_count)
+        targets = [Traffic(str(target_index), __get_report__(flight, 0.0), table) for target_index, flight in enumerate(flights)]
+
+        for target in targets:
+            table.time_positioned[target.slot] = start_time
+
+        extrapolation = traffic_extrapolation.TrafficExtrapolation(table)
+        next_reports = [start_time + flight['report_phase'] for flight in flights]
+        last_positions = [None] * traffic_count
+
+        step_samples = []
+        error_samples = []
+        update_samples = []
+
+        for frame in range(frames):
+            now = start_time + frame / EXTRAPOLATION_RENDER_HZ
+
+            for target_index, flight in enumerate(flights):
+                if now >= next_reports[target_index]:
+                    table.update(
+                        targets[target_index].slot,
+                        __get_report__(flight, next_reports[target_index] - start_time),
+                        next_reports[target_index])
+                    next_reports[target_index] += EXTRAPOLATION_REPORT_SECONDS
+
+            update_start = time.perf_counter()
+            extrapolation.update(orientation, now, max_age)
+            update_samples.append((time.perf_counter() - update_start) * 1000.0)
+
+            for target_index, target in enumerate(targets):
+                distance = float(extrapolation.distance[target.slot])
+                radians = math.radians(float(extrapolation.bearing[target.slot]))
+                position = (distance * math.sin(radians), distance * math.cos(radians))
+                true_position = __get_true_position__(flights[target_index], now - start_time)
+
+                error_samples.append(math.hypot(position[0] - true_position[0], position[1] - true_position[1]))
+
+                if last_positions[target_index] is not None:
+                    step_samples.append(math.hypot(
+                        position[0] - last_positions[target_index][0],
+                        position[1] - last_positions[target_index][1]))
+
+                last_positions[target_index] = position
+
+        results['methods'][method_name] = {
+            'max_age_s': max_age,
+            'step_per_frame': __summarize_counts__(step_samples),
+            'error': __summarize_counts__(error_samples),
+            'update_ms': __summarize__(update_samples),
+            'python_update_ms': __time_python_extrapolation__(table, orientation, now, max_age)
+        }
+
+    return results
+
+
+def __time_python_extrapolation__(
+    table,
+    orientation,
+    now: float,
+    max_age: float
+) -> dict:
+    """
+    Times the plain Python extrapolation pass, for comparison with NumPy.
+    """
+
+    from data_sources import traffic_extrapolation
+
+    extrapolation = traffic_extrapolation.TrafficExtrapolation(table, False)
+    samples = []
+
+    for sample_index in range(100):
+        start = time.perf_counter()
+        extrapolation.update(orientation, now + sample_index * 0.001, max_age)
+        samples.append((time.perf_counter() - start) * 1000.0)
+
+    return __summarize__(samples)
+
+
+def __get_recorded_attitude__(
+    recording_path: str
+) -> list:
+    """
+    Reads the attitude out of a GDL-90 capture.
+
+    The capture does not keep when each message arrived, so
+    (as when replaying) the heartbeats are taken to be one
+    second apart and the AHRS messages between them are
+    spread evenly across that second.
+
+    Returns:
+        list: (time, pitch, roll, heading) for each AHRS message.
+    """
+
+    from data_sources import gdl90_decoder
+
+    with open(recording_path, 'rb') as recording_file:
+        messages = gdl90_decoder.get_messages(recording_file.read())
+
+    samples = []
+    second = []
+    second_start = 0.0
+
+    for message in messages:
+        if message[0] == gdl90_decoder.HEARTBEAT_ID:
+            samples.extend([
+                (second_start + (index / len(second)), pitch, roll, heading)
+                for index, (pitch, roll, heading) in enumerate(second)])
+            second = []
+            second_start += 1.0
+
+            continue
+
+        if message[0] != gdl90_decoder.STRATUX_AHRS_ID:
+            continue
+
+        ahrs = gdl90_decoder.decode_message(message)
+
+        if ahrs is not None and ahrs.pitch is not None and ahrs.roll is not None:
+            second.append((ahrs.pitch, ahrs.roll, ahrs.heading))
+
+    return samples
+
+
+def __get_simulated_attitude__(
+    seconds: float
+) -> list:
+    """
+    A smooth flight, with turns through north,
+    sampled at the AHRS rate with jitter and sensor noise.
+
+    Returns:
+        list: (time, pitch, roll, heading) for each sample.
+    """
+
+    from configuration import configuration
+
+    randomizer = random.Random(1)
+    interval = 1.0 / configuration.TARGET_AHRS_FRAMERATE
+    samples = []
+    sample_time = 0.0
+
+    while sample_time < seconds:
+        jittered_time = sample_time + randomizer.gauss(0.0, PREDICTION_SAMPLE_JITTER_SECONDS)
+        roll = 25.0 * math.sin(2.0 * math.pi * jittered_time / 20.0) + 5.0 * math.sin(2.0 * math.pi * jittered_time / 3.0)
+        pitch = 4.0 * math.sin(2.0 * math.pi * jittered_time / 7.0)
+
+        # A standard rate turn, in either direction.
+        heading = (350.0 + 60.0 * math.sin(2.0 * math.pi * jittered_time / 40.0)) % 360.0
+
+        samples.append((
+            jittered_time,
+            pitch + randomizer.gauss(0.0, PREDICTION_SAMPLE_NOISE_DEGREES),
+            roll + randomizer.gauss(0.0, PREDICTION_SAMPLE_NOISE_DEGREES),
+            (heading + randomizer.gauss(0.0, PREDICTION_SAMPLE_NOISE_DEGREES)) % 360.0))
+        sample_time += interval
+
+    return sorted(samples)
+
+
+def run_ahrs_prediction_benchmark(
+    recording_path: str = None
+) -> dict:
+    """
+    Compares the attitude drawn each frame against the real attitude.
+
+    The frames are drawn at MAX_FRAMERATE, and take a frame to
+    reach the screen. The real attitude at that moment is
+    interpolated from the samples on either side of it.
+    Every method sees the samples as they would have arrived.
+
+    Args:
+        recording_path (str, optional): A GDL-90 capture to replay. Defaults to None (a simulated flight).
+
+    Returns:
+        dict: For each method, the error (in degrees) of the drawn attitude
+              and of each sample's prediction, and the time taken to predict.
+    """
+
+    from configuration import configuration
+    from data_sources import ahrs_history
+    from data_sources.ahrs_data import AhrsData
+
+    samples = __get_recorded_attitude__(recording_path) if recording_path is not None \
+        else __get_simulated_attitude__(PREDICTION_SIMULATED_SECONDS)
+
+    sample_times = [sample[0] for sample in samples]
+    frame_interval = 1.0 / configuration.MAX_FRAMERATE
+    present_latency = frame_interval
+
+    def __get_actual__(
+        timestamp: float,
+        index: int
+    ) -> tuple:
+        """
+        The real attitude, between samples index - 1 and index.
+        """
+
+        before, after = samples[index - 1], samples[index]
+        proportion = (timestamp - before[0]) / (after[0] - before[0])
+
+        def __interpolate__(start, end, is_angle):
+            change = ahrs_history.get_angle_difference(start, end) if is_angle else end - start
+
+            return start + change * proportion
+
+        heading = __interpolate__(before[3], after[3], True) % 360.0 \
+            if before[3] is not None and after[3] is not None else None
+
+        return __interpolate__(before[1], after[1], False), __interpolate__(before[2], after[2], True), heading
+
+    results = {
+        'timestamp': str(datetime.utcnow()),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'source': recording_path if recording_path is not None else 'simulated',
+        'samples': len(samples),
+        'frame_interval_ms': frame_interval * 1000.0,
+        'present_latency_ms': present_latency * 1000.0,
+        'methods': {}
+    }
+
+    if len(samples) < 3:
+        return results
+
+    for method in ahrs_history.PREDICTION_METHODS:
+        history = ahrs_history.AhrsHistory(method=method)
+        errors = {'pitch': [], 'roll': [], 'heading': []}
+        predict_samples = []
+        next_sample = 0
+        frame_time = sample_times[0]
+
+        while frame_time + present_latency < sample_times[-1]:
+            while next_sample < len(samples) and sample_times[next_sample] <= frame_time:
+                sample_time, pitch, roll, heading = samples[next_sample]
+                orientation = AhrsData()
+                orientation.version = next_sample + 1
+                orientation.timestamp = sample_time
+                orientation.pitch = pitch
+                orientation.roll = roll
+                orientation.compass_heading = heading if heading is not None else 1080
+                history.push(orientation)
+                next_sample += 1
+
+            shown_time = frame_time + present_latency
+            predict_start = time.perf_counter()
+            prediction = history.predict(shown_time)
+            predict_samples.append((time.perf_counter() - predict_start) * 1000.0)
+
+            if prediction is not None:
+                actual_index = next((index for index in range(max(1, next_sample), len(samples)) if sample_times[index] >= shown_time), None)
+
+                if actual_index is not None:
+                    actual = __get_actual__(shown_time, actual_index)
+
+                    errors['pitch'].append(abs(prediction[0] - actual[0]))
+                    errors['roll'].append(abs(ahrs_history.get_angle_difference(prediction[1], actual[1])))
+
+                    if prediction[2] is not None and actual[2] is not None:
+                        errors['heading'].append(abs(ahrs_history.get_angle_difference(prediction[2], actual[2])))
+
+            frame_time += frame_interval
+
+        statistics = history.get_statistics()
+
+        results['methods'][method] = {
+            'frame_error_degrees': {name: __summarize_counts__(values) for name, values in errors.items()},
+            'sample_error_degrees': {name: {key: stats[key] for key in ['mean', 'p50', 'p95', 'p99', 'max']} for name, stats in statistics['error_degrees'].items()},
+            'predict_ms': __summarize__(predict_samples),
+            'clamped': statistics['clamped']
+        }
+
+    return results
+
+
+def run_replay_benchmark(
+    recording_path: str,
+    max_frames: int = None
+) -> dict:
+    """
+    Replays a flight recording through the full HUD, as fast
+    as it will go, and reports the throughput and frame times.
+
+    The replay is stepped from this thread: every frame, the
+    next 1 / REPLAY_RENDER_HZ seconds of the recording are handed
+    to the data sources, then the HUD draws a frame. The same
+    recording always goes through the same frames, so runs can
+    be compared release to release.
+
+    Args:
+        recording_path (str): The flight recording to replay.
+        max_frames (int, optional): Stop after this many frames. Defaults to None (the whole recording).
+
+    Returns:
+        dict: How fast the recording went through, how long handing over
+              the data and drawing each frame took, and what was replayed.
+    """
+
+    # The display and renderer are picked at import time,
+    # and the data sources are created when the HUD is imported,
+    # so all of these need to be in place before the HUD is imported.
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+
+    from rendering import display
+
+    if not display.is_forced_software_rendering():
+        sys.argv.append(display.FORCE_SOFTWARE_FLAG)
+
+    from configuration.configuration import (CONFIGURATION, Configuration,
+                                             DataSourceNames)
+
+    CONFIGURATION.__configuration__[Configuration.DATA_SOURCE_KEY] = DataSourceNames.REPLAY
+    CONFIGURATION.replay_file = recording_path
+
+    import heads_up_display
+    from data_sources import flight_replay
+    from data_sources.data_cache import HudDataCache
+    from rendering import drawing
+
+    # The replay is stepped from here, instead of from its own thread.
+    heads_up_display.HeadsUpDisplay.__start_flight_replay__ = lambda hud: None
+
+    replay = flight_replay.INSTANCE
+    replay.open(recording_path)
+
+    hud = heads_up_display.HeadsUpDisplay(
+        LOGGER,
+        False,
+        True)
+
+    clock = BenchmarkClock()
+    frame_interval = 1.0 / REPLAY_RENDER_HZ
+    step_samples = []
+    frame_samples = []
+    frame = 0
+    replay_start = time.perf_counter()
+
+    while not replay.is_finished and (max_frames is None or frame < max_frames):
+        frame += 1
+
+        start_time = time.perf_counter()
+        replay.step(frame * frame_interval)
+        HudDataCache.update_traffic_reports()
+        HudDataCache.update_nearby_traffic_reports()
+        step_samples.append((time.perf_counter() - start_time) * 1000.0)
+
+        start_time = time.perf_counter()
+        hud.tick(clock)
+        frame_samples.append((time.perf_counter() - start_time) * 1000.0)
+
+    replay_seconds = time.perf_counter() - replay_start
+    statistics = replay.get_statistics()
+    record_count = sum(statistics['records'].values())
+
+    return {
+        'timestamp': str(datetime.utcnow()),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'renderer': drawing.renderer.RENDERER_NAME,
+        'resolution': [hud.__width__, hud.__height__],
+        'recording': recording_path,
+        'frames': frame,
+        'recording_s': statistics['recording_s'],
+        'replay_s': replay_seconds,
+        'speedup': statistics['recording_s'] / replay_seconds if replay_seconds > 0.0 else None,
+        'records': statistics['records'],
+        'records_per_s': record_count / replay_seconds if replay_seconds > 0.0 else None,
+        'unhandled': statistics['unhandled'],
+        'errors': statistics['errors'],
+        'last_error': statistics['last_error'],
+        'step_ms': __summarize__(step_samples),
+        'dispatch_ms': statistics['dispatch_ms'],
+        'frame': __summarize__(frame_samples)
+    }
+
+
+def __get_arguments__():
+    parser = argparse.ArgumentParser(description="StratuxHud benchmarks.")
+    parser.add_argument(
+        'mode',
+        nargs='?',
+        default=MATH_MODE,
+        choices=[MATH_MODE, FRAMES_MODE, TRAFFIC_MODE, CONTENTION_MODE, EXTRAPOLATION_MODE, PREDICTION_MODE, REPLAY_MODE],
+        help="Which benchmark to run.")
+    parser.add_argument(
+        '--frames',
+        type=int,
+        default=DEFAULT_FRAMES_PER_VIEW,
+        help="Measured frames per view (or passes per traffic count).")
+    parser.add_argument(
+        '--warmup',
+        type=int,
+        default=DEFAULT_WARMUP_FRAMES,
+        help="Frames rendered before measuring each view.")
+    parser.add_argument(
+        '--traffic',
+        type=int,
+        default=DEFAULT_TRAFFIC_COUNT,
+        help="Number of simulated traffic targets.")
+    parser.add_argument(
+        '--reduced',
+        action='store_true',
+        help="Build the HUD with reduced visuals.")
+    parser.add_argument(
+        '--allocations',
+        action='store_true',
+        help="Trace the allocations made by each frame.")
+    parser.add_argument(
+        '--recording',
+        default=None,
+        help="GDL-90 capture to replay for the prediction benchmark, or flight recording for the replay benchmark.")
+    parser.add_argument(
+        '--output',
+        default=None,
+        help="File to write the JSON results to. Printed if not given.")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = __get_arguments__()
+
+    if arguments.mode in [FRAMES_MODE, TRAFFIC_MODE, CONTENTION_MODE, EXTRAPOLATION_MODE, PREDICTION_MODE, REPLAY_MODE]:
+        if arguments.mode == FRAMES_MODE:
+            benchmark_results = run_frame_benchmark(
+                arguments.frames,
+                arguments.traffic,
+                arguments.warmup,
+                arguments.reduced,
+                arguments.allocations)
+        elif arguments.mode == PREDICTION_MODE:
+            benchmark_results = run_ahrs_prediction_benchmark(arguments.recording)
+        elif arguments.mode == REPLAY_MODE:
+            if arguments.recording is None:
+                print("The replay benchmark needs a --recording")
+                sys.exit(1)
+
+            benchmark_results = run_replay_benchmark(arguments.recording)
+        elif arguments.mode == EXTRAPOLATION_MODE:
+            benchmark_results = run_traffic_extrapolation_benchmark(
+                arguments.frames,
+                arguments.traffic)
+        elif arguments.mode == CONTENTION_MODE:
+            benchmark_results = run_traffic_contention_benchmark(
+                arguments.frames,
+                arguments.traffic)
+        else:
+            benchmark_results = run_traffic_geometry_benchmark(arguments.frames)
+
+        results_text = json.dumps(benchmark_results, indent=4)
+
+        if arguments.output is not None:
+            with open(arguments.output, 'w') as results_file:
+                results_file.write(results_text)
+
+        print(results_text)
+
+        # The HUD's background tasks are not daemon threads
+        # (and the REST host never returns), so leave hard.
+        sys.stdout.flush()
+        os._exit(0)
+
+    run_math_benchmarks()
+
+    quit()
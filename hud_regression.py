@@ -0,0 +1,548 @@
+"""
+Golden frame regression, and performance, suite for the HUD.
+
+Renders a fixed set of AHRS and traffic scenarios through
+every element, and every view, of the HUD using the same
+headless (SDL "dummy") display as `hud_benchmark.py frames`.
+Each frame is hashed (SHA-256 of the framebuffer's pixels)
+and compared against the stored goldens, and every render
+is timed. A change to what is drawn shows up as a diff, and
+a change to how long it takes shows up as a slowdown against
+the timings stored with the goldens.
+
+Usage:
+    python3 hud_regression.py --update
+        Renders every scenario, and stores the hashes and
+        timings as the new goldens. Run this before making a
+        change, on the machine the comparisons will be made on.
+
+    python3 hud_regression.py --frames 20 --output results.json
+        Renders every scenario, and compares it against the goldens.
+        Exits with 1 if any frame is different, or (with
+        --fail-on-slowdown) if anything got slower than allowed.
+
+The hashes depend on the renderer, the resolution, and the
+versions of pygame and SDL. The goldens record these, and a
+run that does not match them is not compared (exits with 2).
+
+Nothing changes between frames except the scenarios: the
+background tasks are stopped once the HUD is built, the
+traffic is only what the scenario reports, the zoom and
+breadcrumbs start over, the traffic is not dead reckoned, and
+the warnings that blink with the wall clock see a fixed time.
+Anything that still draws differently from one render to the
+next is reported as "unstable" rather than compared.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import sys
+from datetime import datetime, timezone
+
+from hud_benchmark import (LOGGER, BenchmarkClock, __get_element_name__,
+                           __summarize__)
+
+DEFAULT_GOLDENS_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    'data',
+    'regression_goldens.json')
+
+DEFAULT_FRAMES = 20
+
+# How much slower (as a multiple of the golden's median)
+# a render may get before it is reported.
+DEFAULT_SLOWDOWN = 1.5
+
+# Differences smaller than this (in milliseconds) are noise.
+MINIMUM_SLOWDOWN_MS = 0.1
+
+# Elements that draw the state of the machine they run on,
+# so can never match a golden. They are still timed.
+UNHASHED_ELEMENTS = ['views.system_info.SystemInfo']
+
+MATCH = 'match'
+DIFF = 'diff'
+NEW = 'new'
+UNSTABLE = 'unstable'
+UNHASHED = 'unhashed'
+
+SCENARIO_POSITION = (47.6, -122.3)
+# An odd second, so the GPS warning is drawn rather than blinked off.
+SCENARIO_UTC_TIME = datetime(2021, 7, 26, 17, 30, 1, tzinfo=timezone.utc)
+
+# (pitch, roll, heading, groundspeed, altitude, is the GPS online)
+ATTITUDES = {
+    'level': (0.0, 0.0, 0.0, 110.0, 5500.0, True),
+    'climbing_turn': (8.0, 25.0, 135.0, 95.0, 6200.0, True),
+    'steep_bank': (-5.0, -60.0, 270.0, 140.0, 4800.0, True),
+    'heading_wrap': (2.0, -3.0, 359.5, 110.0, 5500.0, True),
+    'no_gps': (1.0, 5.0, 45.0, 0.0, 5500.0, False)
+}
+
+# (ICAO address, distance (raw units), bearing, altitude, track, speed)
+NEARBY_TRAFFIC = [
+    (0xA10001, 900.0, 10.0, 5600.0, 190.0, 100.0),
+    (0xA10002, 2600.0, 95.0, 5200.0, 270.0, 120.0),
+    (0xA10003, 5400.0, 200.0, 7500.0, 20.0, 140.0),
+    (0xA10004, 9100.0, 315.0, 3500.0, 90.0, 85.0),
+    (0xA10005, 16000.0, 355.0, 5500.0, 180.0, 250.0)
+]
+
+BUSY_TRAFFIC = [
+    (0xA20000 + index,
+     800.0 + (index * 390.0),
+     (index * 37.0) % 360.0,
+     3000.0 + ((index * 170.0) % 5000.0),
+     (index * 53.0) % 360.0,
+     90.0 + (index % 60))
+    for index in range(50)]
+
+# (name, attitude, traffic)
+SCENARIOS = [
+    ('level_no_traffic', 'level', []),
+    ('level_nearby', 'level', NEARBY_TRAFFIC),
+    ('climbing_turn_nearby', 'climbing_turn', NEARBY_TRAFFIC),
+    ('steep_bank_busy', 'steep_bank', BUSY_TRAFFIC),
+    ('heading_wrap_nearby', 'heading_wrap', NEARBY_TRAFFIC),
+    ('no_gps_nearby', 'no_gps', NEARBY_TRAFFIC)
+]
+
+
+class ScenarioClock(datetime):
+    """
+    Stands in for `datetime` in the views that blink
+    with the wall clock, so they always see the same time.
+    """
+
+    @classmethod
+    def utcnow(
+        cls
+    ):
+        return SCENARIO_UTC_TIME.replace(tzinfo=None)
+
+
+def __get_orientation__(
+    attitude: tuple
+):
+    """
+    Builds the (frozen) orientation for a scenario.
+    """
+
+    from data_sources.ahrs_data import AhrsData
+
+    pitch, roll, heading, groundspeed, altitude, is_gps_online = attitude
+
+    orientation = AhrsData()
+    orientation.pitch = pitch
+    orientation.roll = roll
+    orientation.compass_heading = heading
+    orientation.gps_heading = heading
+    orientation.alt = altitude
+    orientation.position = SCENARIO_POSITION
+    orientation.groundspeed = groundspeed
+    orientation.airspeed = groundspeed
+    orientation.utc_time = SCENARIO_UTC_TIME
+    orientation.gps_online = is_gps_online
+    orientation.slip_skid = 0.0
+
+    return orientation.freeze()
+
+
+def __get_traffic_report__(
+    target: tuple
+) -> dict:
+    """
+    Builds a report for a target, shaped like the traffic manager's.
+    """
+
+    from data_sources.traffic import Traffic
+
+    icao_address, distance, bearing, altitude, track, speed = target
+    tail_number = "N{}".format(icao_address % 100000)
+
+    return {
+        Traffic.ICAO_ADDR_KEY: icao_address,
+        Traffic.TAIL_NUMBER_KEY: tail_number,
+        'Tail': tail_number,
+        'Reg': tail_number,
+        Traffic.LATITUDE_KEY: SCENARIO_POSITION[0],
+        Traffic.LONGITUDE_KEY: SCENARIO_POSITION[1],
+        Traffic.DISTANCE_KEY: distance,
+        Traffic.BEARING_KEY: bearing,
+        'BearingDist_valid': True,
+        Traffic.ALTITUDE_KEY: altitude,
+        Traffic.TRACK_KEY: track,
+        Traffic.SPEED_KEY: speed,
+        'Speed_valid': True,
+        Traffic.VERTICAL_SPEED_KEY: 0,
+        'OnGround': False
+    }
+
+
+def __set_traffic__(
+    traffic: list
+):
+    """
+    Replaces all of the traffic with the scenario's,
+    through the same path the live traffic takes.
+    """
+
+    from core_services import breadcrumbs, zoom_tracker
+    from data_sources.data_cache import HudDataCache
+    from data_sources.traffic import AdsbTrafficClient
+
+    AdsbTrafficClient.TRAFFIC_MANAGER.clear()
+
+    for target in traffic:
+        AdsbTrafficClient.TRAFFIC_MANAGER.handle_traffic_report(
+            target[0],
+            __get_traffic_report__(target))
+
+    AdsbTrafficClient.TRAFFIC_MANAGER.heartbeat()
+    HudDataCache.update_traffic_reports()
+    HudDataCache.update_nearby_traffic_reports()
+
+    # Both change over time, so every scenario starts them over.
+    zoom_tracker.INSTANCE = zoom_tracker.ZoomTracker(zoom_tracker.DEFAULT_SCOPE_RANGE)
+    breadcrumbs.INSTANCE = breadcrumbs.Breadcrumbs()
+
+
+def __hash_framebuffer__(
+    framebuffer
+) -> str:
+    import pygame
+
+    return hashlib.sha256(pygame.image.tobytes(framebuffer, 'RGB')).hexdigest()
+
+
+def __get_environment__(
+    hud
+) -> dict:
+    """
+    Everything the hashes depend on, besides the code.
+    """
+
+    import pygame
+    from rendering import drawing
+
+    return {
+        'renderer': drawing.renderer.RENDERER_NAME,
+        'resolution': [hud.__width__, hud.__height__],
+        'pygame': pygame.version.ver,
+        'sdl': '.'.join([str(part) for part in pygame.get_sdl_version()])
+    }
+
+
+def __time_renders__(
+    render,
+    frames: int
+) -> tuple:
+    """
+    Renders a frame `frames` times (at least once).
+
+    Returns:
+        tuple: The hash of the first frame, if every frame was the same, and the render times (in milliseconds).
+    """
+
+    from time import perf_counter
+
+    first_hash = None
+    is_stable = True
+    samples = []
+
+    for frame in range(max(1, frames)):
+        start_time = perf_counter()
+        frame_hash = render()
+        samples.append((perf_counter() - start_time) * 1000.0)
+
+        if frame == 0:
+            first_hash = frame_hash
+        elif frame_hash != first_hash:
+            is_stable = False
+
+    return first_hash if is_stable else None, samples
+
+
+def __compare__(
+    key: str,
+    frame_hash: str,
+    is_hashed: bool,
+    samples: list,
+    goldens: dict,
+    slowdown: float
+) -> dict:
+    """
+    Compares a rendered frame against its golden.
+    """
+
+    render_stats = __summarize__(samples)
+    golden = goldens.get(key, {})
+    golden_hash = golden.get('sha256')
+    golden_median = golden.get('p50_ms')
+
+    if not is_hashed:
+        status = UNHASHED
+    elif frame_hash is None:
+        status = UNSTABLE
+    elif golden_hash is None:
+        status = NEW
+    else:
+        status = MATCH if frame_hash == golden_hash else DIFF
+
+    is_slower = golden_median is not None \
+        and render_stats['p50_ms'] > (golden_median * slowdown) \
+        and (render_stats['p50_ms'] - golden_median) > MINIMUM_SLOWDOWN_MS
+
+    return {
+        'status': status,
+        'sha256': frame_hash if is_hashed else None,
+        'golden_sha256': golden_hash,
+        'golden_p50_ms': golden_median,
+        'is_slower': is_slower,
+        'render': render_stats
+    }
+
+
+def run_regression(
+    frames: int = DEFAULT_FRAMES,
+    goldens: dict = None,
+    slowdown: float = DEFAULT_SLOWDOWN
+) -> dict:
+    """
+    Builds a HeadsUpDisplay using the SDL dummy video driver,
+    and renders every scenario through every element and view.
+
+    Args:
+        frames (int, optional): How many times to render each frame, for the timing.
+        goldens (dict, optional): The stored goldens to compare against. Defaults to None (nothing to compare against).
+        slowdown (float, optional): How many times slower than the golden a render may get before it is reported.
+
+    Returns:
+        dict: The hash, status, and render times of every frame, keyed by "scenario/element/name" and "scenario/view/name".
+    """
+
+    # The display and renderer are picked at import time,
+    # and the data sources are created when the HUD is imported,
+    # so all of these need to be in place before the HUD is imported.
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+
+    from rendering import display
+
+    if not display.is_forced_software_rendering():
+        sys.argv.append(display.FORCE_SOFTWARE_FLAG)
+
+    from configuration.configuration import (CONFIGURATION, Configuration,
+                                             DataSourceNames)
+
+    CONFIGURATION.__configuration__[Configuration.DATA_SOURCE_KEY] = DataSourceNames.SIMULATION
+    CONFIGURATION.async_polling_enabled = False
+    CONFIGURATION.quality_governor_enabled = False
+    CONFIGURATION.max_traffic_extrapolation_seconds = 0.0
+
+    import heads_up_display
+    from common_utils.tasks import RecurringTask
+    from views import gps_not_available, traffic_not_available
+
+    gps_not_available.datetime = ScenarioClock
+    traffic_not_available.datetime = ScenarioClock
+
+    hud = heads_up_display.HeadsUpDisplay(
+        LOGGER,
+        False,
+        True)
+
+    # Tasks on a dedicated thread (the REST host) can not be
+    # stopped, but do not change anything that is drawn.
+    for task in RecurringTask.__TASKS__[:]:
+        task.stop()
+
+    goldens = goldens or {}
+    golden_frames = goldens.get('frames', {})
+    environment = __get_environment__(hud)
+    framebuffer = hud.__display__.get_framebuffer()
+    clock = BenchmarkClock()
+
+    # Every element, once, even if it is in more than one view.
+    elements = {}
+
+    for _, view_elements, _ in hud.get_hud_views():
+        for hud_element in view_elements:
+            elements.setdefault(__get_element_name__(hud_element), hud_element)
+
+    results = {
+        'timestamp': str(datetime.utcnow()),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'environment': environment,
+        'golden_environment': goldens.get('environment'),
+        'frames_per_render': frames,
+        'slowdown': slowdown,
+        'frames': {}
+    }
+
+    for scenario_name, attitude, traffic in SCENARIOS:
+        LOGGER.log_info_message("Rendering scenario '{}'".format(scenario_name))
+
+        orientation = __get_orientation__(ATTITUDES[attitude])
+        __set_traffic__(traffic)
+
+        hud.__get_orientation__ = lambda: orientation
+
+        for element_name, hud_element in elements.items():
+            def __render_element__():
+                hud.__display__.clear()
+                hud.__render_view_element__(hud_element, orientation)
+
+                return __hash_framebuffer__(framebuffer)
+
+            key = "{}/element/{}".format(scenario_name, element_name)
+            frame_hash, samples = __time_renders__(__render_element__, frames)
+
+            results['frames'][key] = __compare__(
+                key,
+                frame_hash,
+                element_name not in UNHASHED_ELEMENTS,
+                samples,
+                golden_frames,
+                slowdown)
+
+        for view_index, (view_name, view_elements, _) in enumerate(hud.get_hud_views()):
+            def __render_view__():
+                CONFIGURATION.__view_index__ = view_index
+                hud.tick(clock)
+
+                return __hash_framebuffer__(framebuffer)
+
+            key = "{}/view/{}".format(scenario_name, view_name)
+            frame_hash, samples = __time_renders__(__render_view__, frames)
+            is_hashed = not any([__get_element_name__(hud_element) in UNHASHED_ELEMENTS for hud_element in view_elements])
+
+            results['frames'][key] = __compare__(
+                key,
+                frame_hash,
+                is_hashed,
+                samples,
+                golden_frames,
+                slowdown)
+
+    statuses = [frame['status'] for frame in results['frames'].values()]
+    results['summary'] = {status: statuses.count(status) for status in [MATCH, DIFF, NEW, UNSTABLE, UNHASHED]}
+    results['summary']['slower'] = len([frame for frame in results['frames'].values() if frame['is_slower']])
+
+    return results
+
+
+def get_goldens(
+    results: dict
+) -> dict:
+    """
+    Turns the results of a run into goldens to compare later runs against.
+
+    Args:
+        results (dict): The results from `run_regression`.
+
+    Returns:
+        dict: The environment, and the hash (when it is stable) and median render time of every frame.
+    """
+
+    return {
+        'timestamp': results['timestamp'],
+        'environment': results['environment'],
+        'frames': {
+            key: {
+                'sha256': frame['sha256'] if frame['status'] not in [UNSTABLE, UNHASHED] else None,
+                'p50_ms': frame['render']['p50_ms']
+            } for key, frame in results['frames'].items()}
+    }
+
+
+def __get_arguments__():
+    parser = argparse.ArgumentParser(description="StratuxHud golden frame regression and performance suite.")
+    parser.add_argument(
+        '--update',
+        action='store_true',
+        help="Store this run as the new goldens.")
+    parser.add_argument(
+        '--goldens',
+        default=DEFAULT_GOLDENS_FILE,
+        help="The goldens file.")
+    parser.add_argument(
+        '--frames',
+        type=int,
+        default=DEFAULT_FRAMES,
+        help="How many times to render each frame, for the timing.")
+    parser.add_argument(
+        '--slowdown',
+        type=float,
+        default=DEFAULT_SLOWDOWN,
+        help="How many times slower than the golden a render may get before it is reported.")
+    parser.add_argument(
+        '--fail-on-slowdown',
+        action='store_true',
+        help="Fail the run if anything got slower than allowed.")
+    parser.add_argument(
+        '--output',
+        default=None,
+        help="File to write the JSON results to.")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = __get_arguments__()
+
+    stored_goldens = None
+
+    if not arguments.update and os.path.exists(arguments.goldens):
+        with open(arguments.goldens, 'r') as goldens_file:
+            stored_goldens = json.load(goldens_file)
+
+    regression_results = run_regression(
+        arguments.frames,
+        stored_goldens,
+        arguments.slowdown)
+
+    if arguments.output is not None:
+        with open(arguments.output, 'w') as results_file:
+            results_file.write(json.dumps(regression_results, indent=4))
+
+    exit_code = 0
+
+    if arguments.update:
+        with open(arguments.goldens, 'w') as goldens_file:
+            goldens_file.write(json.dumps(get_goldens(regression_results), indent=4, sort_keys=True))
+
+        print("Stored {} goldens in {}".format(len(regression_results['frames']), arguments.goldens))
+    elif stored_goldens is None:
+        print("No goldens in {}. Run with --update first.".format(arguments.goldens))
+        exit_code = 2
+    elif stored_goldens.get('environment') != regression_results['environment']:
+        print("The goldens were made with {}, this run is {}. Run with --update to make new goldens.".format(
+            stored_goldens.get('environment'),
+            regression_results['environment']))
+        exit_code = 2
+    else:
+        for key, frame in sorted(regression_results['frames'].items()):
+            if frame['status'] in [DIFF, NEW, UNSTABLE]:
+                print("{:8} {}".format(frame['status'].upper(), key))
+
+            if frame['is_slower']:
+                print("{:8} {} {:.3f}ms -> {:.3f}ms".format(
+                    'SLOWER',
+                    key,
+                    frame['golden_p50_ms'],
+                    frame['render']['p50_ms']))
+
+        summary = regression_results['summary']
+        print(", ".join(["{} {}".format(count, status) for status, count in summary.items()]))
+
+        if summary[DIFF] > 0 or (arguments.fail_on_slowdown and summary['slower'] > 0):
+            exit_code = 1
+
+    # The HUD's background tasks are not daemon threads
+    # (and the REST host never returns), so leave hard.
+    sys.stdout.flush()
+    os._exit(exit_code)
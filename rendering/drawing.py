@@ -3,6 +3,7 @@ Module to abstract and centralize rendering code.
 """
 
 from common_utils.local_debug import IS_SLOW
+from configuration import configuration
 
 from rendering import display
 
@@ -300,3 +301,136 @@ class FilledPolygon:
             self.__color__,
             self.__points__,
             self.__is_anti_aliased__)
+
+
+class StaticGeometry:
+    """
+    Holds drawing elements that never move so they can be
+    recorded once and then replayed with a single call.
+
+    With the software renderer the recording is a cropped surface,
+    with OpenGL it is a display list.
+
+    The recording is made again whenever the size of the framebuffer,
+    the configuration, or the key given by the owner changes.
+    """
+
+    def __init__(
+        self,
+        elements: list = None,
+        key=None
+    ) -> None:
+        """
+        Create the static geometry.
+
+        Args:
+            elements (list, optional): Anything with a `render(framebuffer)`, or a function taking the framebuffer. Defaults to None.
+            key (optional): Anything else that the geometry depends on. Defaults to None.
+        """
+
+        super().__init__()
+
+        self.__elements__ = elements if elements is not None else []
+        self.__key__ = key
+        self.__recording__ = None
+        self.__recording_key__ = None
+        self.__is_recorded__ = False
+
+    def set_elements(
+        self,
+        elements: list,
+        key=None
+    ) -> None:
+        """
+        Replaces what is drawn. The new elements are recorded on the next render.
+
+        Args:
+            elements (list): Anything with a `render(framebuffer)`, or a function taking the framebuffer.
+            key (optional): Anything else that the geometry depends on. Defaults to None.
+        """
+
+        self.__elements__ = elements
+        self.__key__ = key
+        self.invalidate()
+
+    def set_key(
+        self,
+        key
+    ) -> None:
+        """
+        Updates the owner's key. The geometry is only recorded
+        again if the key is different.
+
+        Args:
+            key: Anything else that the geometry depends on.
+        """
+
+        self.__key__ = key
+
+    def invalidate(
+        self
+    ) -> None:
+        """
+        Throws out the recording so it is made again on the next render.
+        """
+
+        renderer.release_geometry(self.__recording__)
+        self.__recording__ = None
+        self.__recording_key__ = None
+        self.__is_recorded__ = False
+
+    def render(
+        self,
+        framebuffer
+    ) -> None:
+        """
+        Draws the geometry, recording it first if needed.
+
+        The geometry is drawn directly on the first frame after
+        the key changes, and only recorded once the key has held
+        for another frame. This keeps something that is animating
+        (such as a zoom) from being recorded every frame.
+
+        If the renderer can not replay a recording exactly,
+        the geometry is always drawn directly.
+
+        Args:
+            framebuffer: The framebuffer to draw to.
+        """
+
+        recording_key = (
+            framebuffer.get_size() if framebuffer is not None else None,
+            configuration.CONFIGURATION.generation,
+            self.__key__)
+
+        if recording_key != self.__recording_key__:
+            self.invalidate()
+            self.__recording_key__ = recording_key
+            self.__render_elements__(framebuffer)
+
+            return
+
+        if not renderer.is_geometry_recording_exact():
+            self.__render_elements__(framebuffer)
+
+            return
+
+        if not self.__is_recorded__:
+            self.__recording__ = renderer.record_geometry(
+                framebuffer,
+                self.__render_elements__)
+            self.__is_recorded__ = True
+
+        renderer.replay_geometry(
+            framebuffer,
+            self.__recording__)
+
+    def __render_elements__(
+        self,
+        framebuffer
+    ) -> None:
+        for element in self.__elements__:
+            if callable(element):
+                element(framebuffer)
+            else:
+                element.render(framebuffer)
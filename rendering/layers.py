@@ -0,0 +1,174 @@
+"""
+Module to keep what each HUD element drew last frame in an
+off-screen layer so unchanged elements can be composited
+instead of being rendered again.
+
+Only used with the software renderer, and only when numpy
+is available to repair the alpha of what is captured. The
+OpenGL renderer draws straight to the display and has no
+framebuffer to capture from.
+"""
+
+import pygame
+
+from common_utils.task_timer import TaskProfiler
+from rendering import software
+
+
+class ElementLayers(object):
+    """
+    Off-screen layers, one per element, keyed by the element's inputs.
+
+    A layer is only captured once its key has been the same for
+    two frames in a row. Elements whose inputs change every frame
+    are drawn directly and never pay for the capture.
+    """
+
+    def __init__(
+        self,
+        size: list
+    ):
+        """
+        Creates the layer store.
+
+        Args:
+            size (list): The size of the framebuffer the layers are composited onto.
+        """
+
+        # Shared surface that elements are rendered into
+        # before the drawn area is cropped out.
+        self.__scratch__ = pygame.Surface(size, pygame.SRCALPHA)
+        self.__scratch_bounds__ = self.__scratch__.get_rect()
+
+        # {owner: [key, is_captured, surface, position]}
+        self.__layers__ = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.captures = 0
+
+    def render(
+        self,
+        framebuffer,
+        owner,
+        layer_key: tuple,
+        render_function,
+        render_argument
+    ):
+        """
+        Draws the owner's output onto the framebuffer.
+        The owner is only rendered again when the key has changed.
+
+        Args:
+            framebuffer: The surface to composite onto.
+            owner: Whatever the layer belongs to. Usually the HudElement.
+            layer_key (tuple): The current values of everything the output depends on.
+            render_function: Function taking a surface and `render_argument`, that draws the owner's output onto the surface.
+            render_argument: The second argument to `render_function`. Passed separately so no closure is made each frame.
+        """
+
+        cached_layer = self.__layers__.get(owner)
+
+        if cached_layer is None or cached_layer[0] != layer_key:
+            self.misses += 1
+
+            # Nothing is captured until the key holds for another frame.
+            self.__layers__[owner] = [layer_key, False, None, None]
+            render_function(framebuffer, render_argument)
+
+            return
+
+        self.hits += 1
+
+        if not cached_layer[1]:
+            with TaskProfiler("rendering.layers.ElementLayers.capture"):
+                layer, position = self.__capture__(render_function, render_argument)
+
+            cached_layer[1:] = [True, layer, position]
+            self.captures += 1
+
+        layer = cached_layer[2]
+
+        # Blending onto the transparent scratch surface leaves the
+        # colors already multiplied by their alpha.
+        if layer is not None:
+            framebuffer.blit(layer, cached_layer[3], special_flags=pygame.BLEND_PREMULTIPLIED)
+
+    def invalidate(
+        self,
+        owner=None
+    ):
+        """
+        Forces a layer (or all of them) to be rendered again.
+
+        Args:
+            owner (optional): The owner of the layer to throw out. Defaults to None for all.
+        """
+
+        if owner is None:
+            self.__layers__.clear()
+        else:
+            self.__layers__.pop(owner, None)
+
+    def get_statistics(
+        self
+    ) -> dict:
+        total = self.hits + self.misses
+        captured_layers = [layer[2] for layer in self.__layers__.values() if layer[2] is not None]
+
+        return {
+            'layers': len(self.__layers__),
+            'hits': self.hits,
+            'misses': self.misses,
+            'captures': self.captures,
+            'hit_rate': (self.hits / total) if total > 0 else 0.0,
+            'pixels': sum([layer.get_width() * layer.get_height() for layer in captured_layers])
+        }
+
+    def reset_statistics(
+        self
+    ):
+        self.hits = 0
+        self.misses = 0
+        self.captures = 0
+
+    def __capture__(
+        self,
+        render_function,
+        render_argument
+    ) -> tuple:
+        """
+        Renders into the scratch surface and keeps only
+        the part that was drawn on.
+
+        Returns:
+            tuple: The cropped layer (None if nothing was drawn) and where it goes.
+        """
+
+        software.start_tracking_drawn_area()
+
+        try:
+            render_function(self.__scratch__, render_argument)
+        except Exception:
+            self.__scratch__.fill((0, 0, 0, 0))
+
+            raise
+        finally:
+            drawn_area = software.stop_tracking_drawn_area()
+
+        if drawn_area is None:
+            return None, None
+
+        drawn_area = drawn_area.clip(self.__scratch_bounds__)
+
+        if drawn_area.width <= 0 or drawn_area.height <= 0:
+            return None, None
+
+        layer = self.__scratch__.subsurface(drawn_area).copy()
+        software.repair_anti_aliased_alpha(layer)
+
+        # Only the area that was drawn on needs to be
+        # cleared for the next capture.
+        self.__scratch__.fill((0, 0, 0, 0), drawn_area)
+
+        return layer, drawn_area.topleft
@@ -13,6 +13,22 @@ RENDERER_NAME = "OpenGl"
 __CONVERTED_TEXTURE_CACHE__ = generic_data_cache.GenericDataCache()
 
 
+def get_texture_cache_statistics() -> dict:
+    """
+    Returns the size and hit rate of the cache of textures
+    that have been converted for OpenGl.
+
+    Returns:
+        dict: The statistics of the texture cache.
+    """
+
+    return __CONVERTED_TEXTURE_CACHE__.get_statistics()
+
+
+def reset_texture_cache_statistics():
+    __CONVERTED_TEXTURE_CACHE__.reset_statistics()
+
+
 def __set_color__(
     color: list
 ) -> None:
@@ -38,6 +54,75 @@ def __convert_texture__(
     return converted, size
 
 
+def record_geometry(
+    framebuffer,
+    render_callback
+):
+    """
+    Compiles geometry that never changes into a display list
+    so it can be replayed with a single call.
+
+    Args:
+        framebuffer: Passed through to the render callback.
+        render_callback: Function taking a surface that draws the geometry.
+
+    Returns:
+        int: The display list.
+    """
+
+    display_list = GL.glGenLists(1)
+    GL.glNewList(display_list, GL.GL_COMPILE)
+
+    try:
+        render_callback(framebuffer)
+    finally:
+        GL.glEndList()
+
+    return display_list
+
+
+def replay_geometry(
+    framebuffer,
+    recording
+):
+    """
+    Draws geometry previously made by `record_geometry`.
+
+    Args:
+        framebuffer: Ignored
+        recording: The display list from `record_geometry`
+    """
+
+    if recording is None:
+        return
+
+    GL.glCallList(recording)
+
+
+def is_geometry_recording_exact() -> bool:
+    """
+    A display list replays exactly what was drawn.
+
+    Returns:
+        bool: True
+    """
+
+    return True
+
+
+def release_geometry(
+    recording
+):
+    """
+    Frees the display list made by `record_geometry`.
+    """
+
+    if recording is None:
+        return
+
+    GL.glDeleteLists(recording, 1)
+
+
 def draw_sprite(
     framebuffer,
     position: list,
@@ -51,11 +136,13 @@ def draw_sprite(
         position (list): The position to draw the sprite
         texture (pygame.Surface): The sprite to draw.
     """
-    key = "{}".format(hash(texture))
+    converted_texture = __CONVERTED_TEXTURE_CACHE__.get_data(texture)
+
+    if converted_texture is None:
+        converted_texture = __convert_texture__(texture)
+        __CONVERTED_TEXTURE_CACHE__.set_data(texture, converted_texture)
 
-    rgba_data, size = __CONVERTED_TEXTURE_CACHE__.get_or_create_data(
-        key,
-        lambda: __convert_texture__(texture))
+    rgba_data, size = converted_texture
 
     # For some reason, OpenGl appears to "draw up"
     # starting at the Y position. So be need to adjust downwards
@@ -89,7 +176,8 @@ def polygon(
     __set_color__(color)
 
     GL.glBegin(GL.GL_POLYGON)
-    [GL.glVertex2f(point[0], point[1]) for point in points]
+    for point in points:
+        GL.glVertex2f(point[0], point[1])
     GL.glEnd()
 
 
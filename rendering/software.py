@@ -9,10 +9,233 @@ import pygame.gfxdraw
 from common_utils import fast_math, generic_data_cache
 from common_utils.local_debug import IS_PI
 
+__NUMPY_AVAILABLE__ = False
+try:
+    import numpy
+    import pygame.surfarray
+
+    __NUMPY_AVAILABLE__ = True
+except:
+    pass
+
 RENDERER_NAME = "Rasterization"
 
 __TEXT_CACHE__ = generic_data_cache.GenericDataCache()
 
+# While tracking, every area that is drawn to is added here.
+# This is much cheaper than scanning a surface for what changed.
+__DRAWN_AREAS__ = None
+
+# Tracking can be nested (geometry recorded while a layer is being captured)
+# so the outer tracking is put aside until the inner tracking stops.
+__SUSPENDED_DRAWN_AREAS__ = []
+
+
+def start_tracking_drawn_area():
+    """
+    Starts collecting the areas touched by the draw calls.
+    """
+
+    global __DRAWN_AREAS__
+
+    __SUSPENDED_DRAWN_AREAS__.append(__DRAWN_AREAS__)
+    __DRAWN_AREAS__ = []
+
+
+def stop_tracking_drawn_area() -> pygame.Rect:
+    """
+    Stops collecting the areas touched by the draw calls.
+
+    Returns:
+        pygame.Rect: The area containing everything drawn since tracking started. None if nothing was drawn.
+    """
+
+    global __DRAWN_AREAS__
+
+    drawn_areas = __DRAWN_AREAS__
+    __DRAWN_AREAS__ = __SUSPENDED_DRAWN_AREAS__.pop() if __SUSPENDED_DRAWN_AREAS__ else None
+
+    if not drawn_areas:
+        return None
+
+    return drawn_areas[0].unionall(drawn_areas[1:])
+
+
+def __track_drawn_area__(
+    drawn_area: pygame.Rect,
+    margin: int = 0
+):
+    if __DRAWN_AREAS__ is None:
+        return
+
+    __DRAWN_AREAS__.append(drawn_area.inflate(margin << 1, margin << 1) if margin > 0 else drawn_area)
+
+
+def __track_drawn_points__(
+    points: list,
+    margin: int
+):
+    """
+    Tracks the area covered by a shape.
+    The rectangle returned by PyGame for a polygon with
+    fractional points does not always cover the anti-aliased
+    outline, so the area is worked out from the points instead.
+    """
+
+    x_values = [point[0] for point in points]
+    y_values = [point[1] for point in points]
+    left = int(math.floor(min(x_values)))
+    top = int(math.floor(min(y_values)))
+
+    __track_drawn_area__(
+        pygame.Rect(
+            left,
+            top,
+            int(math.ceil(max(x_values))) - left + 1,
+            int(math.ceil(max(y_values))) - top + 1),
+        margin)
+
+
+def get_texture_cache_statistics() -> dict:
+    """
+    The software renderer blits the surfaces directly,
+    so there is no converted texture cache.
+
+    Returns:
+        dict: None
+    """
+
+    return None
+
+
+def reset_texture_cache_statistics():
+    pass
+
+
+def is_geometry_recording_exact() -> bool:
+    """
+    Does replaying recorded geometry draw exactly what
+    drawing the geometry directly would?
+
+    Without numpy the anti-aliased alpha can not be repaired,
+    so the recording would leave holes in the outlines.
+
+    Returns:
+        bool: True if the geometry can be recorded.
+    """
+
+    return __NUMPY_AVAILABLE__
+
+
+def repair_anti_aliased_alpha(
+    surface: pygame.Surface
+):
+    """
+    pygame.gfxdraw does not blend the alpha of anti-aliased
+    pixels correctly when drawing onto a surface with per-pixel
+    alpha. Where an outline overlaps something already drawn the
+    pixel can be left with its color but no alpha, which leaves
+    holes when the surface is blitted.
+
+    Since everything drawn onto a transparent surface is
+    premultiplied, a pixel's alpha can never be less than its
+    brightest channel. Requires numpy; without it the surface
+    is left as-is, and `is_geometry_recording_exact()` is False.
+
+    Args:
+        surface (pygame.Surface): A surface with per-pixel alpha.
+    """
+
+    if not __NUMPY_AVAILABLE__:
+        return
+
+    colors = pygame.surfarray.pixels3d(surface)
+    alpha = pygame.surfarray.pixels_alpha(surface)
+
+    numpy.maximum(alpha, colors.max(axis=2), out=alpha)
+
+    # Release the surface lock held by the pixel arrays.
+    del colors
+    del alpha
+
+
+def record_geometry(
+    framebuffer: pygame.Surface,
+    render_callback
+):
+    """
+    Draws geometry that never changes into an off-screen
+    surface so it can be replayed with a single blit.
+
+    Args:
+        framebuffer (pygame.Surface): The surface the geometry will be replayed onto.
+        render_callback: Function taking a surface that draws the geometry onto it.
+
+    Returns:
+        tuple: The drawn area as a surface and where it goes. None if nothing was drawn.
+    """
+
+    recording_surface = pygame.Surface(framebuffer.get_size(), pygame.SRCALPHA)
+
+    start_tracking_drawn_area()
+
+    try:
+        render_callback(recording_surface)
+    finally:
+        drawn_area = stop_tracking_drawn_area()
+
+    if drawn_area is None:
+        return None
+
+    drawn_area = drawn_area.clip(recording_surface.get_rect())
+
+    if drawn_area.width <= 0 or drawn_area.height <= 0:
+        return None
+
+    recording = recording_surface.subsurface(drawn_area).copy()
+    repair_anti_aliased_alpha(recording)
+
+    return recording, drawn_area.topleft
+
+
+def replay_geometry(
+    framebuffer: pygame.Surface,
+    recording
+):
+    """
+    Draws geometry previously made by `record_geometry`.
+
+    Args:
+        framebuffer (pygame.Surface): The surface to draw to.
+        recording: The result of `record_geometry`
+    """
+
+    if framebuffer is None or recording is None:
+        return
+
+    texture, position = recording
+
+    # Blending onto the transparent recording surface leaves
+    # the colors already multiplied by their alpha.
+    drawn_area = framebuffer.blit(
+        texture,
+        position,
+        special_flags=pygame.BLEND_PREMULTIPLIED)
+
+    if __DRAWN_AREAS__ is not None:
+        __track_drawn_area__(drawn_area)
+
+
+def release_geometry(
+    recording
+):
+    """
+    Frees anything held by a recording.
+    The surface is garbage collected, so there is nothing to do.
+    """
+
+    pass
+
 
 def draw_sprite(
     framebuffer: pygame.Surface,
@@ -30,7 +253,10 @@ def draw_sprite(
     if framebuffer is None:
         return
 
-    framebuffer.blit(texture, position)
+    drawn_area = framebuffer.blit(texture, position)
+
+    if __DRAWN_AREAS__ is not None:
+        __track_drawn_area__(drawn_area)
 
 
 def polygon(
@@ -55,6 +281,9 @@ def polygon(
         points,
         0)  # Make filled
 
+    if __DRAWN_AREAS__ is not None:
+        __track_drawn_points__(points, 2)
+
     if is_antialiased:
         segments(
             framebuffer,
@@ -199,12 +428,15 @@ def segment(
     # horizontal lines can not gain anything
     # from anti-aliasing
     if rise == 0 or run == 0:
-        pygame.draw.line(
+        drawn_area = pygame.draw.line(
             framebuffer,
             color,
             start,
             end,
             width)
+
+        if __DRAWN_AREAS__ is not None:
+            __track_drawn_area__(drawn_area, 1)
     else:
         slope = rise / float(run)
         degrees = math.degrees(math.atan(slope))
@@ -242,3 +474,6 @@ def segment(
             framebuffer,
             segments_to_draw,
             color)
+
+        if __DRAWN_AREAS__ is not None:
+            __track_drawn_points__(segments_to_draw, 2)
@@ -11,6 +11,21 @@ from rendering.drawing import renderer
 __TEXT_CACHE__ = generic_data_cache.GenericDataCache()
 
 
+def get_cache_statistics() -> dict:
+    """
+    Returns the size and hit rate of the text texture cache.
+
+    Returns:
+        dict: The statistics of the text cache.
+    """
+
+    return __TEXT_CACHE__.get_statistics()
+
+
+def reset_cache_statistics():
+    __TEXT_CACHE__.reset_statistics()
+
+
 def __get_text_texture_key__(
     font: pygame.font,
     text: str,
@@ -19,12 +34,15 @@ def __get_text_texture_key__(
     scale: float = 1.0,
     rotation: float = 0.0,
     use_alpha: bool = False
-) -> str:
-    return "{}{}{}{}{}{}{}".format(
-        hash(font),
+) -> tuple:
+    # A tuple is a single allocation, where formatting a string
+    # key made several for every piece of text drawn.
+    # Colors are normally tuples, but can be lists when mixed.
+    return (
+        font,
         text,
-        color,
-        bg_color,
+        color if isinstance(color, tuple) else tuple(color),
+        bg_color if bg_color is None or isinstance(bg_color, tuple) else tuple(bg_color),
         scale,
         rotation,
         use_alpha)
@@ -100,16 +118,20 @@ def get_or_create_text_texture(
         rotation,
         use_alpha)
 
-    texture, size = __TEXT_CACHE__.get_or_create_data(
-        key,
-        lambda: __get_text_texture__(font, text, color, bg_color, scale, rotation, use_alpha))
+    cached_texture = __TEXT_CACHE__.get_data(key)
+
+    if cached_texture is None:
+        cached_texture = __get_text_texture__(font, text, color, bg_color, scale, rotation, use_alpha)
+        __TEXT_CACHE__.set_data(key, cached_texture)
+
+    texture, size = cached_texture
 
     return key, texture, size
 
 
 def render_cached_texture(
     framebuffer,
-    cache_key: str,
+    cache_key: tuple,
     position: list
 ) -> None:
     """
@@ -119,7 +141,7 @@ def render_cached_texture(
 
     Args:
         framebuffer: The texture being rendered to.
-        cache_key (str): The key to the stored texture.
+        cache_key (tuple): The key to the stored texture.
         position (list): The UL position to start drawing the texture.
     """
     texture, size = __TEXT_CACHE__.get_data(cache_key)
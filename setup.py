@@ -4,6 +4,7 @@ from common_utils.local_debug import IS_PI
 
 installs = ['pytest',
             'pygame',
+            'numpy',
             'requests']
 
 if IS_PI:
@@ -33,7 +33,9 @@ import sys
 from rendering import display
 
 import heads_up_display
+from common_utils import allocation_tracker
 from common_utils.logger import HudLogger
+from common_utils.task_timer import TaskProfiler
 
 __PYTHON_LOGGGER__ = logging.getLogger("stratux_hud")
 __PYTHON_LOGGGER__.setLevel(logging.DEBUG)
@@ -50,6 +52,8 @@ __PYTHON_LOGGGER__.addHandler(__HANDLER__)
 
 __USE_FULLSCREEN_FLAG__ = "fullscreen"
 __USE_REDUCED_VISUALS_FLAG__ = "reduced"
+__DISABLE_PROFILING_FLAG__ = "noprofile"
+__TRACE_ALLOCATIONS_FLAG__ = "allocations"
 
 
 def __is_flag_present__(
@@ -74,6 +78,12 @@ if __name__ == '__main__':
     __LOGGER__.log_info_message("Starting HUD")
     __LOGGER__.log_info_message("System, DateTime, Component, Instantaneous, Rolling Mean, Max")
 
+    TaskProfiler.set_enabled(not __is_flag_present__(__DISABLE_PROFILING_FLAG__))
+
+    # Tracing every allocation is expensive, so it is opt-in.
+    # The garbage collections are always watched.
+    allocation_tracker.INSTANCE.start(__is_flag_present__(__TRACE_ALLOCATIONS_FLAG__))
+
     hud = heads_up_display.HeadsUpDisplay(
         __LOGGER__,
         __is_flag_present__(__USE_FULLSCREEN_FLAG__),
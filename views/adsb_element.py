@@ -2,12 +2,13 @@ import math
 
 from common_utils import units
 from configuration import configuration
-from data_sources.ahrs_data import AhrsData
+from data_sources import traffic_geometry
+from data_sources.ahrs_data import NOT_AVAILABLE, AhrsData
 from data_sources.traffic import Traffic
 from rendering import colors, drawing, text_renderer
 
 from views.ahrs_element import AhrsElement, HudElement
-from views.hud_elements import apply_declination
+from views.hud_elements import MAX_TARGET_BUGS, REDUCED_TARGET_BUG_LIMITS
 
 
 class AdsbElement(HudElement):
@@ -39,6 +40,30 @@ class AdsbElement(HudElement):
         self.__pixels_per_degree_x__ = self.__framebuffer_size__[0] / 360.0
         self.start_fade_threshold = (configuration.CONFIGURATION.max_minutes_before_removal * 60) / 2
         self.__lower_reticle_bottom_y__ = self.__bottom_border__ - self.__font_height__ - self.__font_half_height__ - (self.__thick_line_width__ << 2)
+        self.__max_target_bugs__ = MAX_TARGET_BUGS
+
+    def get_quality_levels(
+        self
+    ) -> int:
+        """
+        After reduced visuals, each step lowers
+        the number of targets that are drawn.
+
+        Returns:
+            int -- The lowest quality level the element supports.
+        """
+
+        return super().get_quality_levels() + len(REDUCED_TARGET_BUG_LIMITS)
+
+    def __apply_quality_level__(
+        self,
+        quality_level: int
+    ) -> None:
+        visual_steps = super().get_quality_levels()
+        super().__apply_quality_level__(quality_level)
+
+        limit_index = quality_level - visual_steps - 1
+        self.__max_target_bugs__ = REDUCED_TARGET_BUG_LIMITS[limit_index] if limit_index >= 0 else MAX_TARGET_BUGS
 
     def __get_distance_string__(
         self,
@@ -56,6 +81,9 @@ class AdsbElement(HudElement):
             string -- The distance in a handy string for display.
         """
 
+        if distance is None:
+            return NOT_AVAILABLE
+
         display_units = configuration.CONFIGURATION.__get_config_value__(
             configuration.Configuration.DISTANCE_UNITS_KEY,
             units.STATUTE)
@@ -73,25 +101,21 @@ class AdsbElement(HudElement):
         """
         Attempts to figure out where the traffic reticle should be rendered.
         Returns value within screen space
+
+        Uses the traffic geometry, so `traffic_geometry.INSTANCE.update()`
+        must have been called for this frame.
         """
 
         # Assumes traffic.position_valid
         # TODO - Account for aircraft roll...
 
-        altitude_delta = traffic.get_altitude_delta(orientation.alt)
-        slope = altitude_delta / traffic.distance if traffic.distance > 0 else 0.0
-        vertical_degrees_to_target = math.degrees(math.atan(slope))
-        vertical_degrees_to_target -= orientation.pitch
-
         # TODO - Double check ALL of this math...
-        compass = orientation.get_onscreen_projection_heading()
+        horizontal_degrees_to_target, vertical_degrees_to_target = traffic_geometry.INSTANCE.get_projection_degrees(
+            traffic)
 
-        if isinstance(compass, str):
+        if horizontal_degrees_to_target is None:
             return None, None
 
-        horizontal_degrees_to_target = apply_declination(
-            traffic.bearing) - compass
-
         screen_y = -vertical_degrees_to_target * self.__pixels_per_degree_y__
         screen_x = horizontal_degrees_to_target * self.__pixels_per_degree_y__
 
@@ -158,6 +182,9 @@ class AdsbElement(HudElement):
         """
         Gets the additional text for a traffic report
 
+        Uses the traffic geometry, so `traffic_geometry.INSTANCE.update()`
+        must have been called for this frame.
+
         Arguments:
             traffic_report {[type]} -- [description]
             orientation {[type]} -- [description]
@@ -166,10 +193,10 @@ class AdsbElement(HudElement):
             [type] -- [description]
         """
 
-        altitude_delta_text = traffic_report.get_altitude_delta_text(orientation)
-        distance_text = self.__get_distance_string__(traffic_report.distance)
-        bearing_text = "{0}".format(
-            int(apply_declination(traffic_report.bearing)))
+        altitude_delta_text = traffic_geometry.INSTANCE.get_altitude_delta_text(traffic_report)
+        distance_text = self.__get_distance_string__(traffic_geometry.INSTANCE.get_distance(traffic_report))
+        bearing = traffic_geometry.INSTANCE.get_magnetic_bearing(traffic_report)
+        bearing_text = "{0}".format(bearing) if bearing is not None else NOT_AVAILABLE
 
         return [bearing_text, distance_text, altitude_delta_text]
 
@@ -6,6 +6,7 @@ import math
 
 from common_utils import fast_math
 from common_utils.task_timer import TaskProfiler
+from data_sources import traffic_geometry
 from data_sources.ahrs_data import AhrsData
 from data_sources.data_cache import HudDataCache
 from data_sources.traffic import Traffic
@@ -107,7 +108,7 @@ class AdsbOnScreenReticles(AdsbElement):
             return None
 
         # Render using the Above us bug
-        on_screen_reticle_scale = hud_elements.get_reticle_size(traffic.distance)
+        on_screen_reticle_scale = hud_elements.get_reticle_size(traffic_geometry.INSTANCE.get_distance(traffic))
         reticle = self.__get_onscreen_reticle__(
             on_screen_reticle_scale,
             orientation.roll,
@@ -185,16 +186,18 @@ class AdsbOnScreenReticles(AdsbElement):
             if isinstance(our_heading, str):
                 return
 
-            # Get the traffic, and bail out of we have none
-            traffic_reports = HudDataCache.get_nearby_traffic()
-
-            if traffic_reports is None:
-                return
+            # The nearby traffic that is in front of us.
+            traffic_reports = HudDataCache.get_traffic_index().query_cone(
+                our_heading,
+                45,
+                HudDataCache.get_inner_range_raw_distance())
 
             traffic_reports = list(
                 filter(
-                    lambda x: not x.is_on_ground() and (math.fabs(our_heading - x.bearing) < 45),
-                    traffic_reports))[:hud_elements.MAX_TARGET_BUGS]
+                    lambda x: not x.is_on_ground(),
+                    traffic_reports))[:self.__max_target_bugs__]
+
+            traffic_geometry.INSTANCE.update(orientation)
 
             # find the position of the center of the 0 pitch indicator
             rotation_center = self.__get_rotation_point__(orientation)
@@ -205,8 +208,9 @@ class AdsbOnScreenReticles(AdsbElement):
                 traffic) for traffic in traffic_reports]
 
         with TaskProfiler('views.on_screen_reticles.AdsbOnScreenReticles.rendering'):
-            # pylint:disable=expression-not-assigned
-            [reticle.render(framebuffer) for reticle in reticles if reticle is not None]
+            for reticle in reticles:
+                if reticle is not None:
+                    reticle.render(framebuffer)
 
 
 if __name__ == '__main__':
@@ -3,12 +3,12 @@ Shows the "Info Cards" for ADSB information
 """
 
 from common_utils.task_timer import TaskProfiler
-from core_services import zoom_tracker
+from data_sources import traffic_geometry
 from data_sources.ahrs_data import AhrsData
 from data_sources.data_cache import HudDataCache
 
 from views.adsb_element import AdsbElement
-from views.hud_elements import MAX_TARGET_BUGS, get_heading_bug_x
+from views.hud_elements import get_heading_bug_x
 
 
 class AdsbTargetBugs(AdsbElement):
@@ -55,7 +55,7 @@ class AdsbTargetBugs(AdsbElement):
 
         heading_bug_x = get_heading_bug_x(
             heading,
-            traffic_report.bearing,
+            traffic_geometry.INSTANCE.get_bearing(traffic_report),
             self.__pixels_per_degree_x__)
 
         additional_info_text = self.__get_additional_target_text__(
@@ -82,35 +82,24 @@ class AdsbTargetBugs(AdsbElement):
             if not orientation.gps_online:
                 return
 
-            # Get the traffic, and bail out of we have none
-            traffic_reports = HudDataCache.get_nearby_traffic()
-
-            if traffic_reports is None:
-                return
-
-            reports_to_show = list(
-                filter(
-                    lambda x: zoom_tracker.INSTANCE.is_in_inner_range(
-                        x.distance
-                    )[0],
-                    traffic_reports))
+            # Make sure only the closest bugs are rendered.
+            reports_to_show = HudDataCache.get_traffic_index().query_nearest(
+                self.__max_target_bugs__,
+                HudDataCache.get_inner_range_raw_distance())
 
             # Draw the heading bugs in reverse order so the traffic closest to
             # us will be the most visible
-            reports_to_show.sort(
-                key=lambda traffic: traffic.distance,
-                reverse=True)
+            reports_to_show = reports_to_show[::-1]
 
-            # Make sure only the closest bugs are rendered.
-            reports_to_show = reports_to_show[:MAX_TARGET_BUGS]
+            traffic_geometry.INSTANCE.update(orientation)
 
         with TaskProfiler('views.adsb_target_bugs.AdsbTargetBugs.render'):
-            # pylint:disable=expression-not-assigned
-            [self.__render_traffic_heading_bug__(
-                traffic_report,
-                heading,
-                orientation,
-                framebuffer) for traffic_report in reports_to_show]
+            for traffic_report in reports_to_show:
+                self.__render_traffic_heading_bug__(
+                    traffic_report,
+                    heading,
+                    orientation,
+                    framebuffer)
 
 
 if __name__ == '__main__':
@@ -9,8 +9,7 @@ from data_sources.traffic import Traffic
 from rendering import colors, drawing
 
 from views.adsb_element import AdsbElement
-from views.hud_elements import (MAX_TARGET_BUGS, get_heading_bug_x,
-                                get_reticle_size)
+from views.hud_elements import get_heading_bug_x, get_reticle_size
 
 
 class AdsbTargetBugsOnly(AdsbElement):
@@ -91,15 +90,15 @@ class AdsbTargetBugsOnly(AdsbElement):
             if traffic_reports is None:
                 return
 
-            reports_to_show = traffic_reports[:MAX_TARGET_BUGS]
+            reports_to_show = traffic_reports[:self.__max_target_bugs__]
 
-        # pylint:disable=expression-not-assigned
         with TaskProfiler('views.adsb_target_bugs_only.AdsbTargetBugsOnly.render'):
-            [self.__render_traffic_heading_bug__(
-                traffic_report,
-                heading,
-                orientation.alt,
-                framebuffer) for traffic_report in reports_to_show]
+            for traffic_report in reports_to_show:
+                self.__render_traffic_heading_bug__(
+                    traffic_report,
+                    heading,
+                    orientation.alt,
+                    framebuffer)
 
 
 if __name__ == '__main__':
@@ -10,7 +10,7 @@ from common_utils import fast_math, geo_math, units
 from common_utils.task_timer import TaskProfiler
 from configuration import configuration
 from core_services import breadcrumbs, zoom_tracker
-from data_sources import ahrs_data
+from data_sources import ahrs_data, traffic_geometry
 from data_sources.ahrs_data import AhrsData
 from data_sources.data_cache import HudDataCache
 from data_sources.traffic import Traffic
@@ -75,6 +75,13 @@ class AdsbTopViewScope(AdsbElement):
             [quarter_size, half_size]
         ]
 
+        # The ownship and the distance rings only
+        # change when the zoom does.
+        self.__scope_range__ = None
+        self.__scope_geometry__ = drawing.StaticGeometry([
+            self.__render_ownship__,
+            lambda framebuffer: self.__draw_distance_rings__(framebuffer, self.__scope_range__)])
+
     def __get_traffic_indicator__(
         self,
         indicator_position: list,
@@ -179,7 +186,7 @@ class AdsbTopViewScope(AdsbElement):
         # TODO - Consider tail numbers to the side, with lines
         # that connect the number to the target.
 
-        (is_within_threshold, display_distance) = zoom_tracker.INSTANCE.is_in_inner_range(traffic.distance)
+        (is_within_threshold, display_distance) = traffic_geometry.INSTANCE.is_in_inner_range(traffic)
 
         if not is_within_threshold:
             return
@@ -189,7 +196,7 @@ class AdsbTopViewScope(AdsbElement):
             scope_range)
 
         delta_angle = orientation.get_onscreen_gps_heading()
-        delta_angle = traffic.bearing - delta_angle
+        delta_angle = traffic_geometry.INSTANCE.get_bearing(traffic) - delta_angle
         # We need to rotate by 270 to make sure that
         # the orientation is correct AND to correct the phase.
         delta_angle = AdsbTopViewScope.TRAFFIC_PHASE_SHIFT + delta_angle
@@ -240,7 +247,7 @@ class AdsbTopViewScope(AdsbElement):
                 0,
                 True)
 
-            altitude_text = traffic.get_altitude_delta_text(orientation)
+            altitude_text = traffic_geometry.INSTANCE.get_altitude_delta_text(traffic)
 
             self.__render_centered_text__(
                 framebuffer,
@@ -345,29 +352,23 @@ class AdsbTopViewScope(AdsbElement):
                 self.__scope_center__,
                 width=self.__line_width__)
 
-    def __draw_distance_rings__(
+    def __get_ring_distances__(
         self,
-        framebuffer: pygame.Surface,
         scope_range: Tuple[int, int]
-    ) -> int:
+    ) -> list:
         """
-        Draws rings that indicate how far out another aircraft is.
-        Each ring represents 5 units. The spacing will always be
-        the same no matter what the units are.
+        Gets the distances that the rings are drawn at.
 
         Args:
-            framebuffer {pygame.Surface} -- The render target.
+            scope_range (Tuple[int, int]): The range of the scope, and the step between rings.
 
         Returns:
-            int: The distance (in pixels from the center to the first ring. Used for clutter control.)
+            list: The distance of each ring, starting with the closest.
         """
 
         max_distance = scope_range[0]
         step = scope_range[1]
         ring_distances = [max_distance]
-        distance_units = configuration.CONFIGURATION.get_units()
-        units_suffix = units.get_distance_unit_suffix(distance_units)
-        ring_pixel_distances = []
 
         if step > 0:
             ring_distances = list(
@@ -379,6 +380,31 @@ class AdsbTopViewScope(AdsbElement):
             # since range() does not include the last item.
             ring_distances.append(max_distance)
 
+        return ring_distances
+
+    def __draw_distance_rings__(
+        self,
+        framebuffer: pygame.Surface,
+        scope_range: Tuple[int, int]
+    ) -> int:
+        """
+        Draws rings that indicate how far out another aircraft is.
+        Each ring represents 5 units. The spacing will always be
+        the same no matter what the units are.
+
+        Args:
+            framebuffer {pygame.Surface} -- The render target.
+
+        Returns:
+            int: The distance (in pixels from the center to the first ring. Used for clutter control.)
+        """
+
+        max_distance = scope_range[0]
+        ring_distances = self.__get_ring_distances__(scope_range)
+        distance_units = configuration.CONFIGURATION.get_units()
+        units_suffix = units.get_distance_unit_suffix(distance_units)
+        ring_pixel_distances = []
+
         radians = math.radians(30)
         sin_text_placement = math.sin(radians)
         cos_text_placement = math.cos(radians)
@@ -518,8 +544,8 @@ class AdsbTopViewScope(AdsbElement):
 
         with TaskProfiler('views.adsb_top_view_scope.AdsbTopViewScope.setup'):
             scope_range = zoom_tracker.INSTANCE.get_target_zoom()
-            traffic_reports = HudDataCache.get_reliable_traffic()
-            traffic_reports.sort(
+            traffic_reports = sorted(
+                HudDataCache.get_reliable_traffic(),
                 key=lambda traffic: traffic.distance,
                 reverse=True)
 
@@ -532,11 +558,13 @@ class AdsbTopViewScope(AdsbElement):
                 orientation)
 
         with TaskProfiler('views.adsb_top_view_scope.AdsbTopViewScope.render'):
-            self.__render_ownship__(framebuffer)
+            self.__scope_range__ = scope_range
+            self.__scope_geometry__.set_key((scope_range, self.__quality_level__))
+            self.__scope_geometry__.render(framebuffer)
 
-            first_ring_pixel_radius = self.__draw_distance_rings__(
-                framebuffer,
-                scope_range)
+            first_ring_pixel_radius = self.__get_pixel_distance__(
+                self.__get_ring_distances__(scope_range)[0],
+                scope_range[0])
 
             self.__draw_all_compass_headings__(
                 framebuffer,
@@ -546,13 +574,15 @@ class AdsbTopViewScope(AdsbElement):
             if not orientation.gps_online:
                 return
 
-            # pylint: disable=expression-not-assigned
-            [self.__render_on_screen_target__(
-                framebuffer,
-                orientation,
-                traffic,
-                near_target_distance,
-                first_ring_pixel_radius) for traffic in traffic_reports]
+            traffic_geometry.INSTANCE.update(orientation)
+
+            for traffic in traffic_reports:
+                self.__render_on_screen_target__(
+                    framebuffer,
+                    orientation,
+                    traffic,
+                    near_target_distance,
+                    first_ring_pixel_radius)
 
 
 if __name__ == '__main__':
@@ -2,15 +2,26 @@
 View that shows the list of nearby traffic
 """
 
+from configuration import configuration
 from data_sources.ahrs_data import NOT_AVAILABLE, AhrsData
 from data_sources.data_cache import HudDataCache
 from data_sources.traffic import Traffic
 from rendering import colors, text_renderer
 
-from views.adsb_element import AdsbElement, apply_declination
+from views.adsb_element import AdsbElement
+from views.ahrs_element import LayerDependencies, get_whole_number
+from views.hud_elements import apply_declination
 
 
 class AdsbTrafficListing(AdsbElement):
+    # The altitude is only used to the nearest hundred feet,
+    # so the whole number is enough to decide when to redraw.
+    LAYER_DEPENDENCIES = LayerDependencies(
+        ahrs_fields=['gps_online', ('alt', get_whole_number)],
+        config_keys=[configuration.Configuration.DISTANCE_UNITS_KEY],
+        uses_traffic=True,
+        uses_declination=True)
+
     def uses_ahrs(
         self
     ) -> bool:
@@ -51,10 +62,7 @@ class AdsbTrafficListing(AdsbElement):
         max_string_lengths: list
     ):
         identifier = report[0]
-        try:
-            bearing = str(apply_declination(float(report[1])))
-        except:
-            bearing = str(report[1])
+        bearing = str(report[1])
         distance_text = report[2]
         altitude = report[3]
         delta = report[4]
@@ -91,14 +99,21 @@ class AdsbTrafficListing(AdsbElement):
         traffic: Traffic,
         orientation: AhrsData
     ):
+        # The listing is a layer that is only redrawn when a report arrives,
+        # so it shows the reported values, not the dead reckoned ones.
         identifier = str(traffic.get_display_name())
         display_alt = int(traffic.altitude)
         distance_text = self.__get_distance_string__(traffic.distance, True) if orientation.gps_online else NOT_AVAILABLE
         altitude_text = "{0}".format(display_alt)
-        bearing_text = "{0:.0f}".format(apply_declination(traffic.bearing)) if orientation.gps_online else NOT_AVAILABLE
-        alt_delta = int(((display_alt - orientation.alt) / 100) + 0.5)
-        alt_sign = "+" if alt_delta >= 0 else ""
-        delta_text = "{0}{1}".format(alt_sign, alt_delta)
+        bearing_text = "{0}".format(apply_declination(traffic.bearing)) \
+            if orientation.gps_online and traffic.bearing is not None else NOT_AVAILABLE
+
+        if isinstance(orientation.alt, (int, float)):
+            alt_delta = int(((display_alt - orientation.alt) / 100) + 0.5)
+            alt_sign = "+" if alt_delta >= 0 else ""
+            delta_text = "{0}{1}".format(alt_sign, alt_delta)
+        else:
+            delta_text = NOT_AVAILABLE
 
         return [identifier, bearing_text, distance_text, altitude_text, delta_text, traffic.icao_address]
 
@@ -2,7 +2,10 @@
 Base class for AHRS view elements.
 """
 
+import time
+
 from data_sources.ahrs_data import AhrsData
+from data_sources.data_cache import HudDataCache
 from common_utils import tasks, units
 from configuration import configuration
 from rendering import colors, display, text_renderer
@@ -12,7 +15,125 @@ def __get_default_text_background_color__() -> list:
     return colors.BLACK if display.IS_OPENGL else None
 
 
+class LayerDependencies(object):
+    """
+    Declares everything that decides what an element draws.
+
+    When none of the inputs have changed since the last frame
+    the HUD can re-use what the element drew last time
+    instead of asking it to render again.
+    """
+
+    def __init__(
+        self,
+        ahrs_fields: list = None,
+        config_keys: list = None,
+        uses_traffic: bool = False,
+        uses_traffic_availability: bool = False,
+        uses_declination: bool = False,
+        uses_wall_clock_second: bool = False
+    ) -> None:
+        """
+        Creates the set of dependencies.
+
+        Arguments:
+            ahrs_fields {list} -- The AhrsData fields that are drawn. An entry may be a (name, function) pair to reduce the field to what is actually shown.
+            config_keys {list} -- Configuration values that change the output.
+            uses_traffic {bool} -- Does the element draw the traffic from the HudDataCache?
+            uses_traffic_availability {bool} -- Does the element only care if traffic is available?
+            uses_declination {bool} -- Does the element apply the declination?
+            uses_wall_clock_second {bool} -- Does the output change with the time of day? (blinking, timers)
+        """
+
+        super().__init__()
+
+        self.__ahrs_fields__ = [
+            (field, None) if isinstance(field, str) else field for field in (ahrs_fields or [])]
+        self.__config_keys__ = list(config_keys or [])
+        self.__uses_traffic__ = uses_traffic
+        self.__uses_traffic_availability__ = uses_traffic or uses_traffic_availability
+        self.__uses_declination__ = uses_declination
+        self.__uses_wall_clock_second__ = uses_wall_clock_second
+
+    def get_key(
+        self,
+        hud_element,
+        orientation: AhrsData
+    ) -> tuple:
+        """
+        Builds a key that only changes when the output of the element would.
+
+        Arguments:
+            hud_element {HudElement} -- The element the key is for.
+            orientation {AhrsData} -- The AHRS data for the frame.
+
+        Returns:
+            tuple -- The current values of all of the dependencies.
+        """
+
+        key = [hud_element.__quality_level__, hud_element.__speed_units__]
+
+        for field, reducer in self.__ahrs_fields__:
+            value = getattr(orientation, field, None)
+            key.append(value if reducer is None else reducer(value))
+
+        for config_key in self.__config_keys__:
+            key.append(configuration.CONFIGURATION.__get_config_value__(config_key, None))
+
+        traffic_snapshot = HudDataCache.get_traffic_snapshot()
+
+        if self.__uses_traffic__:
+            key.append(traffic_snapshot.generation)
+
+        if self.__uses_traffic_availability__:
+            key.append(traffic_snapshot.is_traffic_available)
+
+        if self.__uses_declination__:
+            key.append(configuration.CONFIGURATION.is_declination_enabled())
+            key.append(HudDataCache.DECLINATION)
+
+        if self.__uses_wall_clock_second__:
+            key.append(int(time.time()))
+
+        return tuple(key)
+
+
+def get_whole_number(
+    value
+):
+    """
+    Reduces a numeric AHRS field to the whole number that is displayed.
+    Anything else (such as an INOP string) is returned as-is.
+
+    >>> get_whole_number(1234.56)
+    1234
+    >>> get_whole_number('INOP')
+    'INOP'
+    >>> get_whole_number(None)
+    """
+
+    return int(value) if isinstance(value, (int, float)) else value
+
+
+def get_whole_seconds(
+    value
+):
+    """
+    Reduces a GPS time to the resolution that is displayed.
+
+    >>> get_whole_seconds('2021-03-01 19:22:14.123456+00:00')
+    '2021-03-01 19:22:14'
+    >>> get_whole_seconds(None)
+    """
+
+    return None if value is None else str(value).split('.')[0]
+
+
 class HudElement(object):
+    # The inputs that decide what the element draws.
+    # None means the element has to be rendered every frame.
+    LAYER_DEPENDENCIES = None
+
     def __init__(
         self,
         font,
@@ -48,6 +169,8 @@ class HudElement(object):
         self.__thick_line_width__ = self.__line_width__ >> 1
 
         self.__reduced_visuals__ = reduced_visuals
+        self.__startup_reduced_visuals__ = reduced_visuals
+        self.__quality_level__ = 0
 
         self.__speed_units__ = configuration.CONFIGURATION.__get_config_value__(
             configuration.Configuration.DISTANCE_UNITS_KEY,
@@ -96,6 +219,80 @@ class HudElement(object):
 
         return False
 
+    def get_layer_key(
+        self,
+        orientation: AhrsData
+    ) -> tuple:
+        """
+        Returns a key that changes whenever what the element draws would change.
+        Elements with inputs that can not be described by LAYER_DEPENDENCIES
+        may override this.
+
+        Arguments:
+            orientation {AhrsData} -- The AHRS data for the frame.
+
+        Returns:
+            tuple -- The key, or None if the element must be rendered every frame.
+        """
+
+        if self.LAYER_DEPENDENCIES is None:
+            return None
+
+        return self.LAYER_DEPENDENCIES.get_key(self, orientation)
+
+    def get_quality_levels(
+        self
+    ) -> int:
+        """
+        How many steps of reduced quality does this element support?
+        Level 0 is always full quality.
+
+        By default an element can only turn on reduced visuals,
+        and can not go any further if it started with them.
+
+        Returns:
+            int -- The lowest quality level the element supports.
+        """
+
+        return 0 if self.__startup_reduced_visuals__ else 1
+
+    def get_quality_level(
+        self
+    ) -> int:
+        """
+        Returns the current quality level. 0 is full quality.
+        """
+
+        return self.__quality_level__
+
+    def set_quality_level(
+        self,
+        quality_level: int
+    ) -> None:
+        """
+        Changes how much the element should trade visual quality for speed.
+
+        Arguments:
+            quality_level {int} -- 0 for full quality, up to get_quality_levels()
+        """
+
+        self.__quality_level__ = max(0, min(quality_level, self.get_quality_levels()))
+        self.__apply_quality_level__(self.__quality_level__)
+
+    def __apply_quality_level__(
+        self,
+        quality_level: int
+    ) -> None:
+        """
+        Applies the quality level to the element.
+        Elements with more steps than reduced visuals override this.
+
+        Arguments:
+            quality_level {int} -- The new quality level.
+        """
+
+        self.__reduced_visuals__ = self.__startup_reduced_visuals__ or quality_level > 0
+
     def __get_skid_amount__(
         self,
         orientation: AhrsData
@@ -58,7 +58,8 @@ class AhrsNotAvailable:
         no_setup.stop()
 
         with TaskProfiler("views.ahrs_not_available.AhrsNotAvailable.render"):
-            [element.render(framebuffer) for element in self.__na_draw_commands__]
+            for element in self.__na_draw_commands__:
+                element.render(framebuffer)
 
 
 if __name__ == '__main__':
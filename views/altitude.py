@@ -8,7 +8,7 @@ from common_utils.task_timer import TaskProfiler
 from data_sources.ahrs_data import AhrsData
 from rendering import colors
 
-from views.ahrs_element import AhrsElement
+from views.ahrs_element import AhrsElement, LayerDependencies, get_whole_number
 
 
 def __get_indicated_text__(
@@ -58,6 +58,9 @@ class Altitude(AhrsElement):
     Element to render the Altitude.
     """
 
+    LAYER_DEPENDENCIES = LayerDependencies(
+        ahrs_fields=[('alt', get_whole_number)])
+
     # pylint:disable=unused-argument
     def __init__(
         self,
@@ -60,7 +60,8 @@ class ArtificialHorizon(AhrsElement):
 
         self.__upper_cull__ = -self.__font_height__
         self.__lower_cull__ = self.__height__ + self.__font_height__
-        self.__enable_text_shadow__ = not display.IS_OPENGL and not reduced_visuals
+        self.__startup_text_shadow__ = not display.IS_OPENGL and not reduced_visuals
+        self.__enable_text_shadow__ = self.__startup_text_shadow__
 
         self.__pitch_range__ = int(self.__center_x__ / self.__pixels_per_degree_y__)
 
@@ -69,6 +70,28 @@ class ArtificialHorizon(AhrsElement):
             degrees_of_pitch + 1,
             10)
 
+    def get_quality_levels(
+        self
+    ) -> int:
+        """
+        The first step drops the text shadows (if we have them),
+        the next turns off anti-aliasing.
+
+        Returns:
+            int -- The lowest quality level the element supports.
+        """
+
+        return super().get_quality_levels() + (1 if self.__startup_text_shadow__ else 0)
+
+    def __apply_quality_level__(
+        self,
+        quality_level: int
+    ) -> None:
+        shadow_steps = 1 if self.__startup_text_shadow__ else 0
+
+        self.__enable_text_shadow__ = self.__startup_text_shadow__ and quality_level < 1
+        super().__apply_quality_level__(quality_level - shadow_steps)
+
     def __render_horizon_reference__(
         self,
         framebuffer,
@@ -153,11 +176,11 @@ class ArtificialHorizon(AhrsElement):
                 reference_angle) for reference_angle in angles_to_render]
 
         with TaskProfiler("views.artificial_horizon.ArtificialHorizon.render"):
-            # pylint: disable=expression-not-assigned
-            [self.__render_horizon_reference__(
-                framebuffer,
-                segments,
-                orientation.roll) for segments in segments_centers_and_angles]
+            for segments in segments_centers_and_angles:
+                self.__render_horizon_reference__(
+                    framebuffer,
+                    segments,
+                    orientation.roll)
 
     def __get_segment_endpoints__(
         self,
@@ -63,7 +63,7 @@ class CompassAndHeadingTopElement(AhrsElement):
         for heading in range(361):
             self.__heading_strip__[heading] = self.__generate_heading_strip__(heading)
 
-        self.__heading_box_elements__ = self.__get_hollow_heading_box_elements__()
+        self.__heading_box_geometry__ = drawing.StaticGeometry(self.__get_hollow_heading_box_elements__())
 
     def __get_heading_box_points__(
         self,
@@ -166,12 +166,12 @@ class CompassAndHeadingTopElement(AhrsElement):
             notation_text = "HDG       TRK"
 
         with TaskProfiler("views.compass_and_heading_top_element.CompassAndHeadingTopElement.render"):
-            # pylint:disable=expression-not-assigned
             if not isinstance(heading, str):
-                [self.__render_heading_mark__(
-                    framebuffer,
-                    heading_mark_to_render[0],
-                    heading_mark_to_render[1]) for heading_mark_to_render in self.__heading_strip__[heading]]
+                for heading_mark_x, heading_mark in self.__heading_strip__[heading]:
+                    self.__render_heading_mark__(
+                        framebuffer,
+                        heading_mark_x,
+                        heading_mark)
 
             # Render the text that is showing our AHRS and GPS headings
             self.__render_hollow_heading_box__(
@@ -183,8 +183,7 @@ class CompassAndHeadingTopElement(AhrsElement):
         heading_text: list,
         framebuffer
     ):
-        # pylint:disable=expression-not-assigned
-        [box_element.render(framebuffer) for box_element in self.__heading_box_elements__]
+        self.__heading_box_geometry__.render(framebuffer)
 
         self.__render_horizontal_centered_text__(
             framebuffer,
@@ -4,10 +4,15 @@ from data_sources.ahrs_data import AhrsData
 from rendering import colors
 
 from views import hud_elements
-from views.ahrs_element import AhrsElement
+from views.ahrs_element import AhrsElement, LayerDependencies
 
 
 class GpsNotAvailable(AhrsElement):
+    # The warning blinks with the wall clock.
+    LAYER_DEPENDENCIES = LayerDependencies(
+        ahrs_fields=['gps_online'],
+        uses_wall_clock_second=True)
+
     def __init__(
         self,
         degrees_of_pitch: float,
@@ -6,10 +6,13 @@ from configuration import configuration
 from data_sources.ahrs_data import AhrsData
 from rendering import colors
 
-from views.ahrs_element import AhrsElement
+from views.ahrs_element import AhrsElement, LayerDependencies
 
 
 class Groundspeed(AhrsElement):
+    LAYER_DEPENDENCIES = LayerDependencies(
+        ahrs_fields=['is_avionics_source', 'airspeed', 'groundspeed', 'gps_online'])
+
     def __init__(
         self,
         degrees_of_pitch: float,
@@ -16,6 +16,10 @@ DEFAULT_FONT = "./assets/fonts/LiberationMono-Bold.ttf"
 
 MAX_TARGET_BUGS = 25
 
+# The caps on the number of target bugs that elements
+# step through when they need to trade detail for frame rate.
+REDUCED_TARGET_BUG_LIMITS = [15, 8]
+
 IMPERIAL_FARAWAY = units.yards_to_sm * 5
 IMPERIAL_SUPERCLOSE = units.yards_to_sm / 8.0
 
@@ -6,7 +6,7 @@ to help create a level reference during flight.
 from common_utils.task_timer import TaskProfiler
 from rendering import colors, drawing
 
-from views.ahrs_element import AhrsElement
+from views.ahrs_element import AhrsElement, LayerDependencies
 
 # pylint:disable=unused-argument
 
@@ -17,6 +17,9 @@ class LevelReference(AhrsElement):
     what is level flight.
     """
 
+    # Nothing but the quality level changes what is drawn.
+    LAYER_DEPENDENCIES = LayerDependencies()
+
     def __init__(
         self,
         degrees_of_pitch: float,
@@ -43,7 +46,7 @@ class LevelReference(AhrsElement):
 
         line_width = int(self.__line_width__ * 1.5)
 
-        self.__reference_segments__ = [
+        self.__reference_geometry__ = drawing.StaticGeometry([
             drawing.Segment(
                 artificial_horizon_level[0],
                 artificial_horizon_level[1],
@@ -61,7 +64,7 @@ class LevelReference(AhrsElement):
                 right_hash[1],
                 colors.WHITE,
                 line_width,
-                False)]
+                False)])
 
     def render(
         self,
@@ -76,9 +79,8 @@ class LevelReference(AhrsElement):
         no_setup.start()
         no_setup.stop()
 
-        # pylint:disable=expression-not-assigned
         with TaskProfiler("views.level_reference.LevelReference.render"):
-            [segment.render(framebuffer) for segment in self.__reference_segments__]
+            self.__reference_geometry__.render(framebuffer)
 
 
 if __name__ == '__main__':
@@ -86,26 +86,48 @@ class RollIndicator(AhrsElement):
         self.__slip_skid_box__ = self.__get_current_angle_box_shape__()
         self.__arc_width__ = self.__line_width__
 
+        self.__indicator_geometry__ = drawing.StaticGeometry(self.__build_indicator_elements__())
+
+    def __build_indicator_elements__(
+        self
+    ) -> list:
+        """
+        Builds the parts of the indicator that never move.
+
+        Returns:
+            list: The drawing elements for the arc, marks, and zero reference.
+        """
+
         roll_angle_marks = self.__get_major_roll_indicator_marks__()
 
         is_antialiased = not IS_PI
 
-        self.__indicator_elements__ = [drawing.Segments(self.__indicator_arc__, colors.WHITE, self.__arc_width__, is_antialiased)]
+        indicator_elements = [drawing.Segments(self.__indicator_arc__, colors.WHITE, self.__arc_width__, is_antialiased)]
 
         # Draw the important angle/roll step marks
-        self.__indicator_elements__.extend([drawing.Segment(segment_start, segment_end, colors.WHITE, self.__line_width__, is_antialiased)
-                                            for segment_start, segment_end in roll_angle_marks])
+        indicator_elements.extend([drawing.Segment(segment_start, segment_end, colors.WHITE, self.__line_width__, is_antialiased)
+                                   for segment_start, segment_end in roll_angle_marks])
 
         # Roll scale zero
-        self.__indicator_elements__.append(
+        indicator_elements.append(
             drawing.FilledPolygon(
                 self.__get_upper_angle_reference_shape__(),
                 colors.WHITE,
                 not self.__reduced_visuals__))
 
         if not self.__reduced_visuals__:
-            self.__indicator_elements__.extend([drawing.FilledCircle(segment_start, self.__thin_line_width__, colors.WHITE, is_antialiased)
-                                                for segment_start, segment_end in roll_angle_marks])
+            indicator_elements.extend([drawing.FilledCircle(segment_start, self.__thin_line_width__, colors.WHITE, is_antialiased)
+                                       for segment_start, segment_end in roll_angle_marks])
+
+        return indicator_elements
+
+    def __apply_quality_level__(
+        self,
+        quality_level: int
+    ) -> None:
+        super().__apply_quality_level__(quality_level)
+
+        self.__indicator_geometry__.set_elements(self.__build_indicator_elements__())
 
     def __get_angle_mark_points__(
         self
@@ -304,11 +326,11 @@ class RollIndicator(AhrsElement):
                     is_antialiased)]
 
         with TaskProfiler("views.roll_indicator.RollIndicator.render.indicator_elements"):
-            # pylint:disable=expression-not-assigned
-            [mark.render(framebuffer) for mark in self.__indicator_elements__]
+            self.__indicator_geometry__.render(framebuffer)
 
         with TaskProfiler("views.roll_indicator.RollIndicator.render.indicator_objects"):
-            [indicator.render(framebuffer) for indicator in indicator_objects]
+            for indicator in indicator_objects:
+                indicator.render(framebuffer)
 
 
 if __name__ == '__main__':
@@ -3,10 +3,15 @@ from data_sources.ahrs_data import AhrsData
 from rendering import colors
 
 from views import hud_elements
-from views.ahrs_element import AhrsElement
+from views.ahrs_element import AhrsElement, LayerDependencies, get_whole_seconds
 
 
 class Time(AhrsElement):
+    # The flight duration is derived from the wall clock.
+    LAYER_DEPENDENCIES = LayerDependencies(
+        ahrs_fields=[('utc_time', get_whole_seconds)],
+        uses_wall_clock_second=True)
+
     def __init__(
         self,
         degrees_of_pitch,
@@ -5,10 +5,15 @@ from data_sources.data_cache import HudDataCache
 from rendering import colors
 
 from views import hud_elements
-from views.ahrs_element import AhrsElement
+from views.ahrs_element import AhrsElement, LayerDependencies
 
 
 class TrafficNotAvailable(AhrsElement):
+    # The warning blinks with the wall clock.
+    LAYER_DEPENDENCIES = LayerDependencies(
+        uses_traffic_availability=True,
+        uses_wall_clock_second=True)
+
     def __init__(
         self,
         degrees_of_pitch: float,
@@ -28,7 +33,7 @@ class TrafficNotAvailable(AhrsElement):
         framebuffer,
         orientation: AhrsData
     ):
-        if HudDataCache.IS_TRAFFIC_AVAILABLE:
+        if HudDataCache.get_traffic_snapshot().is_traffic_available:
             return
 
         current_time = datetime.utcnow()